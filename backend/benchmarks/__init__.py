@@ -0,0 +1,7 @@
+"""
+Offline benchmarks for the Chorizaurio API.
+
+Run from the backend directory, e.g.:
+    python -m benchmarks.bench_pdf_parallel
+    python -m benchmarks.suite --output results.json   # full suite, JSON p50/p95/p99
+"""
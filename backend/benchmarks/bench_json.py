@@ -0,0 +1,129 @@
+"""
+Benchmark: JSON response paths for a 5,000-order list.
+
+Each case turns the same DB-shaped rows (pedido tuples plus their
+productos) into the response body:
+
+    stdlib_dicts            per-row dicts + Starlette JSONResponse (stdlib json),
+                            the previous GET /pedidos path
+    response_model          FastAPI's response_model path: validate with the
+                            List[Pedido] field, serialize to Python, JSONResponse
+    rows_response           serialization.rows_response (orjson when installed)
+    tuple_writer            JSON written straight from the row tuples: a key
+                            template per column, one dumps() per value, no
+                            per-row dict (the alternative rows_response rejects)
+    response_serializer     serialization.ResponseSerializer(List[Pedido])
+
+Usage (from backend/):
+    python -m benchmarks.bench_json [--orders 5000] [--iterations 20]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import operator
+import random
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from benchmarks.harness import run_metadata, time_calls
+
+
+def build_rows(orders: int, seed: int = 42):
+    """Pedido tuples in the SELECT order of GET /pedidos, plus productos per pedido"""
+    rnd = random.Random(seed)
+    pedidos = [
+        (i, rnd.randint(1, 500), f"2026-03-{rnd.randint(1, 28):02d}T{rnd.randint(9, 18):02d}:15:00",
+         rnd.choice(["pendiente", "preparando", "entregado"]), None if i % 3 else "Entregar antes de las 10",
+         "vendedor1", f"Almacén Cliente {i}", i % 2, "Juan" if i % 2 else None)
+        for i in range(1, orders + 1)
+    ]
+    productos = {
+        p[0]: [
+            {"id": pid, "producto_id": pid, "nombre": f"Producto {pid}", "precio": round(rnd.uniform(40, 900), 2),
+             "cantidad": rnd.choice([1, 2, 5, 12]), "tipo": "unidad"}
+            for pid in rnd.sample(range(1, 300), rnd.randint(1, 7))
+        ]
+        for p in pedidos
+    }
+    return pedidos, productos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    import models
+    from routers.pedidos import PEDIDO_LIST_COLUMNS
+    from serialization import ORJSON_AVAILABLE, ResponseSerializer, dumps, rows_response
+
+    pedidos, productos = build_rows(args.orders)
+    field = create_model_field(name="Response_get_pedidos", type_=List[models.Pedido], mode="serialization")
+    serializer = ResponseSerializer(List[models.Pedido])
+
+    def as_dicts():
+        return [
+            {"id": p[0], "cliente_id": p[1], "fecha": p[2], "estado": p[3], "notas": p[4],
+             "creado_por": p[5], "cliente_nombre": p[6], "pdf_generado": p[7], "repartidor": p[8],
+             "productos": productos.get(p[0], [])}
+            for p in pedidos
+        ]
+
+    def stdlib_dicts(_):
+        return JSONResponse(as_dicts()).body
+
+    def response_model(_):
+        content = asyncio.run(serialize_response(field=field, response_content=as_dicts()))
+        return JSONResponse(content).body
+
+    def fast_rows(_):
+        return rows_response(PEDIDO_LIST_COLUMNS, ((*p, productos.get(p[0], [])) for p in pedidos)).body
+
+    keys = [b"{" + dumps(PEDIDO_LIST_COLUMNS[0]) + b":"] + [b"," + dumps(c) + b":" for c in PEDIDO_LIST_COLUMNS[1:]]
+
+    def tuple_writer(_):
+        rows = ((*p, productos.get(p[0], [])) for p in pedidos)
+        return b"[" + b"},".join(b"".join(map(operator.add, keys, map(dumps, row))) for row in rows) + b"}]"
+
+    def fast_serializer(_):
+        return serializer(as_dicts()).body
+
+    cases = {
+        "stdlib_dicts": stdlib_dicts,
+        "response_model": response_model,
+        "rows_response": fast_rows,
+        "tuple_writer": tuple_writer,
+        "response_serializer": fast_serializer,
+    }
+    baseline = json.loads(stdlib_dicts(0))
+    results = {}
+    for name, fn in cases.items():
+        body = fn(0)
+        decoded = json.loads(body)
+        # response_model adds the defaulted "cliente": null key
+        same = [{k: v for k, v in o.items() if k != "cliente"} for o in decoded] == baseline
+        results[name] = {"bytes": len(body), "same_content": same, **time_calls(fn, args.iterations, warmup=2)}
+
+    for reference in ("stdlib_dicts", "response_model"):
+        reference_ms = results[reference]["p50_ms"]
+        for result in list(results.values()):
+            result[f"speedup_vs_{reference}"] = round(reference_ms / result["p50_ms"], 2) if result["p50_ms"] else None
+
+    print(json.dumps({
+        "benchmark": "json_response",
+        **run_metadata(),
+        "orjson": ORJSON_AVAILABLE,
+        "orders": args.orders,
+        "productos": sum(len(v) for v in productos.values()),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: middleware overhead on a trivial endpoint.
+
+Compares requests/second through the previous middleware stack (one
+BaseHTTPMiddleware class plus two @app.middleware("http") functions, all
+generating request IDs and timing) with the consolidated pure ASGI
+RequestTrackingMiddleware. GZip and CORS are mounted in both, as in main.py.
+Requests are driven in-process with httpx over ASGI, so the numbers measure
+the application stack only (no network, no server).
+
+Usage (from backend/):
+    python -m benchmarks.bench_middleware [--requests 5000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+
+from logging_config import set_request_id
+from middleware import RequestTrackingMiddleware
+from serialization import TimedJSONResponse
+
+
+def _common(app: FastAPI):
+    @app.get("/api/ping")
+    def ping():
+        return {"ok": True}
+
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    app.add_middleware(
+        CORSMiddleware, allow_origins=["http://localhost"], allow_credentials=True,
+        allow_methods=["*"], allow_headers=["*"], expose_headers=["X-Request-ID"],
+    )
+
+
+def legacy_app() -> FastAPI:
+    """Replica of the stack before the consolidation"""
+    app = FastAPI()
+
+    class LegacyTracking(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            request_id = str(uuid.uuid4())[:8]
+            request.state.request_id = request_id
+            start_time = time.time()
+            response = await call_next(request)
+            response.headers["X-Request-ID"] = request_id
+            response.headers["X-Process-Time"] = f"{(time.time() - start_time) * 1000:.2f}ms"
+            return response
+
+    app.add_middleware(LegacyTracking)
+    _common(app)
+
+    @app.middleware("http")
+    async def request_logging_middleware(request: Request, call_next):
+        request_id = request.headers.get("X-Request-ID") or set_request_id()
+        set_request_id(request_id)
+        start_time = time.time()
+        response = await call_next(request)
+        logging.getLogger("bench").info(f"{request.url.path} {(time.time() - start_time) * 1000:.2f}")
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+    @app.middleware("http")
+    async def add_security_headers(request, call_next):
+        return await call_next(request)
+
+    return app
+
+
+def current_app() -> FastAPI:
+    app = FastAPI(default_response_class=TimedJSONResponse)
+    _common(app)
+    app.add_middleware(RequestTrackingMiddleware)
+    return app
+
+
+async def _drive(app: FastAPI, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):  # warm-up
+            await client.get("/api/ping")
+        remaining = total
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get("/api/ping")
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    # Request logging is part of both stacks but must not dominate the numbers
+    logging.disable(logging.INFO)
+    before = asyncio.run(_drive(legacy_app(), args.requests, args.concurrency))
+    after = asyncio.run(_drive(current_app(), args.requests, args.concurrency))
+
+    print(json.dumps({
+        "benchmark": "middleware",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "before_rps": round(before, 1),
+        "after_rps": round(after, 1),
+        "speedup": round(after / before, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: PDF layout cost (time + output size) for a fixed batch.
+
+Renders the lista de pedidos and the hoja de ruta with the fragment cache
+disabled, so the numbers reflect layout/measurement/Form XObject work only.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_layout [--pedidos 500] [--repeat 5]
+"""
+import argparse
+import json
+import statistics
+import time
+
+import pdf_layout
+import pdf_utils
+from benchmarks.fixtures import make_pedidos
+
+
+def _time(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pedidos", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pedidos, clientes = make_pedidos(args.pedidos)
+    fecha = "01/03/2026 08:00"
+
+    lista_s, lista_pdf = _time(
+        lambda: pdf_utils.generar_pdf_multiple(pedidos, clientes, fecha, parallel=False, use_cache=False),
+        args.repeat)
+    hoja_s, hoja_pdf = _time(
+        lambda: pdf_utils.generar_pdf_hoja_ruta(pedidos, clientes, "Repartidor", fecha, use_cache=False),
+        args.repeat)
+
+    print(json.dumps({
+        "benchmark": "pdf_layout",
+        "pedidos": args.pedidos,
+        "lista_s": round(lista_s, 3),
+        "lista_bytes": len(lista_pdf),
+        "hoja_ruta_s": round(hoja_s, 3),
+        "hoja_ruta_bytes": len(hoja_pdf),
+        "measure_caches": pdf_layout.cache_info(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
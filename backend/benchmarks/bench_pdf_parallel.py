@@ -0,0 +1,57 @@
+"""
+Benchmark: generar_pdf_multiple serial vs. parallel page rendering.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_parallel [--pedidos 1000] [--repeat 3]
+"""
+import argparse
+import json
+import statistics
+import time
+
+import pdf_utils
+from benchmarks.fixtures import make_pedidos
+
+
+def _time(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pedidos", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pedidos, clientes = make_pedidos(args.pedidos)
+    fecha = "01/03/2026 08:00"
+
+    # Warm up the process pool so its spawn cost is not billed to the first run
+    pdf_utils.generar_pdf_multiple(pedidos[:50], clientes, fecha, parallel=True)
+
+    serial_s, serial_pdf = _time(
+        lambda: pdf_utils.generar_pdf_multiple(pedidos, clientes, fecha, parallel=False), args.repeat)
+    parallel_s, parallel_pdf = _time(
+        lambda: pdf_utils.generar_pdf_multiple(pedidos, clientes, fecha, parallel=True), args.repeat)
+
+    print(json.dumps({
+        "benchmark": "pdf_parallel",
+        "pedidos": args.pedidos,
+        "pages": len(pdf_utils.paginar_pedidos(pedidos)),
+        "workers": pdf_utils.PDF_PARALLEL_WORKERS,
+        "serial_s": round(serial_s, 3),
+        "parallel_s": round(parallel_s, 3),
+        "speedup": round(serial_s / parallel_s, 2) if parallel_s else None,
+        "serial_bytes": len(serial_pdf),
+        "parallel_bytes": len(parallel_pdf),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
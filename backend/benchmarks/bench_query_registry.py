@@ -0,0 +1,155 @@
+"""
+Benchmark: per-call overhead of building SQL for the pedidos hot paths.
+
+Compares, without executing anything, the previous per-call work (column
+lookups through _table_columns and the _*_col helpers, optional-column
+lists, f-string SQL, `?` -> `%s` replace for PostgreSQL) with a lookup in
+the query registry (db.get_query), for:
+
+    add_pedido    INSERT pedidos + INSERT detalles_pedido statements
+    get_pedidos   COUNT + paginated SELECT + detalles batch statements
+
+Usage (from backend/):
+    python -m benchmarks.bench_query_registry [--calls 100000]
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.harness import run_metadata
+
+
+def legacy_cols(db, cur):
+    """The former _pedidos_cliente_col / _detalles_*_col helpers"""
+    cols_ped = db._table_columns(cur, "pedidos")
+    cols_det = db._table_columns(cur, "detalles_pedido")
+    return (
+        "cliente_id" if "cliente_id" in cols_ped else "id_cliente",
+        "pedido_id" if "pedido_id" in db._table_columns(cur, "detalles_pedido") else "id_pedido",
+        "producto_id" if "producto_id" in cols_det else "id_producto",
+    )
+
+
+def legacy_add_pedido_sql(db, cur, postgres):
+    """SQL building as add_pedido did it before the registry"""
+    cliente_col, pedido_fk, prod_fk = legacy_cols(db, cur)
+    cols_pedidos = db._table_columns(cur, "pedidos")
+    fields = [cliente_col]
+    for col in ("fecha", "pdf_generado", "fecha_creacion", "creado_por", "notas", "dispositivo", "user_agent"):
+        if col in cols_pedidos:
+            fields.append(col)
+    insert = f"INSERT INTO pedidos ({', '.join(fields)}) VALUES ({', '.join(['?'] * len(fields))})"
+    cols_det = db._table_columns(cur, "detalles_pedido")
+    if "tipo" in cols_det:
+        detalle = f"INSERT INTO detalles_pedido ({pedido_fk}, {prod_fk}, cantidad, tipo) VALUES (?, ?, ?, ?)"
+    else:
+        detalle = f"INSERT INTO detalles_pedido ({pedido_fk}, {prod_fk}, cantidad) VALUES (?, ?, ?)"
+    if postgres:
+        return insert.replace("?", "%s"), detalle.replace("?", "%s")
+    return insert, detalle
+
+
+def legacy_get_pedidos_sql(db, cur, postgres, ids):
+    """SQL building as get_pedidos did it before the registry"""
+    cliente_col, pedido_fk, prod_fk = legacy_cols(db, cur)
+    cols_ped = db._table_columns(cur, "pedidos")
+    cols_det = db._table_columns(cur, "detalles_pedido")
+    pr_cols = db._table_columns(cur, "productos")
+    sel = ["id", cliente_col]
+    for col in ("fecha", "pdf_generado", "fecha_creacion", "fecha_generacion", "creado_por", "generado_por",
+                "notas", "dispositivo", "ultimo_editor", "fecha_ultima_edicion", "estado", "repartidor",
+                "fecha_entrega"):
+        if col in cols_ped:
+            sel.append(col)
+    where_clause = "WHERE (estado = ? OR estado IS NULL)"
+    count = f"SELECT COUNT(*) FROM pedidos {where_clause}"
+    listed = f"SELECT {', '.join(sel)} FROM pedidos {where_clause} ORDER BY id DESC LIMIT 50 OFFSET 0"
+    sel_cols = f"dp.{pedido_fk} as pedido_id, pr.id, pr.nombre, pr.precio, dp.cantidad"
+    if "tipo" in cols_det:
+        sel_cols += ", dp.tipo"
+    if "imagen_url" in pr_cols:
+        sel_cols += ", pr.imagen_url"
+    placeholders = ",".join("?" * len(ids))
+    detalles = (f"SELECT {sel_cols} FROM detalles_pedido dp JOIN productos pr ON dp.{prod_fk} = pr.id "
+                f"WHERE dp.{pedido_fk} IN ({placeholders})")
+    statements = (count, listed, detalles)
+    if postgres:
+        return tuple(s.replace("?", "%s") for s in statements)
+    return statements
+
+
+def registry_add_pedido_sql(db, cur):
+    return db.get_query(cur, "pedido_insert"), db.get_query(cur, "detalle_insert")
+
+
+def registry_get_pedidos_sql(db, cur, ids):
+    """Statement lookups plus the ID_LIST parameter work done by run_query_ids"""
+    if db._schema(cur).postgres:
+        return (
+            db.get_query(cur, "pedidos_count", "pendiente", False),
+            db.get_query(cur, "pedidos_list", "pendiente", False, True),
+            db.get_query(cur, "pedidos_productos"),
+            list(ids),
+        )
+    size = 1 << (len(ids) - 1).bit_length()
+    return (
+        db.get_query(cur, "pedidos_count", "pendiente", False),
+        db.get_query(cur, "pedidos_list", "pendiente", False, True),
+        db.get_query(cur, "pedidos_productos", id_count=size),
+        (*ids, *[ids[-1]] * (size - len(ids))),
+    )
+
+
+def per_call_us(fn, calls):
+    fn()
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return round((time.perf_counter() - start) / calls * 1e6, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix="chorizaurio_bench_") as tmp:
+        os.environ.update({"DB_PATH": os.path.join(tmp, "bench.db"), "USE_POSTGRES": "false"})
+        import db
+        import migrations
+
+        db.DB_PATH = os.environ["DB_PATH"]
+        db.ensure_schema()
+        migrations.run_pending_migrations()
+        ids = list(range(1, 51))
+        results = {}
+        with db.get_db_connection() as con:
+            cur = con.cursor()
+            for dialect, postgres in (("sqlite", False), ("postgres", True)):
+                # Compile the registry for this dialect, as the first request would
+                db.clear_column_cache()
+                db._schema_info = db.SchemaInfo(cur, postgres)
+                for case, legacy, registry in (
+                    ("add_pedido", lambda: legacy_add_pedido_sql(db, cur, postgres),
+                     lambda: registry_add_pedido_sql(db, cur)),
+                    ("get_pedidos", lambda: legacy_get_pedidos_sql(db, cur, postgres, ids),
+                     lambda: registry_get_pedidos_sql(db, cur, ids)),
+                ):
+                    before = per_call_us(legacy, args.calls)
+                    after = per_call_us(registry, args.calls)
+                    results[f"{case}_{dialect}"] = {
+                        "legacy_us": before, "registry_us": after,
+                        "speedup": round(before / after, 2) if after else None,
+                    }
+            db.clear_column_cache()
+
+    print(json.dumps({"benchmark": "query_registry", **run_metadata(), "calls": args.calls,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
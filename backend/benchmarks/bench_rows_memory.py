@@ -0,0 +1,104 @@
+"""
+Benchmark: memory per row of the large read paths, dict rows vs Records.
+
+Each query runs on a seeded tools.gen_data database and is fetched with:
+
+    dicts       db._fetchall_as_dict (a fresh dict per row; sqlite3.Row ->
+                dict(row) on SQLite), the previous materialization
+    records     db.fetchall_records (value tuple + shared column map)
+
+Reported per case: rows, bytes/row still allocated while the result is
+held (tracemalloc, values included), peak bytes/row during the fetch and
+the fetch time.
+
+Usage (from backend/):
+    python -m benchmarks.bench_rows_memory [--scale 1] [--iterations 5]
+"""
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+
+from benchmarks.harness import bench_environment, run_metadata
+
+QUERIES = {
+    "productos_catalog": "SELECT * FROM productos ORDER BY nombre",
+    "reporte_clientes": """
+        SELECT c.id, c.nombre, c.telefono, c.direccion,
+               COUNT(p.id) as total_pedidos,
+               COALESCE(SUM(dp.cantidad * pr.precio), 0) as total_gastado,
+               MAX(DATE(p.fecha)) as ultimo_pedido
+        FROM clientes c
+        LEFT JOIN pedidos p ON p.cliente_id = c.id
+        LEFT JOIN detalles_pedido dp ON dp.pedido_id = p.id
+        LEFT JOIN productos pr ON pr.id = dp.producto_id
+        GROUP BY c.id, c.nombre, c.telefono, c.direccion
+        ORDER BY total_gastado DESC
+    """,
+    "export_pedidos": """
+        SELECT p.id, p.cliente_id, c.nombre as cliente_nombre, p.fecha, p.pdf_generado
+        FROM pedidos p LEFT JOIN clientes c ON p.cliente_id = c.id
+        ORDER BY p.fecha DESC
+    """,
+    "detalles_pedido": "SELECT * FROM detalles_pedido",
+}
+
+
+def measure(cur, sql, fetch):
+    """Bytes held by the fetched rows and the peak while fetching"""
+    cur.execute(sql)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        rows = fetch(cur)
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return len(rows), held - before, peak - before
+
+
+def fetch_ms(cur, sql, fetch, iterations):
+    samples = []
+    for _ in range(iterations):
+        cur.execute(sql)
+        start = time.perf_counter()
+        fetch(cur)
+        samples.append(time.perf_counter() - start)
+    return round(sorted(samples)[len(samples) // 2] * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with bench_environment(args.scale) as env:
+        import db
+
+        fetchers = {"dicts": db._fetchall_as_dict, "records": db.fetchall_records}
+        results = {}
+        with db.get_db_connection() as con:
+            cur = con.cursor()
+            for case, sql in QUERIES.items():
+                result = {}
+                for name, fetch in fetchers.items():
+                    rows, held, peak = measure(cur, sql, fetch)
+                    result["rows"] = rows
+                    result[name] = {
+                        "bytes_per_row": round(held / rows, 1) if rows else None,
+                        "peak_bytes_per_row": round(peak / rows, 1) if rows else None,
+                        "fetch_ms": fetch_ms(cur, sql, fetch, args.iterations),
+                    }
+                before, after = result["dicts"]["bytes_per_row"], result["records"]["bytes_per_row"]
+                result["memory_ratio"] = round(before / after, 2) if before and after else None
+                results[case] = result
+
+    print(json.dumps({"benchmark": "rows_memory", **run_metadata(), "scale": args.scale,
+                      "dataset": env["dataset"], "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
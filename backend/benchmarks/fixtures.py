@@ -0,0 +1,50 @@
+"""
+Synthetic in-memory data shared by the benchmarks.
+Deterministic (seeded) so runs are comparable over time.
+"""
+import random
+from typing import Any, Dict, List, Tuple
+
+_NOMBRES_PRODUCTO = [
+    "Chorizo parrillero", "Morcilla dulce", "Salchicha viena x 12 unidades",
+    "Panceta ahumada feteada", "Bondiola curada", "Jamón cocido natural sin TACC",
+    "Queso muzzarella barra", "Hamburguesa casera de carne vacuna x 4",
+    "Asado de tira", "Vacío", "Pollo entero congelado", "Milanesa de nalga",
+]
+_TIPOS = ["unidad", "caja", "kg", "gancho", "tira"]
+_ZONAS = ["Centro", "Cordón", "Pocitos", "Malvín", "Cerro", "Unión", "Prado"]
+
+
+def make_clientes(n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    return [{
+        "id": i,
+        "nombre": f"Cliente {i} {rnd.choice(['SRL', 'SA', 'Almacén', 'Carnicería'])}",
+        "telefono": f"09{rnd.randint(1000000, 9999999)}",
+        "direccion": f"Calle {rnd.randint(1, 3000)} esq. {rnd.randint(1, 300)}",
+        "zona": rnd.choice(_ZONAS),
+    } for i in range(1, n + 1)]
+
+
+def make_pedidos(n: int, num_clientes: int = 200, seed: int = 42) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Return (pedidos, clientes) shaped like the /pedidos/generar_pdfs payload."""
+    rnd = random.Random(seed)
+    clientes = make_clientes(num_clientes, seed)
+    pedidos = []
+    for i in range(1, n + 1):
+        productos = [{
+            "id": rnd.randint(1, 500),
+            "nombre": rnd.choice(_NOMBRES_PRODUCTO),
+            "cantidad": rnd.randint(1, 20),
+            "precio": round(rnd.uniform(50, 900), 2),
+            "tipo": rnd.choice(_TIPOS),
+        } for _ in range(rnd.randint(1, 8))]
+        pedidos.append({
+            "id": i,
+            "cliente_id": rnd.randint(1, num_clientes),
+            "fecha": f"2026-03-{rnd.randint(1, 28):02d}T{rnd.randint(7, 19):02d}:{rnd.randint(0, 59):02d}:00",
+            "estado": "pendiente",
+            "notas": "Entregar antes de las 10, tocar timbre" if rnd.random() < 0.3 else "",
+            "productos": productos,
+        })
+    return pedidos, clientes
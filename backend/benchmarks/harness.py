@@ -0,0 +1,170 @@
+"""
+Shared harness for the benchmark suite: an isolated app environment on a
+temporary database, latency statistics and an asyncio/httpx load driver.
+
+Everything runs in-process (ASGI transport, no server, no network), so
+results only depend on the code and the machine and can be compared over
+time.
+"""
+import asyncio
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+BENCH_USER = "benchadmin"
+BENCH_PASSWORD = "benchpass123"
+
+
+# ============================================================================
+# ENVIRONMENT
+# ============================================================================
+
+@contextmanager
+def bench_environment(scale: float = 1.0, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """
+    Point every storage at a fresh temp directory, create the schema the way
+    startup does (ensure_schema + migrations + indexes) and seed a
+    deterministic dataset. Must run before db/main are imported.
+    """
+    with tempfile.TemporaryDirectory(prefix="chorizaurio_bench_") as tmp:
+        os.environ.update({
+            "ENVIRONMENT": "test",
+            "SECRET_KEY": os.environ.get("SECRET_KEY", "bench-secret-key"),
+            "DB_PATH": os.path.join(tmp, "bench.db"),
+            "USE_POSTGRES": "false",
+            "PDF_CACHE_PATH": os.path.join(tmp, "pdf_cache.sqlite"),
+            "RATE_LIMIT_STORAGE_URI": "sqlite://" + os.path.join(tmp, "ratelimit.sqlite"),
+            "UPLOAD_DIR": os.path.join(tmp, "uploads"),
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        })
+        import db
+        import migrations
+
+        db.DB_PATH = os.environ["DB_PATH"]
+        db.ensure_schema()
+        migrations.run_pending_migrations()
+        db.ensure_indexes()
+        dataset = seed_dataset(scale, seed)
+        yield {"tmp": tmp, "db_path": db.DB_PATH, "dataset": dataset}
+
+
+def seed_dataset(scale: float = 1.0, seed: int = 42) -> Dict[str, int]:
+    """Load ~120 days of tools.gen_data history plus the benchmark admin user."""
+    import db
+    from passlib.context import CryptContext
+    from tools.gen_data import generate
+
+    report = generate(scale, years=120 / 365, seed=seed, log=lambda msg: None)
+    with db.get_db_transaction() as (con, cur):
+        cur.execute(
+            "INSERT INTO usuarios (username, password_hash, rol, activo) VALUES (?, ?, 'admin', 1)",
+            (BENCH_USER, CryptContext(schemes=["bcrypt"], deprecated="auto").hash(BENCH_PASSWORD))
+        )
+    return {
+        "clientes": report["clientes"]["rows"],
+        "productos": report["productos"]["rows"],
+        "pedidos": report["pedidos"]["rows"],
+        "detalles": report["detalles_pedido"]["rows"],
+    }
+
+
+# ============================================================================
+# STATISTICS
+# ============================================================================
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def summarize(samples: List[float], wall_seconds: Optional[float] = None, errors: int = 0) -> Dict[str, Any]:
+    """Latency distribution in ms plus throughput (ops/s over the wall time)."""
+    ordered = sorted(samples)
+    wall = wall_seconds if wall_seconds is not None else sum(ordered)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "min_ms": round(ordered[0] * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "throughput_per_s": round(len(ordered) / wall, 2) if wall else 0.0,
+    }
+
+
+def time_calls(fn: Callable[[int], Any], iterations: int, warmup: int = 3) -> Dict[str, Any]:
+    """Call fn(i) sequentially and summarize the per-call latency."""
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - start)
+
+
+# ============================================================================
+# LOAD DRIVER
+# ============================================================================
+
+async def drive(
+    send: Callable[[int], Awaitable[Any]],
+    total: int,
+    concurrency: int,
+    ok: Callable[[Any], bool] = lambda response: response.status_code < 400,
+) -> Dict[str, Any]:
+    """
+    Issue total requests from `concurrency` concurrent workers; send(i)
+    performs request i. Returns the latency summary over the wall time.
+    """
+    counter = iter(range(total))
+    samples: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                response = await send(i)
+                success = ok(response)
+            except Exception:
+                success = False
+            samples.append(time.perf_counter() - t0)
+            if not success:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(samples, time.perf_counter() - start, errors)
+
+
+def run_metadata() -> Dict[str, Any]:
+    """Context needed to compare runs: code revision and machine."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
@@ -0,0 +1,148 @@
+"""
+Offline benchmark suite: micro-benchmarks of the hot db.py functions and
+macro scenarios through the full ASGI app, on a temporary seeded database.
+
+Micro (sequential calls, direct):
+    get_pedidos (page / filtered by estado), add_pedido, get_productos_con_precios_lista,
+    get_reporte_* (ventas, inventario, clientes, productos, rendimiento, comparativo)
+Macro (asyncio + httpx over ASGI, concurrent):
+    order_entry_burst      POST /api/pedidos
+    dashboard_refresh      GET  /api/dashboard/{metrics,pedidos_por_dia,alertas}
+    pdf_batch              POST /api/pedidos/generar_pdfs (100 pedidos each)
+
+Every result has count, errors, mean/min/p50/p95/p99/max (ms) and
+throughput, plus run metadata (commit, machine), so JSON files from
+different runs can be diffed.
+
+Usage (from backend/):
+    python -m benchmarks.suite [--scale 1] [--iterations 50] [--requests 200]
+                               [--concurrency 16] [--only micro|macro]
+                               [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict
+
+from benchmarks.harness import (
+    BENCH_PASSWORD, BENCH_USER, bench_environment, drive, run_metadata, time_calls,
+)
+
+
+def run_micro(dataset: Dict[str, int], iterations: int) -> Dict[str, Any]:
+    import db
+
+    rnd = random.Random(7)
+    hasta = date.today().isoformat()
+    desde = (date.today() - timedelta(days=90)).isoformat()
+
+    def nuevo_pedido(_):
+        db.add_pedido({
+            "cliente_id": rnd.randint(1, dataset["clientes"]),
+            "productos": [
+                {"id": p, "cantidad": rnd.randint(1, 10), "tipo": "unidad"}
+                for p in rnd.sample(range(1, dataset["productos"] + 1), 4)
+            ],
+        }, creado_por=BENCH_USER)
+
+    cases = {
+        "get_pedidos_page": lambda _: db.get_pedidos(page=1, limit=50),
+        "get_pedidos_estado": lambda _: db.get_pedidos(page=1, limit=50, estado="pendiente"),
+        "add_pedido": nuevo_pedido,
+        "get_productos_con_precios_lista": lambda i: db.get_productos_con_precios_lista(
+            cliente_id=(i % dataset["clientes"]) + 1),
+        "get_reporte_ventas": lambda _: db.get_reporte_ventas(desde, hasta),
+        "get_reporte_inventario": lambda _: db.get_reporte_inventario(),
+        "get_reporte_clientes": lambda _: db.get_reporte_clientes(),
+        "get_reporte_productos": lambda _: db.get_reporte_productos(desde, hasta),
+        "get_reporte_rendimiento": lambda _: db.get_reporte_rendimiento(),
+        "get_reporte_comparativo": lambda _: db.get_reporte_comparativo(),
+    }
+    results = {}
+    for name, fn in cases.items():
+        results[name] = time_calls(fn, iterations)
+        print(f"  micro {name}: p50={results[name]['p50_ms']}ms p99={results[name]['p99_ms']}ms", file=sys.stderr)
+    return results
+
+
+async def run_macro(dataset: Dict[str, int], requests: int, concurrency: int) -> Dict[str, Any]:
+    import httpx
+    import main
+
+    main.limiter.enabled = False
+    rnd = random.Random(11)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        login = await client.post("/api/login", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+        login.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+
+        def order(i):
+            return client.post("/api/pedidos", json={
+                "cliente_id": rnd.randint(1, dataset["clientes"]),
+                "productos": [
+                    {"id": p, "cantidad": rnd.randint(1, 10), "tipo": "unidad"}
+                    for p in rnd.sample(range(1, dataset["productos"] + 1), 4)
+                ],
+            })
+
+        dashboard_paths = ["/api/dashboard/metrics", "/api/dashboard/pedidos_por_dia", "/api/dashboard/alertas"]
+
+        def dashboard(i):
+            return client.get(dashboard_paths[i % len(dashboard_paths)])
+
+        def pdf_batch(i):
+            start = (i * 100) % max(1, dataset["pedidos"] - 100) + 1
+            return client.post("/api/pedidos/generar_pdfs", json={"pedido_ids": list(range(start, start + 100))})
+
+        scenarios = {
+            "order_entry_burst": (order, requests, concurrency),
+            "dashboard_refresh": (dashboard, requests * 3, concurrency * 2),
+            "pdf_batch": (pdf_batch, max(4, requests // 20), min(concurrency, 4)),
+        }
+        results = {}
+        for name, (send, total, workers) in scenarios.items():
+            await drive(send, min(total, 10), workers)  # warm-up
+            results[name] = {"concurrency": workers, **await drive(send, total, workers)}
+            print(f"  macro {name}: p50={results[name]['p50_ms']}ms p99={results[name]['p99_ms']}ms "
+                  f"{results[name]['throughput_per_s']}/s errors={results[name]['errors']}", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="dataset size factor (1 = ~8700 pedidos)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=50, help="calls per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="requests per macro scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", choices=["micro", "macro"])
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with bench_environment(args.scale, args.seed) as env:
+        document = {
+            "benchmark": "suite",
+            **run_metadata(),
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+            "dataset": env["dataset"],
+        }
+        if args.only != "macro":
+            document["micro"] = run_micro(env["dataset"], args.iterations)
+        if args.only != "micro":
+            document["macro"] = asyncio.run(run_macro(env["dataset"], args.requests, args.concurrency))
+
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
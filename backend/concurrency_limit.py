@@ -0,0 +1,205 @@
+"""
+Adaptive concurrency limit and load shedding, per worker (pure ASGI).
+
+Requests beyond the current limit no longer pile up in the threadpool and
+the database where they slow down everyone. Instead:
+- critical requests (POST /api/pedidos, POST /api/login, health checks)
+  are always admitted; they still count as in flight
+- normal requests wait FIFO for a free slot, up to
+  CONCURRENCY_QUEUE_TIMEOUT_MS and at most `limit` of them
+- low-priority requests (the query_deadline "reports" class: reportes,
+  estadisticas, dashboard, exports) are shed as soon as the worker is at
+  its limit
+Shed requests get 503 with Retry-After.
+
+The limit adapts to latency (gradient algorithm): a short and a long
+moving average of request latency are compared; while recent latency stays
+within CONCURRENCY_RTT_TOLERANCE x the long-term average the limit grows
+(by about sqrt(limit) per update, only when it is actually being used),
+and it shrinks proportionally as latency climbs, between
+CONCURRENCY_MIN_LIMIT and CONCURRENCY_MAX_LIMIT.
+
+Metrics: concurrency_limit, concurrency_in_flight, concurrency_queue_depth
+and requests_shed_total{priority}.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque
+
+import query_deadline
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CONCURRENCY_LIMIT_ENABLED = os.getenv("CONCURRENCY_LIMIT_ENABLED", "true").lower() == "true"
+CONCURRENCY_INITIAL_LIMIT = int(os.getenv("CONCURRENCY_INITIAL_LIMIT", "20"))
+CONCURRENCY_MIN_LIMIT = int(os.getenv("CONCURRENCY_MIN_LIMIT", "4"))
+CONCURRENCY_MAX_LIMIT = int(os.getenv("CONCURRENCY_MAX_LIMIT", "200"))
+CONCURRENCY_QUEUE_TIMEOUT_MS = float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT_MS", "2000"))
+CONCURRENCY_RTT_TOLERANCE = float(os.getenv("CONCURRENCY_RTT_TOLERANCE", "1.5"))
+RETRY_AFTER_SECONDS = int(os.getenv("CONCURRENCY_RETRY_AFTER", "2"))
+
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+
+_CRITICAL_REQUESTS = frozenset({("POST", "/api/pedidos"), ("POST", "/api/login")})
+_CRITICAL_PATHS = frozenset({"/health", "/api/health", "/metrics"})
+
+_SHED_BODY = (
+    b'{"error":"Servidor ocupado, intente nuevamente en unos segundos",'
+    b'"code":"SERVICE_UNAVAILABLE"}'
+)
+
+
+def request_priority(method: str, path: str) -> str:
+    """critical / normal / low (see the module docstring)"""
+    if (method, path.rstrip("/")) in _CRITICAL_REQUESTS or path in _CRITICAL_PATHS:
+        return CRITICAL
+    if query_deadline.route_class(method, path) == "reports":
+        return LOW
+    return NORMAL
+
+
+class GradientLimit:
+    """Concurrency limit estimated from the latency of completed requests"""
+
+    def __init__(
+        self,
+        initial: float = CONCURRENCY_INITIAL_LIMIT,
+        min_limit: float = CONCURRENCY_MIN_LIMIT,
+        max_limit: float = CONCURRENCY_MAX_LIMIT,
+        tolerance: float = CONCURRENCY_RTT_TOLERANCE,
+        smoothing: float = 0.2,
+        short_window: int = 10,
+        long_window: int = 500,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self._short_alpha = 2 / (short_window + 1)
+        self._long_alpha = 2 / (long_window + 1)
+        self.short_rtt = 0.0
+        self.long_rtt = 0.0
+
+    def update(self, rtt: float, in_flight: int) -> float:
+        """Add one latency sample (seconds) observed with in_flight requests running"""
+        if self.long_rtt == 0.0:
+            self.short_rtt = self.long_rtt = rtt
+            return self.limit
+        self.short_rtt += (rtt - self.short_rtt) * self._short_alpha
+        self.long_rtt += (rtt - self.long_rtt) * self._long_alpha
+        # Latency dropped well below the long-term average (load went away):
+        # let the baseline catch up instead of holding the limit down
+        if self.long_rtt > 2 * self.short_rtt:
+            self.long_rtt *= 0.95
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        if new_limit > self.limit and in_flight < self.limit / 2:
+            return self.limit  # not using the limit: no evidence it can grow
+        new_limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+        self.limit = max(self.min_limit, min(self.max_limit, new_limit))
+        return self.limit
+
+
+class ConcurrencyLimiter:
+    """Admission control for one worker; used from its event loop only"""
+
+    def __init__(self, limit: GradientLimit = None, queue_timeout: float = CONCURRENCY_QUEUE_TIMEOUT_MS / 1000):
+        self.limit = limit or GradientLimit()
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._queue: Deque[asyncio.Future] = deque()
+        self.shed = {CRITICAL: 0, NORMAL: 0, LOW: 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit.limit)
+
+    async def acquire(self, priority: str) -> bool:
+        """True once admitted (call release() when done); False: shed"""
+        if priority == CRITICAL or (self._has_slot() and not self._queue):
+            self.in_flight += 1
+            return True
+        if priority == LOW or len(self._queue) >= int(self.limit.limit):
+            self.shed[priority] += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return True  # admitted just as the timeout fired
+            waiter.cancel()
+            self._queue.remove(waiter)
+            self.shed[priority] += 1
+            return False
+        except asyncio.CancelledError:
+            # Client went away while queued: give back a slot handed to us
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)
+            else:
+                waiter.cancel()
+                self._queue.remove(waiter)
+            raise
+        return True
+
+    def release(self, rtt: float = None) -> None:
+        """A request finished; rtt (seconds) feeds the limit, None skips the sample"""
+        self.in_flight -= 1
+        if rtt is not None:
+            self.limit.update(rtt, self.in_flight + 1)
+        while self._queue and self._has_slot():
+            waiter = self._queue.popleft()
+            if not waiter.done():
+                self.in_flight += 1  # the slot passes straight to the waiter
+                waiter.set_result(None)
+
+
+limiter = ConcurrencyLimiter()
+
+
+class ConcurrencyLimitMiddleware:
+    """Admit, queue or shed each HTTP request through the worker's limiter"""
+
+    def __init__(self, app, limiter: ConcurrencyLimiter = limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not CONCURRENCY_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        priority = request_priority(scope["method"], scope["path"])
+        if not await self.limiter.acquire(priority):
+            logger.warning(
+                "request_shed", method=scope["method"], path=scope["path"], priority=priority,
+                limit=int(self.limiter.limit.limit), in_flight=self.limiter.in_flight,
+            )
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_SHED_BODY)).encode("latin-1")),
+                    (b"retry-after", str(RETRY_AFTER_SECONDS).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _SHED_BODY})
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(time.perf_counter() - start)
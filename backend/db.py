@@ -2,21 +2,18 @@ import os
 import re
 import sqlite3
 import logging
-import base64
-import gzip
 import json
+import time
 from datetime import datetime, timezone, timedelta
+from collections.abc import Mapping
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple, Union
 from contextlib import contextmanager
 
-# PostgreSQL support with connection pooling
-try:
-    import psycopg2
-    import psycopg2.extras
-    import psycopg2.pool
-    POSTGRES_AVAILABLE = True
-except ImportError:
-    POSTGRES_AVAILABLE = False
+import query_deadline
+import query_stats
+import sqlite_tuning
+from pg_pool import ConnectionPool
 
 logger = logging.getLogger(__name__)
 
@@ -28,91 +25,156 @@ DATABASE_URL = os.getenv("DATABASE_URL", "")  # PostgreSQL connection string
 USE_POSTGRES = os.getenv("USE_POSTGRES", "false").lower() == "true"
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
+# PostgreSQL support with connection pooling (psycopg2 is not imported by
+# SQLite deployments)
+POSTGRES_AVAILABLE = False
+if USE_POSTGRES:
+    try:
+        import psycopg2
+        import psycopg2.extras
+        POSTGRES_AVAILABLE = True
+    except ImportError:
+        pass
+
 # Connection pool settings
 PG_POOL_MIN_CONN = int(os.getenv("PG_POOL_MIN_CONN", "2"))
 PG_POOL_MAX_CONN = int(os.getenv("PG_POOL_MAX_CONN", "20"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "10"))  # seconds waiting for a free connection
+PG_POOL_PING_AFTER = float(os.getenv("PG_POOL_PING_AFTER", "30"))  # idle seconds before a pre-ping
+PG_POOL_MAX_LIFETIME = float(os.getenv("PG_POOL_MAX_LIFETIME", "1800"))
+PG_POOL_LEAK_SECONDS = float(os.getenv("PG_POOL_LEAK_SECONDS", "60"))
 
 # Global connection pool (initialized lazily)
-_pg_pool: Optional["psycopg2.pool.ThreadedConnectionPool"] = None
+_pg_pool: Optional[ConnectionPool] = None
 
 
-def _init_sqlite_from_base64():
-    """
-    Initialize SQLite database from base64-encoded secret file if available.
-    Supports both plain base64 (.b64) and gzip-compressed base64 (.gz.b64).
-    This is used in Render where we can't upload binary files directly.
-    """
-    # Try compressed version first (smaller)
-    gz_b64_path = "/etc/secrets/ventas.db.gz.b64"
-    b64_path = "/etc/secrets/ventas.db.b64"
-    
-    source_path = None
-    is_gzipped = False
-    
-    if os.path.exists(gz_b64_path):
-        source_path = gz_b64_path
-        is_gzipped = True
-    elif os.path.exists(b64_path):
-        source_path = b64_path
-        is_gzipped = False
-    else:
-        logger.info("No base64 database file found in /etc/secrets/, using default DB_PATH")
-        return
-    
-    # Force recreate if env var is set (useful after uploading new database)
-    force_recreate = os.getenv("FORCE_DB_RECREATE", "false").lower() == "true"
-    if force_recreate:
-        logger.info("FORCE_DB_RECREATE is set, will recreate database from base64")
-        if os.path.exists(DB_PATH):
-            os.remove(DB_PATH)
-            logger.info(f"Removed existing database at {DB_PATH}")
-    
-    # CRITICAL: Only restore from backup if DB doesn't exist or force_recreate is set
-    # This prevents overwriting live production data on every container restart
-    if os.path.exists(DB_PATH) and not force_recreate:
-        try:
-            # Verify DB is valid
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.execute("SELECT COUNT(*) FROM usuarios")
-            count = cursor.fetchone()[0]
-            conn.close()
-            if count > 0:
-                logger.info(f"SQLite database already exists at {DB_PATH} ({count} users) - skipping restore")
-                return
-        except Exception as e:
-            logger.warning(f"Existing database is invalid, will restore from base64: {e}")
-    
+# -----------------------------------------------------------------------------
+# Instrumented cursors: every statement is reported to query_stats (per-request
+# time and count for Server-Timing, slow-query log, N+1 detection) and runs
+# under the deadline of the request's route class (query_deadline)
+# -----------------------------------------------------------------------------
+def _explain_sqlite(con, sql, parameters) -> str:
+    # Runs while the slow statement's rows are still being fetched: its
+    # deadline is lifted for the EXPLAIN only, then applies to the fetch again
+    deadline, con.deadline = con.deadline, None
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        
-        # Read base64 file
-        with open(source_path, 'r') as f:
-            b64_content = f.read().strip()
-        
-        # Decode base64
-        compressed_or_raw = base64.b64decode(b64_content)
-        
-        # Decompress if gzipped
-        if is_gzipped:
-            db_bytes = gzip.decompress(compressed_or_raw)
-            logger.info(f"Decompressed gzip data: {len(compressed_or_raw)} -> {len(db_bytes)} bytes")
-        else:
-            db_bytes = compressed_or_raw
-        
-        # Write to DB_PATH
-        with open(DB_PATH, 'wb') as f:
-            f.write(db_bytes)
-        
-        logger.info(f"Successfully decoded database from {source_path} to {DB_PATH} ({len(db_bytes)} bytes)")
-    except Exception as e:
-        logger.error(f"Failed to decode base64 database: {e}")
-        raise
+        rows = con.cursor(sqlite3.Cursor).execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    finally:
+        con.deadline = deadline
+    return " | ".join(row[3] for row in rows)
+
 
+class _TimedSQLiteCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        self.connection.start_statement()
+        start = time.perf_counter()
+        try:
+            result = super().execute(sql, parameters)
+        except sqlite3.OperationalError as e:
+            query_stats.record_query(sql, time.perf_counter() - start)
+            if self.connection.past_deadline():
+                raise query_deadline.timed_out(sql) from e
+            raise
+        except BaseException:
+            query_stats.record_query(sql, time.perf_counter() - start)
+            raise
+        query_stats.record_query(
+            sql, time.perf_counter() - start, lambda: _explain_sqlite(self.connection, sql, parameters)
+        )
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection.start_statement()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        except sqlite3.OperationalError as e:
+            if self.connection.past_deadline():
+                raise query_deadline.timed_out(sql) from e
+            raise
+        finally:
+            query_stats.record_query(sql, time.perf_counter() - start)
+
+
+class _TimedSQLiteConnection(sqlite3.Connection):
+    # time.monotonic() by which the running statement must finish (None: no deadline).
+    # Checked by the progress handler installed in conectar(), which interrupts
+    # the statement (also while its rows are being fetched) once it has passed
+    deadline: Optional[float] = None
+
+    def start_statement(self):
+        timeout = query_deadline.statement_timeout()
+        self.deadline = time.monotonic() + timeout if timeout else None
 
-# Initialize SQLite from base64 if available (runs on module load)
-if not USE_POSTGRES:
-    _init_sqlite_from_base64()
+    def past_deadline(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def cursor(self, factory=_TimedSQLiteCursor):
+        return super().cursor(factory)
+
+    # Connection.execute() would otherwise create an uninstrumented cursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _explain_pg(con, query, vars) -> str:
+    # Runs inside the caller's transaction: a failing EXPLAIN must not abort it
+    with con.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute("SAVEPOINT query_stats_explain")
+        try:
+            cur.execute("EXPLAIN " + query, vars)  # EXPLAIN EXECUTE for prepared statements
+            plan = " | ".join(row[0].strip() for row in cur.fetchall())
+        except Exception:
+            cur.execute("ROLLBACK TO SAVEPOINT query_stats_explain")
+            raise
+        cur.execute("RELEASE SAVEPOINT query_stats_explain")
+        return plan
+
+
+if POSTGRES_AVAILABLE:
+    class _TimedPgCursor(psycopg2.extensions.cursor):
+        def execute(self, query, vars=None):
+            start = time.perf_counter()
+            try:
+                result = super().execute(query, vars)
+            except psycopg2.extensions.QueryCanceledError as e:
+                query_stats.record_query(query, time.perf_counter() - start)
+                raise query_deadline.timed_out(query) from e
+            except BaseException:
+                query_stats.record_query(query, time.perf_counter() - start)
+                raise
+            query_stats.record_query(
+                query, time.perf_counter() - start, lambda: _explain_pg(self.connection, query, vars)
+            )
+            return result
+
+        def executemany(self, query, vars_list):
+            start = time.perf_counter()
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                query_stats.record_query(query, time.perf_counter() - start)
+
+    class _PgConnection(psycopg2.extensions.connection):
+        """Pooled connection that remembers the registry statements it has PREPAREd"""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.prepared_statements: Dict[str, int] = {}  # name -> schema version
+            self.statement_timeout_ms: Optional[int] = None  # last value SET (None: server default)
+
+
+def _connect_pg():
+    return psycopg2.connect(DATABASE_URL, connection_factory=_PgConnection, cursor_factory=_TimedPgCursor)
+
+
+def _ping_pg(con) -> None:
+    # Plain cursor: pre-pings are not application queries for query_stats
+    with con.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute("SELECT 1")
 
 
 def _get_pg_pool():
@@ -120,18 +182,34 @@ def _get_pg_pool():
     global _pg_pool
     if _pg_pool is None and POSTGRES_AVAILABLE and DATABASE_URL:
         try:
-            _pg_pool = psycopg2.pool.ThreadedConnectionPool(
-                PG_POOL_MIN_CONN,
-                PG_POOL_MAX_CONN,
-                DATABASE_URL
+            _pg_pool = ConnectionPool(
+                _connect_pg,
+                minconn=PG_POOL_MIN_CONN,
+                maxconn=PG_POOL_MAX_CONN,
+                acquire_timeout=PG_POOL_TIMEOUT,
+                ping_after=PG_POOL_PING_AFTER,
+                max_lifetime=PG_POOL_MAX_LIFETIME,
+                leak_after=PG_POOL_LEAK_SECONDS,
+                ping=_ping_pg,
+            )
+            logger.info(
+                f"PostgreSQL connection pool initialized (min={PG_POOL_MIN_CONN}, max={PG_POOL_MAX_CONN}, "
+                f"timeout={PG_POOL_TIMEOUT:g}s)"
             )
-            logger.info(f"PostgreSQL connection pool initialized (min={PG_POOL_MIN_CONN}, max={PG_POOL_MAX_CONN})")
         except Exception as e:
             logger.error(f"Failed to create PostgreSQL connection pool: {e}")
             raise
     return _pg_pool
 
 
+def close_pg_pool():
+    """Close the PostgreSQL pool; the next connection opens a new one (e.g. in a forked worker)"""
+    global _pg_pool
+    pool, _pg_pool = _pg_pool, None
+    if pool is not None:
+        pool.closeall()
+
+
 def validate_production_config():
     """Validate that production environment has proper configuration"""
     if ENVIRONMENT == "production":
@@ -223,15 +301,33 @@ def _dict_factory_pg(cursor, row):
 
 
 def conectar_postgres():
-    """Connect to PostgreSQL database using connection pool"""
+    """Connect to PostgreSQL database using connection pool (waits up to PG_POOL_TIMEOUT, then PoolTimeout)"""
     pool = _get_pg_pool()
     if pool is None:
         raise RuntimeError("PostgreSQL connection pool not available")
     con = pool.getconn()
     con.autocommit = False
+    try:
+        _apply_statement_timeout(con)
+    except Exception:
+        release_pg_connection(con)
+        raise
     return con
 
 
+def _apply_statement_timeout(con) -> None:
+    """SET statement_timeout for the current route class, only when the connection has another value"""
+    timeout = query_deadline.statement_timeout()
+    timeout_ms = int(timeout * 1000) if timeout else 0
+    if con.statement_timeout_ms == timeout_ms:
+        return
+    with con.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute("SET statement_timeout = %s", (timeout_ms,))
+    # Committed so the pool's rollback on release does not undo it
+    con.commit()
+    con.statement_timeout_ms = timeout_ms
+
+
 def release_pg_connection(con):
     """Return a PostgreSQL connection to the pool"""
     if _pg_pool is not None and con is not None:
@@ -247,7 +343,7 @@ def conectar() -> Union[sqlite3.Connection, Any]:
         return conectar_postgres()
     
     # SQLite connection with production-hardened settings
-    con = sqlite3.connect(DB_PATH, timeout=30)
+    con = sqlite3.connect(DB_PATH, timeout=30, factory=_TimedSQLiteConnection)
     con.row_factory = sqlite3.Row
     
     # CRITICAL: These PRAGMAs are CONNECTION-LEVEL and must be set on EVERY connection
@@ -256,11 +352,10 @@ def conectar() -> Union[sqlite3.Connection, Any]:
     con.execute("PRAGMA busy_timeout=30000")  # 30 seconds
     # foreign_keys: Enforce referential integrity
     con.execute("PRAGMA foreign_keys=ON")
-    # query_timeout: Prevent runaway queries from hanging (requires SQLite 3.41+)
-    try:
-        con.execute("PRAGMA query_timeout=10000")  # 10 seconds max per query
-    except Exception:
-        pass  # Older SQLite versions don't support this
+    # Storage tuning profile: synchronous, cache, mmap, temp store, WAL limits
+    sqlite_tuning.apply_profile(con)
+    # Per-statement deadlines: a non-zero return interrupts the statement
+    con.set_progress_handler(con.past_deadline, query_deadline.QUERY_PROGRESS_OPS)
     # NOTE: 'zona' column migration handled by ensure_schema() at startup
     return con
 
@@ -292,6 +387,93 @@ def _fetchone_as_dict(cur) -> Optional[Dict[str, Any]]:
     return dict(row)
 
 
+# -----------------------------------------------------------------------------
+# Compact rows
+# -----------------------------------------------------------------------------
+class Record(Mapping):
+    """
+    Read-only row: the driver's value tuple plus a column -> index map shared by
+    every row of the result set (one subclass per column list, see _record_type).
+
+    Reads like the dicts from _fetchall_as_dict (row["col"], .get(), .keys(),
+    .items(), dict(row), == dict) and also by position like sqlite3.Row, at
+    about a third of the memory of a dict per row. Use to_dict() where a
+    mutable copy is needed.
+    """
+
+    __slots__ = ("_values",)
+    _columns: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __init__(self, values: tuple):
+        self._values = values
+
+    def __getitem__(self, key):
+        if key.__class__ is int:
+            return self._values[key]
+        return self._values[self._index[key]]
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else self._values[index]
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._columns
+
+    def values(self) -> tuple:
+        return self._values
+
+    def items(self):
+        return zip(self._columns, self._values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._columns, self._values))
+
+    def __repr__(self) -> str:
+        return f"Record({self.to_dict()!r})"
+
+
+@lru_cache(maxsize=256)
+def _record_type(columns: Tuple[str, ...]) -> type:
+    """Record subclass holding the column map for one column list"""
+    index = {}
+    for position, name in enumerate(columns):
+        index.setdefault(name, position)  # duplicate names: first wins, like sqlite3.Row
+    return type("Record", (Record,), {"__slots__": (), "_columns": columns, "_index": index})
+
+
+def _cursor_columns(cur) -> Tuple[str, ...]:
+    """Column names of the last statement (col[0] is the name in both drivers)"""
+    return tuple(col[0] for col in cur.description) if cur.description else ()
+
+
+def _fetch_tuples(cur) -> list:
+    """fetchall() as plain value tuples, skipping the sqlite3.Row factory"""
+    if is_postgres():
+        return cur.fetchall()
+    row_factory = cur.row_factory
+    cur.row_factory = None
+    try:
+        return cur.fetchall()
+    finally:
+        cur.row_factory = row_factory
+
+
+def fetchall_records(cur) -> List[Record]:
+    """Fetch all results as Records; for large reads (catalogs, reports, exports)"""
+    record = _record_type(_cursor_columns(cur))
+    return [record(row) for row in _fetch_tuples(cur)]
+
+
 @contextmanager
 def get_db_connection():
     """Context manager para conexiones de base de datos con manejo automático de errores"""
@@ -388,7 +570,12 @@ _COLUMN_CACHE: Dict[str, List[str]] = {}
 
 def clear_column_cache() -> None:
     """Clear cached table column names. Call after schema migrations."""
+    global _schema_version, _schema_info
     _COLUMN_CACHE.clear()
+    # Compiled statements depend on the columns: start a new schema version
+    _COMPILED_QUERIES.clear()
+    _schema_info = None
+    _schema_version += 1
 
 
 def _table_columns(cur, table: str) -> List[str]:
@@ -419,6 +606,170 @@ def _has_column(cur, table: str, col: str) -> bool:
     return col in _table_columns(cur, table)
 
 
+# -----------------------------------------------------------------------------
+# Query registry: hot-path statements compiled once per schema version
+# -----------------------------------------------------------------------------
+# Statements are registered by name with a builder that gets the resolved
+# schema (legacy column variants, optional columns) and returns SQL with `?`
+# placeholders. The first use after a schema change compiles it for the
+# active dialect and caches the final SQL, so callers only pay a dict lookup.
+# On PostgreSQL non-variant statements are also PREPAREd once per pooled
+# connection and run with EXECUTE (disable with PG_PREPARED_STATEMENTS=false,
+# e.g. behind a transaction-pooling proxy).
+
+PG_PREPARED_STATEMENTS = os.getenv("PG_PREPARED_STATEMENTS", "true").lower() == "true"
+
+_schema_version = 0
+_schema_info: Optional["SchemaInfo"] = None
+_QUERY_BUILDERS: Dict[str, Any] = {}
+_COMPILED_QUERIES: Dict[Tuple, "CompiledQuery"] = {}
+
+
+class SchemaInfo:
+    """Column layout of the hot tables, with legacy column variants resolved"""
+
+    __slots__ = ("postgres", "columns", "pedido_cliente", "detalle_pedido", "detalle_producto")
+
+    def __init__(self, cur, postgres: bool):
+        self.postgres = postgres
+        self.columns = {
+            table: frozenset(_table_columns(cur, table))
+            for table in ("pedidos", "detalles_pedido", "productos", "clientes")
+        }
+        self.pedido_cliente = "cliente_id" if "cliente_id" in self.columns["pedidos"] else "id_cliente"
+        self.detalle_pedido = "pedido_id" if "pedido_id" in self.columns["detalles_pedido"] else "id_pedido"
+        self.detalle_producto = "producto_id" if "producto_id" in self.columns["detalles_pedido"] else "id_producto"
+
+    def has(self, table: str, column: str) -> bool:
+        return column in self.columns[table]
+
+
+def _schema(cur) -> SchemaInfo:
+    global _schema_info
+    info = _schema_info
+    if info is None:
+        info = _schema_info = SchemaInfo(cur, bool(is_postgres()))
+    return info
+
+
+class CompiledQuery:
+    """Final SQL of a registered statement for one dialect and schema version (name = PREPARE name on PostgreSQL)"""
+
+    __slots__ = ("name", "sql", "prepare_sql", "execute_sql", "version")
+
+    def __init__(self, name: str, sql: str, prepare_sql: Optional[str], execute_sql: Optional[str], version: int):
+        self.name = name
+        self.sql = sql
+        self.prepare_sql = prepare_sql
+        self.execute_sql = execute_sql
+        self.version = version
+
+
+def register_query(name: str, prepare: bool = True):
+    """
+    Decorator registering builder(schema, *variant) -> SQL under `name`.
+
+    `ID_LIST(x)` marks a membership filter on a list of ids, run with
+    run_query_ids(): `x = ANY(?)` with one array parameter on PostgreSQL,
+    `x IN (?, ...)` on SQLite. Each variant is compiled (and PREPAREd)
+    separately, so variants must come from a small fixed set (filter
+    combinations), never from data.
+    """
+    def decorator(builder):
+        _QUERY_BUILDERS[name] = (builder, prepare)
+        return builder
+    return decorator
+
+
+_ID_LIST_RE = re.compile(r"ID_LIST\(([^)]+)\)")
+
+
+def _convert_placeholders(sql: str, numbered: bool) -> Tuple[str, int]:
+    """`?` -> `%s` (and `%` -> `%%`) for psycopg2, or `$1..$n` for PREPARE; string literals untouched"""
+    out: List[str] = []
+    count = 0
+    quote = None
+    for ch in sql:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == "?":
+            count += 1
+            out.append(f"${count}" if numbered else "%s")
+            continue
+        if ch == "%" and not numbered:
+            out.append("%%")
+            continue
+        out.append(ch)
+    return "".join(out), count
+
+
+def compile_query(schema: SchemaInfo, name: str, variant: Tuple = (), id_count: int = 0) -> CompiledQuery:
+    """Build and dialect-adapt a registered statement (no caching)"""
+    builder, prepare = _QUERY_BUILDERS[name]
+    sql = " ".join(builder(schema, *variant).split())
+    if schema.postgres:
+        sql = _ID_LIST_RE.sub(r"\1 = ANY(?)", sql)
+    else:
+        sql = _ID_LIST_RE.sub(lambda m: f"{m.group(1)} IN ({', '.join(['?'] * id_count)})", sql)
+        return CompiledQuery(name, sql, None, None, _schema_version)
+
+    final_sql, count = _convert_placeholders(sql, numbered=False)
+    if not (prepare and PG_PREPARED_STATEMENTS):
+        return CompiledQuery(name, final_sql, None, None, _schema_version)
+    prepared_name = re.sub(r"\W", "_", "_".join(["q", name, *map(str, variant)]))
+    numbered_sql, _ = _convert_placeholders(sql, numbered=True)
+    args = f" ({', '.join(['%s'] * count)})" if count else ""
+    return CompiledQuery(
+        prepared_name, final_sql, f"PREPARE {prepared_name} AS {numbered_sql}",
+        f"EXECUTE {prepared_name}{args}", _schema_version,
+    )
+
+
+def get_query(cur, name: str, *variant, id_count: int = 0) -> CompiledQuery:
+    """Compiled statement for the current schema (compiled on first use)"""
+    key = (name, variant, id_count)
+    query = _COMPILED_QUERIES.get(key)
+    if query is None:
+        query = _COMPILED_QUERIES[key] = compile_query(_schema(cur), name, variant, id_count)
+    return query
+
+
+def run_query(cur, name: str, params: Union[tuple, list] = (), *variant):
+    """Execute a registered statement; PREPAREs it first on a new PostgreSQL connection"""
+    query = get_query(cur, name, *variant)
+    if query.prepare_sql is None:
+        return cur.execute(query.sql, params)
+    prepared = cur.connection.prepared_statements
+    version = prepared.get(query.name)
+    if version != query.version:
+        if version is not None:
+            cur.execute(f"DEALLOCATE {query.name}")
+        cur.execute(query.prepare_sql)
+        prepared[query.name] = query.version
+    return cur.execute(query.execute_sql, params)
+
+
+def run_query_ids(cur, name: str, ids: List[int], params: Union[tuple, list] = (), *variant):
+    """Execute a statement whose last parameter is its ID_LIST(...) filter on `ids`"""
+    if _schema(cur).postgres:
+        return run_query(cur, name, (*params, list(ids)), *variant)
+    # SQLite: pad the IN list to a power of two (repeating an id) so any
+    # number of ids shares a handful of compiled statements
+    ids = list(ids) or [None]
+    size = 1 << (len(ids) - 1).bit_length()
+    query = get_query(cur, name, *variant, id_count=size)
+    return cur.execute(query.sql, (*params, *ids, *[ids[-1]] * (size - len(ids))))
+
+
+def run_query_many(cur, name: str, seq_of_params: List[Union[tuple, list]], *variant):
+    """executemany() over a registered statement (never PREPAREd: one round trip per row anyway)"""
+    query = get_query(cur, name, *variant)
+    return cur.executemany(query.sql, seq_of_params)
+
+
 # Regex for valid SQL identifiers (alphanumeric + underscore, no leading digit)
 _SQL_IDENTIFIER_RE = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
 # Valid SQL types for column definitions
@@ -536,11 +887,43 @@ def _ensure_schema_postgres() -> None:
         # Ensure all required columns exist (migration might have added them)
         # This is a safety check for future column additions
         
+        _ensure_idempotency_table(cur)
+        _ensure_maintenance_table(cur)
+        
         con.commit()
     finally:
         con.close()
 
 
+def _ensure_idempotency_table(cur) -> None:
+    """Idempotency keys shared by all workers (see idempotency.py)"""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        response TEXT,
+        locked_until BIGINT NOT NULL,
+        expires_at BIGINT NOT NULL
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys(expires_at)")
+
+
+def _ensure_maintenance_table(cur) -> None:
+    """Run history of the maintenance jobs (see maintenance.py)"""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS maintenance_runs (
+        job TEXT NOT NULL,
+        started_at TEXT NOT NULL,
+        duration_ms REAL NOT NULL,
+        status TEXT NOT NULL,
+        detail TEXT,
+        pid INTEGER
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_runs_job ON maintenance_runs(job, started_at)")
+
+
 def _ensure_schema_sqlite() -> None:
     """Crear esquema para SQLite (desarrollo/tests)"""
     con = conectar()
@@ -703,6 +1086,12 @@ def _ensure_schema_sqlite() -> None:
         CREATE INDEX IF NOT EXISTS idx_revoked_tokens_jti ON revoked_tokens(jti);
         """)
 
+        # === IDEMPOTENCY KEYS (offline queue retries, cross-worker) ===
+        _ensure_idempotency_table(cur)
+
+        # === MAINTENANCE JOB RUN HISTORY ===
+        _ensure_maintenance_table(cur)
+
         # === LISTAS DE PRECIOS ===
         cur.execute("""
         CREATE TABLE IF NOT EXISTS listas_precios (
@@ -911,9 +1300,9 @@ def ensure_indexes() -> None:
         cur.execute("CREATE INDEX IF NOT EXISTS idx_historial_fecha ON historial_pedidos(fecha)")
         
         con.commit()
-        logger.info("indexes_ensured", message="All database indexes created/verified")
+        logger.info("All database indexes created/verified")
     except Exception as e:
-        logger.error("indexes_failed", error=str(e))
+        logger.error(f"Failed to ensure indexes: {e}")
         raise
     finally:
         if is_postgres():
@@ -1461,7 +1850,7 @@ def get_audit_summary() -> Dict[str, Any]:
 # -----------------------------------------------------------------------------
 # Productos
 # -----------------------------------------------------------------------------
-def get_productos(search: Optional[str] = None, sort: Optional[str] = None, categoria_id: Optional[int] = None) -> List[Dict[str, Any]]:
+def get_productos(search: Optional[str] = None, sort: Optional[str] = None, categoria_id: Optional[int] = None) -> List[Record]:
     with get_db_connection() as con:
         cur = con.cursor()
         cols = _table_columns(cur, "productos")
@@ -1500,7 +1889,7 @@ def get_productos(search: Optional[str] = None, sort: Optional[str] = None, cate
                 order = " ORDER BY precio DESC"
 
         _execute(cur, base + order, tuple(params))
-        return _fetchall_as_dict(cur)
+        return fetchall_records(cur)
 
 
 def get_producto_by_id(producto_id: int) -> Optional[Dict[str, Any]]:
@@ -1700,7 +2089,7 @@ def export_productos_csv() -> str:
         query += " ORDER BY p.nombre"
         
         _execute(cur, query)
-        rows = _fetchall_as_dict(cur)
+        rows = fetchall_records(cur)
         
         d = CSV_DELIMITER
         header = f"id{d}nombre{d}precio{d}imagen_url"
@@ -1842,18 +2231,81 @@ def verificar_stock_pedido(productos: List[Dict[str, Any]]) -> List[Dict[str, An
 # Pedidos
 # -----------------------------------------------------------------------------
 def _pedidos_cliente_col(cur: Union[sqlite3.Cursor, Any]) -> str:
-    cols = _table_columns(cur, "pedidos")
-    return "cliente_id" if "cliente_id" in cols else "id_cliente"
+    return _schema(cur).pedido_cliente
 
 
 def _detalles_pedido_col(cur: Union[sqlite3.Cursor, Any]) -> str:
-    cols = _table_columns(cur, "detalles_pedido")
-    return "pedido_id" if "pedido_id" in cols else "id_pedido"
+    return _schema(cur).detalle_pedido
 
 
 def _detalles_producto_col(cur: Union[sqlite3.Cursor, Any]) -> str:
-    cols = _table_columns(cur, "detalles_pedido")
-    return "producto_id" if "producto_id" in cols else "id_producto"
+    return _schema(cur).detalle_producto
+
+
+# Optional pedidos columns written by add_pedido, in INSERT order
+_PEDIDO_INSERT_COLUMNS = ("fecha", "pdf_generado", "fecha_creacion", "creado_por", "notas", "dispositivo", "user_agent")
+# Optional pedidos columns returned by get_pedidos
+_PEDIDO_SELECT_COLUMNS = (
+    "fecha", "pdf_generado", "fecha_creacion", "fecha_generacion", "creado_por", "generado_por", "notas",
+    "dispositivo", "ultimo_editor", "fecha_ultima_edicion", "estado", "repartidor", "fecha_entrega",
+)
+
+
+@register_query("pedido_insert")
+def _q_pedido_insert(schema: SchemaInfo) -> str:
+    cols = [schema.pedido_cliente] + [c for c in _PEDIDO_INSERT_COLUMNS if schema.has("pedidos", c)]
+    sql = f"INSERT INTO pedidos ({', '.join(cols)}) VALUES ({', '.join(['?'] * len(cols))})"
+    return sql + " RETURNING id" if schema.postgres else sql
+
+
+@register_query("detalle_insert")
+def _q_detalle_insert(schema: SchemaInfo) -> str:
+    if schema.has("detalles_pedido", "tipo"):
+        return (f"INSERT INTO detalles_pedido ({schema.detalle_pedido}, {schema.detalle_producto}, cantidad, tipo) "
+                "VALUES (?, ?, ?, ?)")
+    return f"INSERT INTO detalles_pedido ({schema.detalle_pedido}, {schema.detalle_producto}, cantidad) VALUES (?, ?, ?)"
+
+
+@register_query("producto_id_por_nombre")
+def _q_producto_id_por_nombre(schema: SchemaInfo) -> str:
+    return "SELECT id FROM productos WHERE nombre = ? LIMIT 1"
+
+
+def _pedidos_where(estado_filter: Optional[str], por_creador: bool) -> str:
+    clauses = []
+    if estado_filter == "pendiente":
+        # Handle 'pendiente' as default for NULL estado
+        clauses.append("(estado = ? OR estado IS NULL)")
+    elif estado_filter:
+        clauses.append("estado = ?")
+    if por_creador:
+        clauses.append("creado_por = ?")
+    return "WHERE " + " AND ".join(clauses) if clauses else ""
+
+
+@register_query("pedidos_count")
+def _q_pedidos_count(schema: SchemaInfo, estado_filter: Optional[str], por_creador: bool) -> str:
+    return f"SELECT COUNT(*) FROM pedidos {_pedidos_where(estado_filter, por_creador)}"
+
+
+@register_query("pedidos_list")
+def _q_pedidos_list(schema: SchemaInfo, estado_filter: Optional[str], por_creador: bool, paginated: bool) -> str:
+    sel = ["id", schema.pedido_cliente] + [c for c in _PEDIDO_SELECT_COLUMNS if schema.has("pedidos", c)]
+    sql = f"SELECT {', '.join(sel)} FROM pedidos {_pedidos_where(estado_filter, por_creador)} ORDER BY id DESC"
+    return sql + " LIMIT ? OFFSET ?" if paginated else sql
+
+
+@register_query("pedidos_productos")
+def _q_pedidos_productos(schema: SchemaInfo) -> str:
+    sel_cols = f"dp.{schema.detalle_pedido} as pedido_id, pr.id, pr.nombre, pr.precio, dp.cantidad"
+    if schema.has("detalles_pedido", "tipo"):
+        sel_cols += ", dp.tipo"
+    if schema.has("productos", "imagen_url"):
+        sel_cols += ", pr.imagen_url"
+    return f"""SELECT {sel_cols}
+               FROM detalles_pedido dp
+               JOIN productos pr ON dp.{schema.detalle_producto} = pr.id
+               WHERE ID_LIST(dp.{schema.detalle_pedido})"""
 
 
 def add_pedido(pedido: Dict[str, Any], creado_por: str = None, dispositivo: str = None, user_agent: str = None) -> Dict[str, Any]:
@@ -1882,52 +2334,23 @@ def add_pedido(pedido: Dict[str, Any], creado_por: str = None, dispositivo: str
         if cliente_id is None:
             raise ValueError("Pedido inválido: falta cliente_id / cliente.id")
 
-        cliente_col = _pedidos_cliente_col(cur)
-        cols_pedidos = _table_columns(cur, "pedidos")
-
-        fecha = pedido.get("fecha") or _now_iso()
-        pdf_generado = 1 if bool(pedido.get("pdf_generado", False)) else 0
-        fecha_creacion = _now_uruguay()  # Timestamp Uruguay legible
-        notas = pedido.get("notas") or ""
-
-        # Insert dinámico según columnas existentes
-        fields: List[str] = [cliente_col]
-        values: List[Any] = [cliente_id]
-
-        if "fecha" in cols_pedidos:
-            fields.append("fecha")
-            values.append(fecha)
-        if "pdf_generado" in cols_pedidos:
-            fields.append("pdf_generado")
-            values.append(pdf_generado)
-        if "fecha_creacion" in cols_pedidos:
-            fields.append("fecha_creacion")
-            values.append(fecha_creacion)
-        if "creado_por" in cols_pedidos and creado_por:
-            fields.append("creado_por")
-            values.append(creado_por)
-        if "notas" in cols_pedidos and notas:
-            fields.append("notas")
-            values.append(notas)
-        if "dispositivo" in cols_pedidos and dispositivo:
-            fields.append("dispositivo")
-            values.append(dispositivo)
-        if "user_agent" in cols_pedidos and user_agent:
-            fields.append("user_agent")
-            values.append(user_agent[:500] if user_agent else None)
-
-        _execute(
-            cur,
-            f"INSERT INTO pedidos ({', '.join(fields)}) VALUES ({', '.join(['?'] * len(fields))})",
-            tuple(values),
-        )
-        pid = cur.lastrowid
+        schema = _schema(cur)
+        values = {
+            "fecha": pedido.get("fecha") or _now_iso(),
+            "pdf_generado": 1 if bool(pedido.get("pdf_generado", False)) else 0,
+            "fecha_creacion": _now_uruguay(),  # Timestamp Uruguay legible
+            "creado_por": creado_por or None,
+            "notas": pedido.get("notas") or None,
+            "dispositivo": dispositivo or None,
+            "user_agent": user_agent[:500] if user_agent else None,
+        }
+        params = [cliente_id] + [values[c] for c in _PEDIDO_INSERT_COLUMNS if schema.has("pedidos", c)]
+        run_query(cur, "pedido_insert", params)
+        pid = cur.fetchone()[0] if schema.postgres else cur.lastrowid
 
         # Insert detalles
-        pedido_fk = _detalles_pedido_col(cur)
-        prod_fk = _detalles_producto_col(cur)
-        cols_det = _table_columns(cur, "detalles_pedido")
-
+        detalle_width = 4 if schema.has("detalles_pedido", "tipo") else 3
+        detalles = []
         for prod in pedido.get("productos", []):
             product_id = prod.get("id") or prod.get("producto_id")
             if product_id is None:
@@ -1935,27 +2358,17 @@ def add_pedido(pedido: Dict[str, Any], creado_por: str = None, dispositivo: str
                 nombre = prod.get("nombre")
                 if not nombre:
                     raise ValueError("Producto inválido en pedido: falta id/producto_id y nombre")
-                _execute(cur, "SELECT id FROM productos WHERE nombre = ? LIMIT 1", (nombre,))
-                r = _fetchone_as_dict(cur)
+                run_query(cur, "producto_id_por_nombre", (nombre,))
+                r = cur.fetchone()
                 if not r:
                     raise ValueError(f"Producto no existe en DB: {nombre}")
-                product_id = r["id"]
+                product_id = r[0]
 
             cantidad = float(prod.get("cantidad", 0))
             tipo = prod.get("tipo", "unidad")
-
-            if "tipo" in cols_det:
-                _execute(
-                    cur,
-                    f"INSERT INTO detalles_pedido ({pedido_fk}, {prod_fk}, cantidad, tipo) VALUES (?, ?, ?, ?)",
-                    (pid, product_id, cantidad, tipo),
-                )
-            else:
-                _execute(
-                    cur,
-                    f"INSERT INTO detalles_pedido ({pedido_fk}, {prod_fk}, cantidad) VALUES (?, ?, ?)",
-                    (pid, product_id, cantidad),
-                )
+            detalles.append((pid, product_id, cantidad, tipo)[:detalle_width])
+        if detalles:
+            run_query_many(cur, "detalle_insert", detalles)
 
         # Return payload with generated id - commit automático por context manager
         return {**pedido, "id": pid}
@@ -1980,59 +2393,29 @@ def get_pedidos(page: int = None, limit: int = 50, estado: str = None, creado_po
     with get_db_connection() as con:
         cur = con.cursor()
 
-        cliente_col = _pedidos_cliente_col(cur)
-        cols_ped = _table_columns(cur, "pedidos")
-        cols_det = _table_columns(cur, "detalles_pedido")
-        pedido_fk = _detalles_pedido_col(cur)
-        prod_fk = _detalles_producto_col(cur)
-        pr_cols = _table_columns(cur, "productos")
-        include_img = "imagen_url" in pr_cols
-        has_tipo = "tipo" in cols_det
-
-        # Build SELECT columns for pedidos
-        sel = ["id", cliente_col]
-        optional_cols = ["fecha", "pdf_generado", "fecha_creacion", "fecha_generacion", 
-                        "creado_por", "generado_por", "notas", "dispositivo", 
-                        "ultimo_editor", "fecha_ultima_edicion", "estado", 
-                        "repartidor", "fecha_entrega"]
-        for col in optional_cols:
-            if col in cols_ped:
-                sel.append(col)
-
-        # Build base query with optional estado filter and creado_por filter
-        where_clauses = []
+        schema = _schema(cur)
+        cliente_col = schema.pedido_cliente
+        include_img = schema.has("productos", "imagen_url")
+        has_tipo = schema.has("detalles_pedido", "tipo")
+
+        # Filters select a precompiled statement variant
+        estado_filter = None
         params = []
-        
         if estado:
-            # Handle 'pendiente' as default for NULL estado
-            if estado == 'pendiente':
-                where_clauses.append("(estado = ? OR estado IS NULL)")
-            else:
-                where_clauses.append("estado = ?")
+            estado_filter = "pendiente" if estado == "pendiente" else "eq"
             params.append(estado)
-        
         if creado_por:
-            where_clauses.append("creado_por = ?")
             params.append(creado_por)
-        
-        where_clause = ""
-        if where_clauses:
-            where_clause = "WHERE " + " AND ".join(where_clauses)
 
         # Get total count for pagination
-        count_query = f"SELECT COUNT(*) FROM pedidos {where_clause}"
-        _execute(cur, count_query, params)
+        run_query(cur, "pedidos_count", tuple(params), estado_filter, bool(creado_por))
         total_count = cur.fetchone()[0]
 
-        # Build main query with pagination
-        base_query = f"SELECT {', '.join(sel)} FROM pedidos {where_clause} ORDER BY id DESC"
-        
         if page is not None:
             limit = min(max(1, limit), 200) # Clamp limit
-            offset = (page - 1) * limit
-            base_query += f" LIMIT {limit} OFFSET {offset}"
-        
-        _execute(cur, base_query, params)
+            params += [limit, (page - 1) * limit]
+
+        run_query(cur, "pedidos_list", tuple(params), estado_filter, bool(creado_por), page is not None)
         pedidos_rows = _fetchall_as_dict(cur)
 
         if not pedidos_rows:
@@ -2042,22 +2425,7 @@ def get_pedidos(page: int = None, limit: int = 50, estado: str = None, creado_po
 
         # OPTIMIZATION: Batch load all productos for all pedidos in ONE query
         pedido_ids = [r["id"] for r in pedidos_rows]
-        placeholders = ",".join("?" * len(pedido_ids))
-        
-        sel_cols = f"dp.{pedido_fk} as pedido_id, pr.id, pr.nombre, pr.precio, dp.cantidad"
-        if has_tipo:
-            sel_cols += ", dp.tipo"
-        if include_img:
-            sel_cols += ", pr.imagen_url"
-        
-        _execute(
-            cur,
-            f"""SELECT {sel_cols} 
-                FROM detalles_pedido dp 
-                JOIN productos pr ON dp.{prod_fk} = pr.id 
-                WHERE dp.{pedido_fk} IN ({placeholders})""",
-            tuple(pedido_ids)
-        )
+        run_query_ids(cur, "pedidos_productos", pedido_ids)
         
         # Group productos by pedido_id
         productos_por_pedido: Dict[int, List[Dict]] = {}
@@ -2389,7 +2757,7 @@ def export_pedidos_csv(desde: Optional[str] = None, hasta: Optional[str] = None)
         
         query += " ORDER BY p.fecha DESC"
         _execute(cur, query, tuple(params))
-        rows = _fetchall_as_dict(cur)
+        rows = fetchall_records(cur)
         
         d = CSV_DELIMITER
         lines = [f"id{d}cliente_id{d}cliente_nombre{d}fecha{d}pdf_generado{d}productos"]
@@ -2412,7 +2780,7 @@ def export_pedidos_csv(desde: Optional[str] = None, hasta: Optional[str] = None)
                     WHERE dp.{pedido_fk} = ?""",
                 (pid,)
             )
-            productos_rows = _fetchall_as_dict(cur)
+            productos_rows = fetchall_records(cur)
             productos_str = ", ".join([f"{p['cantidad']} x {p['nombre']}" for p in productos_rows])
             productos_str = _sanitize_csv_field(productos_str)
 
@@ -2747,7 +3115,7 @@ def delete_precio_de_lista(lista_id: int, producto_id: int) -> Dict[str, Any]:
         return {"status": "deleted"}
 
 
-def get_productos_con_precios_lista(cliente_id: Optional[int] = None) -> List[Dict[str, Any]]:
+def get_productos_con_precios_lista(cliente_id: Optional[int] = None) -> List[Record]:
     """
     Obtiene todos los productos con su precio final, aplicando la lista de precios
     del cliente si corresponde.
@@ -2770,7 +3138,8 @@ def get_productos_con_precios_lista(cliente_id: Optional[int] = None) -> List[Di
 
         # 1. Get all products
         _execute(cur, "SELECT id, nombre, precio, categoria_id, imagen_url, stock FROM productos ORDER BY nombre")
-        productos = _fetchall_as_dict(cur)
+        producto = _record_type(_cursor_columns(cur) + ("precio_final", "en_lista"))
+        productos = _fetch_tuples(cur)
         
         # 2. Get special prices if a list is active
         precios_especiales = {}
@@ -2779,17 +3148,15 @@ def get_productos_con_precios_lista(cliente_id: Optional[int] = None) -> List[Di
             for row in cur.fetchall():
                 precios_especiales[row[0]] = row[1]
         
-        # 3. Calculate final prices
+        # 3. Calculate final prices (columns: id, nombre, precio, ...)
+        resultado = []
         for p in productos:
-            producto_id = p['id']
-            if producto_id in precios_especiales:
-                p['precio_final'] = precios_especiales[producto_id]
-                p['en_lista'] = True
+            if p[0] in precios_especiales:
+                resultado.append(producto((*p, precios_especiales[p[0]], True)))
             else:
-                p['precio_final'] = p['precio'] * multiplicador
-                p['en_lista'] = False
+                resultado.append(producto((*p, p[2] * multiplicador, False)))
         
-        return productos
+        return resultado
 
 
 # -----------------------------------------------------------------------------
@@ -3172,14 +3539,15 @@ def get_productos_by_tag(tag_id: int) -> List[Dict[str, Any]]:
         return _fetchall_as_dict(cur)
 
 
-def get_productos_with_tags() -> List[Dict[str, Any]]:
+def get_productos_with_tags() -> List[Record]:
     """Obtiene todos los productos con sus tags incluidos."""
     with get_db_connection() as con:
         cur = con.cursor()
         
         # Primero obtener todos los productos
         _execute(cur, "SELECT * FROM productos ORDER BY nombre")
-        productos = _fetchall_as_dict(cur)
+        producto = _record_type(_cursor_columns(cur) + ("tags",))
+        productos = _fetch_tuples(cur)
         
         # Luego obtener todos los tags de productos en una sola query
         _execute(
@@ -3200,10 +3568,8 @@ def get_productos_with_tags() -> List[Dict[str, Any]]:
             })
         
         # Añadir tags a cada producto
-        for producto in productos:
-            producto["tags"] = tags_by_product.get(producto["id"], [])
-        
-        return productos
+        id_pos = producto._index["id"]
+        return [producto((*p, tags_by_product.get(p[id_pos], []))) for p in productos]
 
 
 # -----------------------------------------------------------------------------
@@ -3340,7 +3706,7 @@ def get_reporte_clientes() -> Dict[str, Any]:
             LEFT JOIN productos pr ON dp.producto_id = pr.id
             GROUP BY c.id ORDER BY total_compras DESC LIMIT 20
         """)
-        ranking = [dict(r) for r in cur.fetchall()]
+        ranking = fetchall_records(cur)
         
         fecha_60 = (datetime.now() - timedelta(days=60)).strftime("%Y-%m-%d")
         cur.execute(f"""
@@ -3349,7 +3715,7 @@ def get_reporte_clientes() -> Dict[str, Any]:
             GROUP BY c.id HAVING ultimo_pedido IS NULL OR ultimo_pedido < ?
             ORDER BY ultimo_pedido DESC LIMIT 20
         """, (fecha_60,))
-        inactivos = [dict(r) for r in cur.fetchall()]
+        inactivos = fetchall_records(cur)
         
         return {
             "resumen": {"total_clientes": total_clientes, "clientes_activos": clientes_activos,
@@ -0,0 +1,218 @@
+"""
+Seed database restore from a base64 secret file (SQLite only).
+
+Render cannot upload binary files, so the seed database is shipped as a
+secret file, plain (ventas.db.b64) or gzip-compressed (ventas.db.gz.b64),
+in DB_RESTORE_DIR. main.run_startup_tasks() restores it (once per server,
+before any connection is opened):
+
+- Streaming: base64 chunks -> gunzip -> temporary file next to DB_PATH, so
+  memory stays flat whatever the database size
+- Verified: SHA-256 of the restored database against DB_RESTORE_SHA256 or a
+  sidecar <source>.sha256 file (`sha256sum` output) when present, plus the
+  SQLite header; a mismatch aborts and leaves the current database alone
+- Atomic: fsync + rename over DB_PATH (stale -wal / -shm files removed)
+- Skipped when the database on disk is the same or newer: a valid existing
+  database (with users) is live data and is only replaced with
+  FORCE_DB_RECREATE=true, and even then not again from a source it was
+  already restored from (recorded in <DB_PATH>.restore.json), so a leftover
+  FORCE_DB_RECREATE does not wipe the data on every restart
+
+Usage:
+    import db_restore
+
+    result = db_restore.restore_if_needed(db.DB_PATH)   # None: nothing to restore
+"""
+
+import os
+import json
+import time
+import zlib
+import base64
+import hashlib
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration from environment
+DB_RESTORE_DIR = os.getenv("DB_RESTORE_DIR", "/etc/secrets")
+DB_RESTORE_SHA256 = os.getenv("DB_RESTORE_SHA256", "")
+FORCE_DB_RECREATE = os.getenv("FORCE_DB_RECREATE", "false").lower() == "true"
+
+# Compressed version first (smaller)
+SOURCES = (("ventas.db.gz.b64", True), ("ventas.db.b64", False))
+
+_CHUNK = 1024 * 1024
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+class RestoreError(Exception):
+    """The seed database could not be restored (the current database is left as it was)"""
+
+
+def find_source(directory: str = None) -> Optional[Tuple[str, bool]]:
+    """(path, gzipped) of the seed file, or None"""
+    directory = directory or DB_RESTORE_DIR
+    for name, gzipped in SOURCES:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path, gzipped
+    return None
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _expected_sha256(source: str) -> Optional[str]:
+    if DB_RESTORE_SHA256:
+        return DB_RESTORE_SHA256.strip().lower()
+    try:
+        with open(source + ".sha256") as f:
+            return f.read().split()[0].lower()
+    except (OSError, IndexError):
+        return None
+
+
+def _existing_users(db_path: str) -> Optional[int]:
+    """Users in the database on disk; None when it is missing or unusable"""
+    if not os.path.exists(db_path):
+        return None
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM usuarios").fetchone()[0]
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"Existing database is invalid, will restore from base64: {e}")
+        return None
+
+
+def _marker_path(db_path: str) -> str:
+    return db_path + ".restore.json"
+
+
+def _restored_from(db_path: str) -> Optional[str]:
+    """SHA-256 of the source the database was last restored from"""
+    try:
+        with open(_marker_path(db_path)) as f:
+            return json.load(f).get("source_sha256")
+    except (OSError, ValueError):
+        return None
+
+
+def stream_decode(source: str, gzipped: bool, out) -> Tuple[int, str]:
+    """Decode source into the binary file out chunk by chunk; returns (bytes written, SHA-256)"""
+    digest = hashlib.sha256()
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    written = 0
+    pending = b""
+
+    def write(data: bytes):
+        nonlocal written
+        digest.update(data)
+        out.write(data)
+        written += len(data)
+
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            pending += b"".join(chunk.split())  # line breaks / whitespace
+            usable = len(pending) - len(pending) % 4
+            if usable:
+                data = base64.b64decode(pending[:usable], validate=True)
+                pending = pending[usable:]
+                write(inflater.decompress(data) if inflater is not None else data)
+    if pending:
+        raise RestoreError(f"Truncated base64 data in {source}")
+    if inflater is not None:
+        write(inflater.flush())
+        if not inflater.eof:
+            raise RestoreError(f"Truncated gzip data in {source}")
+    return written, digest.hexdigest()
+
+
+def restore_if_needed(db_path: str, directory: str = None, force: bool = None) -> Optional[Dict[str, Any]]:
+    """
+    Restore db_path from the seed file when needed (see the module docstring).
+    Returns what was done ({"restored": bool, "reason": ...}) or None without a seed file.
+    """
+    found = find_source(directory)
+    if found is None:
+        logger.info(f"No base64 database file found in {directory or DB_RESTORE_DIR}, using DB_PATH as is")
+        return None
+    source, gzipped = found
+    force = FORCE_DB_RECREATE if force is None else force
+
+    users = _existing_users(db_path)
+    source_sha256 = None
+    if users:
+        if not force:
+            logger.info(f"SQLite database already exists at {db_path} ({users} users) - skipping restore")
+            return {"restored": False, "reason": "exists", "source": source}
+        source_sha256 = _file_sha256(source)
+        if _restored_from(db_path) == source_sha256:
+            logger.warning(
+                f"FORCE_DB_RECREATE is set but {db_path} was already restored from this {source} - "
+                "skipping restore (unset FORCE_DB_RECREATE)"
+            )
+            return {"restored": False, "reason": "same_source", "source": source}
+        logger.info("FORCE_DB_RECREATE is set, will recreate database from base64")
+
+    start = time.perf_counter()
+    result = _restore(source, gzipped, db_path, source_sha256 or _file_sha256(source))
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(
+        f"Database restored from {source} to {db_path} in {result['seconds']:.2f}s "
+        f"({result['bytes']} bytes, sha256 {result['sha256'][:12]}, "
+        f"{'verified' if result['verified'] else 'no checksum to verify'})"
+    )
+    return result
+
+
+def _restore(source: str, gzipped: bool, db_path: str, source_sha256: str) -> Dict[str, Any]:
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    tmp_path = f"{db_path}.restore-{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as out:
+            written, sha256 = stream_decode(source, gzipped, out)
+            out.flush()
+            os.fsync(out.fileno())
+
+        expected = _expected_sha256(source)
+        if expected is not None and expected != sha256:
+            raise RestoreError(f"Checksum mismatch for {source}: expected {expected}, got {sha256}")
+        with open(tmp_path, "rb") as f:
+            if f.read(len(_SQLITE_MAGIC)) != _SQLITE_MAGIC:
+                raise RestoreError(f"{source} does not contain a SQLite database")
+
+        # A WAL left by the old database would be replayed into the new one
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        os.replace(tmp_path, db_path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if isinstance(e, RestoreError):
+            raise
+        raise RestoreError(f"Failed to decode base64 database {source}: {e}") from e
+
+    with open(_marker_path(db_path), "w") as f:
+        json.dump({
+            "source": source,
+            "source_sha256": source_sha256,
+            "sha256": sha256,
+            "restored_at": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+        }, f)
+    return {
+        "restored": True, "reason": "restored", "source": source,
+        "bytes": written, "sha256": sha256, "verified": expected is not None,
+    }
@@ -11,11 +11,14 @@ from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from functools import lru_cache
+from typing import Optional
 import os
 import re
 import logging
 
 import db
+import rate_limit_storage  # registers the shared sqlite:// limits storage
 
 logger = logging.getLogger(__name__)
 
@@ -49,8 +52,39 @@ RATE_LIMIT_ADMIN = os.getenv("RATE_LIMIT_ADMIN", "20/minute")  # Admin operation
 RATE_LIMIT_READ = os.getenv("RATE_LIMIT_READ", "100/minute")
 RATE_LIMIT_WRITE = os.getenv("RATE_LIMIT_WRITE", "30/minute")
 
+# Counters shared by all workers (see rate_limit_storage.py); "memory://" = per process
+RATE_LIMIT_STORAGE_URI = os.getenv(
+    "RATE_LIMIT_STORAGE_URI", f"sqlite://{rate_limit_storage.DEFAULT_RATE_LIMIT_DB}"
+)
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+
+
 # --- Rate Limiting ---
-limiter = Limiter(key_func=get_remote_address)
+@lru_cache(maxsize=4096)
+def _token_subject(token: str) -> Optional[str]:
+    """Username of a signed token (memoized: runs before auth, on every request)."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+def rate_limit_key(request) -> str:
+    """Rate limit per user when the request carries a valid token, per IP otherwise."""
+    auth = request.headers.get("authorization")
+    if auth and auth[:7].lower() == "bearer ":
+        username = _token_subject(auth[7:])
+        if username:
+            return f"user:{username}"
+    return f"ip:{get_remote_address(request)}"
+
+
+limiter = Limiter(
+    key_func=rate_limit_key,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY
+)
 
 # --- Security ---
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -11,6 +11,8 @@ import traceback
 import logging
 from fastapi import HTTPException
 
+from exceptions_custom import ServiceUnavailableException
+
 logger = logging.getLogger(__name__)
 
 
@@ -94,6 +96,9 @@ def safe_error_handler(
     # Map known exceptions to appropriate HTTP status codes
     error_type = type(error).__name__
     
+    if isinstance(error, ServiceUnavailableException):
+        return HTTPException(status_code=503, detail=error.detail)
+    
     if error_type == "ValidationError":
         return HTTPException(status_code=400, detail="Datos de entrada inválidos")
     
@@ -106,6 +111,10 @@ def safe_error_handler(
     if "IntegrityError" in error_type or "UNIQUE constraint" in str(error):
         return HTTPException(status_code=409, detail="El registro ya existe o hay un conflicto")
     
+    if "OperationalError" in error_type and "interrupted" in str(error).lower():
+        # SQLite statement stopped by its deadline while its rows were fetched
+        return HTTPException(status_code=503, detail="La consulta tardó demasiado, intente nuevamente en unos segundos")
+    
     if "OperationalError" in error_type and "locked" in str(error).lower():
         return HTTPException(
             status_code=503, 
@@ -74,6 +74,12 @@ class TimeoutException(ChorizaurioException):
         super().__init__(message, 504)
 
 
+class ServiceUnavailableException(ChorizaurioException):
+    """Raised when the database cannot serve the request right now (pool exhausted, deadline hit)"""
+    def __init__(self, message: str, detail: str = "Servicio no disponible, intente nuevamente en unos segundos"):
+        super().__init__(message, 503, detail)
+
+
 class InvalidStateException(ChorizaurioException):
     """Raised when operation not allowed in current state"""
     def __init__(self, current_state: str, message: str):
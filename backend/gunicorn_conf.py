@@ -0,0 +1,137 @@
+"""
+Production server: gunicorn master with uvicorn workers.
+
+    gunicorn -c gunicorn_conf.py main:app
+
+- WEB_CONCURRENCY workers, by default one per CPU available to the process
+- The master imports the application (GUNICORN_PRELOAD) and, with more
+  than one worker, the heavy modules in PRELOAD_MODULES once; workers share
+  them copy-on-write. The application itself only imports them on first use
+  (tests/test_startup_time.py), so a single worker starts without them
+- Migrations, SQLite hardening and index checks (main.run_startup_tasks)
+  run once in the master before any worker is forked; workers skip them
+- Each worker is recycled after GUNICORN_MAX_REQUESTS requests (plus up to
+  GUNICORN_MAX_REQUESTS_JITTER, so they do not all restart together)
+- With more than one worker, /metrics merges all workers through
+  METRICS_MULTIPROC_DIR (emptied when the master starts)
+
+Reloading:
+    kill -HUP <master>    graceful restart of every worker (new settings);
+                          new code only with GUNICORN_PRELOAD=false
+    kill -USR2 <master>   start a new master with the new code next to the
+                          old one, then kill -TERM <old master>
+Either way startup tasks run again first, so new migrations apply before
+any worker serves requests.
+"""
+
+import os
+import glob
+import logging
+import importlib
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))  # honours container CPU sets
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", str(_cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+# Above the reports statement deadline (QUERY_TIMEOUT_REPORTS_MS)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Worker heartbeat files on tmpfs: a slow disk must not get workers killed
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+accesslog = "-"
+errorlog = "-"
+
+# Third-party modules imported by the master before forking (shared by all
+# workers even without GUNICORN_PRELOAD; application modules are not listed
+# so that HUP still reloads them in that mode)
+PRELOAD_MODULES = (
+    "fastapi",
+    "pydantic",
+    "reportlab.pdfgen.canvas",
+    "reportlab.pdfbase.pdfmetrics",
+    "reportlab.lib.colors",
+    "pypdf",
+    "PIL.Image",
+)
+
+# Set by the master before it loads the application
+raw_env = []
+if workers > 1 and not os.getenv("METRICS_MULTIPROC_DIR"):
+    raw_env.append("METRICS_MULTIPROC_DIR=/tmp/chorizaurio-metrics")
+
+
+def _clear_metrics_dir() -> None:
+    directory = os.getenv("METRICS_MULTIPROC_DIR", "")
+    for path in glob.glob(os.path.join(directory, "metrics_*.json")) if directory else ():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _preload_modules() -> None:
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Preload of {name} failed: {e}")
+
+
+def _run_startup_tasks(preloaded: bool) -> None:
+    """Run main.run_startup_tasks once for the whole server"""
+    if preloaded:
+        import db
+        import main
+        try:
+            main.run_startup_tasks()
+        finally:
+            # Workers must not inherit the master's pooled connections
+            db.close_pg_pool()
+    else:
+        # Not imported into the master, so that HUP reloads the code
+        subprocess.run([sys.executable, "-c", "import main; main.run_startup_tasks()"], check=True)
+
+
+def _startup(server, fail_fast: bool) -> None:
+    try:
+        _run_startup_tasks(server.cfg.preload_app)
+    except Exception as e:
+        server.log.error(f"Startup tasks failed: {type(e).__name__} - {e}")
+        # Workers run them on their own, as without this launcher
+        os.environ.pop("STARTUP_TASKS_DONE", None)
+        if fail_fast:
+            raise
+        return
+    os.environ["STARTUP_TASKS_DONE"] = "1"
+
+
+# --- Server hooks ---
+
+def on_starting(server):
+    """Master, before the first workers are forked"""
+    _clear_metrics_dir()
+    if server.cfg.workers > 1:  # nothing to share with a single worker
+        _preload_modules()
+    _startup(server, fail_fast=ENVIRONMENT == "production")
+
+
+def on_reload(server):
+    """Master, on HUP, before the workers are replaced (a failure must not stop the master)"""
+    _startup(server, fail_fast=False)
@@ -0,0 +1,307 @@
+"""
+Durable idempotency store for mutating endpoints.
+
+Clients send X-Idempotency-Key on writes they may retry (the offline queue
+replays them, possibly against a different worker or after a restart).
+The first request with a key claims it in the idempotency_keys table and
+runs; its JSON response is kept until the key expires. Retries get that
+stored response instead of executing again, and a retry that arrives while
+the first request is still running waits for it instead of running twice.
+The running request keeps extending its claim, so it is only taken over
+once its worker has died, and it completes even if its client goes away.
+
+Layers:
+- Per-process LRU of completed responses in front of the table.
+- Time-bucketed expiry: memory entries are dropped one bucket at a time and
+  the table is swept through its expires_at index at most once per bucket,
+  never scanned on every store.
+
+Usage:
+    from idempotency import idempotent
+
+    @router.post("/pedidos")
+    @limiter.limit(RATE_LIMIT_WRITE)
+    @idempotent()
+    async def crear_pedido(request: Request, ..., current_user: dict = Depends(get_current_user)):
+        ...
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Configuration from environment
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "3600"))
+IDEMPOTENCY_LRU_SIZE = int(os.getenv("IDEMPOTENCY_LRU_SIZE", "2048"))
+# A claim not extended within this time is considered abandoned (crashed worker);
+# the request holding it extends it every third of this while it runs
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+# How long a retry waits for the in-flight request with the same key
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+IDEMPOTENCY_HEADER = "X-Idempotency-Key"
+
+_BUCKET_SECONDS = 60
+_POLL_INTERVAL = 0.05
+
+# Claim outcomes
+CLAIMED = "claimed"
+DONE = "done"
+IN_FLIGHT = "in_flight"
+
+# Global store instance (initialized lazily)
+_store: Optional["IdempotencyStore"] = None
+_store_lock = threading.Lock()
+
+
+class IdempotencyStore:
+    """idempotency_keys table (shared by all workers) with an in-memory LRU front."""
+
+    def __init__(self, ttl: int, lru_size: int, lock_seconds: int):
+        self.ttl = ttl
+        self.lru_size = lru_size
+        self.lock_seconds = lock_seconds
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()  # key -> (response, expires_at)
+        self._buckets: Dict[int, list] = {}  # expiry bucket -> keys
+        self._swept_bucket = int(time.time()) // _BUCKET_SECONDS
+
+    # -- memory front --
+
+    def _remember(self, key: str, response: Any, expires_at: int):
+        with self._lock:
+            self._memory[key] = (response, expires_at)
+            self._memory.move_to_end(key)
+            self._buckets.setdefault(expires_at // _BUCKET_SECONDS, []).append(key)
+            while len(self._memory) > self.lru_size:
+                self._memory.popitem(last=False)
+
+    def _recall(self, key: str, now: int) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return False, None
+            response, expires_at = entry
+            if expires_at <= now:
+                del self._memory[key]
+                return False, None
+            self._memory.move_to_end(key)
+            return True, response
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._buckets.clear()
+
+    # -- expiry --
+
+    def sweep(self, now: Optional[int] = None) -> int:
+        """
+        Drop expired entries, at most once per bucket: whole memory buckets
+        whose window has passed, plus one indexed DELETE on the table.
+        """
+        now = int(now if now is not None else time.time())
+        current = now // _BUCKET_SECONDS
+        with self._lock:
+            if current <= self._swept_bucket:
+                return 0
+            self._swept_bucket = current
+            for bucket in [b for b in self._buckets if b < current]:
+                for key in self._buckets.pop(bucket, ()):
+                    entry = self._memory.get(key)
+                    if entry is not None and entry[1] <= now:
+                        del self._memory[key]
+        try:
+            with db.get_db_transaction() as (conn, cursor):
+                db._execute(cursor, "DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,))
+                deleted = cursor.rowcount or 0
+        except Exception as e:
+            logger.warning(f"Idempotency sweep failed: {e}")
+            return 0
+        if deleted:
+            logger.info(f"Idempotency sweep removed {deleted} expired keys")
+        return deleted
+
+    # -- claims --
+
+    def claim(self, key: str) -> Tuple[str, Any]:
+        """
+        Try to become the request that executes key.
+        Returns (CLAIMED, None), (DONE, stored_response) or (IN_FLIGHT, None).
+        """
+        now = int(time.time())
+        self.sweep(now)
+        found, response = self._recall(key, now)
+        if found:
+            return DONE, response
+
+        with db.get_db_transaction() as (conn, cursor):
+            db._execute(cursor, """
+                INSERT INTO idempotency_keys (key, status, response, locked_until, expires_at)
+                VALUES (?, 'pending', NULL, ?, ?)
+                ON CONFLICT (key) DO NOTHING
+            """, (key, now + self.lock_seconds, now + self.ttl))
+            if cursor.rowcount == 1:
+                return CLAIMED, None
+
+            db._execute(cursor, "SELECT status, response, expires_at FROM idempotency_keys WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            if row is None:
+                # Released between our insert and select; the caller retries
+                return IN_FLIGHT, None
+            status, stored, expires_at = row[0], row[1], row[2]
+            if status == "done" and expires_at > now:
+                response = json.loads(stored) if stored is not None else None
+                self._remember(key, response, expires_at)
+                return DONE, response
+
+            # Expired, or abandoned by a worker that died mid-request: take it
+            # over. Conditional so only one of several retries wins.
+            db._execute(cursor, """
+                UPDATE idempotency_keys
+                SET status = 'pending', response = NULL, locked_until = ?, expires_at = ?
+                WHERE key = ? AND (expires_at <= ? OR (status = 'pending' AND locked_until <= ?))
+            """, (now + self.lock_seconds, now + self.ttl, key, now, now))
+            return (CLAIMED, None) if cursor.rowcount == 1 else (IN_FLIGHT, None)
+
+    def extend(self, key: str):
+        """Push back the lock of a claim whose request is still running."""
+        with db.get_db_transaction() as (conn, cursor):
+            db._execute(
+                cursor,
+                "UPDATE idempotency_keys SET locked_until = ? WHERE key = ? AND status = 'pending'",
+                (int(time.time()) + self.lock_seconds, key)
+            )
+
+    def complete(self, key: str, response: Any):
+        """Store the response of a claimed key for replay."""
+        expires_at = int(time.time()) + self.ttl
+        # Remembered even if the table write fails: retries on this worker still replay
+        self._remember(key, response, expires_at)
+        with db.get_db_transaction() as (conn, cursor):
+            db._execute(
+                cursor,
+                "UPDATE idempotency_keys SET status = 'done', response = ?, expires_at = ? WHERE key = ?",
+                (json.dumps(response, default=str), expires_at, key)
+            )
+
+    def release(self, key: str):
+        """Give up a claim (the request failed) so a retry can execute."""
+        try:
+            with db.get_db_transaction() as (conn, cursor):
+                db._execute(cursor, "DELETE FROM idempotency_keys WHERE key = ? AND status = 'pending'", (key,))
+        except Exception as e:
+            # The claim still expires after IDEMPOTENCY_LOCK_SECONDS
+            logger.warning(f"Could not release idempotency key: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_buckets": len(self._buckets),
+                "ttl_seconds": self.ttl,
+            }
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Get or create the process-wide idempotency store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IdempotencyStore(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_LRU_SIZE, IDEMPOTENCY_LOCK_SECONDS)
+    return _store
+
+
+def scoped_key(request: Request, user: Optional[dict], client_key: str) -> str:
+    """Namespace a client key by user and route so keys never cross endpoints or users."""
+    username = (user or {}).get("username", "")
+    raw = f"{username}:{request.method}:{request.url.path}:{client_key}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _hold_claim(store: IdempotencyStore, key: str):
+    """Extend the claim on key until cancelled (the request is still running)"""
+    while True:
+        await asyncio.sleep(max(store.lock_seconds / 3, _POLL_INTERVAL))
+        try:
+            await asyncio.to_thread(store.extend, key)
+        except Exception as e:
+            logger.warning(f"Could not extend idempotency claim: {e}")
+
+
+async def _execute_claimed(store: IdempotencyStore, key: str, func, args, kwargs):
+    """Run the endpoint for a claimed key and store or release its result"""
+    holder = asyncio.ensure_future(_hold_claim(store, key))
+    try:
+        result = await func(*args, **kwargs)
+    except BaseException:
+        holder.cancel()
+        await asyncio.to_thread(store.release, key)
+        raise
+    holder.cancel()
+    if isinstance(result, Response):
+        # Raw responses (files, streams) can't be replayed
+        await asyncio.to_thread(store.release, key)
+        return result
+    try:
+        await asyncio.to_thread(store.complete, key, jsonable_encoder(result))
+    except Exception as e:
+        # The write is done: the client must get its result, not a 500
+        logger.error(f"Could not store idempotent response (retries on other workers may run again): {e}")
+    return result
+
+
+def idempotent(body_key: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None):
+    """
+    Make a mutating endpoint idempotent on the X-Idempotency-Key header
+    (or the key returned by body_key(kwargs), e.g. a field of the body).
+    The endpoint must take request: Request and return JSON-serializable
+    data; requests without a key run unchanged. Store calls run in a thread,
+    never on the event loop.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            client_key = request.headers.get(IDEMPOTENCY_HEADER) or (body_key(kwargs) if body_key else None)
+            if not client_key:
+                return await func(*args, **kwargs)
+
+            store = get_idempotency_store()
+            key = scoped_key(request, kwargs.get("current_user"), client_key)
+            deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+            while True:
+                state, response = await asyncio.to_thread(store.claim, key)
+                if state == DONE:
+                    return response
+                if state == CLAIMED:
+                    break
+                if time.monotonic() >= deadline:
+                    raise HTTPException(
+                        status_code=409,
+                        detail="Ya hay una solicitud en curso con esta clave de idempotencia"
+                    )
+                await asyncio.sleep(_POLL_INTERVAL)
+
+            # Shielded: a client that goes away must not cancel a write in
+            # progress, nor free its key while the write may still commit
+            task = asyncio.ensure_future(_execute_claimed(store, key, func, args, kwargs))
+            return await asyncio.shield(task)
+        return wrapper
+    return decorator
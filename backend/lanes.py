@@ -0,0 +1,148 @@
+"""
+Execution lanes: bounded thread pools per kind of work.
+
+Endpoints do their (blocking) database and PDF work in an `async def`,
+i.e. on the event loop, so one heavy /reportes call held up every other
+request of the worker, including order entry. An endpoint decorated with
+@lane(name) is a plain `def` whose body runs on that lane's threads
+instead:
+
+    orders    order entry                         LANE_ORDERS_THREADS   (4)
+    reads     large list endpoints                LANE_READS_THREADS    (8)
+    reports   reportes, estadisticas, dashboard,  LANE_REPORTS_THREADS  (2)
+              exports
+    pdf       PDF generation                      LANE_PDF_THREADS      (2)
+
+A lane runs at most its thread count at once; heavy work waits in its own
+lane's queue and can never take the threads order entry runs on. At most
+LANE_<NAME>_QUEUE calls wait per lane; beyond that the request gets a 503
+(LaneFull). The request context (request id, timings, query deadline) is
+carried into the lane thread.
+
+Usage:
+    @router.get("/reportes/clientes")
+    @limiter.limit(RATE_LIMIT_READ)
+    @lane("reports")
+    def get_reporte_clientes(request: Request, ...):
+        ...
+
+Metrics: execution_lane{lane,state} (threads, active, queued) and
+lane_rejected_total{lane}.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Callable, Dict
+
+from exceptions_custom import ServiceUnavailableException
+
+_DEFAULTS = {
+    # name: (threads, max queued)
+    "orders": (4, 100),
+    "reads": (8, 100),
+    "reports": (2, 20),
+    "pdf": (2, 10),
+}
+
+
+class LaneFull(ServiceUnavailableException):
+    """Too many calls already waiting in a lane"""
+
+    def __init__(self, name: str, max_queue: int):
+        super().__init__(f"Lane '{name}' has {max_queue} calls waiting")
+
+
+class Lane:
+    """A bounded thread pool with queue accounting"""
+
+    def __init__(self, name: str, threads: int, max_queue: int):
+        self.name = name
+        self.threads = threads
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"lane-{name}")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _call(self, fn: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on this lane in the caller's context"""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise LaneFull(self.name, self.max_queue)
+            self.queued += 1
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, self._call, fn, args, kwargs)
+        except RuntimeError:  # lane shut down
+            with self._lock:
+                self.queued -= 1
+            raise
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            if future.cancelled():
+                # Client went away (or shutdown) before a thread picked it up
+                with self._lock:
+                    self.queued -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "threads": self.threads, "active": self.active, "queued": self.queued,
+                "completed": self.completed, "rejected": self.rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+LANES: Dict[str, Lane] = {
+    name: Lane(
+        name,
+        int(os.getenv(f"LANE_{name.upper()}_THREADS", str(threads))),
+        int(os.getenv(f"LANE_{name.upper()}_QUEUE", str(max_queue))),
+    )
+    for name, (threads, max_queue) in _DEFAULTS.items()
+}
+
+
+def lane(name: str) -> Callable:
+    """Decorator: run a sync endpoint on the named lane (see the module docstring)"""
+    execution_lane = LANES[name]
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            raise TypeError(f"@lane runs blocking code: make {func.__name__} a plain def")
+
+        @wraps(func)
+        async def endpoint(*args, **kwargs):
+            return await execution_lane.run(func, *args, **kwargs)
+
+        endpoint.lane = name
+        return endpoint
+
+    return decorator
+
+
+def shutdown() -> None:
+    """Stop every lane (application shutdown)"""
+    for execution_lane in LANES.values():
+        execution_lane.shutdown()
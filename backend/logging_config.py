@@ -12,6 +12,7 @@ import os
 import sys
 import logging
 import uuid
+import importlib.util
 from contextvars import ContextVar
 from datetime import datetime, timezone
 from typing import Optional
@@ -23,18 +24,29 @@ try:
 except ImportError:
     STRUCTLOG_AVAILABLE = False
 
-# Try to import Sentry
-try:
-    import sentry_sdk
-    from sentry_sdk.integrations.logging import LoggingIntegration
-    SENTRY_AVAILABLE = True
-except ImportError:
-    SENTRY_AVAILABLE = False
+# Sentry is only imported when it is initialized (slow import, unused without a DSN)
+SENTRY_AVAILABLE = importlib.util.find_spec("sentry_sdk") is not None
 
 # Context variable for request ID tracking
 request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
 
 
+class RequestTimings:
+    """Time spent in the database and in response serialization during one request"""
+    __slots__ = ("db_seconds", "db_queries", "query_counts", "serialization_seconds")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.query_counts = {}  # statement fingerprint -> executions (see query_stats)
+        self.serialization_seconds = 0.0
+
+
+# Set by the request middleware; mutated in place, so sync endpoints running
+# in the threadpool (which get a copy of the context) still add to it
+request_timings_var: ContextVar[Optional[RequestTimings]] = ContextVar('request_timings', default=None)
+
+
 def _read_secret(env_var: str, file_env_var: str, default: str) -> str:
     """Read secret from environment or Docker secrets file"""
     # First try direct environment variable
@@ -71,6 +83,20 @@ def set_request_id(request_id: Optional[str] = None) -> str:
     return request_id
 
 
+def start_request_timings() -> RequestTimings:
+    """Start collecting timings for the current request"""
+    timings = RequestTimings()
+    request_timings_var.set(timings)
+    return timings
+
+
+def record_serialization_time(seconds: float):
+    """Add response serialization time to the current request"""
+    timings = request_timings_var.get()
+    if timings is not None:
+        timings.serialization_seconds += seconds
+
+
 def add_request_id(logger, method_name, event_dict):
     """Structlog processor to add request ID to all log entries"""
     request_id = get_request_id()
@@ -138,6 +164,8 @@ def setup_logging():
     # Initialize Sentry if configured (only with valid DSN)
     if SENTRY_AVAILABLE and SENTRY_DSN and SENTRY_DSN.strip() and ENVIRONMENT == "production":
         try:
+            import sentry_sdk
+            from sentry_sdk.integrations.logging import LoggingIntegration
             sentry_sdk.init(
                 dsn=SENTRY_DSN,
                 environment=ENVIRONMENT,
@@ -6,23 +6,27 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.staticfiles import StaticFiles
 from slowapi.errors import RateLimitExceeded
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from starlette.middleware.gzip import GZipMiddleware
 from datetime import datetime, timezone
 import os
+import hmac
 import time
+import asyncio
 import traceback
 
-# --- Sentry Error Tracking ---
-import sentry_sdk
-from sentry_sdk.integrations.fastapi import FastApiIntegration
-
 import db
+import lanes
+import maintenance
 import models
+import metrics
 from deps import limiter
 from exceptions_custom import ChorizaurioException, to_http_exception
 from routers import pedidos, clientes, productos, auth, categorias, ofertas, migration, dashboard, estadisticas, usuarios, templates, tags, upload, admin, repartidores, hoja_ruta, reportes, listas_precios, admin_migrations, debug_ofertas, admin_force_migration  # , websocket - Disabled: Render free tier doesn't support WebSocket
-from logging_config import setup_logging, get_logger, set_request_id, get_request_id, Timer
+from logging_config import setup_logging, get_logger, get_request_id, Timer
+from concurrency_limit import ConcurrencyLimitMiddleware
+from middleware import RequestTrackingMiddleware
+from serialization import TimedJSONResponse
 
 # --- Structured Logging Setup ---
 setup_logging()
@@ -51,12 +55,15 @@ app = FastAPI(
     # Disable docs in production for security
     docs_url="/docs" if ENVIRONMENT != "production" else None,
     redoc_url="/redoc" if ENVIRONMENT != "production" else None,
-    openapi_url="/openapi.json" if ENVIRONMENT != "production" else None
+    openapi_url="/openapi.json" if ENVIRONMENT != "production" else None,
+    default_response_class=TimedJSONResponse
 )
 
 # --- Sentry Initialization ---
 SENTRY_DSN = os.getenv("SENTRY_DSN", "")
 if SENTRY_DSN and ENVIRONMENT == "production":
+    import sentry_sdk  # only when enabled: slow import
+    from sentry_sdk.integrations.fastapi import FastApiIntegration
     sentry_sdk.init(
         dsn=SENTRY_DSN,
         integrations=[FastApiIntegration()],
@@ -115,7 +122,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         403: models.ErrorCodes.FORBIDDEN,
         404: models.ErrorCodes.NOT_FOUND,
         409: models.ErrorCodes.CONFLICT,
-        429: models.ErrorCodes.RATE_LIMITED
+        429: models.ErrorCodes.RATE_LIMITED,
+        503: models.ErrorCodes.SERVICE_UNAVAILABLE,
     }
     
     error_code = code_map.get(exc.status_code, "HTTP_ERROR")
@@ -183,8 +191,10 @@ async def general_exception_handler(request: Request, exc: Exception):
 
 
 # --- Middleware ---
-from middleware import RequestTrackingMiddleware
-app.add_middleware(RequestTrackingMiddleware)
+# Innermost first: concurrency limit (inside CORS so shed responses keep the
+# CORS headers; preflights never reach it), GZip, CORS, then request tracking
+# outermost so its timing covers the whole stack
+app.add_middleware(ConcurrencyLimitMiddleware)
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 # CORS configuration - production domains + localhost for development
@@ -196,58 +206,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Request-ID"],  # Allow frontend to read request ID
+    expose_headers=["X-Request-ID", "Server-Timing"],  # Allow frontend to read request ID and timings
 )
 
-
-@app.middleware("http")
-async def request_logging_middleware(request: Request, call_next):
-    """Add request ID and log all requests with timing"""
-    # Get or generate request ID
-    request_id = request.headers.get("X-Request-ID") or set_request_id()
-    set_request_id(request_id)
-    
-    # Start timing
-    start_time = time.time()
-    
-    # Process request
-    response = await call_next(request)
-    
-    # Calculate duration
-    duration_ms = (time.time() - start_time) * 1000
-    
-    # Log request (skip health checks for noise reduction)
-    if request.url.path not in ["/health", "/favicon.ico"]:
-        log_level = "warning" if duration_ms > 500 else "info"
-        getattr(logger, log_level)(
-            "http_request",
-            method=request.method,
-            path=request.url.path,
-            status_code=response.status_code,
-            duration_ms=round(duration_ms, 2),
-            request_id=request_id
-        )
-    
-    # Add request ID to response headers
-    response.headers["X-Request-ID"] = request_id
-    
-    return response
-
-
-@app.middleware("http")
-async def add_security_headers(request, call_next):
-    response = await call_next(request)
-    if ENVIRONMENT == "production":
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["X-Content-Type-Options"] = "nosniff" 
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        # Remove server header for security (use del instead of pop)
-        if "server" in response.headers:
-            del response.headers["server"]
-    return response
+# Request IDs, timing, Server-Timing, slow-request logging and security headers
+app.add_middleware(RequestTrackingMiddleware, security_headers=ENVIRONMENT == "production")
 
 
 # --- Routers ---
@@ -292,82 +255,114 @@ if ENVIRONMENT != "production":
 # Legacy routes removed for memory optimization (all routes use /api prefix now)
 
 
-# --- Startup Event ---
-@app.on_event("startup")
-async def startup_event():
+# --- Startup ---
+def run_startup_tasks():
     """
-    Safe startup initialization:
-    - Run controlled, one-time migrations (tracked in migration_log)
+    Database startup work that must run once per server, not once per worker:
+    - Restore the seed SQLite database from its base64 secret file if needed
     - Enable SQLite hardening (WAL mode, foreign keys)
-    - Start backup scheduler (in production)
-    
+    - Run controlled, one-time migrations (tracked in migration_log)
+    - Verify database indexes
+
+    Run by the startup event, or once by the gunicorn master before it forks
+    the workers (gunicorn_conf.py), which then skip it.
     IMPORTANT: We do NOT run data-mutating queries here that affect users.
     All such changes must go through the controlled migration system.
     """
+    started = time.perf_counter()
+
+    # Step 0: Seed database restore (before the first connection opens the file)
+    if not db.USE_POSTGRES:
+        import db_restore
+        db_restore.restore_if_needed(db.DB_PATH)
+
+    # Step 1: SQLite hardening (connection-level settings)
+    if not db.USE_POSTGRES:
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            # Enable WAL mode for better concurrency
+            cursor.execute("PRAGMA journal_mode=WAL")
+            journal = cursor.fetchone()[0]
+            # Increase busy timeout to reduce "database locked" errors
+            cursor.execute("PRAGMA busy_timeout=30000")  # 30 seconds
+            # Enable foreign key enforcement
+            cursor.execute("PRAGMA foreign_keys=ON")
+            logger.info(f"SQLite hardening: journal_mode={journal}, busy_timeout=30000ms, foreign_keys=ON")
+
+    # Step 2: Run controlled migrations (one-time, tracked)
+    from migrations import run_pending_migrations
+    executed = run_pending_migrations()
+    if executed:
+        logger.info(f"Migrations executed: {len(executed)} - {executed}")
+    else:
+        logger.info("No pending migrations")
+
+    # Step 3: Verify database indexes (SQLite only, lightweight check)
+    if not db.USE_POSTGRES:
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            # Only check if indexes exist, don't recreate on every startup
+            cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='index' AND name LIKE 'idx_%'")
+            index_count = cursor.fetchone()[0]
+
+            # Only create indexes if missing (first-time setup)
+            if index_count < 6:
+                expected_indexes = {
+                    'idx_pedidos_cliente': 'CREATE INDEX IF NOT EXISTS idx_pedidos_cliente ON pedidos(cliente_id)',
+                    'idx_pedidos_estado': 'CREATE INDEX IF NOT EXISTS idx_pedidos_estado ON pedidos(estado)',
+                    'idx_pedidos_fecha': 'CREATE INDEX IF NOT EXISTS idx_pedidos_fecha ON pedidos(fecha)',
+                    'idx_productos_categoria': 'CREATE INDEX IF NOT EXISTS idx_productos_categoria ON productos(categoria_id)',
+                    'idx_pedido_productos_pedido': 'CREATE INDEX IF NOT EXISTS idx_pedido_productos_pedido ON pedido_productos(pedido_id)',
+                    'idx_pedido_productos_producto': 'CREATE INDEX IF NOT EXISTS idx_pedido_productos_producto ON pedido_productos(producto_id)',
+                }
+
+                created = []
+                for idx_name, create_sql in expected_indexes.items():
+                    try:
+                        cursor.execute(create_sql)
+                        created.append(idx_name)
+                    except Exception as e:
+                        logger.warning(f"Index creation failed for {idx_name}: {str(e)}")
+
+                if created:
+                    conn.commit()
+                    logger.info(f"Indexes created: {created}")
+            else:
+                logger.info(f"Indexes verified: {index_count} existing")
+
+    logger.info(f"Startup tasks completed in {time.perf_counter() - started:.2f}s")
+
+
+@app.on_event("startup")
+async def startup_event():
+    """
+    Safe startup initialization:
+    - Database startup work (run_startup_tasks), unless the server master already ran it
+    - Start the maintenance scheduler
+    """
+    # Event loop lag monitor (also flushes this worker's metrics file)
+    if metrics.METRICS_ENABLED:
+        app.state.event_loop_monitor = asyncio.create_task(metrics.monitor_event_loop())
+    
     logger.info("Starting application initialization...")
     
     try:
-        # Step 1: SQLite hardening (connection-level settings)
-        if not db.USE_POSTGRES:
-            with db.get_db_connection() as conn:
-                cursor = conn.cursor()
-                # Enable WAL mode for better concurrency
-                cursor.execute("PRAGMA journal_mode=WAL")
-                journal = cursor.fetchone()[0]
-                # Increase busy timeout to reduce "database locked" errors
-                cursor.execute("PRAGMA busy_timeout=30000")  # 30 seconds
-                # Enable foreign key enforcement
-                cursor.execute("PRAGMA foreign_keys=ON")
-                logger.info(f"SQLite hardening: journal_mode={journal}, busy_timeout=30000ms, foreign_keys=ON")
-        
-        # Step 2: Run controlled migrations (one-time, tracked)
-        from migrations import run_pending_migrations
-        executed = run_pending_migrations()
-        if executed:
-            logger.info(f"Migrations executed: {len(executed)} - {executed}")
+        if os.getenv("STARTUP_TASKS_DONE") == "1":
+            logger.info("Migrations and index checks already run by the server master")
         else:
-            logger.info("No pending migrations")
+            run_startup_tasks()
         
-        # Step 3: Verify database indexes (SQLite only, lightweight check)
-        if not db.USE_POSTGRES:
-            with db.get_db_connection() as conn:
-                cursor = conn.cursor()
-                # Only check if indexes exist, don't recreate on every startup
-                cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='index' AND name LIKE 'idx_%'")
-                index_count = cursor.fetchone()[0]
-                
-                # Only create indexes if missing (first-time setup)
-                if index_count < 6:
-                    expected_indexes = {
-                        'idx_pedidos_cliente': 'CREATE INDEX IF NOT EXISTS idx_pedidos_cliente ON pedidos(cliente_id)',
-                        'idx_pedidos_estado': 'CREATE INDEX IF NOT EXISTS idx_pedidos_estado ON pedidos(estado)',
-                        'idx_pedidos_fecha': 'CREATE INDEX IF NOT EXISTS idx_pedidos_fecha ON pedidos(fecha)',
-                        'idx_productos_categoria': 'CREATE INDEX IF NOT EXISTS idx_productos_categoria ON productos(categoria_id)',
-                        'idx_pedido_productos_pedido': 'CREATE INDEX IF NOT EXISTS idx_pedido_productos_pedido ON pedido_productos(pedido_id)',
-                        'idx_pedido_productos_producto': 'CREATE INDEX IF NOT EXISTS idx_pedido_productos_producto ON pedido_productos(producto_id)',
-                    }
-                    
-                    created = []
-                    for idx_name, create_sql in expected_indexes.items():
-                        try:
-                            cursor.execute(create_sql)
-                            created.append(idx_name)
-                        except Exception as e:
-                            logger.warning(f"Index creation failed for {idx_name}: {str(e)}")
-                    
-                    if created:
-                        conn.commit()
-                        logger.info(f"Indexes created: {created}")
-                else:
-                    logger.info(f"Indexes verified: {index_count} existing")
+        # Step 4: Maintenance scheduler (only the worker holding its lock runs jobs)
+        if maintenance.MAINTENANCE_ENABLED:
+            maintenance.scheduler.start()
         
-        # Step 4: Start backup scheduler (DISABLED to save resources)
+        # Step 5: Start backup scheduler (DISABLED to save resources)
         # Backups can be done manually or via external cron job
         # if ENVIRONMENT == "production":
         #     from backup_scheduler import start_backup_scheduler
         #     start_backup_scheduler()
         #     logger.info("Backup scheduler started")
-        logger.info("Backup scheduler: DISABLED (use manual backups or external cron)")
+        logger.info("Backup scheduler: DISABLED (use MAINTENANCE_BACKUP_CRON, manual backups or external cron)")
         
         logger.info("Application initialization completed successfully")
         
@@ -378,12 +373,36 @@ async def startup_event():
             raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background monitors, the maintenance scheduler and lanes, and write the final metrics of this worker"""
+    monitor = getattr(app.state, "event_loop_monitor", None)
+    if monitor is not None:
+        monitor.cancel()
+    lanes.shutdown()
+    maintenance.scheduler.stop()
+    metrics.REGISTRY.flush()
+
+
 # --- Root Endpoint ---
 @app.get("/")
 def root():
     return {"message": "Chorizaurio API is running", "version": API_VERSION}
 
 
+# --- Metrics (Prometheus text format) ---
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint(request: Request):
+    # Production only serves authenticated scrapes: without a token the endpoint does not exist
+    if not metrics.METRICS_ENABLED or (ENVIRONMENT == "production" and not metrics.METRICS_TOKEN):
+        raise HTTPException(status_code=404, detail="Not Found")
+    if metrics.METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {metrics.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # --- Health Check ---
 @app.get("/health")
 @app.get("/api/health")  # Frontend uses /api/health
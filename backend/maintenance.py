@@ -0,0 +1,386 @@
+"""
+Background maintenance scheduler.
+
+Periodic jobs (token cleanup, idempotency sweep, SQLite WAL checkpoints and
+planner statistics from sqlite_tuning.py, backups, ...) registered with a
+cron spec run on a background thread, never on the request path. Every
+worker starts the scheduler but only one runs jobs: the leader, the worker
+holding an exclusive fcntl lock on MAINTENANCE_LOCK_FILE (same pattern as
+backup_scheduler.py). When the leader exits (restart, max_requests recycling, crash) the kernel releases
+the lock and another worker takes over on its next tick.
+
+Specs are 5-field cron in UTC: minute hour day-of-month month day-of-week
+(0 = Sunday), each `*`, `n`, `a-b`, `*/n`, `a-b/n` or a comma list. Each run
+is delayed by a random 0..jitter seconds. Every run is recorded in the
+maintenance_runs table (status ok / error, duration, detail) and counted
+in maintenance_runs_total{job,status}; GET /api/admin/maintenance shows
+each job with its next and last run.
+
+Usage:
+    from maintenance import scheduler
+
+    @scheduler.job("cleanup_revoked_tokens", "17 * * * *")
+    def cleanup_revoked_tokens():
+        return f"{db.cleanup_revoked_tokens()} tokens removed"   # detail, optional
+
+    scheduler.start()    # startup event of each worker
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+import db
+import metrics
+import sqlite_tuning
+
+logger = logging.getLogger(__name__)
+
+# Configuration from environment
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE_ENABLED", "true").lower() == "true"
+MAINTENANCE_LOCK_FILE = os.getenv("MAINTENANCE_LOCK_FILE", "/tmp/chorizaurio_maintenance.lock")
+MAINTENANCE_TICK_SECONDS = float(os.getenv("MAINTENANCE_TICK_SECONDS", "30"))
+MAINTENANCE_JITTER_SECONDS = float(os.getenv("MAINTENANCE_JITTER_SECONDS", "60"))
+MAINTENANCE_HISTORY_DAYS = int(os.getenv("MAINTENANCE_HISTORY_DAYS", "30"))
+# Cron spec for database backups (backup_scheduler.create_backup_now); empty: no scheduled backups
+MAINTENANCE_BACKUP_CRON = os.getenv("MAINTENANCE_BACKUP_CRON", "")
+
+_DETAIL_MAX = 500
+
+
+# ============================================================================
+# CRON SPECS
+# ============================================================================
+
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _parse_field(text: str, low: int, high: int) -> FrozenSet[int]:
+    values = set()
+    for part in text.split(","):
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(v) for v in base.split("-", 1))
+        else:
+            start = int(base)
+            end = high if step_text else start
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"'{part}' is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSpec:
+    """A 5-field cron expression, evaluated in UTC"""
+
+    def __init__(self, spec: str):
+        fields = spec.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron spec needs 5 fields: '{spec}'")
+        self.spec = spec
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(text, low, high) for text, (low, high) in zip(fields, _FIELD_RANGES)
+        )
+        # Like cron: with both day fields restricted, either one matching is enough
+        self._any_day = fields[2] != "*" and fields[4] != "*"
+        self.next_after(time.time())  # never-matching specs (e.g. 30 Feb) fail here
+
+    def _day_matches(self, t: datetime) -> bool:
+        in_month = t.day in self.days
+        in_week = (t.weekday() + 1) % 7 in self.weekdays
+        return (in_month or in_week) if self._any_day else (in_month and in_week)
+
+    def next_after(self, timestamp: float) -> float:
+        """First matching minute strictly after timestamp"""
+        t = datetime.fromtimestamp(timestamp, timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t.timestamp()
+        raise ValueError(f"Cron spec never matches: '{self.spec}'")
+
+
+# ============================================================================
+# SCHEDULER
+# ============================================================================
+
+class Job:
+    """A registered maintenance job"""
+
+    def __init__(self, name: str, spec: str, func: Callable[[], Any], jitter: float):
+        self.name = name
+        self.cron = CronSpec(spec)
+        self.func = func
+        self.jitter = jitter
+        self.next_run: Optional[float] = None
+
+    def schedule(self, now: float) -> float:
+        self.next_run = self.cron.next_after(now) + random.uniform(0, self.jitter)
+        return self.next_run
+
+
+class MaintenanceScheduler:
+    """Runs registered jobs on one worker at a time (the holder of the lock file)"""
+
+    def __init__(self, lock_path: str = MAINTENANCE_LOCK_FILE, tick: float = MAINTENANCE_TICK_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        self.lock_path = Path(lock_path)
+        self.tick = tick
+        self.clock = clock
+        self.jobs: Dict[str, Job] = {}
+        self._lock_file = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def job(self, name: str, spec: str, jitter: float = MAINTENANCE_JITTER_SECONDS) -> Callable:
+        """Decorator: register func as a job (its return value is stored as the run's detail)"""
+        def decorator(func: Callable[[], Any]) -> Callable[[], Any]:
+            self.jobs[name] = Job(name, spec, func, jitter)
+            return func
+        return decorator
+
+    # -- leader election --
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_file is not None
+
+    def try_lead(self) -> bool:
+        """Become the leader if no other process holds the lock"""
+        if self._lock_file is not None:
+            return True
+        try:
+            import fcntl
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            lock_file = open(self.lock_path, "a+")
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+            lock_file.truncate(0)
+            lock_file.write(str(os.getpid()))
+            lock_file.flush()
+        except Exception as e:
+            logger.warning(f"Could not acquire maintenance lock: {e}")
+            return False
+        self._lock_file = lock_file
+        for job in self.jobs.values():
+            job.next_run = None  # scheduled from now on, not from when another leader ran them
+        logger.info(f"Maintenance leader: pid {os.getpid()}")
+        return True
+
+    def resign(self) -> None:
+        if self._lock_file is not None:
+            try:
+                import fcntl
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                self._lock_file.close()
+            except Exception:
+                pass
+            self._lock_file = None
+
+    # -- running jobs --
+
+    def run_job(self, name: str) -> Dict[str, Any]:
+        """Run one job now and record the run"""
+        job = self.jobs[name]
+        started = self.clock()
+        start = time.perf_counter()
+        try:
+            result = job.func()
+            status, detail = "ok", None if result is None else str(result)
+        except Exception as e:
+            status, detail = "error", f"{type(e).__name__}: {e}"
+            logger.error(f"Maintenance job {name} failed: {detail}")
+        duration_ms = (time.perf_counter() - start) * 1000
+        run = {
+            "job": name,
+            "started_at": datetime.fromtimestamp(started, timezone.utc).replace(tzinfo=None).isoformat(),
+            "duration_ms": round(duration_ms, 1),
+            "status": status,
+            "detail": detail[:_DETAIL_MAX] if detail else None,
+        }
+        metrics.MAINTENANCE_RUNS.inc(name, status)
+        self._record(run)
+        return run
+
+    def _record(self, run: Dict[str, Any]) -> None:
+        try:
+            with db.get_db_transaction() as (conn, cursor):
+                db._execute(
+                    cursor,
+                    "INSERT INTO maintenance_runs (job, started_at, duration_ms, status, detail, pid) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (run["job"], run["started_at"], run["duration_ms"], run["status"], run["detail"], os.getpid()),
+                )
+        except Exception as e:
+            logger.warning(f"Could not record maintenance run of {run['job']}: {e}")
+
+    def run_pending(self) -> List[str]:
+        """Run the jobs that are due; returns their names"""
+        ran = []
+        for job in list(self.jobs.values()):
+            now = self.clock()
+            if job.next_run is None:
+                job.schedule(now)
+            elif job.next_run <= now:
+                self.run_job(job.name)
+                ran.append(job.name)
+                job.schedule(self.clock())
+        return ran
+
+    def _loop(self) -> None:
+        logger.info(f"Maintenance scheduler started: {len(self.jobs)} jobs, tick={self.tick:g}s")
+        while not self._stop.is_set():
+            try:
+                if self.try_lead():
+                    self.run_pending()
+            except Exception as e:
+                logger.error(f"Maintenance scheduler error: {e}")
+            self._stop.wait(self.tick)
+        self.resign()
+        logger.info("Maintenance scheduler stopped")
+
+    def start(self) -> None:
+        """Start the scheduler thread (once per worker)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="MaintenanceScheduler")
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    # -- status --
+
+    def status(self) -> Dict[str, Any]:
+        """Jobs with their next run and last run / last successful run (from the history table)"""
+        jobs = []
+        with db.get_db_connection() as conn:
+            cursor = conn.cursor()
+            for job in self.jobs.values():
+                entry = {
+                    "job": job.name,
+                    "spec": job.cron.spec,
+                    "next_run": (
+                        datetime.fromtimestamp(job.next_run, timezone.utc).replace(tzinfo=None).isoformat()
+                        if job.next_run is not None and self.is_leader else None
+                    ),
+                }
+                for key, condition in (("last_run", ""), ("last_success", " AND status = 'ok'")):
+                    db._execute(
+                        cursor,
+                        "SELECT started_at, duration_ms, status, detail FROM maintenance_runs "
+                        f"WHERE job = ?{condition} ORDER BY started_at DESC LIMIT 1",
+                        (job.name,),
+                    )
+                    row = cursor.fetchone()
+                    entry[key] = (
+                        {"started_at": row[0], "duration_ms": row[1], "status": row[2], "detail": row[3]}
+                        if row else None
+                    )
+                jobs.append(entry)
+        return {"enabled": MAINTENANCE_ENABLED, "leader": self.is_leader, "pid": os.getpid(), "jobs": jobs}
+
+
+scheduler = MaintenanceScheduler()
+
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+@scheduler.job("cleanup_revoked_tokens", "17 * * * *")
+def cleanup_revoked_tokens():
+    return f"{db.cleanup_revoked_tokens()} expired tokens removed"
+
+
+@scheduler.job("idempotency_sweep", "*/10 * * * *")
+def idempotency_sweep():
+    from idempotency import get_idempotency_store
+    return f"{get_idempotency_store().sweep()} expired keys removed"
+
+
+def _checkpoint_detail(result):
+    if result["skipped"]:
+        return f"skipped: WAL {result['wal_bytes']} bytes"
+    return (
+        f"WAL {result['wal_bytes_before']} -> {result['wal_bytes']} bytes, "
+        f"{result['checkpointed_pages']}/{result['wal_pages']} pages, busy={result['busy']}"
+    )
+
+
+@scheduler.job("sqlite_wal_checkpoint", "*/5 * * * *", jitter=30)
+def sqlite_wal_checkpoint():
+    """Passive checkpoint once the WAL is over SQLITE_WAL_CHECKPOINT_MB"""
+    if db.USE_POSTGRES:
+        return "skipped: PostgreSQL"
+    with db.get_db_connection() as conn:
+        result = sqlite_tuning.checkpoint(conn, db.DB_PATH, threshold_bytes=sqlite_tuning.WAL_CHECKPOINT_BYTES)
+    return _checkpoint_detail(result)
+
+
+@scheduler.job("sqlite_wal_truncate", "30 4 * * *")
+def sqlite_wal_truncate():
+    """Checkpoint everything and truncate the WAL, in quiet hours (waits for readers up to busy_timeout)"""
+    if db.USE_POSTGRES:
+        return "skipped: PostgreSQL"
+    with db.get_db_connection() as conn:
+        result = sqlite_tuning.checkpoint(conn, db.DB_PATH, mode="TRUNCATE")
+    return _checkpoint_detail(result)
+
+
+@scheduler.job("sqlite_optimize", "40 4 * * *")
+def sqlite_optimize():
+    if db.USE_POSTGRES:
+        return "skipped: PostgreSQL"
+    with db.get_db_connection() as conn:
+        sqlite_tuning.optimize(conn)
+
+
+@scheduler.job("sqlite_analyze", "20 4 * * 0")
+def sqlite_analyze():
+    if db.USE_POSTGRES:
+        return "skipped: PostgreSQL"
+    with db.get_db_connection() as conn:
+        sqlite_tuning.analyze(conn)
+
+
+@scheduler.job("prune_maintenance_history", "50 4 * * *")
+def prune_maintenance_history():
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=MAINTENANCE_HISTORY_DAYS)).replace(tzinfo=None).isoformat()
+    with db.get_db_transaction() as (conn, cursor):
+        db._execute(cursor, "DELETE FROM maintenance_runs WHERE started_at < ?", (cutoff,))
+        return f"{cursor.rowcount or 0} runs removed"
+
+
+if MAINTENANCE_BACKUP_CRON:
+    @scheduler.job("backup", MAINTENANCE_BACKUP_CRON)
+    def backup():
+        from backup_scheduler import create_backup_now
+        result = create_backup_now(reason="maintenance_schedule")
+        if result is None:
+            raise RuntimeError("Backup failed (see logs)")
+        return f"{result['filename']} ({result['size_human']})"
@@ -0,0 +1,510 @@
+"""
+In-process metrics registry with Prometheus text exposition (GET /metrics).
+
+Metrics:
+- http_request_duration_seconds{method,route,status}  request latency histogram
+- db_query_duration_seconds{operation}                  query execution histogram
+- db_query_timeouts_total{route_class}                  statements cancelled by their deadline
+- single_flight_requests_total{endpoint,outcome}        coalescing endpoint calls: leader / coalesced
+- maintenance_runs_total{job,status}                    maintenance job runs: ok / error
+- pdf_render_duration_seconds{kind}                     PDF generation histogram
+- event_loop_lag_seconds                                scheduling delay of the event loop
+- db_pool_connections{state}                            PostgreSQL pool in_use / idle / waiters / max
+- db_pool_events_total{event}                           pool opens, closes, timeouts, leaks
+- concurrency_limiter{state}                            adaptive limit, in_flight and queue_depth
+- requests_shed_total{priority}                         requests rejected by the limiter
+- execution_lane{lane,state}                            lane threads / active / queued calls
+- lane_rejected_total{lane}                             calls rejected because a lane queue was full
+- sqlite_storage_bytes{kind}                            SQLite db / wal / freelist size
+- cache_hits_total / cache_misses_total / cache_hit_ratio{cache}
+
+Multiple workers: with METRICS_MULTIPROC_DIR set, every worker periodically
+writes its values to <dir>/metrics_<pid>.json and /metrics merges all files,
+so a scrape that lands on any worker reports the whole server. Counters and
+histograms are summed (including workers that have exited, so totals never
+go backwards); gauges are reported per live worker with a pid label, or
+summed / maxed when declared so. The directory should be emptied when the
+server starts.
+
+Usage:
+    import metrics
+
+    metrics.PDF_RENDER_SECONDS.observe(elapsed, "lista")
+    with metrics.PDF_RENDER_SECONDS.time("hoja_ruta"):
+        ...
+    text = metrics.render()
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration from environment
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Accept prometheus_client's variable name too, so existing deployments work
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", os.getenv("PROMETHEUS_MULTIPROC_DIR", ""))
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+# If set, /metrics requires "Authorization: Bearer <token>"; required in production
+# (without it /metrics is a 404 there)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+EVENT_LOOP_LAG_INTERVAL = 0.5
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PDF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+# ============================================================================
+# METRIC TYPES
+# ============================================================================
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Values computed at collection time instead of recorded
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, object] = {}
+
+    def samples(self) -> Dict[LabelValues, object]:
+        if self.callback is not None:
+            try:
+                return dict(self.callback())
+            except Exception as e:
+                logger.warning(f"Metric callback {self.name} failed: {e}")
+                return {}
+        with self._lock:
+            return {labels: self._copy(value) for labels, value in self._values.items()}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, *args, multiprocess_mode: str = "all", **kwargs):
+        super().__init__(*args, **kwargs)
+        # all: one series per live worker (pid label); sum / max: combined
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        # bucket i counts observations <= buckets[i]; the extra slot is +Inf
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+
+class Registry:
+    """Collection of metrics for one process, mergeable across workers."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def collect(self) -> Dict[str, dict]:
+        """This process' values: {name: {type, help, labels, mode, buckets, samples}}"""
+        collected = {}
+        for metric in list(self._metrics.values()):
+            collected[metric.name] = {
+                "type": metric.type,
+                "help": metric.documentation,
+                "labels": list(metric.labelnames),
+                "mode": getattr(metric, "multiprocess_mode", None),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [[list(labels), value] for labels, value in metric.samples().items()],
+            }
+        return collected
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+    # -- multiprocess files --
+
+    def flush(self, directory: Optional[str] = None):
+        """Write this worker's values for the other workers' scrapes (atomic replace)."""
+        directory = directory or METRICS_MULTIPROC_DIR
+        if not directory:
+            return
+        self._last_flush = time.monotonic()
+        path = os.path.join(directory, f"metrics_{os.getpid()}.json")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"pid": os.getpid(), "metrics": self.collect()}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics file: {e}")
+
+    def maybe_flush(self):
+        if METRICS_MULTIPROC_DIR and time.monotonic() - self._last_flush >= METRICS_FLUSH_SECONDS:
+            self.flush()
+
+    def collect_all(self, directory: Optional[str] = None) -> Dict[str, dict]:
+        """Merge the files of every worker (this one flushed first)."""
+        directory = directory or METRICS_MULTIPROC_DIR
+        merged: Dict[str, dict] = {}
+        if not directory:
+            _merge_process(merged, None, self.collect())
+            return merged
+        self.flush(directory)
+        for filename in sorted(os.listdir(directory)):
+            if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced right now
+            _merge_process(merged, data["pid"], data["metrics"])
+        return merged
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge_process(merged: Dict[str, dict], pid: Optional[int], metrics_data: Dict[str, dict]):
+    """Add one worker's collected values to merged (pid None: single process, no pid label)."""
+    alive = None
+    for name, data in metrics_data.items():
+        kind = data["type"]
+        mode = (data.get("mode") or "all") if kind == "gauge" else None
+        per_worker = mode == "all" and pid is not None
+        target = merged.get(name)
+        if target is None:
+            labels = data["labels"] + ["pid"] if per_worker else data["labels"]
+            target = merged[name] = {**data, "labels": labels, "samples": {}}
+        if kind == "gauge" and pid is not None:
+            if alive is None:
+                alive = _pid_alive(pid)
+            if not alive:
+                continue
+        samples = target["samples"]
+        for labels, value in data["samples"]:
+            key = tuple(labels) + (str(pid),) if per_worker else tuple(labels)
+            current = samples.get(key)
+            if current is None:
+                samples[key] = value
+            elif kind == "histogram":
+                current[0] = [a + b for a, b in zip(current[0], value[0])]
+                current[1] += value[1]
+                current[2] += value[2]
+            elif mode == "max":
+                samples[key] = max(current, value)
+            else:
+                samples[key] = current + value
+
+
+# ============================================================================
+# TEXT EXPOSITION
+# ============================================================================
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: List[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_text(collected: Dict[str, dict]) -> str:
+    """Prometheus text format (version 0.0.4) of merged values (see Registry.collect_all)."""
+    lines = []
+    for name in sorted(collected):
+        data = collected[name]
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        for labels, value in sorted(data["samples"].items()):
+            if data["type"] == "histogram":
+                cumulative = 0
+                for bound, count in zip(list(data["buckets"]) + [float("inf")], value[0]):
+                    cumulative += count
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{name}_bucket{_labels(data['labels'], labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(data['labels'], labels)} {_number(value[1])}")
+                lines.append(f"{name}_count{_labels(data['labels'], labels)} {value[2]}")
+            else:
+                lines.append(f"{name}{_labels(data['labels'], labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def render() -> str:
+    """All workers' metrics in Prometheus text format."""
+    return render_text(REGISTRY.collect_all())
+
+
+# ============================================================================
+# COLLECTORS FOR EXISTING COMPONENTS
+# ============================================================================
+
+def _pool_connections() -> Dict[LabelValues, float]:
+    import db
+    pool = db._pg_pool
+    if pool is None:
+        return {}
+    stats = pool.stats()
+    return {(state,): stats[state] for state in ("in_use", "idle", "waiters", "max")}
+
+
+def _pool_events() -> Dict[LabelValues, float]:
+    import db
+    pool = db._pg_pool
+    if pool is None:
+        return {}
+    return {(event,): count for event, count in pool.stats().items() if event not in ("in_use", "idle", "waiters", "max")}
+
+
+def _concurrency_state() -> Dict[LabelValues, float]:
+    from concurrency_limit import limiter
+    return {
+        ("limit",): int(limiter.limit.limit),
+        ("in_flight",): limiter.in_flight,
+        ("queue_depth",): limiter.queue_depth,
+    }
+
+
+def _requests_shed() -> Dict[LabelValues, float]:
+    from concurrency_limit import limiter
+    return {(priority,): count for priority, count in limiter.shed.items()}
+
+
+def _lane_state() -> Dict[LabelValues, float]:
+    from lanes import LANES
+    return {
+        (name, state): value
+        for name, execution_lane in LANES.items()
+        for state, value in execution_lane.stats().items()
+        if state in ("threads", "active", "queued")
+    }
+
+
+def _lane_rejected() -> Dict[LabelValues, float]:
+    from lanes import LANES
+    return {(name,): execution_lane.rejected for name, execution_lane in LANES.items()}
+
+
+def _sqlite_storage() -> Dict[LabelValues, float]:
+    import db
+    import sqlite_tuning
+    if db.USE_POSTGRES:
+        return {}
+    return {(kind,): value for kind, value in sqlite_tuning.header_stats(db.DB_PATH).items()}
+
+
+def _cache_counters() -> Dict[str, Tuple[int, int]]:
+    """cache name -> (hits, misses) for this process"""
+    counters = {}
+    try:
+        from pdf_cache import get_render_cache, PDF_CACHE_ENABLED
+        if PDF_CACHE_ENABLED:
+            cache = get_render_cache()
+            if cache is not None:
+                with cache._lock:
+                    counters["pdf_fragments"] = (cache._hits, cache._misses)
+    except Exception as e:
+        logger.debug(f"PDF cache stats unavailable: {e}")
+    try:
+        import pdf_layout
+        for name, info in pdf_layout.cache_info().items():
+            counters[f"pdf_{name}"] = (info["hits"], info["misses"])
+    except Exception as e:
+        logger.debug(f"PDF layout cache stats unavailable: {e}")
+    import query_stats
+    info = query_stats.fingerprint.cache_info()
+    counters["query_fingerprint"] = (info.hits, info.misses)
+    return counters
+
+
+def _cache_hits():
+    return {(name,): hits for name, (hits, _) in _cache_counters().items()}
+
+
+def _cache_misses():
+    return {(name,): misses for name, (_, misses) in _cache_counters().items()}
+
+
+def _cache_hit_ratio():
+    return {
+        (name,): hits / (hits + misses)
+        for name, (hits, misses) in _cache_counters().items() if hits + misses
+    }
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status",
+    ("method", "route", "status"),
+))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Database statement execution time", ("operation",), buckets=DB_BUCKETS,
+))
+DB_QUERY_TIMEOUTS = REGISTRY.register(Counter(
+    "db_query_timeouts_total", "Statements cancelled by their route class deadline", ("route_class",),
+))
+SINGLE_FLIGHT_REQUESTS = REGISTRY.register(Counter(
+    "single_flight_requests_total", "Coalescing endpoint calls that executed (leader) or waited for one (coalesced)",
+    ("endpoint", "outcome"),
+))
+MAINTENANCE_RUNS = REGISTRY.register(Counter(
+    "maintenance_runs_total", "Maintenance job runs by outcome (ok, error)", ("job", "status"),
+))
+PDF_RENDER_SECONDS = REGISTRY.register(Histogram(
+    "pdf_render_duration_seconds", "PDF generation time", ("kind",), buckets=PDF_BUCKETS,
+))
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(Gauge(
+    "event_loop_lag_seconds", "Delay of the last event loop wake-up beyond its schedule",
+    multiprocess_mode="max",
+))
+EVENT_LOOP_LAG_HISTOGRAM = REGISTRY.register(Histogram(
+    "event_loop_lag_distribution_seconds", "Event loop wake-up delays",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+))
+REGISTRY.register(Gauge(
+    "db_pool_connections", "PostgreSQL pool connections by state", ("state",),
+    callback=_pool_connections,
+))
+REGISTRY.register(Counter(
+    "db_pool_events_total", "PostgreSQL pool events (opened, closed, timeouts, ping_failures, leaks, reclaimed)",
+    ("event",), callback=_pool_events,
+))
+REGISTRY.register(Gauge(
+    "concurrency_limiter", "Adaptive concurrency limit, admitted requests in flight and queued requests",
+    ("state",), callback=_concurrency_state,
+))
+REGISTRY.register(Counter(
+    "requests_shed_total", "Requests rejected with 503 by the concurrency limiter", ("priority",),
+    callback=_requests_shed,
+))
+REGISTRY.register(Gauge(
+    "execution_lane", "Threads, running calls and queued calls per execution lane",
+    ("lane", "state"), callback=_lane_state,
+))
+REGISTRY.register(Counter(
+    "lane_rejected_total", "Calls rejected with 503 because their lane queue was full", ("lane",),
+    callback=_lane_rejected,
+))
+REGISTRY.register(Gauge(
+    "sqlite_storage_bytes", "SQLite database, WAL and free page bytes (free pages as of the last checkpoint)",
+    ("kind",), callback=_sqlite_storage, multiprocess_mode="max",
+))
+REGISTRY.register(Counter("cache_hits_total", "Cache hits", ("cache",), callback=_cache_hits))
+REGISTRY.register(Counter("cache_misses_total", "Cache misses", ("cache",), callback=_cache_misses))
+REGISTRY.register(Gauge(
+    "cache_hit_ratio", "Cache hit ratio of this worker", ("cache",), callback=_cache_hit_ratio,
+))
+
+
+def observe_query(sql: str, seconds: float):
+    """Record one statement (called for every query by query_stats)."""
+    if METRICS_ENABLED:
+        operation = sql.lstrip()[:6].lower()
+        if operation not in ("select", "insert", "update", "delete"):
+            operation = "other"
+        DB_QUERY_SECONDS.observe(seconds, operation)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    if METRICS_ENABLED:
+        HTTP_REQUEST_SECONDS.observe(seconds, method, route, str(status))
+
+
+async def monitor_event_loop(interval: float = EVENT_LOOP_LAG_INTERVAL):
+    """
+    Measure how late the event loop wakes up (time blocked by sync work on
+    the loop) and flush this worker's metrics file periodically.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        EVENT_LOOP_LAG_SECONDS.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+        REGISTRY.maybe_flush()
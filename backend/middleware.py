@@ -1,53 +1,146 @@
 """
-Request tracking middleware - adds request_id and timing to all requests
-Integrates with Sentry for better error tracking
+Request middleware - request IDs, timing, slow-request logging and security headers.
+
+A single pure ASGI middleware replaces the previous stack of
+BaseHTTPMiddleware layers (each of which ran the endpoint in a separate
+task and re-wrapped streaming bodies). It only touches the
+http.response.start message, so response bodies pass through untouched.
+It also sets the statement deadline of the request's route class
+(query_deadline).
+
+Response headers:
+- X-Request-ID: the client's X-Request-ID if valid, otherwise a new 8-char ID
+- X-Process-Time: time until the response headers were sent
+- Server-Timing: total, db (query execution) and serialization durations
+- Security headers in production
 """
 
+import os
+import re
 import time
 import uuid
+from typing import Optional
+
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-import logging
-
-logger = logging.getLogger(__name__)
-
-class RequestTrackingMiddleware(BaseHTTPMiddleware):
-    """Track all requests with unique ID and timing"""
-    
-    async def dispatch(self, request: Request, call_next):
-        # Generate unique request ID
-        request_id = str(uuid.uuid4())[:8]
-        request.state.request_id = request_id
-        
-        start_time = time.time()
-        
+
+import metrics
+import query_deadline
+import query_stats
+from logging_config import get_logger, set_request_id, request_id_var, start_request_timings
+
+logger = get_logger(__name__)
+
+# Requests slower than this are logged as warnings
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+
+# Not logged at all (noise)
+_QUIET_PATHS = frozenset({"/health", "/favicon.ico"})
+# Never reported as slow: bcrypt is intentionally slow
+_SLOW_EXEMPT_PATHS = frozenset({"/api/login"})
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+SECURITY_HEADERS = [
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+
+
+def _incoming_request_id(scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-request-id":
+            request_id = value.decode("latin-1")
+            return request_id if _VALID_REQUEST_ID.match(request_id) else None
+    return None
+
+
+def server_timing_header(total_ms: float, timings) -> str:
+    """Server-Timing value for the total and the per-phase timings"""
+    return (
+        f"total;dur={total_ms:.2f}, "
+        f'db;desc="{timings.db_queries} queries";dur={timings.db_seconds * 1000:.2f}, '
+        f"serialization;dur={timings.serialization_seconds * 1000:.2f}"
+    )
+
+
+class RequestTrackingMiddleware:
+    """Track all requests with a unique ID and timing (pure ASGI)"""
+
+    def __init__(self, app, security_headers: bool = False):
+        self.app = app
+        self.security_headers = security_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _incoming_request_id(scope) or str(uuid.uuid4())[:8]
+        set_request_id(request_id)
+        scope.setdefault("state", {})["request_id"] = request_id
+        timings = start_request_timings()
+        query_deadline.start_request(scope["method"], scope["path"])
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers", ()))
+                if self.security_headers:
+                    # Don't advertise the server software
+                    headers = [h for h in headers if h[0] != b"server"]
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                headers.append((b"x-process-time", f"{elapsed_ms:.2f}ms".encode("latin-1")))
+                headers.append((b"server-timing", server_timing_header(elapsed_ms, timings).encode("latin-1")))
+                if self.security_headers:
+                    headers.extend(SECURITY_HEADERS)
+                message["headers"] = headers
+            await send(message)
+
         try:
-            response = await call_next(request)
-            
-            # Calculate response time
-            process_time_ms = (time.time() - start_time) * 1000
-            
-            # Add headers for debugging
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = f"{process_time_ms:.2f}ms"
-            
-            # Log slow requests (> 1 second), except login (bcrypt is intentionally slow)
-            if process_time_ms > 1000 and request.url.path != "/api/login":
-                logger.warning(
-                    f"SLOW REQUEST [{request_id}] {request.method} {request.url.path} "
-                    f"took {process_time_ms:.2f}ms"
-                )
-            
-            return response
-            
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            # Add request ID to exception for Sentry
             logger.error(
-                f"ERROR [{request_id}] {request.method} {request.url.path}: {str(e)}"
+                "request_error",
+                method=scope["method"],
+                path=scope["path"],
+                error=str(e),
+                request_id=request_id
             )
             raise
+        finally:
+            self._log_request(scope, status_code, (time.perf_counter() - start) * 1000, timings, request_id)
+
+    @staticmethod
+    def _log_request(scope, status_code: int, duration_ms: float, timings, request_id: str):
+        path = scope["path"]
+        # Route template (/api/pedidos/{pedido_id}) once routing has matched;
+        # unmatched paths share one label to keep metric cardinality bounded
+        route = getattr(scope.get("route"), "path", None)
+        metrics.observe_request(scope["method"], route or "<unmatched>", status_code, duration_ms / 1000)
+        query_stats.finish_request(route or path, timings)
+        if path in _QUIET_PATHS:
+            return
+        slow = duration_ms > SLOW_REQUEST_MS and path not in _SLOW_EXEMPT_PATHS
+        (logger.warning if slow else logger.info)(
+            "http_request",
+            method=scope["method"],
+            path=path,
+            status_code=status_code,
+            duration_ms=round(duration_ms, 2),
+            db_ms=round(timings.db_seconds * 1000, 2),
+            db_queries=timings.db_queries,
+            request_id=request_id
+        )
 
 
 def get_request_id(request: Request) -> str:
     """Get request ID from request state"""
-    return getattr(request.state, "request_id", "unknown")
+    return getattr(request.state, "request_id", None) or request_id_var.get() or "unknown"
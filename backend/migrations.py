@@ -114,6 +114,9 @@ def run_pending_migrations() -> List[str]:
                 _mark_migration_executed(cursor, name, success=False, error=error_msg)
                 raise RuntimeError(f"Migration '{name}' failed: {error_msg}") from e
     
+    if executed:
+        # Column caches and compiled queries must see the new schema
+        db.clear_column_cache()
     return executed
 
 
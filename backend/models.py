@@ -45,6 +45,7 @@ class ErrorCodes:
     # Server errors
     INTERNAL_ERROR = "INTERNAL_ERROR"
     DATABASE_ERROR = "DATABASE_ERROR"
+    SERVICE_UNAVAILABLE = "SERVICE_UNAVAILABLE"
     
     # Rate limiting
     RATE_LIMITED = "RATE_LIMITED"
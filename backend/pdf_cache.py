@@ -0,0 +1,196 @@
+"""
+Content-addressed render cache for PDF fragments.
+
+Each pedido block (lista de pedidos) or delivery card (hoja de ruta) is
+rendered once, and the resulting PDF drawing operators are stored under a
+SHA-256 of the normalized content that produced them. Re-prints and
+incremental batches replay cached fragments and only draw what changed.
+
+Storage is a single SQLite file shared by all workers, with LRU eviction
+once the total payload exceeds PDF_CACHE_MAX_MB.
+
+Usage:
+    from pdf_cache import get_render_cache, content_key
+
+    cache = get_render_cache()          # None when disabled
+    found = cache.get_many([key1, key2])
+    cache.put_many({key3: data})
+    cache.stats()                        # hits, misses, hit_rate, ...
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration from environment
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "true").lower() == "true"
+PDF_CACHE_PATH = os.getenv(
+    "PDF_CACHE_PATH", os.path.join(tempfile.gettempdir(), "chorizaurio_pdf_cache.sqlite")
+)
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "64"))
+
+# SQLite limits the number of bound parameters per statement
+_MAX_BATCH = 500
+
+# Global cache instance (initialized lazily)
+_render_cache: Optional["RenderCache"] = None
+_render_cache_lock = threading.Lock()
+
+
+def content_key(kind: str, payload: Any) -> str:
+    """Stable hash of a fragment kind + its normalized content."""
+    normalized = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{kind}:{normalized}".encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Disk-backed LRU store of rendered fragments, safe across processes."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS fragments (
+                    key TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_fragments_last_used ON fragments(last_used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Return {key: data} for the keys present; refreshes their LRU position."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        if not keys:
+            return found
+        try:
+            with self._connect() as con:
+                for i in range(0, len(keys), _MAX_BATCH):
+                    batch = keys[i:i + _MAX_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = con.execute(
+                        f"SELECT key, data FROM fragments WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, data in rows:
+                        found[key] = zlib.decompress(data)
+                    if rows:
+                        con.execute(
+                            f"UPDATE fragments SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                            [time.time()] + [r[0] for r in rows]
+                        )
+        except sqlite3.Error as e:
+            # A cache failure must never break PDF generation
+            logger.warning(f"PDF cache read failed: {e}")
+        with self._lock:
+            self._hits += len(found)
+            self._misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, bytes]) -> None:
+        """Store fragments and evict least recently used entries over the size cap."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, data in items.items():
+            blob = zlib.compress(data)
+            rows.append((key, blob, len(blob), now))
+        try:
+            with self._connect() as con:
+                con.executemany(
+                    "INSERT OR REPLACE INTO fragments (key, data, size, last_used) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                evicted = self._evict(con)
+        except sqlite3.Error as e:
+            logger.warning(f"PDF cache write failed: {e}")
+            return
+        with self._lock:
+            self._stores += len(rows)
+            self._evictions += evicted
+
+    def _evict(self, con: sqlite3.Connection) -> int:
+        total = con.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        # Trim to 90% of the cap so we don't evict on every single store
+        to_free = total - int(self.max_bytes * 0.9)
+        victims = []
+        for key, size in con.execute("SELECT key, size FROM fragments ORDER BY last_used ASC"):
+            victims.append(key)
+            to_free -= size
+            if to_free <= 0:
+                break
+        for i in range(0, len(victims), _MAX_BATCH):
+            batch = victims[i:i + _MAX_BATCH]
+            con.execute(f"DELETE FROM fragments WHERE key IN ({','.join('?' * len(batch))})", batch)
+        return len(victims)
+
+    def clear(self) -> None:
+        """Drop every stored fragment and reset counters."""
+        with self._connect() as con:
+            con.execute("DELETE FROM fragments")
+        with self._lock:
+            self._hits = self._misses = self._stores = self._evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate counters for this process plus shared storage usage."""
+        try:
+            with self._connect() as con:
+                entries, size = con.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fragments"
+                ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes,
+                "path": self.path,
+            }
+
+
+def get_render_cache() -> Optional[RenderCache]:
+    """Get or create the shared render cache (None when disabled or unavailable)."""
+    global _render_cache
+    if not PDF_CACHE_ENABLED:
+        return None
+    if _render_cache is None:
+        with _render_cache_lock:
+            if _render_cache is None:
+                try:
+                    _render_cache = RenderCache(PDF_CACHE_PATH, PDF_CACHE_MAX_MB * 1024 * 1024)
+                    logger.info(f"PDF render cache initialized at {PDF_CACHE_PATH} (max={PDF_CACHE_MAX_MB}MB)")
+                except Exception as e:
+                    logger.warning(f"PDF render cache disabled: {e}")
+                    return None
+    return _render_cache
@@ -0,0 +1,108 @@
+"""
+Layout primitives for ReportLab documents.
+
+Provides:
+- Measurement caches: wrapped lines and string widths are computed once per
+  distinct text and reused across pedidos, pages and documents
+  (product names and prices repeat a lot).
+- Form XObjects: static chrome (title bars, column headings, badges) is
+  drawn once per document and referenced with a single operator wherever
+  it appears, instead of re-emitting the same operators every time.
+
+Usage:
+    from pdf_layout import wrap_lines, draw_right_string, draw_form
+
+    lines = wrap_lines(nombre, 38)
+    draw_right_string(pdf, x, y, format_currency(total))
+    draw_form(pdf, "columnas", draw_columnas, y=y, bbox=(0, -8, PAGE_WIDTH, 10))
+"""
+
+import textwrap
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+from io import BytesIO
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+# The current font is read from private Canvas attributes (checked in
+# tests/test_pdf_cache.py); without them ReportLab measures the text itself
+_CANVAS_FONT_ATTRS = all(hasattr(canvas.Canvas(BytesIO()), name) for name in ("_fontname", "_fontsize"))
+
+
+@lru_cache(maxsize=8192)
+def wrap_lines(text: str, max_chars: int) -> Tuple[str, ...]:
+    """Wrap text to max_chars per line (memoized, never empty)."""
+    wrapped = textwrap.wrap(text, width=max_chars)
+    return tuple(wrapped) if wrapped else ('',)
+
+
+@lru_cache(maxsize=16384)
+def string_width(text: str, font_name: str, font_size: float) -> float:
+    """Width of text in points for a standard font (memoized)."""
+    return stringWidth(text, font_name, font_size)
+
+
+def draw_right_string(pdf: canvas.Canvas, x: float, y: float, text: str):
+    """drawRightString using the memoized width of the current font."""
+    if not _CANVAS_FONT_ATTRS:
+        pdf.drawRightString(x, y, text)
+        return
+    pdf.drawString(x - string_width(text, pdf._fontname, pdf._fontsize), y, text)
+
+
+def draw_centred_string(pdf: canvas.Canvas, x: float, y: float, text: str):
+    """drawCentredString using the memoized width of the current font."""
+    if not _CANVAS_FONT_ATTRS:
+        pdf.drawCentredString(x, y, text)
+        return
+    pdf.drawString(x - string_width(text, pdf._fontname, pdf._fontsize) / 2, y, text)
+
+
+def ensure_form(
+    pdf: canvas.Canvas,
+    name: str,
+    draw_fn: Callable[[canvas.Canvas], None],
+    bbox: Optional[Tuple[float, float, float, float]] = None
+):
+    """
+    Define a Form XObject on this document the first time it is needed.
+    bbox (lower-x, lower-y, upper-x, upper-y) defaults to the page size;
+    forms drawn around a local origin must pass a bbox covering negative y.
+    """
+    if pdf.hasForm(name):
+        return
+    if bbox:
+        pdf.beginForm(name, *bbox)
+    else:
+        pdf.beginForm(name)
+    draw_fn(pdf)
+    pdf.endForm()
+
+
+def draw_form(
+    pdf: canvas.Canvas,
+    name: str,
+    draw_fn: Callable[[canvas.Canvas], None],
+    x: float = 0,
+    y: float = 0,
+    bbox: Optional[Tuple[float, float, float, float]] = None
+):
+    """Reference a Form XObject at (x, y), defining it on first use."""
+    ensure_form(pdf, name, draw_fn, bbox)
+    if x or y:
+        pdf.saveState()
+        pdf.translate(x, y)
+        pdf.doForm(name)
+        pdf.restoreState()
+    else:
+        pdf.doForm(name)
+
+
+def cache_info() -> dict:
+    """Hit/miss counters of the measurement caches (for benchmarks)."""
+    return {
+        "wrap_lines": wrap_lines.cache_info()._asdict(),
+        "string_width": string_width.cache_info()._asdict(),
+    }
@@ -3,13 +3,53 @@ PDF generation utilities for FRIOSUR.
 Generates professional PDFs with proper pagination, formatting, and totals.
 """
 
+import reportlab
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
 from reportlab.lib.colors import HexColor
 from io import BytesIO
-from typing import List, Dict, Any
-import textwrap
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO, Iterator
+import os
+import json
+import logging
+import tempfile
+
+from metrics import PDF_RENDER_SECONDS
+from pdf_cache import get_render_cache, content_key
+from pdf_layout import wrap_lines, draw_right_string, draw_centred_string, draw_form, ensure_form
+
+# pypdf is only needed to merge page ranges rendered in parallel
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Fragment caching records and replays ReportLab's private page operators
+# (Canvas._code) and form bookkeeping (Canvas._formsinuse), so it is only
+# enabled with the ReportLab release it was written against and cached
+# fragments are keyed by that release (tests/test_pdf_cache.py checks the
+# internals). Bump together with requirements.txt after checking them.
+REPORTLAB_FRAGMENT_VERSION = "4.2.5"
+
+
+def _fragment_cache_supported() -> bool:
+    if reportlab.Version != REPORTLAB_FRAGMENT_VERSION:
+        logger.warning(
+            f"PDF fragment cache disabled: ReportLab {reportlab.Version} is not {REPORTLAB_FRAGMENT_VERSION}"
+        )
+        return False
+    probe = canvas.Canvas(BytesIO())
+    if not all(isinstance(getattr(probe, name, None), list) for name in ("_code", "_formsinuse")):
+        logger.warning("PDF fragment cache disabled: ReportLab canvas internals changed")
+        return False
+    return True
+
+
+FRAGMENT_CACHE_SUPPORTED = _fragment_cache_supported()
 
 
 # Page dimensions
@@ -31,11 +71,23 @@ COLOR_GRAY = HexColor('#6b7280')
 COLOR_LIGHT_GRAY = HexColor('#f3f4f6')
 COLOR_DARK = HexColor('#111827')
 
+# Parallel rendering: above this many pedidos, page ranges are rendered in
+# worker processes and merged. Set PDF_PARALLEL_MIN_PEDIDOS=0 to disable.
+PDF_PARALLEL_MIN_PEDIDOS = int(os.getenv("PDF_PARALLEL_MIN_PEDIDOS", "400"))
+PDF_PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Process pool (initialized lazily, reused across requests)
+_render_pool = None
+
+# Response spooling: PDFs stay in memory up to PDF_SPOOL_MAX_MB, then spill
+# to a temp file; they are streamed to the client PDF_STREAM_CHUNK_KB at a time
+PDF_SPOOL_MAX_MB = int(os.getenv("PDF_SPOOL_MAX_MB", "4"))
+PDF_STREAM_CHUNK_KB = int(os.getenv("PDF_STREAM_CHUNK_KB", "64"))
+
 
 def wrap_text(text: str, max_chars: int = 50) -> List[str]:
     """Wrap text to fit within max characters per line."""
-    wrapped = textwrap.wrap(text, width=max_chars)
-    return wrapped if wrapped else ['']
+    return list(wrap_lines(text, max_chars))
 
 
 def format_currency(value: float) -> str:
@@ -43,8 +95,30 @@ def format_currency(value: float) -> str:
     return f"${value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
 
-def estimate_pedido_height(pedido: Dict[str, Any]) -> float:
-    """Estimate the height needed to render a complete pedido block."""
+# Unit abbreviations for the CANT. column
+TIPO_ABBR = {'unidad': 'u', 'caja': 'cj', 'gancho': 'g', 'tira': 't', 'kg': 'kg'}
+
+# Pedido block columns (x positions)
+COL_PRODUCTO = LEFT_MARGIN + 5                      # 35  product name (left-aligned)
+COL_CANT = LEFT_MARGIN + 340                        # 370 quantity (right-aligned)
+COL_NOTAS_L = LEFT_MARGIN + 345                     # 375 annotation area left border
+COL_NOTAS_R = PAGE_WIDTH - RIGHT_MARGIN - 95        # 487 annotation area right border
+COL_PRECIO = PAGE_WIDTH - RIGHT_MARGIN - 80         # 502 price (right-aligned)
+COL_SUBTOTAL = PAGE_WIDTH - RIGHT_MARGIN - 5        # 577 subtotal (right-aligned)
+
+
+class PedidoLayout:
+    """Measured layout of a pedido block, computed once per pedido."""
+    __slots__ = ("height", "product_lines", "notas_lines")
+    
+    def __init__(self, height: float, product_lines: List[Tuple[str, ...]], notas_lines: Tuple[str, ...]):
+        self.height = height
+        self.product_lines = product_lines
+        self.notas_lines = notas_lines
+
+
+def measure_pedido(pedido: Dict[str, Any]) -> PedidoLayout:
+    """Wrap product names/notes and compute the block height in one pass."""
     line_height = 12
     
     # Header (cliente + fecha badge)
@@ -54,31 +128,37 @@ def estimate_pedido_height(pedido: Dict[str, Any]) -> float:
     height += 14
     
     # Products
-    productos = pedido.get('productos', [])
-    for prod in productos:
-        nombre = prod.get('nombre', 'Producto')
+    product_lines = []
+    for prod in pedido.get('productos', []):
         # Each product takes at least one line, maybe more if name wraps
-        lines = len(wrap_text(nombre, 38))
-        height += line_height * max(lines, 1)
+        lines = wrap_lines(prod.get('nombre', 'Producto'), 38)
+        product_lines.append(lines)
+        height += line_height * len(lines)
         height += 5  # separator line spacing
     
     # Total line + spacing
     height += 22
     
     # Notas/Aclaraciones (if present)
-    notas = pedido.get('notas', '')
-    if notas and notas.strip():
-        wrapped_notas = wrap_text(notas.strip(), 90)
-        height += 10 + (10 * min(len(wrapped_notas), 3)) + 3
+    notas = (pedido.get('notas') or '').strip()
+    notas_lines = wrap_lines(notas, 90)[:3] if notas else ()  # Max 3 lines of notes
+    if notas_lines:
+        height += 10 + (10 * len(notas_lines)) + 3
     
     # Bottom separator
     height += 8
     
-    return height
+    return PedidoLayout(height, product_lines, notas_lines)
 
 
-def draw_header(pdf: canvas.Canvas, page_num: int, total_pages: int, fecha_generacion: str):
-    """Draw page header with title and page number."""
+def estimate_pedido_height(pedido: Dict[str, Any]) -> float:
+    """Estimate the height needed to render a complete pedido block."""
+    return measure_pedido(pedido).height
+
+
+# --- Static chrome (Form XObjects, drawn once per document) ---
+
+def _draw_lista_header_chrome(pdf: canvas.Canvas, fecha_generacion: str):
     # Title
     pdf.setFillColor(COLOR_PRIMARY)
     pdf.setFont("Helvetica-Bold", 12)
@@ -90,25 +170,83 @@ def draw_header(pdf: canvas.Canvas, page_num: int, total_pages: int, fecha_gener
     pdf.drawString(LEFT_MARGIN + 55, CONTENT_TOP, "Lista de Pedidos")
     
     # Generation date
-    pdf.drawRightString(PAGE_WIDTH - RIGHT_MARGIN, CONTENT_TOP, f"Generado: {fecha_generacion}")
+    draw_right_string(pdf, PAGE_WIDTH - RIGHT_MARGIN, CONTENT_TOP, f"Generado: {fecha_generacion}")
     
     # Horizontal line
     pdf.setStrokeColor(COLOR_LIGHT_GRAY)
     pdf.setLineWidth(0.5)
     pdf.line(LEFT_MARGIN, CONTENT_TOP - 14, PAGE_WIDTH - RIGHT_MARGIN, CONTENT_TOP - 14)
+
+
+def _draw_pedido_fondo(pdf: canvas.Canvas):
+    # Header background + pedido number badge, around a local origin
+    pdf.setFillColor(COLOR_LIGHT_GRAY)
+    pdf.roundRect(LEFT_MARGIN, -20, CONTENT_WIDTH, 24, 3, fill=True, stroke=False)
+    pdf.setFillColor(COLOR_PRIMARY)
+    pdf.roundRect(LEFT_MARGIN + 3, -17, 55, 18, 2, fill=True, stroke=False)
+
+
+def _draw_pedido_columnas(pdf: canvas.Canvas):
+    # Products table header, around a local origin
+    pdf.setFillColor(COLOR_GRAY)
+    pdf.setFont("Helvetica-Bold", 7)
+    pdf.drawString(COL_PRODUCTO, 0, "PRODUCTO")
+    draw_right_string(pdf, COL_CANT, 0, "CANT.")
+    draw_right_string(pdf, COL_PRECIO, 0, "PRECIO")
+    draw_right_string(pdf, COL_SUBTOTAL, 0, "SUBTOTAL")
+    pdf.setStrokeColor(HexColor('#e5e7eb'))
+    pdf.setLineWidth(0.5)
+    pdf.line(COL_PRODUCTO, -4, COL_SUBTOTAL, -4)
+
+
+def _draw_hoja_ruta_marcas(pdf: canvas.Canvas):
+    # Entrega number badge + delivery checkbox of a card, around a local origin
+    pdf.setFillColor(COLOR_PRIMARY)
+    pdf.roundRect(LEFT_MARGIN + 8, -18, 35, 22, 3, fill=True, stroke=False)
+    pdf.setStrokeColor(COLOR_GRAY)
+    pdf.setLineWidth(2)
+    pdf.rect(PAGE_WIDTH - RIGHT_MARGIN - 30, -18, 18, 18, fill=False, stroke=True)
+
+
+# Forms referenced from cached fragments: name -> (draw_fn, bbox)
+FRAGMENT_FORMS = {
+    "pedido_fondo": (_draw_pedido_fondo, (0, -24, PAGE_WIDTH, 8)),
+    "pedido_columnas": (_draw_pedido_columnas, (0, -8, PAGE_WIDTH, 10)),
+    "hoja_ruta_marcas": (_draw_hoja_ruta_marcas, (0, -22, PAGE_WIDTH, 8)),
+}
+
+
+def _draw_fragment_form(pdf: canvas.Canvas, name: str, y: float):
+    draw_fn, bbox = FRAGMENT_FORMS[name]
+    draw_form(pdf, name, draw_fn, y=y, bbox=bbox)
+
+
+def draw_header(pdf: canvas.Canvas, page_num: int, total_pages: int, fecha_generacion: str):
+    """Draw page header with title and page number."""
+    # Title, subtitle, date and line are identical on every page
+    draw_form(pdf, "lista_header", lambda c: _draw_lista_header_chrome(c, fecha_generacion))
     
     # Page number at bottom
     pdf.setFillColor(COLOR_GRAY)
     pdf.setFont("Helvetica", 8)
-    pdf.drawCentredString(PAGE_WIDTH / 2, 20, f"Página {page_num} de {total_pages}")
+    draw_centred_string(pdf, PAGE_WIDTH / 2, 20, f"Página {page_num} de {total_pages}")
 
 
-def draw_pedido(pdf: canvas.Canvas, pedido: Dict[str, Any], y: float, clientes_dict: Dict[int, str]) -> float:
+def draw_pedido(
+    pdf: canvas.Canvas,
+    pedido: Dict[str, Any],
+    y: float,
+    clientes_dict: Dict[int, str],
+    layout: Optional[PedidoLayout] = None
+) -> float:
     """
     Draw a single pedido block starting at y position.
+    layout comes from measure_pedido (measured here if not given).
     Returns the new y position after drawing.
     """
     line_height = 12
+    if layout is None:
+        layout = measure_pedido(pedido)
     
     # Get cliente info
     cliente_id = pedido.get('cliente_id')
@@ -125,13 +263,8 @@ def draw_pedido(pdf: canvas.Canvas, pedido: Dict[str, Any], y: float, clientes_d
         except:
             fecha = fecha[:16]
     
-    # Header background
-    pdf.setFillColor(COLOR_LIGHT_GRAY)
-    pdf.roundRect(LEFT_MARGIN, y - 20, CONTENT_WIDTH, 24, 3, fill=True, stroke=False)
-    
-    # Pedido number badge
-    pdf.setFillColor(COLOR_PRIMARY)
-    pdf.roundRect(LEFT_MARGIN + 3, y - 17, 55, 18, 2, fill=True, stroke=False)
+    # Header background + pedido number badge
+    _draw_fragment_form(pdf, "pedido_fondo", y)
     pdf.setFillColor(HexColor('#ffffff'))
     pdf.setFont("Helvetica-Bold", 8)
     pdf.drawString(LEFT_MARGIN + 9, y - 12, f"#{pedido_id}")
@@ -144,30 +277,13 @@ def draw_pedido(pdf: canvas.Canvas, pedido: Dict[str, Any], y: float, clientes_d
     # Fecha
     pdf.setFillColor(COLOR_GRAY)
     pdf.setFont("Helvetica", 8)
-    pdf.drawRightString(PAGE_WIDTH - RIGHT_MARGIN - 5, y - 12, fecha)
+    draw_right_string(pdf, PAGE_WIDTH - RIGHT_MARGIN - 5, y - 12, fecha)
     
     y -= 28
     
     # Products table header
-    # Column right-edges for right-aligned numeric columns
-    col_producto = LEFT_MARGIN + 5                      # 35  product name (left-aligned)
-    col_cant = LEFT_MARGIN + 340                        # 370 quantity (right-aligned)
-    col_notas_l = LEFT_MARGIN + 345                     # 375 annotation area left border
-    col_notas_r = PAGE_WIDTH - RIGHT_MARGIN - 95        # 487 annotation area right border
-    col_precio = PAGE_WIDTH - RIGHT_MARGIN - 80         # 502 price (right-aligned)
-    col_subtotal = PAGE_WIDTH - RIGHT_MARGIN - 5        # 577 subtotal (right-aligned)
-    
-    pdf.setFillColor(COLOR_GRAY)
-    pdf.setFont("Helvetica-Bold", 7)
-    pdf.drawString(col_producto, y, "PRODUCTO")
-    pdf.drawRightString(col_cant, y, "CANT.")
-    pdf.drawRightString(col_precio, y, "PRECIO")
-    pdf.drawRightString(col_subtotal, y, "SUBTOTAL")
-    
+    _draw_fragment_form(pdf, "pedido_columnas", y)
     y -= 4
-    pdf.setStrokeColor(HexColor('#e5e7eb'))
-    pdf.setLineWidth(0.5)
-    pdf.line(col_producto, y, col_subtotal, y)
     
     # Remember the top of the product table for vertical annotation lines
     table_top_y = y
@@ -178,8 +294,7 @@ def draw_pedido(pdf: canvas.Canvas, pedido: Dict[str, Any], y: float, clientes_d
     total = 0
     
     pdf.setFont("Helvetica", 8)
-    for prod in productos:
-        nombre = prod.get('nombre', 'Producto')
+    for prod, wrapped_name in zip(productos, layout.product_lines):
         cantidad = prod.get('cantidad', 1)
         tipo = prod.get('tipo', 'unidad')
         precio = prod.get('precio', 0) or 0
@@ -188,24 +303,23 @@ def draw_pedido(pdf: canvas.Canvas, pedido: Dict[str, Any], y: float, clientes_d
         
         # Product name (may wrap)
         pdf.setFillColor(COLOR_DARK)
-        wrapped_name = wrap_text(nombre, 38)
         for i, line in enumerate(wrapped_name):
-            pdf.drawString(col_producto, y, line)
+            pdf.drawString(COL_PRODUCTO, y, line)
             if i == 0:
                 # Cantidad, precio, subtotal on first line — all right-aligned
                 pdf.setFillColor(COLOR_GRAY)
-                tipo_abbr = {'unidad': 'u', 'caja': 'cj', 'gancho': 'g', 'tira': 't', 'kg': 'kg'}.get(tipo, tipo[:2])
-                pdf.drawRightString(col_cant, y, f"{cantidad} {tipo_abbr}")
-                pdf.drawRightString(col_precio, y, format_currency(precio))
+                tipo_abbr = TIPO_ABBR.get(tipo, tipo[:2])
+                draw_right_string(pdf, COL_CANT, y, f"{cantidad} {tipo_abbr}")
+                draw_right_string(pdf, COL_PRECIO, y, format_currency(precio))
                 pdf.setFillColor(COLOR_DARK)
-                pdf.drawRightString(col_subtotal, y, format_currency(subtotal))
+                draw_right_string(pdf, COL_SUBTOTAL, y, format_currency(subtotal))
             y -= line_height
         
         # Horizontal separator line between products
         y -= 1
         pdf.setStrokeColor(HexColor('#9ca3af'))
         pdf.setLineWidth(0.5)
-        pdf.line(col_producto, y + 3, col_subtotal, y + 3)
+        pdf.line(COL_PRODUCTO, y + 3, COL_SUBTOTAL, y + 3)
         y -= 2
     
     # Draw vertical dashed lines for the annotation column (blank space for handwriting)
@@ -213,35 +327,32 @@ def draw_pedido(pdf: canvas.Canvas, pedido: Dict[str, Any], y: float, clientes_d
     pdf.setStrokeColor(HexColor('#d1d5db'))
     pdf.setLineWidth(0.4)
     pdf.setDash(3, 2)  # Dashed border
-    pdf.line(col_notas_l, table_top_y, col_notas_l, table_bottom_y)  # Left border
-    pdf.line(col_notas_r, table_top_y, col_notas_r, table_bottom_y)  # Right border
+    pdf.line(COL_NOTAS_L, table_top_y, COL_NOTAS_L, table_bottom_y)  # Left border
+    pdf.line(COL_NOTAS_R, table_top_y, COL_NOTAS_R, table_bottom_y)  # Right border
     pdf.setDash()  # Reset to solid lines
     
     # Total line
     y -= 4
     pdf.setStrokeColor(HexColor('#e5e7eb'))
     pdf.setLineWidth(0.5)
-    pdf.line(col_producto, y + 3, col_subtotal, y + 3)
+    pdf.line(COL_PRODUCTO, y + 3, COL_SUBTOTAL, y + 3)
     
     pdf.setFillColor(COLOR_SUCCESS)
     pdf.setFont("Helvetica-Bold", 9)
-    pdf.drawRightString(col_precio, y - 5, "TOTAL:")
-    pdf.drawRightString(col_subtotal, y - 5, format_currency(total))
+    draw_right_string(pdf, COL_PRECIO, y - 5, "TOTAL:")
+    draw_right_string(pdf, COL_SUBTOTAL, y - 5, format_currency(total))
     
     y -= 18
     
     # Notas/Aclaraciones (if present)
-    notas = pedido.get('notas', '')
-    if notas and notas.strip():
+    if layout.notas_lines:
         pdf.setFillColor(COLOR_GRAY)
         pdf.setFont("Helvetica-Bold", 7)
         pdf.drawString(LEFT_MARGIN + 5, y, "ACLARACIONES:")
         y -= 10
         pdf.setFont("Helvetica", 7)
         pdf.setFillColor(COLOR_DARK)
-        # Wrap notes if too long
-        wrapped_notas = wrap_text(notas.strip(), 90)
-        for line in wrapped_notas[:3]:  # Max 3 lines of notes
+        for line in layout.notas_lines:
             pdf.drawString(LEFT_MARGIN + 5, y, line)
             y -= 10
         y -= 3
@@ -251,51 +362,170 @@ def draw_pedido(pdf: canvas.Canvas, pedido: Dict[str, Any], y: float, clientes_d
     return y
 
 
-def generar_pdf_multiple(pedidos: List[Dict[str, Any]], clientes: List[Dict[str, Any]], fecha_generacion: str) -> bytes:
+# =============================================================================
+# FRAGMENTS - cached drawing operators for content-only blocks (see pdf_cache)
+# =============================================================================
+
+# Bump when draw_pedido / draw_hoja_ruta_card output changes to invalidate the cache
+FRAGMENT_VERSION = 2
+
+
+def _new_canvas(buffer: BytesIO, forms: Tuple[str, ...] = ()) -> canvas.Canvas:
     """
-    Generate a multi-page PDF with all pedidos.
-    Handles pagination intelligently - never cuts a pedido across pages.
+    Create a canvas whose font resource names are always the same
+    (Helvetica=/F1, Helvetica-Bold=/F2), so cached operators replay correctly
+    in any document. The given FRAGMENT_FORMS are defined up front so they
+    are never started in the middle of a fragment being recorded.
+    """
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    pdf.setFont("Helvetica-Bold", 8)
+    pdf.setFont("Helvetica", 12)
+    for name in forms:
+        draw_fn, bbox = FRAGMENT_FORMS[name]
+        ensure_form(pdf, name, draw_fn, bbox)
+    return pdf
+
+
+def _ensure_fragment_forms(pdf: canvas.Canvas, names: List[str]):
+    """Define (if needed) and mark as used on this page the forms a fragment references."""
+    for name in names:
+        draw_fn, bbox = FRAGMENT_FORMS[name]
+        ensure_form(pdf, name, draw_fn, bbox)
+        pdf._formsinuse.append(name)
+
+
+def _pedido_fragment_key(pedido: Dict[str, Any], clientes_dict: Dict[int, str]) -> str:
+    """Hash of everything draw_pedido prints for this pedido."""
+    cliente_id = pedido.get('cliente_id')
+    return content_key("pedido", {
+        "v": FRAGMENT_VERSION,
+        "reportlab": reportlab.Version,
+        "id": pedido.get('id'),
+        "cliente": clientes_dict.get(cliente_id, f"Cliente #{cliente_id}"),
+        "fecha": pedido.get('fecha'),
+        "notas": (pedido.get('notas') or '').strip(),
+        "productos": [
+            [p.get('nombre', 'Producto'), p.get('cantidad', 1), p.get('tipo', 'unidad'), p.get('precio', 0) or 0]
+            for p in pedido.get('productos', [])
+        ],
+    })
+
+
+def _hoja_ruta_card_key(pedido: Dict[str, Any]) -> str:
+    """Hash of everything draw_hoja_ruta_card prints for this pedido."""
+    cliente = pedido.get('cliente', {})
+    return content_key("hoja_ruta_card", {
+        "v": FRAGMENT_VERSION,
+        "reportlab": reportlab.Version,
+        "cliente_id": pedido.get('cliente_id'),
+        "cliente": [cliente.get('nombre'), cliente.get('direccion'), cliente.get('telefono')],
+        "productos": [
+            [p.get('nombre', ''), p.get('cantidad', 1), p.get('precio', 0) or 0]
+            for p in pedido.get('productos', [])
+        ],
+    })
+
+
+def _draw_fragment(pdf: canvas.Canvas, y: float, key: Optional[str], fragments: Dict, new_fragments: Dict, draw_fn) -> float:
+    """
+    Draw a block at y whose operators depend only on its content.
+    draw_fn(pdf, y) draws it and returns the new y. The block is drawn at y=0
+    inside a translated graphics state, so its operators are position
+    independent: a cached copy is replayed as-is, a new one is recorded.
+    Returns the new y position after the block.
+    """
+    cached = fragments.get(key) if key else None
+    if cached is not None:
+        height, ops, forms = cached
+        # Forms are defined outside the page stream, before the replayed operators
+        _ensure_fragment_forms(pdf, forms)
+        pdf.saveState()
+        pdf.translate(0, y)
+        pdf._code.extend(ops)
+    else:
+        pdf.saveState()
+        pdf.translate(0, y)
+        start, forms_start = len(pdf._code), len(pdf._formsinuse)
+        height = -draw_fn(pdf, 0)
+        if key:
+            fragments[key] = new_fragments[key] = (
+                height, pdf._code[start:], list(dict.fromkeys(pdf._formsinuse[forms_start:]))
+            )
+    pdf.restoreState()
+    return y - height
+
+
+def _load_fragments(cache, keys: List[str]) -> Dict[str, Any]:
+    fragments = {}
+    for key, data in cache.get_many(keys).items():
+        height, ops, forms = json.loads(data)
+        fragments[key] = (height, ops, forms)
+    return fragments
+
+
+def _store_fragments(cache, new_fragments: Dict[str, Any]):
+    cache.put_many({
+        key: json.dumps(list(fragment), separators=(",", ":")).encode("utf-8")
+        for key, fragment in new_fragments.items()
+    })
+
+
+def paginar_pedidos(pedidos: List[Dict[str, Any]]) -> List[List[Tuple[Dict[str, Any], PedidoLayout]]]:
+    """
+    Measure each pedido once and assign it to a page.
+    A pedido is never split across pages. Returns pages of (pedido, layout)
+    so rendering reuses the measurement instead of wrapping text again.
     """
-    if not pedidos:
-        buffer = BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=letter)
-        pdf.setFont("Helvetica", 12)
-        pdf.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT / 2, "No hay pedidos para generar")
-        pdf.save()
-        return buffer.getvalue()
-    
-    # Build clientes lookup
-    clientes_dict = {c['id']: c['nombre'] for c in clientes}
-    
-    # First pass: calculate which pedidos go on which page
     pages = []
     current_page = []
     current_height = 0
     available_height = CONTENT_TOP - CONTENT_BOTTOM - 25  # -25 for compact header
     
     for pedido in pedidos:
-        pedido_height = estimate_pedido_height(pedido)
+        layout = measure_pedido(pedido)
+        pedido_height = layout.height
         
         if current_height + pedido_height > available_height and current_page:
             # Start new page
             pages.append(current_page)
-            current_page = [pedido]
+            current_page = [(pedido, layout)]
             current_height = pedido_height
         else:
-            current_page.append(pedido)
+            current_page.append((pedido, layout))
             current_height += pedido_height
     
     # Add last page
     if current_page:
         pages.append(current_page)
     
-    total_pages = len(pages)
-    
-    # Second pass: render PDF
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=letter)
+    return pages
+
+
+def _render_pages(
+    pages: List[List[Tuple[Dict[str, Any], PedidoLayout]]],
+    first_page_num: int,
+    total_pages: int,
+    clientes_dict: Dict[int, str],
+    fecha_generacion: str,
+    page_keys: Optional[List[List[str]]] = None,
+    fragments: Optional[Dict[str, Any]] = None,
+    output: Optional[BinaryIO] = None
+) -> Tuple[Optional[bytes], Dict[str, Any]]:
+    """
+    Render a contiguous range of pre-assigned pages.
+    first_page_num/total_pages keep "Página X de N" global when the range
+    is only a slice of the full document.
+    page_keys (parallel to pages) enables fragment caching: known fragments
+    are replayed and newly drawn ones returned alongside the PDF bytes.
+    With output the PDF is written there and None is returned instead of bytes.
+    """
+    buffer = output if output is not None else BytesIO()
+    pdf = _new_canvas(buffer, forms=("pedido_fondo", "pedido_columnas"))
+    fragments = dict(fragments or {})
+    new_fragments: Dict[str, Any] = {}
     
-    for page_num, page_pedidos in enumerate(pages, 1):
+    for offset, page_pedidos in enumerate(pages):
+        page_num = first_page_num + offset
         # Draw header
         draw_header(pdf, page_num, total_pages, fecha_generacion)
         
@@ -303,17 +533,225 @@ def generar_pdf_multiple(pedidos: List[Dict[str, Any]], clientes: List[Dict[str,
         y = CONTENT_TOP - 25
         
         # Draw each pedido
-        for pedido in page_pedidos:
-            y = draw_pedido(pdf, pedido, y, clientes_dict)
+        for i, (pedido, layout) in enumerate(page_pedidos):
+            key = page_keys[offset][i] if page_keys else None
+            y = _draw_fragment(
+                pdf, y, key, fragments, new_fragments,
+                lambda c, fy: draw_pedido(c, pedido, fy, clientes_dict, layout)
+            )
         
-        # Add page break if not last page
-        if page_num < total_pages:
+        # Add page break if not last page of this range
+        if offset < len(pages) - 1:
             pdf.showPage()
     
     pdf.save()
+    return (None if output is not None else buffer.getvalue()), new_fragments
+
+
+def _render_pages_job(args) -> Tuple[bytes, Dict[str, Any]]:
+    """Worker-process entry point (must be a top-level function to be picklable)."""
+    return _render_pages(*args)
+
+
+def _get_render_pool():
+    """Get or create the process pool used for parallel rendering"""
+    global _render_pool
+    if _render_pool is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn: workers only import this module, never inherit app state/locks
+        _render_pool = ProcessPoolExecutor(
+            max_workers=PDF_PARALLEL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"PDF render pool initialized (workers={PDF_PARALLEL_WORKERS})")
+    return _render_pool
+
+
+def _reset_render_pool():
+    """Discard the process pool so the next parallel render starts a fresh one"""
+    global _render_pool
+    if _render_pool is not None:
+        try:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+        except Exception:
+            pass
+        _render_pool = None
+
+
+def _merge_pdfs(
+    parts: List[bytes],
+    output: Optional[BinaryIO] = None,
+    titles: Optional[List[str]] = None
+) -> Optional[bytes]:
+    """
+    Concatenate rendered page ranges into a single document, in order.
+    titles (parallel to parts) adds a bookmark pointing at each part.
+    """
+    writer = PdfWriter()
+    for i, part in enumerate(parts):
+        writer.append(PdfReader(BytesIO(part)), outline_item=titles[i] if titles else None)
+    if output is not None:
+        writer.write(output)
+        return None
+    buffer = BytesIO()
+    writer.write(buffer)
     return buffer.getvalue()
 
 
+def _should_render_parallel(num_pedidos: int, parallel: Optional[bool]) -> bool:
+    if not PYPDF_AVAILABLE or PDF_PARALLEL_WORKERS < 2:
+        return False
+    if parallel is not None:
+        return parallel
+    return PDF_PARALLEL_MIN_PEDIDOS > 0 and num_pedidos >= PDF_PARALLEL_MIN_PEDIDOS
+
+
+def _render_pages_parallel(
+    pages: List[List[Tuple[Dict[str, Any], PedidoLayout]]],
+    clientes_dict: Dict[int, str],
+    fecha_generacion: str,
+    page_keys: Optional[List[List[str]]] = None,
+    fragments: Optional[Dict[str, Any]] = None,
+    output: Optional[BinaryIO] = None
+) -> Tuple[Optional[bytes], Dict[str, Any]]:
+    """Split pages into one contiguous range per worker and merge the results."""
+    total_pages = len(pages)
+    chunk_size = -(-total_pages // PDF_PARALLEL_WORKERS)  # ceil division
+    jobs = []
+    for start in range(0, total_pages, chunk_size):
+        chunk = pages[start:start + chunk_size]
+        chunk_keys = page_keys[start:start + chunk_size] if page_keys else None
+        # Only ship the clientes and cached fragments referenced by this range
+        chunk_clientes = {
+            p.get('cliente_id'): clientes_dict[p.get('cliente_id')]
+            for page in chunk for p, _ in page
+            if p.get('cliente_id') in clientes_dict
+        }
+        chunk_fragments = {
+            k: fragments[k] for keys in chunk_keys for k in keys if k in fragments
+        } if chunk_keys and fragments else None
+        jobs.append((chunk, start + 1, total_pages, chunk_clientes, fecha_generacion, chunk_keys, chunk_fragments))
+    
+    parts = []
+    new_fragments: Dict[str, Any] = {}
+    for part, part_fragments in _get_render_pool().map(_render_pages_job, jobs):
+        parts.append(part)
+        new_fragments.update(part_fragments)
+    return _merge_pdfs(parts, output), new_fragments
+
+
+@PDF_RENDER_SECONDS.time("lista")
+def generar_pdf_multiple(
+    pedidos: List[Dict[str, Any]],
+    clientes: List[Dict[str, Any]],
+    fecha_generacion: str,
+    parallel: Optional[bool] = None,
+    use_cache: bool = True,
+    output: Optional[BinaryIO] = None
+) -> Optional[bytes]:
+    """
+    Generate a multi-page PDF with all pedidos.
+    Handles pagination intelligently - never cuts a pedido across pages.
+    
+    parallel=None renders in worker processes automatically when there are at
+    least PDF_PARALLEL_MIN_PEDIDOS pedidos; True/False forces the mode.
+    use_cache replays pedido blocks already rendered in a previous document.
+    output (e.g. open_pdf_spool()) receives the PDF instead of returning bytes.
+    """
+    if not pedidos:
+        buffer = output if output is not None else BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=letter)
+        pdf.setFont("Helvetica", 12)
+        pdf.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT / 2, "No hay pedidos para generar")
+        pdf.save()
+        return None if output is not None else buffer.getvalue()
+    
+    # Build clientes lookup
+    clientes_dict = {c['id']: c['nombre'] for c in clientes}
+    
+    # First pass: calculate which pedidos go on which page
+    pages = paginar_pedidos(pedidos)
+    
+    # Look up previously rendered pedido blocks
+    cache = get_render_cache() if use_cache and FRAGMENT_CACHE_SUPPORTED else None
+    page_keys = fragments = None
+    if cache is not None:
+        page_keys = [[_pedido_fragment_key(p, clientes_dict) for p, _ in page] for page in pages]
+        fragments = _load_fragments(cache, [k for keys in page_keys for k in keys])
+    
+    # Second pass: render PDF
+    result = None
+    if len(pages) > 1 and _should_render_parallel(len(pedidos), parallel):
+        try:
+            result = _render_pages_parallel(pages, clientes_dict, fecha_generacion, page_keys, fragments, output)
+        except Exception as e:
+            # A broken pool must never prevent printing - fall back to serial
+            logger.warning(f"Parallel PDF rendering failed, falling back to serial: {e}")
+            _reset_render_pool()
+    if result is None:
+        if output is not None:
+            # Drop anything a failed parallel merge may have written
+            output.seek(0)
+            output.truncate()
+        result = _render_pages(pages, 1, len(pages), clientes_dict, fecha_generacion, page_keys, fragments, output)
+    
+    pdf_bytes, new_fragments = result
+    if cache is not None:
+        _store_fragments(cache, new_fragments)
+    return pdf_bytes
+
+
+# =============================================================================
+# RESPONSE SPOOLING
+# =============================================================================
+
+def open_pdf_spool() -> BinaryIO:
+    """
+    Temp file to render a PDF into: kept in memory up to PDF_SPOOL_MAX_MB,
+    transparently moved to disk beyond that.
+    """
+    return tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_MB * 1024 * 1024, mode="w+b")
+
+
+def spool_size(spool: BinaryIO) -> int:
+    """Total bytes written to the spool."""
+    spool.seek(0, os.SEEK_END)
+    return spool.tell()
+
+
+def iter_pdf_spool(spool: BinaryIO, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """Yield the spooled PDF from the beginning, one chunk at a time."""
+    chunk_size = chunk_size or PDF_STREAM_CHUNK_KB * 1024
+    spool.seek(0)
+    while True:
+        chunk = spool.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def streaming_pdf_response(spool: BinaryIO, filename: str, media_type: str = "application/pdf"):
+    """
+    StreamingResponse that sends a spooled PDF (or ZIP of PDFs) as an
+    attachment in chunks and closes (deletes) the spool once the response
+    is finished.
+    """
+    from fastapi.responses import StreamingResponse
+    from starlette.background import BackgroundTask
+    
+    size = spool_size(spool)
+    return StreamingResponse(
+        iter_pdf_spool(spool),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(size),
+        },
+        background=BackgroundTask(spool.close)
+    )
+
+
 # Legacy function for backwards compatibility
 def generar_pdf_pedido(cliente, fecha, productos):
     """Legacy function - not used in current flow."""
@@ -324,12 +762,107 @@ def generar_pdf_pedido(cliente, fecha, productos):
 # HOJA DE RUTA PDF - Para repartidores
 # =============================================================================
 
+def hoja_ruta_card_height(pedido: Dict[str, Any]) -> float:
+    """Height of a delivery card in the hoja de ruta."""
+    productos_lines = (len(pedido.get('productos', [])) + 2) // 3  # 3 products per line
+    return 70 + (productos_lines * 14)
+
+
+def draw_hoja_ruta_card(pdf: canvas.Canvas, pedido: Dict[str, Any], y: float) -> float:
+    """
+    Draw a delivery card (cliente, address, products, total, signature).
+    Everything drawn depends only on the pedido content; the running
+    entrega number is drawn separately so the card can be cached.
+    Returns the new y position after drawing.
+    """
+    cliente = pedido.get('cliente', {})
+    productos = pedido.get('productos', [])
+    pedido_height = hoja_ruta_card_height(pedido)
+    
+    # Pedido card background
+    pdf.setFillColor(HexColor('#f9fafb'))
+    pdf.roundRect(LEFT_MARGIN, y - pedido_height + 10, CONTENT_WIDTH, pedido_height, 5, fill=True, stroke=False)
+    pdf.setStrokeColor(HexColor('#e5e7eb'))
+    pdf.setLineWidth(1)
+    pdf.roundRect(LEFT_MARGIN, y - pedido_height + 10, CONTENT_WIDTH, pedido_height, 5, fill=False, stroke=True)
+    
+    # Entrega number badge (the number itself is drawn by the caller)
+    # and checkbox for delivery confirmation
+    _draw_fragment_form(pdf, "hoja_ruta_marcas", y)
+    
+    # Cliente name
+    pdf.setFillColor(COLOR_DARK)
+    pdf.setFont("Helvetica-Bold", 13)
+    cliente_nombre = cliente.get('nombre', f"Cliente #{pedido.get('cliente_id', '?')}")
+    pdf.drawString(LEFT_MARGIN + 50, y - 12, cliente_nombre[:35])
+    
+    y -= 25
+    
+    # Address and phone
+    pdf.setFillColor(COLOR_GRAY)
+    pdf.setFont("Helvetica", 10)
+    # Clientes loaded from the DB carry explicit NULLs
+    direccion = cliente.get('direccion') or 'Sin dirección'
+    telefono = cliente.get('telefono') or ''
+    
+    pdf.drawString(LEFT_MARGIN + 15, y, f"📍 {direccion[:50]}")
+    if telefono:
+        draw_right_string(pdf, PAGE_WIDTH - RIGHT_MARGIN - 15, y, f"📞 {telefono}")
+    
+    y -= 18
+    
+    # Products in compact format
+    pdf.setFillColor(COLOR_DARK)
+    pdf.setFont("Helvetica", 9)
+    productos_texto = []
+    for prod in productos:
+        nombre = prod.get('nombre', '')[:20]
+        cant = prod.get('cantidad', 1)
+        productos_texto.append(f"{nombre} x{cant}")
+    
+    # Join products in lines of ~3
+    productos_str = " • ".join(productos_texto)
+    wrapped = wrap_lines(productos_str, 80)
+    for line in wrapped[:2]:  # Max 2 lines
+        pdf.drawString(LEFT_MARGIN + 15, y, line)
+        y -= 14
+    if len(wrapped) > 2:
+        pdf.drawString(LEFT_MARGIN + 15, y, f"... y {len(productos) - 4} productos más")
+        y -= 14
+    
+    # Total
+    total = sum((p.get('precio', 0) or 0) * p.get('cantidad', 1) for p in productos)
+    pdf.setFillColor(COLOR_SUCCESS)
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(LEFT_MARGIN + 15, y, f"💰 TOTAL: {format_currency(total)}")
+    
+    # Firma space
+    pdf.setFillColor(COLOR_GRAY)
+    pdf.setFont("Helvetica", 8)
+    draw_right_string(pdf, PAGE_WIDTH - RIGHT_MARGIN - 15, y, "Firma: ____________")
+    
+    y -= 25
+    
+    return y
+
+
+def draw_entrega_num(pdf: canvas.Canvas, entrega_num: int, y: float):
+    """Draw the running delivery number on the badge of a card starting at y."""
+    pdf.setFillColor(HexColor('#ffffff'))
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawCentredString(LEFT_MARGIN + 25, y - 10, f"#{entrega_num}")
+
+
+
+@PDF_RENDER_SECONDS.time("hoja_ruta")
 def generar_pdf_hoja_ruta(
     pedidos: List[Dict[str, Any]], 
     clientes: List[Dict[str, Any]], 
     repartidor: str,
-    fecha_generacion: str
-) -> bytes:
+    fecha_generacion: str,
+    use_cache: bool = True,
+    output: Optional[BinaryIO] = None
+) -> Optional[bytes]:
     """
     Genera un PDF optimizado para repartidores con:
     - Pedidos agrupados por zona
@@ -337,15 +870,18 @@ def generar_pdf_hoja_ruta(
     - Dirección y teléfono prominentes
     - Lista compacta de productos
     - Espacio para firma del cliente
+    
+    use_cache replays delivery cards already rendered in a previous document.
+    output (e.g. open_pdf_spool()) receives the PDF instead of returning bytes.
     """
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=letter)
+    buffer = output if output is not None else BytesIO()
+    pdf = _new_canvas(buffer, forms=("hoja_ruta_marcas",))
     
     if not pedidos:
         pdf.setFont("Helvetica", 14)
         pdf.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT / 2, "No hay pedidos para esta hoja de ruta")
         pdf.save()
-        return buffer.getvalue()
+        return None if output is not None else buffer.getvalue()
     
     # Build clientes lookup
     clientes_dict = {c['id']: c for c in clientes}
@@ -363,11 +899,20 @@ def generar_pdf_hoja_ruta(
     # Sort zones alphabetically
     zonas_ordenadas = sorted(pedidos_por_zona.keys())
     
+    # Look up previously rendered delivery cards
+    cache = get_render_cache() if use_cache and FRAGMENT_CACHE_SUPPORTED else None
+    fragments: Dict[str, Any] = {}
+    new_fragments: Dict[str, Any] = {}
+    if cache is not None:
+        fragments = _load_fragments(cache, [
+            _hoja_ruta_card_key(p) for zona in zonas_ordenadas for p in pedidos_por_zona[zona]
+        ])
+    
     page_num = 1
     total_pedidos = len(pedidos)
     
-    def draw_page_header(pdf, page_num, repartidor, fecha_generacion, total_pedidos):
-        """Draw header for route sheet"""
+    def draw_page_header_chrome(pdf):
+        """Static part of the route sheet header (identical on every page)"""
         # Logo/Title area
         pdf.setFillColor(COLOR_PRIMARY)
         pdf.rect(LEFT_MARGIN, PAGE_HEIGHT - 80, CONTENT_WIDTH, 50, fill=True, stroke=False)
@@ -393,12 +938,20 @@ def generar_pdf_hoja_ruta(
         y = PAGE_HEIGHT - 100
         pdf.drawString(LEFT_MARGIN, y, f"📦 {total_pedidos} pedidos")
         pdf.drawString(LEFT_MARGIN + 120, y, f"📍 {len(zonas_ordenadas)} zonas")
-        pdf.drawRightString(PAGE_WIDTH - RIGHT_MARGIN, y, f"Página {page_num}")
         
         # Line separator
         pdf.setStrokeColor(COLOR_GRAY)
         pdf.setLineWidth(1)
         pdf.line(LEFT_MARGIN, y - 10, PAGE_WIDTH - RIGHT_MARGIN, y - 10)
+    
+    def draw_page_header(pdf, page_num, repartidor, fecha_generacion, total_pedidos):
+        """Draw header for route sheet"""
+        draw_form(pdf, "hoja_ruta_header", draw_page_header_chrome)
+        
+        pdf.setFillColor(COLOR_DARK)
+        pdf.setFont("Helvetica-Bold", 11)
+        y = PAGE_HEIGHT - 100
+        draw_right_string(pdf, PAGE_WIDTH - RIGHT_MARGIN, y, f"Página {page_num}")
         
         return y - 25
     
@@ -428,12 +981,9 @@ def generar_pdf_hoja_ruta(
         
         for pedido in pedidos_zona:
             entrega_num += 1
-            cliente = pedido.get('cliente', {})
             
             # Estimate height needed for this pedido
-            productos = pedido.get('productos', [])
-            productos_lines = (len(productos) + 2) // 3  # 3 products per line
-            pedido_height = 70 + (productos_lines * 14)
+            pedido_height = hoja_ruta_card_height(pedido)
             
             # Check if we need a new page
             if y < CONTENT_BOTTOM + pedido_height:
@@ -441,76 +991,13 @@ def generar_pdf_hoja_ruta(
                 page_num += 1
                 y = draw_page_header(pdf, page_num, repartidor, fecha_generacion, total_pedidos)
             
-            # Pedido card background
-            pdf.setFillColor(HexColor('#f9fafb'))
-            pdf.roundRect(LEFT_MARGIN, y - pedido_height + 10, CONTENT_WIDTH, pedido_height, 5, fill=True, stroke=False)
-            pdf.setStrokeColor(HexColor('#e5e7eb'))
-            pdf.setLineWidth(1)
-            pdf.roundRect(LEFT_MARGIN, y - pedido_height + 10, CONTENT_WIDTH, pedido_height, 5, fill=False, stroke=True)
-            
-            # Entrega number with checkbox
-            pdf.setFillColor(COLOR_PRIMARY)
-            pdf.roundRect(LEFT_MARGIN + 8, y - 18, 35, 22, 3, fill=True, stroke=False)
-            pdf.setFillColor(HexColor('#ffffff'))
-            pdf.setFont("Helvetica-Bold", 11)
-            pdf.drawCentredString(LEFT_MARGIN + 25, y - 10, f"#{entrega_num}")
-            
-            # Checkbox for delivery confirmation
-            pdf.setStrokeColor(COLOR_GRAY)
-            pdf.setLineWidth(2)
-            pdf.rect(PAGE_WIDTH - RIGHT_MARGIN - 30, y - 18, 18, 18, fill=False, stroke=True)
-            
-            # Cliente name
-            pdf.setFillColor(COLOR_DARK)
-            pdf.setFont("Helvetica-Bold", 13)
-            cliente_nombre = cliente.get('nombre', f"Cliente #{pedido.get('cliente_id', '?')}")
-            pdf.drawString(LEFT_MARGIN + 50, y - 12, cliente_nombre[:35])
-            
-            y -= 25
-            
-            # Address and phone
-            pdf.setFillColor(COLOR_GRAY)
-            pdf.setFont("Helvetica", 10)
-            direccion = cliente.get('direccion', 'Sin dirección')
-            telefono = cliente.get('telefono', '')
-            
-            pdf.drawString(LEFT_MARGIN + 15, y, f"📍 {direccion[:50]}")
-            if telefono:
-                pdf.drawRightString(PAGE_WIDTH - RIGHT_MARGIN - 15, y, f"📞 {telefono}")
-            
-            y -= 18
-            
-            # Products in compact format
-            pdf.setFillColor(COLOR_DARK)
-            pdf.setFont("Helvetica", 9)
-            productos_texto = []
-            for prod in productos:
-                nombre = prod.get('nombre', '')[:20]
-                cant = prod.get('cantidad', 1)
-                productos_texto.append(f"{nombre} x{cant}")
-            
-            # Join products in lines of ~3
-            productos_str = " • ".join(productos_texto)
-            wrapped = wrap_text(productos_str, 80)
-            for line in wrapped[:2]:  # Max 2 lines
-                pdf.drawString(LEFT_MARGIN + 15, y, line)
-                y -= 14
-            if len(wrapped) > 2:
-                pdf.drawString(LEFT_MARGIN + 15, y, f"... y {len(productos) - 4} productos más")
-                y -= 14
-            
-            # Total
-            total = sum((p.get('precio', 0) or 0) * p.get('cantidad', 1) for p in productos)
-            pdf.setFillColor(COLOR_SUCCESS)
-            pdf.setFont("Helvetica-Bold", 11)
-            pdf.drawString(LEFT_MARGIN + 15, y, f"💰 TOTAL: {format_currency(total)}")
-            
-            # Firma space
-            pdf.setFillColor(COLOR_GRAY)
-            pdf.setFont("Helvetica", 8)
-            pdf.drawRightString(PAGE_WIDTH - RIGHT_MARGIN - 15, y, "Firma: ____________")
-            
-            y -= 25
+            card_y = y
+            y = _draw_fragment(
+                pdf, y, _hoja_ruta_card_key(pedido) if cache is not None else None,
+                fragments, new_fragments,
+                lambda c, fy: draw_hoja_ruta_card(c, pedido, fy)
+            )
+            draw_entrega_num(pdf, entrega_num, card_y)
     
     # Final summary page
     pdf.showPage()
@@ -584,4 +1071,45 @@ def generar_pdf_hoja_ruta(
     pdf.drawString(LEFT_MARGIN, y, "Firma Repartidor: _________________________  Hora Salida: ______  Hora Regreso: ______")
     
     pdf.save()
-    return buffer.getvalue()
+    if cache is not None:
+        _store_fragments(cache, new_fragments)
+    return None if output is not None else buffer.getvalue()
+
+
+# =============================================================================
+# HOJAS DE RUTA EN LOTE - Todos los repartidores en un pedido
+# =============================================================================
+
+def _hoja_ruta_job(args) -> bytes:
+    """Worker-process entry point: render one repartidor's route sheet."""
+    repartidor, pedidos, clientes, fecha_generacion = args
+    return generar_pdf_hoja_ruta(pedidos, clientes, repartidor, fecha_generacion)
+
+
+@PDF_RENDER_SECONDS.time("hoja_ruta_lote")
+def generar_pdfs_hoja_ruta(
+    hojas: List[Tuple[str, List[Dict[str, Any]], List[Dict[str, Any]]]],
+    fecha_generacion: str,
+    parallel: Optional[bool] = None
+) -> List[bytes]:
+    """
+    Render one route sheet per (repartidor, pedidos, clientes), returned in
+    the same order. Sheets are spread over the render pool when the batch
+    holds at least PDF_PARALLEL_MIN_PEDIDOS pedidos (or parallel=True).
+    """
+    jobs = [(repartidor, pedidos, clientes, fecha_generacion) for repartidor, pedidos, clientes in hojas]
+    total_pedidos = sum(len(job[1]) for job in jobs)
+    if len(jobs) > 1 and _should_render_parallel(total_pedidos, parallel):
+        try:
+            return list(_get_render_pool().map(_hoja_ruta_job, jobs))
+        except Exception as e:
+            logger.warning(f"Parallel route sheet rendering failed, falling back to serial: {e}")
+            _reset_render_pool()
+    return [_hoja_ruta_job(job) for job in jobs]
+
+
+def merge_pdfs_with_bookmarks(parts: List[Tuple[str, bytes]], output: BinaryIO):
+    """Write (title, pdf) parts into output as one document with a bookmark per part."""
+    if not PYPDF_AVAILABLE:
+        raise RuntimeError("pypdf is required to merge PDFs")
+    _merge_pdfs([pdf for _, pdf in parts], output, titles=[title for title, _ in parts])
@@ -0,0 +1,324 @@
+"""
+Blocking, fair connection pool for PostgreSQL.
+
+psycopg2's ThreadedConnectionPool raises PoolError as soon as every
+connection is checked out and hands out connections without checking them.
+ConnectionPool instead:
+- queues callers FIFO when the pool is exhausted and hands each released
+  connection (or freed slot) to the oldest waiter, up to acquire_timeout
+  seconds; then PoolTimeout (a 503 for the client)
+- pings connections that sat idle longer than ping_after seconds (0: on
+  every checkout) and replaces the ones that fail or were closed
+- retires connections older than max_lifetime seconds when they come back
+  or are checked out
+- remembers where each connection was acquired and logs connections held
+  longer than leak_after seconds with that call site; connections a caller
+  closed without releasing are reclaimed instead of holding a slot forever
+- stats(): in_use / idle / waiters gauges plus counters for /metrics
+
+The driver is abstract (connect() returns an object with close(),
+rollback() and closed) so tests run against a fake one.
+
+Usage:
+    pool = ConnectionPool(lambda: psycopg2.connect(dsn), minconn=2, maxconn=20)
+    con = pool.getconn()
+    try:
+        ...
+    finally:
+        pool.putconn(con)
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from exceptions_custom import ServiceUnavailableException
+
+logger = logging.getLogger(__name__)
+
+# Frames from these files are skipped when recording the acquiring call site
+_INTERNAL_FILES = frozenset({"pg_pool.py", "db.py", "contextlib.py"})
+
+
+class PoolTimeout(ServiceUnavailableException):
+    """No connection became available within the acquire timeout"""
+
+    def __init__(self, timeout: float, maxconn: int):
+        super().__init__(
+            f"No database connection available after {timeout:g}s (pool max={maxconn})",
+            "Servidor ocupado, intente nuevamente en unos segundos",
+        )
+
+
+class _ConnInfo:
+    __slots__ = ("created", "last_used", "acquired", "call_site", "leak_logged")
+
+    def __init__(self, now: float):
+        self.created = now
+        self.last_used = now
+        self.acquired = 0.0
+        self.call_site = ""
+        self.leak_logged = False
+
+
+class _Waiter:
+    __slots__ = ("event", "con", "slot")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.con = None  # handed-over connection
+        self.slot = False  # handed-over right to open a new connection
+
+
+def _default_ping(con) -> None:
+    cur = con.cursor()
+    try:
+        cur.execute("SELECT 1")
+    finally:
+        cur.close()
+
+
+def _call_site() -> str:
+    """file:line (function) of the first frame outside the pool and db helpers"""
+    frame = sys._getframe(2)
+    while frame is not None and os.path.basename(frame.f_code.co_filename) in _INTERNAL_FILES:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{frame.f_lineno} ({code.co_name})"
+
+
+class ConnectionPool:
+    """FIFO blocking pool; see the module docstring"""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        minconn: int = 1,
+        maxconn: int = 10,
+        acquire_timeout: float = 10.0,
+        ping_after: float = 30.0,
+        max_lifetime: float = 1800.0,
+        leak_after: float = 60.0,
+        ping: Callable[[Any], None] = _default_ping,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if minconn < 0 or maxconn < max(minconn, 1):
+            raise ValueError(f"Invalid pool size: min={minconn}, max={maxconn}")
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.ping_after = ping_after
+        self.max_lifetime = max_lifetime
+        self.leak_after = leak_after
+        self._connect = connect
+        self._ping = ping
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._idle: List[Any] = []  # LIFO: hot connections stay hot, extras age out
+        self._in_use: Dict[Any, _ConnInfo] = {}
+        self._info: Dict[Any, _ConnInfo] = {}
+        self._waiters: Deque[_Waiter] = deque()
+        self._opening = 0
+        self._closed = False
+        self._last_leak_check = 0.0
+        self.counters = {"opened": 0, "closed": 0, "timeouts": 0, "ping_failures": 0, "leaks": 0, "reclaimed": 0}
+        for _ in range(minconn):
+            self._opening += 1
+            self._idle.append(self._open())
+
+    # ------------------------------------------------------------------
+    # Checkout / return
+    # ------------------------------------------------------------------
+    def getconn(self, timeout: Optional[float] = None):
+        """Check out a connection, waiting up to timeout (default acquire_timeout) seconds"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        self._check_leaks()
+        con = self._reserve(timeout)
+        if con is None:
+            try:
+                con = self._open()
+            except BaseException:
+                self._free_slot()
+                raise
+        else:
+            con = self._validate(con)
+        info = self._info[con]
+        info.acquired = self._clock()
+        info.call_site = _call_site()
+        info.leak_logged = False
+        with self._lock:
+            self._in_use[con] = info
+        return con
+
+    def putconn(self, con, close: bool = False) -> None:
+        """Return a connection; broken, closed or expired ones are replaced by a free slot"""
+        with self._lock:
+            info = self._in_use.pop(con, None)
+        if info is None:
+            logger.warning("putconn() of a connection this pool did not hand out")
+            return
+        info.last_used = self._clock()
+        if not close and not self._closed and not getattr(con, "closed", False):
+            if info.last_used - info.created >= self.max_lifetime:
+                close = True
+            else:
+                try:
+                    con.rollback()  # no-op unless the caller left a transaction open
+                except Exception as e:
+                    logger.warning(f"Discarding connection that failed to roll back: {e}")
+                    close = True
+        else:
+            close = True
+        if close:
+            self._discard(con)
+            self._free_slot()
+            return
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.con = con
+                waiter.event.set()
+            else:
+                self._idle.append(con)
+
+    def _reserve(self, timeout: float):
+        """An idle connection, or None with a reserved slot to open one; waits FIFO for either"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            # Queue behind existing waiters: a released connection goes to them first
+            if not self._waiters:
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._info) + self._opening < self.maxconn:
+                    self._opening += 1
+                    return None
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+        waiter.event.wait(timeout)
+        with self._lock:
+            if waiter.con is None and not waiter.slot:
+                # Timed out; a hand-over may still race in until we leave the queue
+                self._waiters.remove(waiter)
+                self.counters["timeouts"] += 1
+                raise PoolTimeout(timeout, self.maxconn)
+        return waiter.con
+
+    def _validate(self, con):
+        """con if usable, else a new connection opened in its slot (closed, expired or failed ping)"""
+        info = self._info[con]
+        now = self._clock()
+        stale = getattr(con, "closed", False) or now - info.created >= self.max_lifetime
+        if not stale and now - info.last_used >= self.ping_after:
+            try:
+                self._ping(con)
+                con.rollback()
+            except Exception as e:
+                self.counters["ping_failures"] += 1
+                logger.warning(f"Discarding connection that failed the pre-ping: {e}")
+                stale = True
+        if not stale:
+            return con
+        self._discard(con)
+        # Keep the slot: open the replacement for this caller right away
+        with self._lock:
+            self._opening += 1
+        try:
+            return self._open()
+        except BaseException:
+            self._free_slot()
+            raise
+
+    # ------------------------------------------------------------------
+    # Slots
+    # ------------------------------------------------------------------
+    def _open(self):
+        con = self._connect()
+        info = _ConnInfo(self._clock())
+        with self._lock:
+            self._opening = max(self._opening - 1, 0)
+            self._info[con] = info
+            self.counters["opened"] += 1
+        return con
+
+    def _discard(self, con) -> None:
+        with self._lock:
+            self._info.pop(con, None)
+            self._in_use.pop(con, None)
+            self.counters["closed"] += 1
+        try:
+            con.close()
+        except Exception:
+            pass
+
+    def _free_slot(self) -> None:
+        """A connection is gone: let the oldest waiter open a new one"""
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.slot = True
+                self._opening += 1
+                waiter.event.set()
+
+    # ------------------------------------------------------------------
+    # Leaks and stats
+    # ------------------------------------------------------------------
+    def _check_leaks(self, force: bool = False) -> List[Dict[str, Any]]:
+        """Log connections held longer than leak_after; reclaim closed ones. At most once a second."""
+        now = self._clock()
+        if not force and now - self._last_leak_check < 1.0:
+            return []
+        self._last_leak_check = now
+        with self._lock:
+            held = list(self._in_use.items())
+        leaked = []
+        for con, info in held:
+            if getattr(con, "closed", False):
+                # Closed by its user instead of returned: free the slot
+                with self._lock:
+                    if self._in_use.pop(con, None) is None:
+                        continue
+                    self._info.pop(con, None)
+                    self.counters["reclaimed"] += 1
+                logger.warning(f"Reclaimed a pooled connection closed without putconn(), acquired at {info.call_site}")
+                self._free_slot()
+                continue
+            held_for = now - info.acquired
+            if held_for >= self.leak_after:
+                leaked.append({"held_seconds": round(held_for, 1), "call_site": info.call_site})
+                if not info.leak_logged:
+                    info.leak_logged = True
+                    self.counters["leaks"] += 1
+                    logger.warning(
+                        f"Possible connection leak: held for {held_for:.0f}s, acquired at {info.call_site}"
+                    )
+        return leaked
+
+    def check_leaks(self) -> List[Dict[str, Any]]:
+        """Connections held longer than leak_after, with their acquiring call site"""
+        return self._check_leaks(force=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Gauges (in_use, idle, waiters, max) and lifetime counters"""
+        self._check_leaks()
+        with self._lock:
+            return {
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiters": len(self._waiters),
+                "max": self.maxconn,
+                **self.counters,
+            }
+
+    def closeall(self) -> None:
+        """Close idle connections; checked-out ones are closed when returned"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for con in idle:
+            self._discard(con)
@@ -0,0 +1,88 @@
+"""
+Per-statement deadlines by route class.
+
+The request middleware classifies each request and stores its statement
+timeout in a context variable; the database layer enforces it on every
+statement run during that request:
+- SQLite: a progress handler (every QUERY_PROGRESS_OPS VM instructions)
+  interrupts the statement once its deadline has passed
+- PostgreSQL: statement_timeout, SET on a pooled connection only when it
+  differs from the value the connection already has
+
+A statement that runs out of time raises QueryTimeout (503 for the client)
+and is logged with its fingerprint. Statements outside a request
+(startup, migrations, background jobs) have no deadline.
+
+Route classes (timeouts in ms, 0 disables):
+    orders    order entry: POST/PUT/PATCH/DELETE under /api/pedidos  QUERY_TIMEOUT_ORDERS_MS
+    reports   /api/reportes, /api/estadisticas, /api/dashboard, exports  QUERY_TIMEOUT_REPORTS_MS
+    admin     /api/admin...                                           QUERY_TIMEOUT_ADMIN_MS
+    default   everything else                                         QUERY_TIMEOUT_MS
+"""
+
+import logging
+import os
+from contextvars import ContextVar
+from typing import Optional
+
+import metrics
+from exceptions_custom import ServiceUnavailableException
+from query_stats import fingerprint
+
+logger = logging.getLogger(__name__)
+
+QUERY_TIMEOUTS_MS = {
+    "default": float(os.getenv("QUERY_TIMEOUT_MS", "5000")),
+    "orders": float(os.getenv("QUERY_TIMEOUT_ORDERS_MS", "2000")),
+    "reports": float(os.getenv("QUERY_TIMEOUT_REPORTS_MS", "30000")),
+    "admin": float(os.getenv("QUERY_TIMEOUT_ADMIN_MS", "0")),
+}
+QUERY_PROGRESS_OPS = int(os.getenv("QUERY_PROGRESS_OPS", "10000"))
+
+_REPORT_PREFIXES = ("/api/reportes", "/api/estadisticas", "/api/dashboard")
+_WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+# (route class, timeout in seconds or None) for the current request
+_deadline_var: ContextVar[Optional[tuple]] = ContextVar("query_deadline", default=None)
+
+
+class QueryTimeout(ServiceUnavailableException):
+    """A statement ran past the deadline of its route class"""
+
+    def __init__(self, route_class: str, timeout: float):
+        super().__init__(
+            f"Query exceeded the {route_class} deadline ({timeout * 1000:.0f}ms)",
+            "La consulta tardó demasiado, intente nuevamente en unos segundos",
+        )
+
+
+def route_class(method: str, path: str) -> str:
+    """Route class of a request (see the module docstring)"""
+    if path.startswith("/api/admin"):
+        return "admin"
+    if path.startswith(_REPORT_PREFIXES) or "/export" in path:
+        return "reports"
+    if path.startswith("/api/pedidos") and method in _WRITE_METHODS:
+        return "orders"
+    return "default"
+
+
+def start_request(method: str, path: str) -> None:
+    """Set the statement deadline for the current request"""
+    name = route_class(method, path)
+    timeout_ms = QUERY_TIMEOUTS_MS[name]
+    _deadline_var.set((name, timeout_ms / 1000 if timeout_ms > 0 else None))
+
+
+def statement_timeout() -> Optional[float]:
+    """Seconds each statement may run in the current context; None: no deadline"""
+    current = _deadline_var.get()
+    return current[1] if current is not None else None
+
+
+def timed_out(sql: str) -> QueryTimeout:
+    """Log a cancelled statement and return the exception to raise"""
+    name, timeout = _deadline_var.get() or ("default", 0.0)
+    metrics.DB_QUERY_TIMEOUTS.inc(name)
+    logger.warning(f"Query cancelled after {timeout * 1000:.0f}ms ({name} deadline): {fingerprint(sql)}")
+    return QueryTimeout(name, timeout)
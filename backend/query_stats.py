@@ -0,0 +1,190 @@
+"""
+Query instrumentation: per-request counters, slow-query log and N+1 detection.
+
+Every statement executed through a database connection (db._execute and
+direct cursor.execute alike) goes through the timed cursors in db.py, which
+call record_query(). For each statement this module:
+- adds its time to the current request (Server-Timing db metric) and counts
+  its normalized fingerprint (literals and IN lists collapsed)
+- aggregates count / total / max time per fingerprint for this process
+  (and feeds the db_query_duration_seconds histogram in metrics)
+- logs statements slower than SLOW_QUERY_MS together with their query plan
+  (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL)
+
+At the end of each request finish_request() flags fingerprints executed
+N_PLUS_ONE_THRESHOLD or more times as a probable N+1 (a query in a loop
+that should be one batched query).
+
+Usage:
+    import query_stats
+
+    query_stats.snapshot(limit=20)   # aggregates for the admin endpoint
+    query_stats.reset()
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import metrics
+from logging_config import request_timings_var
+
+logger = logging.getLogger(__name__)
+
+# Configuration from environment
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+QUERY_STATS_MAX_FINGERPRINTS = int(os.getenv("QUERY_STATS_MAX_FINGERPRINTS", "500"))
+
+# The same slow statement is explained at most once per interval
+_EXPLAIN_INTERVAL_SECONDS = 300
+# Statements worth explaining
+_EXPLAINABLE = ("select", "insert", "update", "delete", "with", "execute")  # execute: prepared registry statements
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+# fingerprint -> [count, total_seconds, max_seconds, slow_count]
+_queries: Dict[str, List[float]] = {}
+# (route, fingerprint) -> [requests_flagged, max_repeats]
+_n_plus_one: Dict[tuple, List[int]] = {}
+# fingerprint -> (explained_at, plan)
+_plans: Dict[str, tuple] = {}
+_dropped = 0
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """Normalize a statement so executions that differ only in values match."""
+    normalized = _STRING_LITERAL.sub("?", sql)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def record_query(sql: str, seconds: float, explain=None):
+    """
+    Record one executed statement. explain() returns the statement's plan
+    and is only called for slow queries.
+    """
+    metrics.observe_query(sql, seconds)
+    timings = request_timings_var.get()
+    if timings is not None:
+        timings.db_seconds += seconds
+        timings.db_queries += 1
+    if not QUERY_STATS_ENABLED:
+        return
+    fp = fingerprint(sql)
+    if timings is not None:
+        timings.query_counts[fp] = timings.query_counts.get(fp, 0) + 1
+
+    slow = seconds * 1000 >= SLOW_QUERY_MS
+    global _dropped
+    with _lock:
+        entry = _queries.get(fp)
+        if entry is None:
+            if len(_queries) >= QUERY_STATS_MAX_FINGERPRINTS:
+                _dropped += 1
+            else:
+                _queries[fp] = [1, seconds, seconds, int(slow)]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+            if slow:
+                entry[3] += 1
+    if slow:
+        _log_slow_query(fp, seconds, explain)
+
+
+def _log_slow_query(fp: str, seconds: float, explain):
+    plan = None
+    now = time.monotonic()
+    with _lock:
+        cached = _plans.get(fp)
+    if cached and now - cached[0] < _EXPLAIN_INTERVAL_SECONDS:
+        plan = cached[1]
+    elif explain is not None and fp.lower().startswith(_EXPLAINABLE):
+        try:
+            plan = explain()
+        except Exception as e:
+            plan = f"(EXPLAIN failed: {e})"
+        with _lock:
+            _plans[fp] = (now, plan)
+    logger.warning(f"SLOW QUERY {seconds * 1000:.1f}ms: {fp}" + (f"\n  plan: {plan}" if plan else ""))
+
+
+def finish_request(route: str, timings) -> List[Dict[str, Any]]:
+    """Flag fingerprints repeated within one request as probable N+1 queries."""
+    if not QUERY_STATS_ENABLED or timings is None or timings.db_queries < N_PLUS_ONE_THRESHOLD:
+        return []
+    suspects = [
+        {"fingerprint": fp, "count": count}
+        for fp, count in timings.query_counts.items() if count >= N_PLUS_ONE_THRESHOLD
+    ]
+    if not suspects:
+        return []
+    with _lock:
+        for suspect in suspects:
+            entry = _n_plus_one.setdefault((route, suspect["fingerprint"]), [0, 0])
+            entry[0] += 1
+            entry[1] = max(entry[1], suspect["count"])
+    for suspect in suspects:
+        logger.warning(
+            f"PROBABLE N+1 in {route}: {suspect['count']}x {suspect['fingerprint']}"
+        )
+    return suspects
+
+
+def snapshot(limit: int = 20) -> Dict[str, Any]:
+    """Aggregates for this process: top statements by total time, slow queries, N+1 suspects."""
+    with _lock:
+        queries = [
+            {
+                "fingerprint": fp,
+                "count": int(count),
+                "total_ms": round(total * 1000, 2),
+                "avg_ms": round(total * 1000 / count, 3),
+                "max_ms": round(max_s * 1000, 2),
+                "slow_count": int(slow),
+                "plan": _plans.get(fp, (None, None))[1],
+            }
+            for fp, (count, total, max_s, slow) in _queries.items()
+        ]
+        n_plus_one = [
+            {"route": route, "fingerprint": fp, "requests": flagged, "max_repeats": repeats}
+            for (route, fp), (flagged, repeats) in _n_plus_one.items()
+        ]
+        dropped = _dropped
+    queries.sort(key=lambda q: q["total_ms"], reverse=True)
+    n_plus_one.sort(key=lambda s: s["requests"], reverse=True)
+    return {
+        "enabled": QUERY_STATS_ENABLED,
+        "slow_query_ms": SLOW_QUERY_MS,
+        "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD,
+        "fingerprints": len(queries),
+        "untracked_fingerprints": dropped,
+        "total_queries": sum(q["count"] for q in queries),
+        "top_queries": queries[:limit],
+        "slow_queries": [q for q in queries if q["slow_count"]][:limit],
+        "n_plus_one": n_plus_one[:limit],
+    }
+
+
+def reset():
+    """Clear all aggregates (admin endpoint, tests)."""
+    global _dropped
+    with _lock:
+        _queries.clear()
+        _n_plus_one.clear()
+        _plans.clear()
+        _dropped = 0
@@ -0,0 +1,241 @@
+"""
+Shared rate limit storage for slowapi / limits, backed by a local SQLite file.
+
+slowapi's default memory:// storage is per process, so with N gunicorn
+workers every limit is effectively multiplied by N. This storage keeps the
+counters in one SQLite file that all workers on the host share - no
+external service needed.
+
+Each request only touches an in-process table of counters (shared total
+as of the last sync + local increments not yet written). Every
+RATE_LIMIT_FLUSH_MS the local increments are written to SQLite in a single
+transaction and the totals of the keys this worker uses are read back, so
+other workers' hits become visible. A worker can therefore overshoot a
+limit by at most what the other workers admitted during one flush interval.
+
+Supports the fixed-window and sliding-window-counter strategies.
+
+Usage:
+    import rate_limit_storage  # registers the sqlite:// scheme
+
+    limiter = Limiter(key_func=..., storage_uri="sqlite:///tmp/limits.sqlite",
+                      strategy="sliding-window-counter")
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from math import floor
+from typing import Dict, List, Optional, Tuple
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport, TimestampedSlidingWindow
+
+logger = logging.getLogger(__name__)
+
+# Configuration from environment
+RATE_LIMIT_FLUSH_MS = int(os.getenv("RATE_LIMIT_FLUSH_MS", "250"))
+DEFAULT_RATE_LIMIT_DB = os.path.join(tempfile.gettempdir(), "chorizaurio_ratelimit.sqlite")
+
+# Expired rows are deleted every this many flushes
+_SWEEP_EVERY = 40
+# SQLite limits the number of bound parameters per statement
+_MAX_BATCH = 500
+
+
+class SharedSQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate limit counters shared by all workers through a SQLite file."""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, flush_interval: Optional[float] = None, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # sqlite:///tmp/x.sqlite -> /tmp/x.sqlite ; sqlite:// -> default location
+        self.path = uri.split("://", 1)[1] or DEFAULT_RATE_LIMIT_DB
+        self.flush_interval = (
+            float(flush_interval) if flush_interval is not None else RATE_LIMIT_FLUSH_MS / 1000
+        )
+        self._lock = threading.Lock()
+        # key -> [shared_count, pending_delta, expires_at]
+        self._entries: Dict[str, List[float]] = {}
+        self._next_flush = 0.0
+        self._flushes = 0
+        self._con: Optional[sqlite3.Connection] = None
+        self._pid = None
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    # -- connection --
+
+    def _connection(self) -> sqlite3.Connection:
+        # Reconnect after fork: a SQLite handle must not cross processes
+        if self._con is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            # Counters are soft state: losing the last flush on a crash is fine
+            con.execute("PRAGMA synchronous=OFF")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    key TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_rate_limits_expires ON rate_limits(expires_at)")
+            self._con, self._pid = con, os.getpid()
+        return self._con
+
+    # -- local counters --
+
+    def _entry(self, key: str, now: float) -> List[float]:
+        """Local counter for key, loaded from the shared file the first time this worker sees it."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] > now:
+            return entry
+        row = None
+        try:
+            row = self._connection().execute(
+                "SELECT count, expires_at FROM rate_limits WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Rate limit lookup failed: {e}")
+        # Unknown keys are remembered as empty until the next flush re-reads them
+        entry = [row[0], 0, row[1]] if row else [0, 0, now + max(self.flush_interval, 1.0)]
+        self._entries[key] = entry
+        return entry
+
+    def _maybe_flush(self, now: float):
+        if time.monotonic() >= self._next_flush:
+            self._flush(now)
+
+    def _flush(self, now: float):
+        """Write local increments and read back shared totals (caller holds the lock)."""
+        self._next_flush = time.monotonic() + self.flush_interval
+        self._flushes += 1
+        live = {k: e for k, e in self._entries.items() if e[2] > now}
+        self._entries = live
+        if not live:
+            return
+        pending = [(k, int(e[1]), e[2], now, now) for k, e in live.items() if e[1]]
+        try:
+            con = self._connection()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                if pending:
+                    con.executemany("""
+                        INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?)
+                        ON CONFLICT (key) DO UPDATE SET
+                            count = CASE WHEN rate_limits.expires_at <= ?
+                                THEN excluded.count ELSE rate_limits.count + excluded.count END,
+                            expires_at = CASE WHEN rate_limits.expires_at <= ?
+                                THEN excluded.expires_at ELSE rate_limits.expires_at END
+                    """, pending)
+                keys = list(live)
+                shared: Dict[str, Tuple[int, float]] = {}
+                for i in range(0, len(keys), _MAX_BATCH):
+                    batch = keys[i:i + _MAX_BATCH]
+                    rows = con.execute(
+                        f"SELECT key, count, expires_at FROM rate_limits WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for key, count, expires_at in rows:
+                        shared[key] = (count, expires_at)
+                if self._flushes % _SWEEP_EVERY == 0:
+                    con.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            # Keep counting locally; the increments are retried on the next flush
+            logger.warning(f"Rate limit flush failed: {e}")
+            return
+        for key, entry in live.items():
+            count, expires_at = shared.get(key, (entry[0] + entry[1], entry[2]))
+            if expires_at > now:
+                entry[0], entry[1], entry[2] = count, 0, expires_at
+
+    def flush(self):
+        """Force a sync with the shared file (tests, shutdown)."""
+        with self._lock:
+            self._flush(time.time())
+
+    # -- Storage interface --
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            entry = self._entry(key, now)
+            if not entry[0] and not entry[1]:
+                # First hit of a new window
+                entry[2] = now + expiry
+            entry[1] += amount
+            self._maybe_flush(now)
+            return int(entry[0] + entry[1])
+
+    def get(self, key: str) -> int:
+        now = time.time()
+        with self._lock:
+            self._maybe_flush(now)
+            entry = self._entry(key, now)
+            return int(entry[0] + entry[1])
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._lock:
+            entry = self._entry(key, now)
+            return entry[2] if entry[0] or entry[1] else now
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self._lock:
+            self._entries.clear()
+            cur = self._connection().execute("DELETE FROM rate_limits")
+            return cur.rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._connection().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+    # -- sliding window counter --
+
+    def _sliding_window(self, key: str, expiry: int, now: float) -> Tuple[int, float, int, float]:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self.get(previous_key)
+        current_count = self.get(current_key)
+        previous_ttl = 0.0 if previous_count == 0 else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        previous_count, previous_ttl, current_count, _ = self._sliding_window(key, expiry, now)
+        if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+            return False
+        _, current_key = self.sliding_window_keys(key, expiry, now)
+        self.incr(current_key, 2 * expiry, amount)
+        return True
+
+    def get_sliding_window(self, key: str, expiry: int) -> Tuple[int, float, int, float]:
+        return self._sliding_window(key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self.clear(previous_key)
+        self.clear(current_key)
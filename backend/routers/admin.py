@@ -237,6 +237,121 @@ async def get_system_info(
     }
 
 
+# ============================================================================
+# PDF RENDER CACHE ENDPOINTS
+# ============================================================================
+
+@router.get("/pdf-cache")
+@limiter.limit(RATE_LIMIT_ADMIN)
+async def get_pdf_cache_stats(
+    request: Request,
+    current_user: dict = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    Get PDF render cache statistics (hit rate, entries, size on disk).
+    Counters are per worker process; entries/size are shared.
+    """
+    from pdf_cache import get_render_cache
+    
+    cache = get_render_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@router.delete("/pdf-cache")
+@limiter.limit(RATE_LIMIT_ADMIN)
+async def clear_pdf_cache(
+    request: Request,
+    current_user: dict = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """Drop all cached PDF fragments (e.g. after changing the PDF layout)."""
+    from pdf_cache import get_render_cache
+    
+    cache = get_render_cache()
+    if cache is None:
+        return {"enabled": False}
+    cache.clear()
+    logger.info(f"PDF render cache cleared by {current_user['username']}")
+    return {"enabled": True, "success": True}
+
+
+# ============================================================================
+# QUERY INSTRUMENTATION ENDPOINTS
+# ============================================================================
+
+@router.get("/query-stats")
+@limiter.limit(RATE_LIMIT_ADMIN)
+async def get_query_stats(
+    request: Request,
+    limit: int = 20,
+    current_user: dict = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    Get query aggregates of this worker process: top statements by total
+    time, slow queries with their plan, and probable N+1 patterns per route.
+    """
+    import query_stats
+    
+    return query_stats.snapshot(limit=max(1, min(limit, 200)))
+
+
+@router.delete("/query-stats")
+@limiter.limit(RATE_LIMIT_ADMIN)
+async def reset_query_stats(
+    request: Request,
+    current_user: dict = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """Reset the query aggregates of this worker process."""
+    import query_stats
+    
+    query_stats.reset()
+    logger.info(f"Query stats reset by {current_user['username']}")
+    return {"success": True}
+
+
+# ============================================================================
+# SQLITE STORAGE ENDPOINTS
+# ============================================================================
+
+@router.get("/sqlite-storage")
+@limiter.limit(RATE_LIMIT_ADMIN)
+def get_sqlite_storage(
+    request: Request,
+    current_user: dict = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    Get SQLite storage stats: database and WAL size, freelist fragmentation
+    and the tuning PRAGMAs in effect.
+    """
+    import sqlite_tuning
+    
+    if db.USE_POSTGRES:
+        return {"enabled": False}
+    with db.get_db_connection() as conn:
+        return {"enabled": True, **sqlite_tuning.storage_stats(conn, db.DB_PATH)}
+
+
+# ============================================================================
+# MAINTENANCE SCHEDULER ENDPOINTS
+# ============================================================================
+
+@router.get("/maintenance")
+@limiter.limit(RATE_LIMIT_ADMIN)
+def get_maintenance_status(
+    request: Request,
+    current_user: dict = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """
+    Get the maintenance jobs with their schedule, last run and last
+    successful run (status, duration). `leader` tells whether the worker
+    answering runs the jobs; next_run is only known by the leader.
+    """
+    from maintenance import scheduler
+    
+    return scheduler.status()
+
+
 # ============================================================================
 # DELETE IMPACT PREVIEW ENDPOINTS
 # ============================================================================
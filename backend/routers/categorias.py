@@ -8,6 +8,7 @@ from deps import (
     get_current_user, get_admin_user, limiter,
     RATE_LIMIT_READ, RATE_LIMIT_WRITE
 )
+from serialization import ResponseSerializer
 
 router = APIRouter()
 
@@ -21,6 +22,9 @@ class Categoria(BaseModel):
     activa: Optional[int] = 1
 
 
+_categorias_response = ResponseSerializer(List[Categoria])
+
+
 class CategoriaCreate(BaseModel):
     nombre: str = Field(..., min_length=1, max_length=100)
     descripcion: Optional[str] = None
@@ -31,7 +35,7 @@ class CategoriaCreate(BaseModel):
 @router.get("/categorias", response_model=List[Categoria])
 async def get_categorias(current_user: dict = Depends(get_current_user)):
     categorias = db.get_categorias(incluir_inactivas=current_user["rol"] == "admin")
-    return categorias
+    return _categorias_response(categorias)
 
 
 @router.get("/categorias/{categoria_id}", response_model=Categoria)
@@ -8,9 +8,14 @@ from deps import (
     get_current_user, get_admin_user, limiter,
     RATE_LIMIT_READ, RATE_LIMIT_WRITE
 )
+from lanes import lane
+from serialization import ResponseSerializer, rows_response
 
 router = APIRouter()
 
+CLIENTE_COLUMNS = ("id", "nombre", "telefono", "direccion", "zona", "vendedor_id", "vendedor_nombre")
+_cliente_response = ResponseSerializer(models.Cliente)
+
 
 @router.post("/clientes", response_model=models.Cliente)
 @limiter.limit(RATE_LIMIT_WRITE)
@@ -38,8 +43,8 @@ async def crear_cliente(request: Request, cliente: models.ClienteCreate, current
 
 
 @router.get("/clientes")
-async def get_clientes(current_user: dict = Depends(get_current_user)):
-    from fastapi.responses import JSONResponse
+@lane("reads")
+def get_clientes(current_user: dict = Depends(get_current_user)):
     with db.get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
@@ -49,11 +54,7 @@ async def get_clientes(current_user: dict = Depends(get_current_user)):
             ORDER BY c.nombre
         """)
         clientes = cursor.fetchall()
-    return JSONResponse([
-        {"id": c[0], "nombre": c[1], "telefono": c[2], "direccion": c[3], "zona": c[4],
-         "vendedor_id": c[5], "vendedor_nombre": c[6]}
-        for c in clientes
-    ])
+    return rows_response(CLIENTE_COLUMNS, clientes)
 
 
 @router.get("/clientes/{cliente_id}", response_model=models.Cliente)
@@ -69,10 +70,7 @@ async def get_cliente(cliente_id: int, current_user: dict = Depends(get_current_
         cliente = cursor.fetchone()
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
-    return models.Cliente(
-        id=cliente[0], nombre=cliente[1], telefono=cliente[2], direccion=cliente[3], zona=cliente[4],
-        vendedor_id=cliente[5], vendedor_nombre=cliente[6]
-    )
+    return _cliente_response(dict(zip(CLIENTE_COLUMNS, cliente)))
 
 
 @router.put("/clientes/{cliente_id}", response_model=models.Cliente)
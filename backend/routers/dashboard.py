@@ -10,13 +10,17 @@ from deps import (
     RATE_LIMIT_READ
 )
 from exceptions import safe_error_handler
+from lanes import lane
+from single_flight import single_flight
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 
 @router.get("/metrics")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_dashboard_metrics(request: Request, current_user: dict = Depends(get_current_user)):
+@single_flight()
+@lane("reports")
+def get_dashboard_metrics(request: Request, current_user: dict = Depends(get_current_user)):
     """Get main KPI metrics for dashboard"""
     try:
         with db.get_db_connection() as conn:
@@ -95,7 +99,9 @@ async def get_dashboard_metrics(request: Request, current_user: dict = Depends(g
 
 @router.get("/pedidos_por_dia")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_pedidos_por_dia(
+@single_flight()
+@lane("reports")
+def get_pedidos_por_dia(
     request: Request,
     dias: int = Query(default=30, ge=1, le=365),
     current_user: dict = Depends(get_current_user)
@@ -124,7 +130,9 @@ async def get_pedidos_por_dia(
 
 @router.get("/alertas")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_alertas(request: Request, current_user: dict = Depends(get_current_user)):
+@single_flight()
+@lane("reports")
+def get_alertas(request: Request, current_user: dict = Depends(get_current_user)):
     """Get system alerts (stock bajo, etc)"""
     try:
         with db.get_db_connection() as conn:
@@ -10,13 +10,15 @@ from deps import (
     RATE_LIMIT_READ
 )
 from exceptions import safe_error_handler
+from lanes import lane
 
 router = APIRouter(prefix="/estadisticas", tags=["Estadísticas"])
 
 
 @router.get("/usuarios")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_estadisticas_usuarios(
+@lane("reports")
+def get_estadisticas_usuarios(
     request: Request,
     current_user: dict = Depends(get_current_user)
 ):
@@ -69,7 +71,8 @@ async def get_estadisticas_usuarios(
 
 @router.get("/ventas")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_estadisticas_ventas(
+@lane("reports")
+def get_estadisticas_ventas(
     request: Request,
     dias: int = Query(default=30, ge=1, le=365),
     current_user: dict = Depends(get_current_user)
@@ -1,136 +1,233 @@
 """Hoja de Ruta Router - Route sheet generation for delivery drivers"""
 from fastapi import APIRouter, HTTPException, Depends, Request
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Tuple, Literal
 from datetime import datetime
-from fastapi.responses import Response
+import re
+import zipfile
 
 import db
-import pdf_utils
 from deps import get_current_user, limiter, RATE_LIMIT_READ
+from lanes import lane
 
 router = APIRouter()
 
+# SQLite limits the number of bound parameters per statement
+_MAX_IN_PARAMS = 500
+
 
 class HojaRutaRequest(BaseModel):
     repartidor: str
     zona: Optional[str] = None
 
 
+class HojaRutaLoteRequest(BaseModel):
+    repartidores: Optional[List[str]] = Field(None, description="Repartidores a imprimir (todos si se omite)")
+    zona: Optional[str] = None
+    formato: Literal["zip", "pdf"] = "zip"
+
+
+def _fecha_generacion() -> str:
+    return datetime.now().strftime("%d/%m/%Y %H:%M")
+
+
+def _cargar_hojas_ruta(
+    cursor,
+    repartidores: Optional[List[str]],
+    zona: Optional[str] = None
+) -> Dict[str, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Load pending pedidos (with cliente and productos) for the given
+    repartidores - or every repartidor with pending pedidos - in a fixed
+    number of queries, grouped as {repartidor: (pedidos, clientes)}.
+    """
+    query = """
+        SELECT p.id, p.cliente_id, p.fecha, p.estado, p.notas, p.creado_por, p.repartidor,
+               c.nombre, c.telefono, c.direccion, c.zona
+        FROM pedidos p
+        JOIN clientes c ON p.cliente_id = c.id
+        WHERE p.repartidor IS NOT NULL AND p.repartidor != ''
+        AND p.estado NOT IN ('entregado', 'cancelado')
+    """
+    params: List[Any] = []
+    if repartidores:
+        query += f" AND p.repartidor IN ({','.join('?' * len(repartidores))})"
+        params.extend(repartidores)
+    if zona:
+        query += " AND c.zona = ?"
+        params.append(zona)
+    query += " ORDER BY p.repartidor, p.id"
+    cursor.execute(query, params)
+    pedidos_rows = cursor.fetchall()
+    
+    # All productos of all those pedidos, in batches of bound parameters
+    items_por_pedido: Dict[int, List[Dict[str, Any]]] = {}
+    pedido_ids = [row[0] for row in pedidos_rows]
+    for i in range(0, len(pedido_ids), _MAX_IN_PARAMS):
+        batch = pedido_ids[i:i + _MAX_IN_PARAMS]
+        cursor.execute(f"""
+            SELECT dp.pedido_id, pr.nombre, dp.cantidad, pr.precio, dp.tipo
+            FROM detalles_pedido dp
+            JOIN productos pr ON dp.producto_id = pr.id
+            WHERE dp.pedido_id IN ({','.join('?' * len(batch))})
+            ORDER BY dp.pedido_id, dp.id
+        """, batch)
+        for item in cursor.fetchall():
+            items_por_pedido.setdefault(item[0], []).append({
+                "nombre": item[1],
+                "cantidad": item[2],
+                "precio": item[3],
+                "tipo": item[4]
+            })
+    
+    # Selected repartidores without pending pedidos still get an (empty) sheet
+    hojas: Dict[str, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = {
+        r: ([], []) for r in (repartidores or [])
+    }
+    clientes_vistos: Dict[str, set] = {}
+    for row in pedidos_rows:
+        repartidor = row[6]
+        pedidos_list, clientes_list = hojas.setdefault(repartidor, ([], []))
+        items = items_por_pedido.get(row[0], [])
+        pedidos_list.append({
+            'id': row[0],
+            'cliente_id': row[1],
+            'fecha': row[2],
+            'estado': row[3],
+            'notas': row[4],
+            'creado_por': row[5],
+            'productos': items,
+            'total': sum(item["cantidad"] * item["precio"] for item in items)
+        })
+        vistos = clientes_vistos.setdefault(repartidor, set())
+        if row[1] not in vistos:
+            vistos.add(row[1])
+            clientes_list.append({
+                'id': row[1],
+                'nombre': row[7],
+                'telefono': row[8],
+                'direccion': row[9],
+                'zona': row[10]
+            })
+    return hojas
+
+
+def _hoja_ruta_response(pedidos, clientes, repartidor):
+    """Render the route sheet into a spool and stream it back in chunks"""
+    import pdf_utils  # ReportLab is imported on the first PDF, not at startup
+
+    spool = pdf_utils.open_pdf_spool()
+    try:
+        pdf_utils.generar_pdf_hoja_ruta(
+            pedidos,
+            clientes,
+            repartidor,
+            _fecha_generacion(),
+            output=spool
+        )
+    except BaseException:
+        spool.close()
+        raise
+    return pdf_utils.streaming_pdf_response(spool, f"hoja_ruta_{repartidor}.pdf")
+
+
+def _nombre_archivo(repartidor: str) -> str:
+    return re.sub(r"[^\w\-]+", "_", repartidor).strip("_") or "repartidor"
+
+
+def _nombres_zip(repartidores: List[str]) -> List[str]:
+    """One ZIP entry per repartidor; names that sanitize alike get _2, _3... instead of overwriting each other"""
+    usados = set()
+    nombres = []
+    for repartidor in repartidores:
+        base = nombre = _nombre_archivo(repartidor)
+        n = 2
+        while nombre.casefold() in usados:  # case-insensitive file systems too
+            nombre = f"{base}_{n}"
+            n += 1
+        usados.add(nombre.casefold())
+        nombres.append(f"hoja_ruta_{nombre}.pdf")
+    return nombres
+
+
 @router.post("/hoja-ruta/generar-pdf")
 @limiter.limit(RATE_LIMIT_READ)
-async def generar_hoja_ruta_pdf(
+@lane("pdf")
+def generar_hoja_ruta_pdf(
     request: Request,
     data: HojaRutaRequest,
     current_user: dict = Depends(get_current_user)
 ):
     """Generate a printable PDF route sheet for a specific delivery driver"""
     repartidor = data.repartidor
-    zona_filtro = data.zona
     
     if not repartidor:
         raise HTTPException(status_code=400, detail="Se requiere un repartidor")
         
     try:
         with db.get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Get pedidos for this repartidor
-            query = """
-                SELECT p.id, p.cliente_id, p.fecha, p.estado, p.notas, p.creado_por
-                FROM pedidos p
-                JOIN clientes c ON p.cliente_id = c.id
-                WHERE p.repartidor = ? 
-                AND p.estado NOT IN ('entregado', 'cancelado')
-            """
-            params = [repartidor]
-            
-            if zona_filtro:
-                query += " AND c.zona = ?"
-                params.append(zona_filtro)
-                
-            cursor.execute(query, params)
-            pedidos_rows = cursor.fetchall()
-            
-            # If no pedidos, return empty PDF with message
-            if not pedidos_rows:
-                pdf_bytes = pdf_utils.generar_pdf_hoja_ruta([], [], repartidor, datetime.now().strftime("%d/%m/%Y %H:%M"))
-                return Response(
-                    content=pdf_bytes,
-                    media_type="application/pdf",
-                    headers={"Content-Disposition": f"attachment; filename=hoja_ruta_{repartidor}.pdf"}
-                )
-                
-            # Build full pedidos structure
-            pedidos_list = []
-            clientes_ids = set()
-            
-            # Column indices for pedido query
-            for row in pedidos_rows:
-                p_dict = {
-                    'id': row[0],
-                    'cliente_id': row[1],
-                    'fecha': row[2],
-                    'estado': row[3],
-                    'notas': row[4],
-                    'creado_por': row[5]
-                }
-                clientes_ids.add(p_dict['cliente_id'])
-                
-                # Get productos for this pedido
-                cursor.execute("""
-                    SELECT dp.producto_id, pr.nombre, dp.cantidad, pr.precio, dp.tipo
-                    FROM detalles_pedido dp
-                    JOIN productos pr ON dp.producto_id = pr.id
-                    WHERE dp.pedido_id = ?
-                """, (p_dict['id'],))
-                
-                items = []
-                total = 0
-                for item in cursor.fetchall():
-                    subtotal = item[2] * item[3]  # cantidad * precio
-                    total += subtotal
-                    items.append({
-                        "nombre": item[1],
-                        "cantidad": item[2],
-                        "precio": item[3],
-                        "tipo": item[4]
-                    })
-                
-                p_dict['productos'] = items
-                p_dict['total'] = total
-                pedidos_list.append(p_dict)
-                
-            # Get clientes info
-            if clientes_ids:
-                placeholders = ",".join("?" * len(clientes_ids))
-                cursor.execute(f"SELECT id, nombre, telefono, direccion, zona FROM clientes WHERE id IN ({placeholders})", list(clientes_ids))
-                clientes_list = []
-                for row in cursor.fetchall():
-                    clientes_list.append({
-                        'id': row[0],
-                        'nombre': row[1],
-                        'telefono': row[2],
-                        'direccion': row[3],
-                        'zona': row[4]
-                    })
-            else:
-                clientes_list = []
+            pedidos_list, clientes_list = _cargar_hojas_ruta(conn.cursor(), [repartidor], data.zona)[repartidor]
         
         # Generate PDF (outside with block - connection closed)
-        pdf_bytes = pdf_utils.generar_pdf_hoja_ruta(
-            pedidos_list,
-            clientes_list,
-            repartidor,
-            datetime.now().strftime("%d/%m/%Y %H:%M")
-        )
+        return _hoja_ruta_response(pedidos_list, clientes_list, repartidor)
         
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=hoja_ruta_{repartidor}.pdf"}
+    except Exception as e:
+        from exceptions import safe_error_handler
+        raise safe_error_handler(e, "hoja_ruta", "generar PDF")
+
+
+@router.post("/hoja-ruta/generar-lote")
+@limiter.limit(RATE_LIMIT_READ)
+@lane("pdf")
+def generar_hojas_ruta_lote(
+    request: Request,
+    data: HojaRutaLoteRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate the route sheets of every repartidor (or the selected ones) in
+    one request: a ZIP with one PDF per repartidor, or a single merged PDF
+    with one bookmark per repartidor (formato="pdf").
+    """
+    import pdf_utils
+
+    if data.formato == "pdf" and not pdf_utils.PYPDF_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Unir PDFs no está disponible en este servidor")
+    
+    repartidores = list(dict.fromkeys(r for r in (data.repartidores or []) if r)) or None
+    
+    try:
+        with db.get_db_connection() as conn:
+            hojas = _cargar_hojas_ruta(conn.cursor(), repartidores, data.zona)
+        
+        if not hojas:
+            raise HTTPException(status_code=404, detail="No hay pedidos pendientes con repartidor asignado")
+        
+        fecha = _fecha_generacion()
+        nombres = list(hojas.keys())
+        pdfs = pdf_utils.generar_pdfs_hoja_ruta(
+            [(repartidor, *hojas[repartidor]) for repartidor in nombres], fecha
         )
         
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        spool = pdf_utils.open_pdf_spool()
+        try:
+            if data.formato == "pdf":
+                pdf_utils.merge_pdfs_with_bookmarks(list(zip(nombres, pdfs)), spool)
+                return pdf_utils.streaming_pdf_response(spool, f"hojas_ruta_{stamp}.pdf")
+            
+            with zipfile.ZipFile(spool, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for entrada, pdf_bytes in zip(_nombres_zip(nombres), pdfs):
+                    zf.writestr(entrada, pdf_bytes)
+            return pdf_utils.streaming_pdf_response(
+                spool, f"hojas_ruta_{stamp}.zip", media_type="application/zip"
+            )
+        except BaseException:
+            spool.close()
+            raise
+        
+    except HTTPException:
+        raise
     except Exception as e:
         from exceptions import safe_error_handler
-        raise safe_error_handler(e, "hoja_ruta", "generar PDF")
+        raise safe_error_handler(e, "hoja_ruta", "generar lote de PDFs")
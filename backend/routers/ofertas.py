@@ -12,6 +12,7 @@ from deps import (
 )
 from exceptions import safe_error_handler
 from logging_config import get_logger
+from serialization import ResponseSerializer
 
 logger = get_logger(__name__)
 
@@ -88,11 +89,14 @@ class OfertaCreate(BaseModel):
     productos: Optional[List[OfertaProducto]] = None
 
 
+_ofertas_response = ResponseSerializer(List[Oferta])
+
+
 @router.get("/ofertas", response_model=List[Oferta])
 async def get_ofertas(current_user: dict = Depends(get_current_user)):
     """Get ofertas - all authenticated users can view, admins see all including inactive"""
     ofertas = db.get_ofertas(solo_activas=current_user["rol"] != "admin")
-    return ofertas
+    return _ofertas_response(ofertas)
 
 
 @router.get("/ofertas/activas")
@@ -6,7 +6,6 @@ from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel, Field
 import io
 import csv
-import time
 
 import db
 import models
@@ -15,30 +14,18 @@ from deps import (
     RATE_LIMIT_READ, RATE_LIMIT_WRITE
 )
 from exceptions import safe_error_handler
+from idempotency import idempotent
+from lanes import lane
+from serialization import rows_response
 from routers.websocket import broadcast_pedido_change, WSEventType
 
 router = APIRouter()
 
-# --- Idempotency cache (in-memory, TTL 1h) ---
-_idempotency_cache: Dict[str, Any] = {}  # {key: (result_dict, timestamp)}
-_IDEMPOTENCY_TTL = 3600  # 1 hour
-
-def _check_idempotency(key: str):
-    """Return cached result if idempotency key was seen recently, else None."""
-    if key in _idempotency_cache:
-        result, ts = _idempotency_cache[key]
-        if time.time() - ts < _IDEMPOTENCY_TTL:
-            return result
-        del _idempotency_cache[key]
-    return None
-
-def _store_idempotency(key: str, result):
-    """Store result for idempotency key and cleanup expired entries."""
-    now = time.time()
-    expired = [k for k, (_, ts) in _idempotency_cache.items() if now - ts > _IDEMPOTENCY_TTL]
-    for k in expired:
-        del _idempotency_cache[k]
-    _idempotency_cache[key] = (result, now)
+# Keys of the GET /pedidos list items, in SELECT order plus the productos list
+PEDIDO_LIST_COLUMNS = (
+    "id", "cliente_id", "fecha", "estado", "notas", "creado_por", "cliente_nombre",
+    "pdf_generado", "repartidor", "productos",
+)
 
 
 class NotasUpdate(BaseModel):
@@ -108,17 +95,12 @@ async def get_pedidos_antiguos(
 
 @router.post("/pedidos", response_model=models.Pedido, tags=["pedidos"], summary="Crear pedido", description="Crea un nuevo pedido para un cliente con productos")
 @limiter.limit(RATE_LIMIT_WRITE)
-async def crear_pedido(request: Request, pedido: models.PedidoCreate, current_user: dict = Depends(get_current_user)):
+@idempotent(body_key=lambda kwargs: kwargs["pedido"].idempotency_key)  # header or body field
+@lane("orders")
+def crear_pedido(request: Request, pedido: models.PedidoCreate, current_user: dict = Depends(get_current_user)):
     if current_user["rol"] not in ["admin", "vendedor", "administrador", "oficina"]:
         raise HTTPException(status_code=403, detail="No tienes permiso para crear pedidos")
 
-    # --- Idempotency check (header or body field) ---
-    idempotency_key = request.headers.get("X-Idempotency-Key") or pedido.idempotency_key
-    if idempotency_key:
-        cached = _check_idempotency(idempotency_key)
-        if cached is not None:
-            return models.Pedido(**cached)
-
     creado_por = current_user["username"]
     
     # Build pedido dict in the format expected by db.add_pedido
@@ -169,9 +151,6 @@ async def crear_pedido(request: Request, pedido: models.PedidoCreate, current_us
             creado_por=creado_por,
             pdf_generado=1 if result.get("pdf_generado") else 0
         )
-        # Store in idempotency cache
-        if idempotency_key:
-            _store_idempotency(idempotency_key, pedido_response.model_dump())
         return pedido_response
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -179,7 +158,8 @@ async def crear_pedido(request: Request, pedido: models.PedidoCreate, current_us
         raise safe_error_handler(e, "pedidos", "crear pedido")
 
 @router.get("/pedidos", response_model=List[models.Pedido])
-async def get_pedidos(
+@lane("reads")
+def get_pedidos(
     current_user: dict = Depends(get_current_user),
     cliente_id: Optional[int] = None,
     fecha_inicio: Optional[str] = None,
@@ -251,18 +231,11 @@ async def get_pedidos(
                 "precio": row[3], "cantidad": row[4], "tipo": row[5] or "unidad"
             })
         
-        # Build result using dicts for memory efficiency
-        from fastapi.responses import JSONResponse
-        result = []
-        for p in pedidos_raw:
-            result.append({
-                "id": p[0], "cliente_id": p[1], "fecha": p[2], "estado": p[3],
-                "notas": p[4], "creado_por": p[5], "cliente_nombre": p[6],
-                "pdf_generado": p[7], "repartidor": p[8],
-                "productos": productos_by_pedido.get(p[0], [])
-            })
-        
-        return JSONResponse(result)
+        # Row tuples + productos straight to JSON (no response_model pass)
+        return rows_response(
+            PEDIDO_LIST_COLUMNS,
+            ((*p, productos_by_pedido.get(p[0], [])) for p in pedidos_raw)
+        )
 
 
 # --- Static routes MUST come before dynamic /{pedido_id} routes ---
@@ -288,7 +261,8 @@ async def get_pedidos_creators(request: Request, current_user: dict = Depends(ge
 
 @router.get("/pedidos/export/csv")
 @limiter.limit(RATE_LIMIT_READ)
-async def export_pedidos_csv(
+@lane("reports")
+def export_pedidos_csv(
     request: Request,
     current_user: dict = Depends(get_current_user),
     desde: Optional[str] = None,
@@ -383,7 +357,9 @@ async def get_pedido_detalle(pedido_id: int, current_user: dict = Depends(get_cu
     return models.PedidoDetalle(**pedido_dict)
 
 @router.put("/pedidos/{pedido_id}/estado", response_model=models.Pedido)
+@idempotent()
 async def cambiar_estado_pedido(
+    request: Request,
     pedido_id: int, 
     estado_update: models.EstadoPedidoUpdate, 
     background_tasks: BackgroundTasks,
@@ -424,7 +400,8 @@ async def cambiar_estado_pedido(
     return pedido
 
 @router.delete("/pedidos/{pedido_id}", status_code=204)
-async def eliminar_pedido(pedido_id: int, current_user: dict = Depends(get_admin_user)):
+@idempotent()
+async def eliminar_pedido(request: Request, pedido_id: int, current_user: dict = Depends(get_admin_user)):
     with db.get_db_transaction() as (conn, cursor):
         # Verificar si el pedido existe
         cursor.execute("SELECT id FROM pedidos WHERE id = ?", (pedido_id,))
@@ -448,6 +425,7 @@ class EliminarPedidosRequest(BaseModel):
 
 @router.post("/pedidos/bulk-delete", status_code=200, tags=["pedidos"], summary="Eliminar pedidos en lote", description="Elimina múltiples pedidos de forma atómica. Requiere rol admin. Máximo 100 pedidos por operación.")
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def eliminar_pedidos_bulk(
     request: Request,
     data: EliminarPedidosRequest,
@@ -514,6 +492,7 @@ async def eliminar_pedidos_bulk(
 
 @router.put("/pedidos/{pedido_id}/notas")
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def update_pedido_notas(
     request: Request,
     pedido_id: int,
@@ -539,6 +518,7 @@ async def update_pedido_notas(
 
 @router.put("/pedidos/{pedido_id}/cliente")
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def update_pedido_cliente(
     request: Request,
     pedido_id: int,
@@ -562,6 +542,7 @@ async def update_pedido_cliente(
 
 @router.put("/pedidos/{pedido_id}/items/{producto_id}")
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def update_pedido_item(
     request: Request,
     pedido_id: int,
@@ -593,6 +574,7 @@ async def update_pedido_item(
 
 @router.delete("/pedidos/{pedido_id}/items/{producto_id}", status_code=204)
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def delete_pedido_item(
     request: Request,
     pedido_id: int,
@@ -623,6 +605,7 @@ async def delete_pedido_item(
 
 @router.post("/pedidos/{pedido_id}/items")
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def add_pedido_item(
     request: Request,
     pedido_id: int,
@@ -712,7 +695,8 @@ async def preview_stock_impact(
 
 @router.post("/pedidos/generar_pdfs")
 @limiter.limit(RATE_LIMIT_WRITE)
-async def generar_pdfs(
+@lane("pdf")
+def generar_pdfs(
     request: Request,
     data: GenerarPDFsRequest,
     current_user: dict = Depends(get_current_user)
@@ -722,7 +706,7 @@ async def generar_pdfs(
         raise HTTPException(status_code=400, detail="No se seleccionaron pedidos")
     
     try:
-        from pdf_utils import generar_pdf_multiple
+        from pdf_utils import generar_pdf_multiple, open_pdf_spool, streaming_pdf_response
         
         with db.get_db_connection() as conn:
             cursor = conn.cursor()
@@ -785,19 +769,23 @@ async def generar_pdfs(
             # Generate PDF using generar_pdf_multiple (Uruguay timezone UTC-3)
             tz_uruguay = timezone(timedelta(hours=-3))
             fecha_generacion = datetime.now(tz_uruguay).strftime("%d/%m/%Y %H:%M")
-            pdf_content = generar_pdf_multiple(pedidos_data, clientes_data, fecha_generacion)
-            
-            # Mark pedidos as pdf_generado = 1
-            with db.get_db_transaction() as (conn2, cursor2):
-                cursor2.execute(
-                    f"UPDATE pedidos SET pdf_generado = 1 WHERE id IN ({placeholders})",
-                    data.pedido_ids
-                )
+            # Rendered straight into a spool (memory, then disk) and streamed in chunks
+            spool = open_pdf_spool()
+            try:
+                generar_pdf_multiple(pedidos_data, clientes_data, fecha_generacion, output=spool)
+                
+                # Mark pedidos as pdf_generado = 1
+                with db.get_db_transaction() as (conn2, cursor2):
+                    cursor2.execute(
+                        f"UPDATE pedidos SET pdf_generado = 1 WHERE id IN ({placeholders})",
+                        data.pedido_ids
+                    )
+            except BaseException:
+                spool.close()
+                raise
             
-            return StreamingResponse(
-                io.BytesIO(pdf_content),
-                media_type="application/pdf",
-                headers={"Content-Disposition": f"attachment; filename=pedidos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"}
+            return streaming_pdf_response(
+                spool, f"pedidos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
             )
             
     except ImportError:
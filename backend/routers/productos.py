@@ -9,9 +9,16 @@ from deps import (
     get_current_user, get_admin_user, limiter,
     RATE_LIMIT_READ, RATE_LIMIT_WRITE
 )
+from lanes import lane
+from serialization import rows_response
+from single_flight import single_flight
 
 router = APIRouter()
 
+PRODUCTO_LIST_COLUMNS = (
+    "id", "nombre", "precio", "categoria_id", "imagen_url", "stock", "stock_minimo", "stock_tipo",
+)
+
 
 @router.post("/productos", response_model=models.Producto)
 @limiter.limit(RATE_LIMIT_WRITE)
@@ -38,7 +45,9 @@ async def crear_producto(request: Request, producto: models.ProductoCreate, curr
 
 
 @router.get("/productos")
-async def get_productos(
+@single_flight()
+@lane("reads")
+def get_productos(
     current_user: dict = Depends(get_current_user),
     q: Optional[str] = Query(None, description="Search productos by name"),
     limit: Optional[int] = Query(None, ge=1, le=1000, description="Limit results"),
@@ -46,7 +55,7 @@ async def get_productos(
     lite: Optional[bool] = Query(False, description="Return without images for faster loading")
 ):
     """Get all productos - optimized for large datasets.
-    Returns raw JSON for memory efficiency instead of Pydantic models.
+    Returns JSON built from the row tuples instead of Pydantic models.
     Use ?lite=true to exclude imagen_url for faster loading (useful for search/dropdowns).
     """
     with db.get_db_connection() as conn:
@@ -54,7 +63,7 @@ async def get_productos(
         
         # Select columns based on lite mode
         if lite:
-            columns = "id, nombre, precio, categoria_id, stock, stock_minimo, stock_tipo"
+            columns = "id, nombre, precio, categoria_id, NULL AS imagen_url, stock, stock_minimo, stock_tipo"
         else:
             columns = "id, nombre, precio, categoria_id, imagen_url, stock, stock_minimo, stock_tipo"
         
@@ -86,21 +95,8 @@ async def get_productos(
                 )
         productos = cursor.fetchall()
     
-    # Return raw dicts for memory efficiency - avoid Pydantic overhead for large lists
-    if lite:
-        return JSONResponse([
-            {
-                "id": p[0], "nombre": p[1], "precio": p[2], "categoria_id": p[3],
-                "imagen_url": None, "stock": p[4], "stock_minimo": p[5], "stock_tipo": p[6]
-            } for p in productos
-        ])
-    else:
-        return JSONResponse([
-            {
-                "id": p[0], "nombre": p[1], "precio": p[2], "categoria_id": p[3],
-                "imagen_url": p[4], "stock": p[5], "stock_minimo": p[6], "stock_tipo": p[7]
-            } for p in productos
-        ])
+    # Rows straight to JSON - avoid Pydantic overhead for large lists
+    return rows_response(PRODUCTO_LIST_COLUMNS, productos)
 
 
 @router.post("/productos/images")
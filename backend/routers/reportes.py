@@ -9,13 +9,18 @@ from deps import (
     RATE_LIMIT_READ
 )
 from exceptions import safe_error_handler
+from lanes import lane
+from single_flight import single_flight
+from serialization import TimedJSONResponse
 
 router = APIRouter(prefix="/reportes", tags=["Reportes"])
 
 
 @router.get("/ventas")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_reporte_ventas(
+@single_flight()
+@lane("reports")
+def get_reporte_ventas(
     request: Request,
     desde: str = Query(default=None),
     hasta: str = Query(default=None),
@@ -105,7 +110,9 @@ async def get_reporte_ventas(
 
 @router.get("/inventario")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_reporte_inventario(
+@single_flight()
+@lane("reports")
+def get_reporte_inventario(
     request: Request,
     current_user: dict = Depends(get_admin_user)
 ):
@@ -201,7 +208,9 @@ async def get_reporte_inventario(
 
 @router.get("/clientes")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_reporte_clientes(
+@single_flight()
+@lane("reports")
+def get_reporte_clientes(
     request: Request,
     current_user: dict = Depends(get_admin_user)
 ):
@@ -236,15 +245,7 @@ async def get_reporte_clientes(
                 GROUP BY c.id, c.nombre, c.telefono, c.direccion
                 ORDER BY total_gastado DESC
             """)
-            clientes = [{
-                "id": row[0],
-                "nombre": row[1],
-                "telefono": row[2],
-                "direccion": row[3],
-                "total_pedidos": row[4],
-                "total_gastado": row[5],
-                "ultimo_pedido": row[6]
-            } for row in cur.fetchall()]
+            clientes = db.fetchall_records(cur)
             
             # Top 10 clientes frecuentes
             top_frecuentes = sorted(clientes, key=lambda x: x["total_pedidos"], reverse=True)[:10]
@@ -253,7 +254,8 @@ async def get_reporte_clientes(
             hace_60_dias = (datetime.now() - timedelta(days=60)).strftime("%Y-%m-%d")
             inactivos = [c for c in clientes if c["ultimo_pedido"] and c["ultimo_pedido"] < hace_60_dias]
             
-            return {
+            # Every client is in the body: render directly, no jsonable_encoder pass
+            return TimedJSONResponse({
                 "resumen": {
                     "total_clientes": total_clientes,
                     "clientes_activos": clientes_activos,
@@ -262,14 +264,16 @@ async def get_reporte_clientes(
                 "clientes": clientes,
                 "ranking": top_frecuentes,
                 "inactivos": inactivos[:20]
-            }
+            })
     except Exception as e:
         raise safe_error_handler(e, "reportes", "generar reporte de clientes")
 
 
 @router.get("/productos")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_reporte_productos(
+@single_flight()
+@lane("reports")
+def get_reporte_productos(
     request: Request,
     desde: str = Query(default=None),
     hasta: str = Query(default=None),
@@ -354,7 +358,9 @@ async def get_reporte_productos(
 
 @router.get("/rendimiento")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_reporte_rendimiento(
+@single_flight()
+@lane("reports")
+def get_reporte_rendimiento(
     request: Request,
     current_user: dict = Depends(get_admin_user)
 ):
@@ -478,7 +484,9 @@ async def get_reporte_rendimiento(
 
 @router.get("/comparativo")
 @limiter.limit(RATE_LIMIT_READ)
-async def get_reporte_comparativo(
+@single_flight()
+@lane("reports")
+def get_reporte_comparativo(
     request: Request,
     current_user: dict = Depends(get_admin_user)
 ):
@@ -7,6 +7,7 @@ from datetime import datetime
 import db
 import models
 from deps import get_current_user, get_admin_user, limiter, RATE_LIMIT_READ, RATE_LIMIT_WRITE
+from idempotency import idempotent
 
 router = APIRouter(prefix="/templates", tags=["Templates"])
 
@@ -133,6 +134,7 @@ async def get_template(request: Request, template_id: int, current_user: dict =
 
 @router.post("", response_model=Template)
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def create_template(request: Request, template: TemplateCreate, current_user: dict = Depends(get_admin_user)):
     """Create a new template"""
     if not template.productos:
@@ -191,6 +193,7 @@ async def create_template(request: Request, template: TemplateCreate, current_us
 
 @router.put("/{template_id}", response_model=Template)
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def update_template(request: Request, template_id: int, template: TemplateUpdate, current_user: dict = Depends(get_admin_user)):
     """Update a template"""
     with db.get_db_transaction() as (conn, cursor):
@@ -240,6 +243,7 @@ async def update_template(request: Request, template_id: int, template: Template
 
 @router.delete("/{template_id}", status_code=204)
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def delete_template(request: Request, template_id: int, current_user: dict = Depends(get_admin_user)):
     """Delete a template"""
     with db.get_db_transaction() as (conn, cursor):
@@ -254,6 +258,7 @@ async def delete_template(request: Request, template_id: int, current_user: dict
 
 @router.post("/{template_id}/ejecutar")
 @limiter.limit(RATE_LIMIT_WRITE)
+@idempotent()
 async def ejecutar_template(request: Request, template_id: int, current_user: dict = Depends(get_current_user)):
     """Create a new pedido from a template"""
     if current_user["rol"] not in ["admin", "vendedor", "administrador", "oficina"]:
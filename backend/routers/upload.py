@@ -7,7 +7,6 @@ import base64
 from io import BytesIO
 import logging
 
-from PIL import Image
 from deps import get_current_user, limiter, RATE_LIMIT_WRITE
 
 logger = logging.getLogger(__name__)
@@ -42,6 +41,7 @@ def optimize_image(content: bytes, original_ext: str) -> tuple[bytes, str]:
         tuple: (optimized_bytes, mime_type)
     """
     try:
+        from PIL import Image  # imported on the first upload (slow import)
         img = Image.open(BytesIO(content))
         original_size = len(content)
         
@@ -0,0 +1,118 @@
+"""
+Fast JSON serialization for API responses.
+
+- dumps(): orjson when installed (3-5x faster than stdlib json), stdlib
+  fallback with the same compact output
+- TimedJSONResponse: the app's default response class, renders with
+  dumps() and reports the time as Server-Timing serialization
+- rows_response(): list endpoints build the body straight from DB row
+  tuples, skipping FastAPI's jsonable_encoder pass
+- ResponseSerializer: a response_model compiled once into a pydantic
+  TypeAdapter; validates and writes JSON bytes in pydantic-core instead of
+  validate -> Python dicts -> jsonable_encoder -> json.dumps
+
+Routes that return these responses directly keep their response_model in
+the decorator for the OpenAPI schema; FastAPI skips its own serialization
+for Response instances.
+"""
+
+import json
+import time
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+from logging_config import record_serialization_time
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _default(obj: Any) -> Any:
+    """Types neither encoder handles natively (PostgreSQL NUMERIC, models, sets, db.Record rows)"""
+    if isinstance(obj, Mapping):
+        return dict(obj.items())
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(content: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes"""
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(content: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes"""
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default
+        ).encode("utf-8")
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps(), reporting its time as Server-Timing serialization"""
+
+    def render(self, content) -> bytes:
+        start = time.perf_counter()
+        try:
+            return dumps(content)
+        finally:
+            record_serialization_time(time.perf_counter() - start)
+
+
+class RawJSONResponse(Response):
+    """Response for a body that is already JSON bytes"""
+    media_type = "application/json"
+
+
+def rows_response(columns: Sequence[str], rows: Iterable[Sequence[Any]], status_code: int = 200) -> Response:
+    """
+    JSON array of objects from DB row tuples (one key per column, in order).
+
+    The per-row dicts are built in C by dict(zip()) and encoded by a single
+    dumps() call; writing the objects from the tuples with a key template
+    needs one dumps() per value and is slower (tuple_writer in
+    benchmarks/bench_json.py).
+    """
+    start = time.perf_counter()
+    body = dumps([dict(zip(columns, row)) for row in rows])
+    record_serialization_time(time.perf_counter() - start)
+    return RawJSONResponse(body, status_code=status_code)
+
+
+class ResponseSerializer:
+    """
+    A response type compiled once (at import) into a TypeAdapter.
+
+    Calling it validates the content exactly like response_model would
+    (extra keys dropped, defaults applied, ValidationError -> 500) and
+    returns the JSON response.
+    """
+
+    __slots__ = ("adapter",)
+
+    def __init__(self, response_type: Any):
+        self.adapter = TypeAdapter(response_type)
+
+    def dump_json(self, content: Any) -> bytes:
+        return self.adapter.dump_json(self.adapter.validate_python(content))
+
+    def __call__(self, content: Any, status_code: int = 200) -> Response:
+        start = time.perf_counter()
+        body = self.dump_json(content)
+        record_serialization_time(time.perf_counter() - start)
+        return RawJSONResponse(body, status_code=status_code)
@@ -0,0 +1,111 @@
+"""
+Request coalescing (single flight) for expensive GET endpoints.
+
+When the shift opens the dashboard, many clients ask for the same
+/api/dashboard/metrics, /api/productos and /api/reportes/* at once and each
+request ran the same queries. An endpoint decorated with @single_flight()
+runs once per distinct request at a time: the first request (the leader)
+executes it, identical requests arriving while it runs (followers) wait for
+its result instead of executing again. Nothing is kept once the leader
+finishes; this is not a cache.
+
+Requests are identical when they hit the same endpoint with the same
+parameters (bound to the endpoint signature, defaults applied) within the
+same scope:
+    role    same role (current_user["rol"]), the default
+    user    same username, for endpoints whose result depends on the user
+    global  everyone
+
+The leader's call runs as its own task, so a leader whose client goes away
+does not cancel the work its followers are waiting for. Every request gets
+its own copy of a Response result (middlewares add headers to it).
+
+Opt in per route, below the rate limit (every request still counts) and
+above @lane (followers take no lane thread):
+    @router.get("/dashboard/metrics")
+    @limiter.limit(RATE_LIMIT_READ)
+    @single_flight()
+    @lane("reports")
+    def get_dashboard_metrics(request: Request, current_user: dict = Depends(get_current_user)):
+        ...
+
+Metrics: single_flight_requests_total{endpoint,outcome} (leader, coalesced).
+"""
+
+import asyncio
+import copy
+import inspect
+import os
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from starlette.background import BackgroundTasks
+from starlette.requests import Request
+from starlette.responses import Response
+
+import metrics
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+SCOPES = ("role", "user", "global")
+
+# Parameters that are per request, not part of what is being asked for
+_PER_REQUEST_TYPES = (Request, Response, BackgroundTasks)
+
+
+def _scope_key(scope: str, current_user: Any) -> Hashable:
+    if scope == "global" or not isinstance(current_user, dict):
+        return None
+    return current_user.get("rol") if scope == "role" else current_user.get("username")
+
+
+def _request_key(signature: inspect.Signature, scope: str, args: tuple, kwargs: Dict[str, Any]) -> Tuple:
+    """Normalized (scope, parameters) key of one call"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    params = []
+    for name, value in sorted(bound.arguments.items()):
+        if name == "current_user" or isinstance(value, _PER_REQUEST_TYPES):
+            continue
+        params.append((name, repr(value)))
+    return _scope_key(scope, bound.arguments.get("current_user")), tuple(params)
+
+
+def _own_copy(result: Any) -> Any:
+    """A Response per request: middlewares mutate the header list they are sent"""
+    if isinstance(result, Response):
+        result = copy.copy(result)
+        result.raw_headers = list(result.raw_headers)
+    return result
+
+
+def single_flight(scope: str = "role") -> Callable:
+    """Decorator: coalesce identical concurrent calls of an async endpoint (see the module docstring)"""
+    if scope not in SCOPES:
+        raise ValueError(f"scope must be one of {SCOPES}")
+
+    def decorator(func: Callable) -> Callable:
+        if not asyncio.iscoroutinefunction(func):
+            raise TypeError(f"@single_flight needs an async endpoint: put it above @lane on {func.__name__}")
+        signature = inspect.signature(func)
+        in_flight: Dict[Tuple, asyncio.Task] = {}
+
+        @wraps(func)
+        async def endpoint(*args, **kwargs):
+            if not SINGLE_FLIGHT_ENABLED:
+                return await func(*args, **kwargs)
+            key = _request_key(signature, scope, args, kwargs)
+            task = in_flight.get(key)
+            if task is None:
+                metrics.SINGLE_FLIGHT_REQUESTS.inc(func.__name__, "leader")
+                task = in_flight[key] = asyncio.ensure_future(func(*args, **kwargs))
+                task.add_done_callback(lambda _: in_flight.pop(key, None))
+            else:
+                metrics.SINGLE_FLIGHT_REQUESTS.inc(func.__name__, "coalesced")
+            return _own_copy(await asyncio.shield(task))
+
+        endpoint.single_flight = scope
+        endpoint.in_flight = in_flight
+        return endpoint
+
+    return decorator
@@ -0,0 +1,156 @@
+"""
+SQLite storage tuning: per-connection PRAGMA profile, WAL checkpoints,
+planner statistics and storage stats.
+
+Profile (applied by db.conectar() to every connection):
+    synchronous         SQLITE_SYNCHRONOUS (NORMAL: safe in WAL mode, no fsync per commit)
+    cache_size          SQLITE_CACHE_SIZE_KB page cache per connection
+    mmap_size           SQLITE_MMAP_SIZE_MB of the file read through mmap
+                        (the OS page cache, shared by all connections)
+    temp_store          SQLITE_TEMP_STORE (MEMORY: sorts and temp tables off disk)
+    wal_autocheckpoint  SQLITE_WAL_AUTOCHECKPOINT pages
+    journal_size_limit  SQLITE_JOURNAL_SIZE_LIMIT_MB the WAL is truncated to after a checkpoint
+
+WAL growth: automatic checkpoints are passive and cannot finish while
+readers still use old snapshots, so under steady reads the WAL keeps growing.
+The maintenance scheduler checks it every few minutes and runs a passive
+checkpoint once it is over SQLITE_WAL_CHECKPOINT_MB, truncates it once a day
+in quiet hours, refreshes planner statistics (PRAGMA optimize daily, a full
+ANALYZE weekly) and GET /api/admin/sqlite-storage reports WAL size and
+freelist fragmentation.
+
+Connections are opened per request and their page cache is dropped on
+close, so cache_size only has to hold the working set of one request; what
+survives between requests is the mmap'd file in the OS page cache. Defaults
+are sized for a 512 MB instance (a few MB per concurrent connection). The
+page cache hit rate is not reported: the sqlite3 module does not expose
+sqlite3_db_status().
+
+Usage:
+    import sqlite_tuning
+
+    sqlite_tuning.apply_profile(con)
+    sqlite_tuning.checkpoint(con, db.DB_PATH, threshold_bytes=sqlite_tuning.WAL_CHECKPOINT_BYTES)
+    stats = sqlite_tuning.storage_stats(con, db.DB_PATH)
+"""
+
+import os
+import logging
+import sqlite3
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration from environment
+SQLITE_TUNING_ENABLED = os.getenv("SQLITE_TUNING_ENABLED", "true").lower() == "true"
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "4096"))
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "64"))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+SQLITE_WAL_AUTOCHECKPOINT = int(os.getenv("SQLITE_WAL_AUTOCHECKPOINT", "1000"))
+SQLITE_JOURNAL_SIZE_LIMIT_MB = int(os.getenv("SQLITE_JOURNAL_SIZE_LIMIT_MB", "64"))
+# Passive checkpoint by the maintenance scheduler once the WAL is this big
+WAL_CHECKPOINT_BYTES = int(float(os.getenv("SQLITE_WAL_CHECKPOINT_MB", "32")) * 1024 * 1024)
+# Rows sampled per index by PRAGMA optimize (0: no limit)
+SQLITE_ANALYSIS_LIMIT = int(os.getenv("SQLITE_ANALYSIS_LIMIT", "1000"))
+
+PROFILE: Tuple[Tuple[str, Any], ...] = (
+    ("synchronous", SQLITE_SYNCHRONOUS),
+    ("cache_size", -SQLITE_CACHE_SIZE_KB),  # negative: KiB instead of pages
+    ("mmap_size", SQLITE_MMAP_SIZE_MB * 1024 * 1024),
+    ("temp_store", SQLITE_TEMP_STORE),
+    ("wal_autocheckpoint", SQLITE_WAL_AUTOCHECKPOINT),
+    ("journal_size_limit", SQLITE_JOURNAL_SIZE_LIMIT_MB * 1024 * 1024),
+)
+# One uninstrumented call per connection (pragmas are not application queries)
+_PROFILE_SCRIPT = "".join(f"PRAGMA {name}={value};" for name, value in PROFILE)
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+def apply_profile(con: sqlite3.Connection) -> None:
+    """Set the tuning PRAGMAs on a new connection"""
+    if SQLITE_TUNING_ENABLED:
+        con.executescript(_PROFILE_SCRIPT)
+
+
+# ============================================================================
+# WAL AND PLANNER STATISTICS
+# ============================================================================
+
+def wal_size(path: str) -> int:
+    try:
+        return os.path.getsize(path + "-wal")
+    except OSError:
+        return 0
+
+
+def checkpoint(con: sqlite3.Connection, path: str, mode: str = "PASSIVE",
+               threshold_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """Checkpoint the WAL (only when it is over threshold_bytes, if given)"""
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Checkpoint mode must be one of {CHECKPOINT_MODES}")
+    before = wal_size(path)
+    if threshold_bytes is not None and before < threshold_bytes:
+        return {"mode": mode, "skipped": True, "wal_bytes": before}
+    busy, wal_pages, checkpointed = sqlite3.Connection.execute(con, f"PRAGMA wal_checkpoint({mode})").fetchone()
+    result = {
+        "mode": mode, "skipped": False, "wal_bytes_before": before, "wal_bytes": wal_size(path),
+        "busy": bool(busy), "wal_pages": wal_pages, "checkpointed_pages": checkpointed,
+    }
+    if busy or (wal_pages > 0 and checkpointed < wal_pages):
+        logger.warning(f"WAL checkpoint ({mode}) incomplete: {checkpointed}/{wal_pages} pages, busy={bool(busy)}")
+    return result
+
+
+def optimize(con: sqlite3.Connection) -> None:
+    """Refresh the planner statistics that are stale (cheap, bounded by SQLITE_ANALYSIS_LIMIT)"""
+    con.executescript(f"PRAGMA analysis_limit={SQLITE_ANALYSIS_LIMIT}; PRAGMA optimize;")
+
+
+def analyze(con: sqlite3.Connection) -> None:
+    """Rebuild all planner statistics (full scan of every index)"""
+    con.executescript("PRAGMA analysis_limit=0; ANALYZE;")
+
+
+# ============================================================================
+# STORAGE STATS
+# ============================================================================
+
+def header_stats(path: str) -> Dict[str, int]:
+    """Database and WAL size and free pages from the file header (no connection; free pages as of the last checkpoint)"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(100)
+        db_bytes = os.path.getsize(path)
+    except OSError:
+        return {}
+    if len(header) < 100 or not header.startswith(b"SQLite format 3\x00"):
+        return {}
+    page_size = int.from_bytes(header[16:18], "big")
+    page_size = 65536 if page_size == 1 else page_size
+    return {
+        "db_bytes": db_bytes,
+        "wal_bytes": wal_size(path),
+        "freelist_bytes": int.from_bytes(header[36:40], "big") * page_size,
+    }
+
+
+def storage_stats(con: sqlite3.Connection, path: str) -> Dict[str, Any]:
+    """WAL size, freelist fragmentation and the PRAGMA profile in effect"""
+    def pragma(name):
+        return sqlite3.Connection.execute(con, f"PRAGMA {name}").fetchone()[0]
+
+    page_size, page_count, freelist = pragma("page_size"), pragma("page_count"), pragma("freelist_count")
+    return {
+        "db_bytes": page_size * page_count,
+        "wal_bytes": wal_size(path),
+        "wal_checkpoint_threshold_bytes": WAL_CHECKPOINT_BYTES,
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_pages": freelist,
+        "fragmentation": round(freelist / page_count, 4) if page_count else 0.0,
+        "journal_mode": pragma("journal_mode"),
+        "page_cache": {"available": False, "hit_ratio": None},  # see the module docstring
+        "profile": {name: pragma(name) for name, _ in PROFILE},
+    }
@@ -18,6 +18,8 @@ import tempfile
 _temp_upload_dir = tempfile.mkdtemp(prefix="test_uploads_")
 os.environ["UPLOAD_DIR"] = _temp_upload_dir
 os.environ["MEDIA_DIR"] = _temp_upload_dir
+os.environ["PDF_CACHE_PATH"] = os.path.join(_temp_upload_dir, "pdf_cache.sqlite")
+os.environ["RATE_LIMIT_STORAGE_URI"] = "sqlite://" + os.path.join(_temp_upload_dir, "ratelimit.sqlite")
 
 @pytest.fixture(scope="function")
 def temp_db():
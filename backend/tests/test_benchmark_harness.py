@@ -0,0 +1,51 @@
+"""
+Tests for the benchmark harness statistics and load driver.
+"""
+import asyncio
+
+from benchmarks.harness import drive, percentile, summarize
+
+
+class TestStatistics:
+    """Test percentile and summary computation"""
+
+    def test_nearest_rank_percentiles(self):
+        """p50/p95/p99 use the nearest-rank method"""
+        samples = [i / 1000 for i in range(1, 101)]  # 1..100 ms
+        assert percentile(samples, 50) == 0.05
+        assert percentile(samples, 95) == 0.095
+        assert percentile(samples, 99) == 0.099
+        assert percentile([], 50) == 0.0
+
+    def test_summary_throughput(self):
+        """Throughput is computed over the wall time"""
+        summary = summarize([0.01] * 10, wall_seconds=0.05, errors=1)
+        assert summary["count"] == 10 and summary["errors"] == 1
+        assert summary["p99_ms"] == 10.0
+        assert summary["throughput_per_s"] == 200.0
+
+
+class TestDriver:
+    """Test the asyncio load driver"""
+
+    def test_all_requests_issued_concurrently(self):
+        """Every request index is sent once and failures are counted"""
+        sent = []
+        active = {"now": 0, "peak": 0}
+
+        class Response:
+            def __init__(self, status_code):
+                self.status_code = status_code
+
+        async def send(i):
+            sent.append(i)
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.001)
+            active["now"] -= 1
+            return Response(500 if i % 10 == 0 else 200)
+
+        summary = asyncio.run(drive(send, total=50, concurrency=5))
+        assert sorted(sent) == list(range(50))
+        assert summary["count"] == 50 and summary["errors"] == 5
+        assert active["peak"] == 5
@@ -0,0 +1,97 @@
+"""
+Tests for the adaptive concurrency limiter and load shedding.
+"""
+import asyncio
+
+import concurrency_limit
+from concurrency_limit import CRITICAL, LOW, NORMAL, ConcurrencyLimiter, GradientLimit, request_priority
+
+
+def _fixed(limit):
+    return GradientLimit(initial=limit, min_limit=limit, max_limit=limit)
+
+
+class TestPriority:
+    """Test request classification"""
+
+    def test_priorities(self):
+        assert request_priority("POST", "/api/pedidos") == CRITICAL
+        assert request_priority("POST", "/api/login") == CRITICAL
+        assert request_priority("GET", "/health") == CRITICAL
+        assert request_priority("GET", "/api/reportes/clientes") == LOW
+        assert request_priority("GET", "/api/pedidos/export/csv") == LOW
+        assert request_priority("GET", "/api/pedidos") == NORMAL
+
+
+class TestGradientLimit:
+    """Test the limit estimate"""
+
+    def test_grows_when_used_at_stable_latency(self):
+        limit = GradientLimit(initial=10, max_limit=100)
+        for _ in range(50):
+            limit.update(0.02, in_flight=10)
+        assert limit.limit > 20
+
+    def test_no_growth_when_unused(self):
+        limit = GradientLimit(initial=10)
+        for _ in range(50):
+            limit.update(0.02, in_flight=1)
+        assert limit.limit == 10
+
+    def test_shrinks_when_latency_climbs(self):
+        limit = GradientLimit(initial=50, min_limit=4)
+        for _ in range(200):
+            limit.update(0.02, in_flight=50)
+        grown = limit.limit
+        for _ in range(30):
+            limit.update(0.5, in_flight=50)
+        assert limit.limit < grown / 2 and limit.limit >= 4
+
+
+class TestLimiter:
+    """Test admission, queueing and shedding"""
+
+    def test_admission_order(self):
+        """At the limit: low is shed, normal queues FIFO, critical always gets in"""
+        async def scenario():
+            limiter = ConcurrencyLimiter(_fixed(2), queue_timeout=1)
+            assert await limiter.acquire(NORMAL) and await limiter.acquire(NORMAL)
+            assert not await limiter.acquire(LOW)
+            assert await limiter.acquire(CRITICAL)
+            first = asyncio.create_task(limiter.acquire(NORMAL))
+            second = asyncio.create_task(limiter.acquire(NORMAL))
+            await asyncio.sleep(0)
+            assert limiter.queue_depth == 2
+            assert not await limiter.acquire(NORMAL)  # queue holds at most `limit` requests
+            limiter.release(0.01)  # critical done: still 2 in flight, nothing admitted
+            assert not first.done()
+            limiter.release(0.01)
+            assert await first and not second.done()
+            limiter.release(0.01)
+            assert await second
+            return limiter
+
+        limiter = asyncio.run(scenario())
+        assert limiter.in_flight == 2 and limiter.shed == {CRITICAL: 0, NORMAL: 1, LOW: 1}
+
+    def test_queue_timeout(self):
+        """A queued request that never gets a slot is shed"""
+        async def scenario():
+            limiter = ConcurrencyLimiter(_fixed(1), queue_timeout=0.02)
+            await limiter.acquire(NORMAL)
+            admitted = await limiter.acquire(NORMAL)
+            return limiter, admitted
+
+        limiter, admitted = asyncio.run(scenario())
+        assert not admitted and limiter.queue_depth == 0 and limiter.shed[NORMAL] == 1
+
+    def test_middleware_sheds_reports_only(self, client, auth_headers, monkeypatch):
+        """A saturated worker answers reports with 503 + Retry-After and still serves critical requests"""
+        monkeypatch.setattr(concurrency_limit.limiter, "limit", _fixed(1))
+        monkeypatch.setattr(concurrency_limit.limiter, "in_flight", 1)
+        response = client.get("/api/reportes/clientes", headers=auth_headers)
+        assert response.status_code == 503 and response.headers["retry-after"] == "2"
+        assert response.json()["code"] == "SERVICE_UNAVAILABLE"
+        assert client.get("/health").status_code == 200
+        assert concurrency_limit.limiter.in_flight == 1
+        assert 'requests_shed_total{priority="low"}' in client.get("/metrics").text
@@ -0,0 +1,107 @@
+"""
+Tests for the streaming seed database restore.
+"""
+import base64
+import gzip
+import hashlib
+import os
+import sqlite3
+import textwrap
+
+import pytest
+
+import db_restore
+from db_restore import RestoreError, restore_if_needed
+
+
+def _make_db(path, users=("admin",)):
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE usuarios (username TEXT)")
+    con.execute("CREATE TABLE filler (data TEXT)")
+    con.executemany("INSERT INTO usuarios VALUES (?)", [(u,) for u in users])
+    con.executemany("INSERT INTO filler VALUES (?)", [(f"row {i}" * 20,) for i in range(500)])
+    con.commit()
+    con.close()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _seed(directory, db_bytes, gzipped=True, sidecar=None):
+    """Write the secret file like `base64 -w 76` does"""
+    payload = gzip.compress(db_bytes) if gzipped else db_bytes
+    name = "ventas.db.gz.b64" if gzipped else "ventas.db.b64"
+    path = directory / name
+    path.write_text("\n".join(textwrap.wrap(base64.b64encode(payload).decode(), 76)) + "\n")
+    if sidecar is not None:
+        (directory / (name + ".sha256")).write_text(f"{sidecar}  ventas.db\n")
+    return path
+
+
+def _users(path):
+    con = sqlite3.connect(path)
+    try:
+        return [row[0] for row in con.execute("SELECT username FROM usuarios")]
+    finally:
+        con.close()
+
+
+@pytest.fixture
+def seed_dir(tmp_path):
+    directory = tmp_path / "secrets"
+    directory.mkdir()
+    return directory
+
+
+class TestRestore:
+    """Test restoring the seed file"""
+
+    @pytest.mark.parametrize("gzipped", [True, False])
+    def test_restores_missing_database(self, tmp_path, seed_dir, monkeypatch, gzipped):
+        """Chunked decode (chunk size not a multiple of 4) writes the exact database, verified"""
+        monkeypatch.setattr(db_restore, "_CHUNK", 7)
+        db_bytes = _make_db(str(tmp_path / "seed.db"), users=("ana", "luis"))
+        _seed(seed_dir, db_bytes, gzipped, sidecar=hashlib.sha256(db_bytes).hexdigest())
+        target = tmp_path / "data" / "ventas.db"
+
+        result = restore_if_needed(str(target), str(seed_dir), force=False)
+        assert result["restored"] and result["verified"] and result["bytes"] == len(db_bytes)
+        assert target.read_bytes() == db_bytes and _users(str(target)) == ["ana", "luis"]
+        assert sorted(os.listdir(target.parent)) == ["ventas.db", "ventas.db.restore.json"]
+
+    def test_no_seed_file(self, tmp_path, seed_dir):
+        assert restore_if_needed(str(tmp_path / "ventas.db"), str(seed_dir)) is None
+
+    def test_existing_database_kept(self, tmp_path, seed_dir):
+        """Live data is not replaced; FORCE replaces it once per seed file"""
+        target = str(tmp_path / "ventas.db")
+        _make_db(target, users=("live",))
+        _seed(seed_dir, _make_db(str(tmp_path / "seed.db"), users=("seed",)))
+
+        assert restore_if_needed(target, str(seed_dir), force=False)["reason"] == "exists"
+        assert _users(target) == ["live"]
+        assert restore_if_needed(target, str(seed_dir), force=True)["restored"]
+        assert _users(target) == ["seed"]
+        con = sqlite3.connect(target)
+        con.execute("INSERT INTO usuarios VALUES ('new')")
+        con.commit()
+        con.close()
+        assert restore_if_needed(target, str(seed_dir), force=True)["reason"] == "same_source"
+        assert _users(target) == ["seed", "new"]
+
+    def test_checksum_mismatch_leaves_database(self, tmp_path, seed_dir):
+        target = str(tmp_path / "ventas.db")
+        _make_db(target, users=())  # no users: would be restored
+        before = open(target, "rb").read()
+        _seed(seed_dir, _make_db(str(tmp_path / "seed.db")), sidecar="0" * 64)
+
+        with pytest.raises(RestoreError, match="Checksum mismatch"):
+            restore_if_needed(target, str(seed_dir), force=False)
+        assert open(target, "rb").read() == before
+        assert sorted(os.listdir(tmp_path)) == ["secrets", "seed.db", "ventas.db"]
+
+    def test_truncated_gzip(self, tmp_path, seed_dir):
+        payload = gzip.compress(_make_db(str(tmp_path / "seed.db")))[:-40]
+        (seed_dir / "ventas.db.gz.b64").write_text(base64.b64encode(payload).decode())
+        with pytest.raises(RestoreError):
+            restore_if_needed(str(tmp_path / "ventas.db"), str(seed_dir))
+        assert not os.path.exists(tmp_path / "ventas.db")
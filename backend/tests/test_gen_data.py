@@ -0,0 +1,65 @@
+"""
+Tests for the synthetic dataset generator (tools.gen_data).
+"""
+import sqlite3
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from tools.gen_data import TIPOS_OFERTA, UTC_OFFSET_HOURS, generate
+
+
+def _generate(temp_db, **kwargs):
+    options = {"scale": 0.1, "years": 0.25, "seed": 1, "today": date(2026, 3, 2), "log": lambda msg: None}
+    options.update(kwargs)
+    report = generate(**options)
+    return report, sqlite3.connect(temp_db)
+
+
+class TestGenData:
+    """Test the generated dataset shape"""
+
+    def test_counts_and_referential_integrity(self, temp_db):
+        """Report matches the tables and every detalle points to a real pedido/producto"""
+        report, con = _generate(temp_db)
+        for table in ("clientes", "productos", "pedidos", "detalles_pedido"):
+            assert con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == report[table]["rows"] > 0
+        orphans = con.execute("""
+            SELECT COUNT(*) FROM detalles_pedido d
+            LEFT JOIN pedidos p ON p.id = d.pedido_id
+            LEFT JOIN productos pr ON pr.id = d.producto_id
+            WHERE p.id IS NULL OR pr.id IS NULL
+        """).fetchone()[0]
+        assert orphans == 0
+
+    def test_every_offer_type(self, temp_db):
+        """Ofertas of every TipoOferta, with type-specific fields"""
+        _, con = _generate(temp_db)
+        tipos = dict(con.execute("SELECT tipo, COUNT(*) FROM ofertas GROUP BY tipo").fetchall())
+        assert set(tipos) == set(TIPOS_OFERTA)
+        assert con.execute(
+            "SELECT COUNT(*) FROM ofertas WHERE tipo = 'nxm' AND paga_cantidad >= compra_cantidad"
+        ).fetchone()[0] == 0
+        assert con.execute(
+            "SELECT COUNT(*) FROM ofertas WHERE tipo = 'precio_cantidad' AND reglas_json IS NULL"
+        ).fetchone()[0] == 0
+
+    def test_weekday_and_hour_distribution(self, temp_db):
+        """Sundays are almost empty and orders fall in business hours (local time)"""
+        _, con = _generate(temp_db)
+        local = [
+            datetime.fromisoformat(fecha) - timedelta(hours=UTC_OFFSET_HOURS)
+            for (fecha,) in con.execute("SELECT fecha FROM pedidos")
+        ]
+        weekdays = Counter(d.weekday() for d in local)
+        assert weekdays[6] < weekdays[0] / 5
+        assert all(6 <= d.hour <= 19 for d in local)
+
+    def test_deterministic_and_appends(self, temp_db):
+        """Same seed gives the same data; a second run appends after existing ids"""
+        first, con = _generate(temp_db)
+        snapshot = con.execute("SELECT cliente_id, fecha, estado FROM pedidos ORDER BY id").fetchall()
+        second, _ = _generate(temp_db)
+        assert second["pedidos"]["rows"] == first["pedidos"]["rows"]
+        rows = con.execute("SELECT cliente_id, fecha, estado FROM pedidos ORDER BY id").fetchall()
+        assert rows[:len(snapshot)] == snapshot
+        assert len(rows) == 2 * len(snapshot)
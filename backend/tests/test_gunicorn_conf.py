@@ -0,0 +1,54 @@
+"""
+Tests for the production server hooks (gunicorn_conf.py).
+"""
+import logging
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import gunicorn_conf
+
+
+def _server(preload_app=True, workers=1):
+    return SimpleNamespace(
+        cfg=SimpleNamespace(preload_app=preload_app, workers=workers), log=logging.getLogger("test.gunicorn")
+    )
+
+
+class TestStartupHooks:
+    """Test the startup work done once by the master"""
+
+    def test_on_starting_runs_startup_tasks_once(self, temp_db, tmp_path, monkeypatch):
+        """Migrations run in the master, stale worker metrics are removed, workers are told to skip"""
+        import db
+        monkeypatch.setenv("STARTUP_TASKS_DONE", "0")
+        monkeypatch.setenv("METRICS_MULTIPROC_DIR", str(tmp_path))
+        (tmp_path / "metrics_123.json").write_text("{}")
+        gunicorn_conf.on_starting(_server())
+        assert os.environ["STARTUP_TASKS_DONE"] == "1"
+        assert not list(tmp_path.iterdir())
+        with db.get_db_connection() as con:
+            assert con.execute("SELECT COUNT(*) FROM migration_log").fetchone()[0] > 0
+
+    def test_without_preload_runs_in_subprocess(self, monkeypatch):
+        """The master does not import the application when it is not preloaded"""
+        calls = []
+        monkeypatch.setenv("STARTUP_TASKS_DONE", "0")
+        monkeypatch.setattr(gunicorn_conf.subprocess, "run", lambda args, check: calls.append(args))
+        gunicorn_conf.on_reload(_server(preload_app=False))
+        assert calls and calls[0][-1] == "import main; main.run_startup_tasks()"
+        assert os.environ["STARTUP_TASKS_DONE"] == "1"
+
+    def test_failure(self, monkeypatch):
+        """A failed startup leaves the work to the workers; production refuses to start"""
+        def fail(preloaded):
+            raise RuntimeError("database unreachable")
+
+        monkeypatch.setenv("STARTUP_TASKS_DONE", "1")
+        monkeypatch.setattr(gunicorn_conf, "_run_startup_tasks", fail)
+        gunicorn_conf.on_reload(_server())
+        assert "STARTUP_TASKS_DONE" not in os.environ
+        monkeypatch.setattr(gunicorn_conf, "ENVIRONMENT", "production")
+        with pytest.raises(RuntimeError):
+            gunicorn_conf.on_starting(_server())
@@ -0,0 +1,98 @@
+"""
+Tests for route sheet (hoja de ruta) generation endpoints.
+"""
+import io
+import zipfile
+
+import pytest
+from pypdf import PdfReader
+
+import db
+
+
+@pytest.fixture
+def pedidos_asignados(client, auth_headers):
+    """Two repartidores with pending pedidos plus one delivered pedido"""
+    producto_id = client.post("/api/productos", headers=auth_headers, json={
+        "nombre": "Chorizo", "precio": 50.0, "stock": 100
+    }).json()["id"]
+    asignaciones = [("Ana", "pendiente"), ("Ana", "pendiente"), ("Beto", "pendiente"), ("Beto", "entregado")]
+    for i, (repartidor, estado) in enumerate(asignaciones):
+        cliente_id = client.post("/api/clientes", headers=auth_headers, json={"nombre": f"Cliente {i}"}).json()["id"]
+        pedido_id = client.post("/api/pedidos", headers=auth_headers, json={
+            "cliente": {"id": cliente_id, "nombre": f"Cliente {i}"},
+            "productos": [{"id": producto_id, "nombre": "Chorizo", "precio": 50.0, "cantidad": i + 1, "tipo": "unidad"}]
+        }).json()["id"]
+        with db.get_db_transaction() as (conn, cursor):
+            cursor.execute("UPDATE pedidos SET repartidor = ?, estado = ? WHERE id = ?", (repartidor, estado, pedido_id))
+
+
+class TestHojaRutaLote:
+    """Test batch route sheet generation for all repartidores"""
+
+    def test_zip_has_one_pdf_per_repartidor(self, client, auth_headers, pedidos_asignados):
+        """Default format is a ZIP with one route sheet per repartidor"""
+        response = client.post("/api/hoja-ruta/generar-lote", headers=auth_headers, json={})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/zip"
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            assert sorted(zf.namelist()) == ["hoja_ruta_Ana.pdf", "hoja_ruta_Beto.pdf"]
+            texto_beto = PdfReader(io.BytesIO(zf.read("hoja_ruta_Beto.pdf"))).pages[0].extract_text()
+        # Delivered pedidos are left out
+        assert "1 pedidos" in texto_beto
+        assert "Cliente 2" in texto_beto and "Cliente 3" not in texto_beto
+
+    def test_merged_pdf_has_bookmarks(self, client, auth_headers, pedidos_asignados):
+        """formato=pdf returns one document with a bookmark per repartidor"""
+        response = client.post("/api/hoja-ruta/generar-lote", headers=auth_headers, json={
+            "repartidores": ["Beto", "Ana"], "formato": "pdf"
+        })
+        assert response.status_code == 200
+        reader = PdfReader(io.BytesIO(response.content))
+        assert [item.title for item in reader.outline] == ["Beto", "Ana"]
+        assert "Beto" in reader.pages[0].extract_text()
+
+    def test_selected_repartidor_without_pedidos(self, client, auth_headers, pedidos_asignados):
+        """Selected repartidores without pending pedidos get an empty sheet"""
+        response = client.post("/api/hoja-ruta/generar-lote", headers=auth_headers, json={
+            "repartidores": ["Carla"]
+        })
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            texto = PdfReader(io.BytesIO(zf.read("hoja_ruta_Carla.pdf"))).pages[0].extract_text()
+        assert "No hay pedidos" in texto
+
+    def test_colliding_file_names_are_kept_apart(self, client, auth_headers, pedidos_asignados):
+        """Repartidores whose names sanitize to the same file get distinct ZIP entries"""
+        response = client.post("/api/hoja-ruta/generar-lote", headers=auth_headers, json={
+            "repartidores": ["Juan Pérez", "Juan_Pérez", "juan pérez"]
+        })
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+            assert zf.namelist() == [
+                "hoja_ruta_Juan_Pérez.pdf", "hoja_ruta_Juan_Pérez_2.pdf", "hoja_ruta_juan_pérez_3.pdf",
+            ]
+
+    def test_no_pending_pedidos(self, client, auth_headers):
+        """Without any assigned pending pedido there is nothing to print"""
+        response = client.post("/api/hoja-ruta/generar-lote", headers=auth_headers, json={})
+        assert response.status_code == 404
+
+    def test_single_sheet_matches_batch_loader(self, client, auth_headers, pedidos_asignados):
+        """The single-repartidor endpoint keeps returning that driver's sheet"""
+        response = client.post("/api/hoja-ruta/generar-pdf", headers=auth_headers, json={"repartidor": "Ana"})
+        assert response.status_code == 200
+        texto = PdfReader(io.BytesIO(response.content)).pages[0].extract_text()
+        assert "2 pedidos" in texto
+
+    def test_parallel_keeps_repartidor_order(self, monkeypatch):
+        """Sheets rendered in worker processes come back in request order"""
+        import pdf_utils
+        from benchmarks.fixtures import make_pedidos
+
+        monkeypatch.setattr(pdf_utils, "PDF_PARALLEL_WORKERS", 2)
+        pedidos, clientes = make_pedidos(30)
+        hojas = [(nombre, pedidos[i::3], clientes) for i, nombre in enumerate(["Ana", "Beto", "Carla"])]
+        pdfs = pdf_utils.generar_pdfs_hoja_ruta(hojas, "01/03/2026 08:00", parallel=True)
+        for (nombre, _, _), pdf_bytes in zip(hojas, pdfs):
+            assert nombre in PdfReader(io.BytesIO(pdf_bytes)).pages[0].extract_text()
@@ -0,0 +1,221 @@
+"""
+Tests for the durable idempotency store used by mutating endpoints.
+"""
+import asyncio
+import time
+import uuid
+
+import pytest
+from starlette.requests import Request
+
+import db
+import idempotency
+
+
+@pytest.fixture
+def store(temp_db):
+    """Fresh store on the per-test database"""
+    return idempotency.IdempotencyStore(ttl=3600, lru_size=16, lock_seconds=60)
+
+
+@pytest.fixture
+def pedido_payload(client, auth_headers):
+    cliente_id = client.post("/api/clientes", headers=auth_headers, json={"nombre": "Cliente Idem"}).json()["id"]
+    producto_id = client.post("/api/productos", headers=auth_headers, json={
+        "nombre": "Producto Idem", "precio": 10.0, "stock": 100
+    }).json()["id"]
+    return {
+        "cliente": {"id": cliente_id, "nombre": "Cliente Idem"},
+        "productos": [{"id": producto_id, "nombre": "Producto Idem", "precio": 10.0, "cantidad": 1, "tipo": "unidad"}]
+    }
+
+
+def _count_pedidos():
+    with db.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM pedidos")
+        return cursor.fetchone()[0]
+
+
+def _keyed_request(key):
+    return Request({
+        "type": "http", "method": "POST", "path": "/api/x", "query_string": b"",
+        "headers": [(b"x-idempotency-key", key.encode())],
+    })
+
+
+class TestIdempotencyStore:
+    """Test claim / complete / release semantics of the store"""
+
+    def test_claim_then_replay(self, store):
+        """Only the first claim executes; later ones get the stored response"""
+        assert store.claim("k1") == (idempotency.CLAIMED, None)
+        assert store.claim("k1") == (idempotency.IN_FLIGHT, None)
+        store.complete("k1", {"id": 7})
+        assert store.claim("k1") == (idempotency.DONE, {"id": 7})
+
+    def test_replay_survives_restart(self, store):
+        """Completed keys are read back from the table by another process/store"""
+        store.claim("k2")
+        store.complete("k2", {"id": 8})
+        other = idempotency.IdempotencyStore(ttl=3600, lru_size=16, lock_seconds=60)
+        assert other.claim("k2") == (idempotency.DONE, {"id": 8})
+
+    def test_release_allows_retry(self, store):
+        """A failed request gives the key back"""
+        store.claim("k3")
+        store.release("k3")
+        assert store.claim("k3") == (idempotency.CLAIMED, None)
+
+    def test_abandoned_claim_taken_over(self, temp_db):
+        """A claim whose lock expired (crashed worker) can be taken over"""
+        store = idempotency.IdempotencyStore(ttl=3600, lru_size=16, lock_seconds=0)
+        assert store.claim("k4")[0] == idempotency.CLAIMED
+        assert store.claim("k4")[0] == idempotency.CLAIMED
+
+    def test_sweep_removes_expired(self, store):
+        """The bucketed sweep deletes expired rows and memory entries"""
+        store.claim("k5")
+        store.complete("k5", {"id": 9})
+        removed = store.sweep(now=time.time() + 3600 + 120)
+        assert removed == 1
+        assert store.stats()["memory_entries"] == 0
+
+    def test_sweep_runs_once_per_bucket(self, store):
+        """Repeated sweeps inside the same bucket don't touch the table"""
+        later = time.time() + 600
+        store.sweep(now=later)
+        assert store.sweep(now=later + 1) == 0
+
+
+class TestIdempotentDecorator:
+    """Test in-flight locking of concurrent retries"""
+
+    def test_concurrent_retries_execute_once(self, temp_db):
+        """Two concurrent requests with one key run the endpoint once"""
+        calls = []
+
+        @idempotency.idempotent()
+        async def endpoint(request, current_user):
+            calls.append(1)
+            await asyncio.sleep(0.2)
+            return {"n": len(calls)}
+
+        def make_request():
+            return Request({
+                "type": "http", "method": "POST", "path": "/api/x", "query_string": b"",
+                "headers": [(b"x-idempotency-key", b"same-key")],
+            })
+
+        async def run():
+            return await asyncio.gather(
+                endpoint(request=make_request(), current_user={"username": "u"}),
+                endpoint(request=make_request(), current_user={"username": "u"}),
+            )
+
+        idempotency.get_idempotency_store().clear_memory()
+        first, second = asyncio.run(run())
+        assert calls == [1]
+        assert first == second == {"n": 1}
+
+    def test_long_request_keeps_its_claim(self, temp_db, monkeypatch):
+        """A request running past the lock time extends it; a retry waits instead of running again"""
+        store = idempotency.IdempotencyStore(ttl=3600, lru_size=16, lock_seconds=2)
+        monkeypatch.setattr(idempotency, "get_idempotency_store", lambda: store)
+        calls = []
+
+        @idempotency.idempotent()
+        async def endpoint(request, current_user):
+            calls.append(1)
+            await asyncio.sleep(2.5)
+            return {"n": len(calls)}
+
+        async def retry_later():
+            await asyncio.sleep(2.2)
+            return await endpoint(request=_keyed_request("slow-key"), current_user={"username": "u"})
+
+        async def run():
+            return await asyncio.gather(
+                endpoint(request=_keyed_request("slow-key"), current_user={"username": "u"}), retry_later()
+            )
+
+        assert asyncio.run(run()) == [{"n": 1}, {"n": 1}]
+        assert calls == [1]
+
+    def test_failed_complete_still_returns_result(self, temp_db, monkeypatch):
+        """The write happened: a failure storing its response is logged, not a 500; store calls run off the loop"""
+        import threading
+        store = idempotency.IdempotencyStore(ttl=3600, lru_size=16, lock_seconds=60)
+        monkeypatch.setattr(idempotency, "get_idempotency_store", lambda: store)
+        threads = []
+        claim = store.claim
+
+        def tracked_claim(key):
+            threads.append(threading.current_thread())
+            return claim(key)
+
+        def locked(key, response):
+            raise RuntimeError("database is locked")
+
+        monkeypatch.setattr(store, "claim", tracked_claim)
+        monkeypatch.setattr(store, "complete", locked)
+
+        @idempotency.idempotent()
+        async def endpoint(request, current_user):
+            return {"id": 1}
+
+        result = asyncio.run(endpoint(request=_keyed_request("locked-key"), current_user={"username": "u"}))
+        assert result == {"id": 1}
+        assert threads and threading.main_thread() not in threads
+
+
+class TestIdempotentEndpoints:
+    """Test idempotent replay on order and template endpoints"""
+
+    def test_crear_pedido_header_replay(self, client, auth_headers, pedido_payload):
+        """Same X-Idempotency-Key creates a single pedido"""
+        headers = {**auth_headers, "X-Idempotency-Key": str(uuid.uuid4())}
+        before = _count_pedidos()
+        first = client.post("/api/pedidos", headers=headers, json=pedido_payload)
+        second = client.post("/api/pedidos", headers=headers, json=pedido_payload)
+        assert first.status_code == second.status_code == 200
+        assert first.json()["id"] == second.json()["id"]
+        assert _count_pedidos() == before + 1
+
+    def test_crear_pedido_body_key_replay(self, client, auth_headers, pedido_payload):
+        """The idempotency_key body field works like the header"""
+        payload = {**pedido_payload, "idempotency_key": str(uuid.uuid4())}
+        first = client.post("/api/pedidos", headers=auth_headers, json=payload)
+        idempotency.get_idempotency_store().clear_memory()  # force the table path
+        second = client.post("/api/pedidos", headers=auth_headers, json=payload)
+        assert first.json()["id"] == second.json()["id"]
+
+    def test_failed_request_is_not_cached(self, client, auth_headers, pedido_payload):
+        """Errors release the key so the corrected retry runs"""
+        headers = {**auth_headers, "X-Idempotency-Key": str(uuid.uuid4())}
+        bad = client.post("/api/pedidos", headers=headers, json={**pedido_payload, "productos": []})
+        assert bad.status_code == 400
+        good = client.post("/api/pedidos", headers=headers, json=pedido_payload)
+        assert good.status_code == 200
+
+    def test_key_scoped_per_endpoint(self, client, auth_headers, pedido_payload):
+        """Reusing a key on another endpoint executes that endpoint"""
+        headers = {**auth_headers, "X-Idempotency-Key": str(uuid.uuid4())}
+        pedido_id = client.post("/api/pedidos", headers=headers, json=pedido_payload).json()["id"]
+        response = client.put(f"/api/pedidos/{pedido_id}/notas", headers=headers, json={"notas": "hola"})
+        assert response.json() == {"message": "Notas actualizadas"}
+
+    def test_template_ejecutar_replay(self, client, auth_headers, pedido_payload):
+        """Executing a template twice with one key creates one pedido"""
+        template_id = client.post("/api/templates", headers=auth_headers, json={
+            "nombre": "Semanal",
+            "cliente_id": pedido_payload["cliente"]["id"],
+            "productos": [{"producto_id": pedido_payload["productos"][0]["id"], "cantidad": 2}]
+        }).json()["id"]
+        headers = {**auth_headers, "X-Idempotency-Key": str(uuid.uuid4())}
+        before = _count_pedidos()
+        first = client.post(f"/api/templates/{template_id}/ejecutar", headers=headers)
+        second = client.post(f"/api/templates/{template_id}/ejecutar", headers=headers)
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json()
+        assert _count_pedidos() == before + 1
@@ -0,0 +1,77 @@
+"""
+Tests for the execution lanes.
+"""
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+import lanes
+from lanes import Lane, LaneFull, lane
+
+_request_var = contextvars.ContextVar("request_var", default=None)
+
+
+class TestLane:
+    """Test running calls on a lane"""
+
+    def test_runs_on_lane_thread_with_context(self):
+        """The call runs on the lane's threads and sees the caller's context variables"""
+        execution_lane = Lane("test", threads=1, max_queue=5)
+
+        def work():
+            return threading.current_thread().name, _request_var.get()
+
+        async def scenario():
+            _request_var.set("req-1")
+            return await execution_lane.run(work)
+
+        try:
+            name, value = asyncio.run(scenario())
+        finally:
+            execution_lane.shutdown()
+        assert name.startswith("lane-test") and value == "req-1"
+        assert execution_lane.stats() == {"threads": 1, "active": 0, "queued": 0, "completed": 1, "rejected": 0}
+
+    def test_full_queue_rejected(self):
+        """Calls beyond max_queue waiting calls raise LaneFull; the running call is unaffected"""
+        execution_lane = Lane("test", threads=1, max_queue=1)
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.ensure_future(execution_lane.run(release.wait))
+            waiting = asyncio.ensure_future(execution_lane.run(lambda: "done"))
+            while execution_lane.active == 0:
+                await asyncio.sleep(0.001)
+            with pytest.raises(LaneFull):
+                await execution_lane.run(lambda: "rejected")
+            release.set()
+            return await running, await waiting
+
+        try:
+            assert asyncio.run(scenario()) == (True, "done")
+        finally:
+            execution_lane.shutdown()
+        assert execution_lane.rejected == 1 and execution_lane.queued == 0
+
+
+class TestDecorator:
+    """Test @lane on endpoints"""
+
+    def test_rejects_async_functions(self):
+        with pytest.raises(TypeError):
+            @lane("reads")
+            async def endpoint():
+                return None
+
+    def test_endpoints_run_on_their_lane(self, client, auth_headers):
+        """Reports and list endpoints answer as before, from their lanes"""
+        from routers import pedidos, reportes
+        assert reportes.get_reporte_clientes.lane == "reports"
+        assert pedidos.get_pedidos.lane == "reads"
+        before = lanes.LANES["reports"].completed
+        assert client.get("/api/reportes/clientes", headers=auth_headers).status_code == 200
+        assert client.get("/api/pedidos", headers=auth_headers).status_code == 200
+        assert lanes.LANES["reports"].completed == before + 1
+        assert 'execution_lane{lane="orders",state="threads"} 4' in client.get("/metrics").text
@@ -0,0 +1,107 @@
+"""
+Tests for the background maintenance scheduler.
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+import maintenance
+from maintenance import CronSpec, MaintenanceScheduler
+
+
+def _ts(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestCronSpec:
+    """Test cron parsing and next run times (UTC)"""
+
+    @pytest.mark.parametrize("spec,after,expected", [
+        ("*/15 * * * *", (2026, 3, 1, 10, 7), (2026, 3, 1, 10, 15)),
+        ("*/15 * * * *", (2026, 3, 1, 10, 45), (2026, 3, 1, 11, 0)),
+        ("40 4 * * *", (2026, 3, 1, 4, 40), (2026, 3, 2, 4, 40)),
+        ("0 9-17/4 * * 1-5", (2026, 3, 6, 17, 30), (2026, 3, 9, 9, 0)),  # Friday evening -> Monday
+        ("0 0 1 * *", (2026, 12, 15, 0, 0), (2027, 1, 1, 0, 0)),
+        ("0 0 13 * 5", (2026, 3, 1, 0, 0), (2026, 3, 6, 0, 0)),  # day 13 OR Friday
+    ])
+    def test_next_after(self, spec, after, expected):
+        assert CronSpec(spec).next_after(_ts(*after)) == _ts(*expected)
+
+    @pytest.mark.parametrize("spec", ["* * * *", "60 * * * *", "0 0 30 2 *", "*/0 * * * *"])
+    def test_invalid(self, spec):
+        with pytest.raises(ValueError):
+            CronSpec(spec)
+
+
+class TestScheduler:
+    """Test leader election, running and history"""
+
+    def test_single_leader(self, tmp_path):
+        """Only one scheduler holds the lock; another takes over when it resigns"""
+        first = MaintenanceScheduler(lock_path=str(tmp_path / "m.lock"))
+        second = MaintenanceScheduler(lock_path=str(tmp_path / "m.lock"))
+        assert first.try_lead() and first.try_lead()
+        assert not second.try_lead()
+        first.resign()
+        assert second.try_lead() and second.is_leader
+        second.resign()
+
+    def test_runs_due_jobs_and_records(self, temp_db, tmp_path):
+        """Jobs run when due, with their outcome and duration in maintenance_runs"""
+        clock = FakeClock(_ts(2026, 3, 1, 10, 0))
+        scheduler = MaintenanceScheduler(lock_path=str(tmp_path / "m.lock"), clock=clock)
+        ran = []
+
+        @scheduler.job("quarter", "*/15 * * * *", jitter=0)
+        def quarter():
+            ran.append(clock.now)
+            return "3 rows"
+
+        @scheduler.job("broken", "0 * * * *", jitter=0)
+        def broken():
+            raise RuntimeError("disk full")
+
+        assert scheduler.run_pending() == []  # first look only schedules
+        clock.now = _ts(2026, 3, 1, 10, 15, 5)
+        assert scheduler.run_pending() == ["quarter"]
+        assert scheduler.jobs["quarter"].next_run == _ts(2026, 3, 1, 10, 30)
+        clock.now = _ts(2026, 3, 1, 11, 0, 1)
+        assert sorted(scheduler.run_pending()) == ["broken", "quarter"]
+
+        status = {job["job"]: job for job in scheduler.status()["jobs"]}
+        assert status["quarter"]["last_run"]["status"] == "ok"
+        assert status["quarter"]["last_run"]["detail"] == "3 rows"
+        assert status["quarter"]["last_run"]["started_at"] == "2026-03-01T11:00:01"
+        assert status["broken"]["last_run"]["status"] == "error"
+        assert status["broken"]["last_run"]["detail"] == "RuntimeError: disk full"
+        assert status["broken"]["last_success"] is None
+
+    def test_builtin_jobs(self, temp_db):
+        """The registered jobs run against the database"""
+        for name in ("cleanup_revoked_tokens", "idempotency_sweep", "sqlite_wal_checkpoint", "sqlite_wal_truncate",
+                     "sqlite_optimize", "sqlite_analyze", "prune_maintenance_history"):
+            assert maintenance.scheduler.run_job(name)["status"] == "ok", name
+
+
+class TestAdminEndpoint:
+    """Test GET /api/admin/maintenance"""
+
+    def test_status(self, client, admin_token):
+        maintenance.scheduler.run_job("cleanup_revoked_tokens")
+        response = client.get("/api/admin/maintenance", headers={"Authorization": f"Bearer {admin_token}"})
+        assert response.status_code == 200
+        jobs = {job["job"]: job for job in response.json()["jobs"]}
+        assert jobs["cleanup_revoked_tokens"]["spec"] == "17 * * * *"
+        assert jobs["cleanup_revoked_tokens"]["last_run"]["duration_ms"] >= 0
+
+    def test_admin_only(self, client, user_token):
+        response = client.get("/api/admin/maintenance", headers={"Authorization": f"Bearer {user_token}"})
+        assert response.status_code == 403
@@ -0,0 +1,129 @@
+"""
+Tests for the in-process metrics registry and the /metrics endpoint.
+"""
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+import metrics
+from metrics import Counter, Gauge, Histogram, Registry, render_text
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+class TestRegistry:
+    """Test metric types and text exposition"""
+
+    def test_histogram_exposition(self):
+        """Buckets are cumulative and end with +Inf, _sum and _count"""
+        registry = Registry()
+        hist = registry.register(Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            hist.observe(value, "/api/pedidos")
+        text = render_text(registry.collect_all(directory=""))
+        assert 'latency_seconds_bucket{route="/api/pedidos",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{route="/api/pedidos",le="1"} 3' in text
+        assert 'latency_seconds_bucket{route="/api/pedidos",le="+Inf"} 4' in text
+        assert 'latency_seconds_count{route="/api/pedidos"} 4' in text
+        assert 'latency_seconds_sum{route="/api/pedidos"} 4.05' in text
+        assert "# TYPE latency_seconds histogram" in text
+
+    def test_label_escaping(self):
+        """Label values are escaped"""
+        registry = Registry()
+        registry.register(Counter("hits_total", "Hits", ("path",))).inc('a"b\\c\n')
+        assert 'hits_total{path="a\\"b\\\\c\\n"} 1' in render_text(registry.collect_all(directory=""))
+
+    def test_callback_metrics(self):
+        """Callback metrics are computed at collection time"""
+        registry = Registry()
+        registry.register(Gauge("pool", "Pool", ("state",), callback=lambda: {("idle",): 3}))
+        assert 'pool{state="idle"} 3' in render_text(registry.collect_all(directory=""))
+
+    def test_multiprocess_merge(self, tmp_path):
+        """Files of all workers are merged: counters summed, gauges per live worker"""
+        registry = Registry()
+        counter = registry.register(Counter("requests_total", "Requests"))
+        gauge = registry.register(Gauge("lag_seconds", "Lag"))
+        hist = registry.register(Histogram("render_seconds", "Render", buckets=(1.0,)))
+        counter.inc(amount=2)
+        gauge.set(0.5)
+        hist.observe(0.5)
+
+        dead = _dead_pid()
+        other = registry.collect()
+        other["lag_seconds"]["samples"] = [[[], 9.0]]
+        (tmp_path / f"metrics_{dead}.json").write_text(json.dumps({"pid": dead, "metrics": other}))
+
+        text = render_text(registry.collect_all(directory=str(tmp_path)))
+        assert "requests_total 4" in text  # exited worker still counted
+        assert "render_seconds_count 2" in text
+        assert f'lag_seconds{{pid="{dead}"}}' not in text  # dead worker's gauge dropped
+        assert 'lag_seconds{pid="' in text and "0.5" in text
+
+
+class TestEventLoopMonitor:
+    """Test event loop lag measurement"""
+
+    def test_blocking_call_measured(self):
+        """A blocking call on the loop shows up as lag"""
+        async def scenario():
+            task = asyncio.create_task(metrics.monitor_event_loop(interval=0.01))
+            await asyncio.sleep(0.02)
+            time.sleep(0.1)  # blocks the loop
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        metrics.EVENT_LOOP_LAG_HISTOGRAM.clear()
+        asyncio.run(scenario())
+        (buckets, total, count), = metrics.EVENT_LOOP_LAG_HISTOGRAM.samples().values()
+        assert count >= 2 and total >= 0.05
+
+
+class TestMetricsEndpoint:
+    """Test GET /metrics"""
+
+    def test_request_and_db_metrics(self, client, auth_headers):
+        """Request latency per route template and DB histograms are exposed"""
+        client.get("/api/productos", headers=auth_headers)
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/productos",status="200"}' in text
+        assert 'db_query_duration_seconds_count{operation="select"}' in text
+        assert 'cache_hits_total{cache="query_fingerprint"}' in text
+
+    def test_unmatched_routes_share_label(self, client):
+        """Unknown paths don't create one series each"""
+        client.get("/no/existe/123")
+        assert 'route="<unmatched>",status="404"' in client.get("/metrics").text
+        assert "/no/existe/123" not in client.get("/metrics").text
+
+    def test_pdf_render_histogram(self, client):
+        """PDF generation time is recorded"""
+        from pdf_utils import generar_pdf_multiple
+        generar_pdf_multiple([], [], "01/01/2026")
+        assert 'pdf_render_duration_seconds_count{kind="lista"}' in client.get("/metrics").text
+
+    def test_token_required(self, client, monkeypatch):
+        """With METRICS_TOKEN set, scrapes must authenticate"""
+        monkeypatch.setattr(metrics, "METRICS_TOKEN", "s3cret")
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+    def test_production_requires_token(self, client, monkeypatch):
+        """Production never serves /metrics without a token"""
+        import main
+        monkeypatch.setattr(main, "ENVIRONMENT", "production")
+        monkeypatch.setattr(metrics, "METRICS_TOKEN", "")
+        assert client.get("/metrics").status_code == 404
+        monkeypatch.setattr(metrics, "METRICS_TOKEN", "s3cret")
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
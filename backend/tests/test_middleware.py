@@ -0,0 +1,105 @@
+"""
+Tests for the request tracking middleware (request IDs, timing, Server-Timing, security headers).
+"""
+import re
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from middleware import RequestTrackingMiddleware
+from serialization import TimedJSONResponse
+
+
+def _server_timing(response) -> dict:
+    """Parse Server-Timing into {metric: duration_ms}"""
+    metrics = {}
+    for part in response.headers["server-timing"].split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                metrics[name] = float(param[4:])
+    return metrics
+
+
+def _app(security_headers=False):
+    app = FastAPI(default_response_class=TimedJSONResponse)
+    app.add_middleware(RequestTrackingMiddleware, security_headers=security_headers)
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    @app.get("/items")
+    def items():
+        return [{"id": i, "nombre": f"Producto {i}"} for i in range(2000)]
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]), media_type="text/plain")
+
+    @app.get("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    return app
+
+
+class TestRequestTracking:
+    """Test request IDs and timing headers"""
+
+    def test_request_id_generated(self):
+        """Every response carries a fresh request ID"""
+        client = TestClient(_app())
+        first = client.get("/ping").headers["x-request-id"]
+        second = client.get("/ping").headers["x-request-id"]
+        assert len(first) == 8 and first != second
+
+    def test_incoming_request_id_kept(self):
+        """A valid client request ID is echoed back, an invalid one replaced"""
+        client = TestClient(_app())
+        assert client.get("/ping", headers={"X-Request-ID": "abc-123"}).headers["x-request-id"] == "abc-123"
+        replaced = client.get("/ping", headers={"X-Request-ID": "bad id\r\n"}).headers["x-request-id"]
+        assert replaced != "bad id" and len(replaced) == 8
+
+    def test_server_timing_metrics(self):
+        """Server-Timing reports total, db and serialization"""
+        response = TestClient(_app()).get("/items")
+        metrics = _server_timing(response)
+        assert set(metrics) == {"total", "db", "serialization"}
+        assert metrics["total"] >= metrics["serialization"] > 0
+        assert re.match(r"^\d+\.\d{2}ms$", response.headers["x-process-time"])
+
+    def test_streaming_body_untouched(self):
+        """Streaming responses pass through with the headers added"""
+        response = TestClient(_app()).get("/stream")
+        assert response.text == "abc"
+        assert "x-request-id" in response.headers
+
+    def test_security_headers_only_when_enabled(self):
+        """Security headers are added only in production mode"""
+        assert "x-frame-options" not in TestClient(_app()).get("/ping").headers
+        headers = TestClient(_app(security_headers=True)).get("/ping").headers
+        assert headers["x-frame-options"] == "DENY"
+        assert headers["strict-transport-security"].startswith("max-age=")
+
+    def test_errors_propagate(self):
+        """Unhandled errors still reach the server error handler"""
+        client = TestClient(_app(), raise_server_exceptions=False)
+        assert client.get("/boom").status_code == 500
+
+
+class TestAppMiddleware:
+    """Test the middleware as mounted in the application"""
+
+    def test_db_time_reported(self, client, auth_headers):
+        """Endpoints that query the database report db time and query count"""
+        response = client.get("/api/productos", headers=auth_headers)
+        assert response.status_code == 200
+        assert _server_timing(response)["db"] > 0
+        assert re.search(r'db;desc="[1-9]\d* queries"', response.headers["server-timing"])
+
+    def test_single_request_id(self, client):
+        """The app sets exactly one request ID header"""
+        response = client.get("/health", headers={"X-Request-ID": "req-42"})
+        assert response.headers.get_list("x-request-id") == ["req-42"]
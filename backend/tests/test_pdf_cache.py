@@ -0,0 +1,140 @@
+"""
+Tests for the content-addressed PDF render cache.
+"""
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader
+
+import pdf_cache
+import pdf_utils
+from benchmarks.fixtures import make_pedidos
+
+
+FECHA = "01/03/2026 08:00"
+
+
+def _page_texts(pdf_bytes):
+    return [page.extract_text() for page in PdfReader(BytesIO(pdf_bytes)).pages]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Fresh render cache used by pdf_utils for the duration of a test"""
+    instance = pdf_cache.RenderCache(str(tmp_path / "cache.sqlite"), max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(pdf_utils, "get_render_cache", lambda: instance)
+    return instance
+
+
+class TestRenderCache:
+    """Test storage, LRU eviction and hit-rate counters"""
+
+    def test_content_key_is_order_independent(self):
+        """Dict key order must not change the hash"""
+        assert pdf_cache.content_key("x", {"a": 1, "b": 2}) == pdf_cache.content_key("x", {"b": 2, "a": 1})
+        assert pdf_cache.content_key("x", {"a": 1}) != pdf_cache.content_key("y", {"a": 1})
+
+    def test_get_put_and_hit_rate(self, tmp_path):
+        """Stored fragments are returned and counted as hits"""
+        store = pdf_cache.RenderCache(str(tmp_path / "c.sqlite"), max_bytes=1024 * 1024)
+        store.put_many({"k1": b"uno", "k2": b"dos"})
+        assert store.get_many(["k1", "k2", "k3"]) == {"k1": b"uno", "k2": b"dos"}
+        stats = store.stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == pytest.approx(2 / 3, abs=1e-3)
+        assert stats["entries"] == 2
+
+    def test_lru_eviction_respects_size_cap(self, tmp_path):
+        """Least recently used entries are evicted first when over the cap"""
+        import os
+        store = pdf_cache.RenderCache(str(tmp_path / "c.sqlite"), max_bytes=3000)
+        blobs = {f"k{i}": os.urandom(1000) for i in range(3)}  # incompressible
+        store.put_many({"k0": blobs["k0"]})
+        store.put_many({"k1": blobs["k1"]})
+        store.get_many(["k0"])  # k0 is now more recent than k1
+        store.put_many({"k2": blobs["k2"]})
+        stats = store.stats()
+        assert stats["size_bytes"] <= 3000
+        assert stats["evictions"] >= 1
+        remaining = store.get_many(["k0", "k1", "k2"])
+        assert "k1" not in remaining
+        assert "k2" in remaining
+
+
+class TestCachedRendering:
+    """Cached fragments must render exactly like freshly drawn ones"""
+
+    def test_pedidos_reprint_hits_cache(self, cache):
+        """A re-print replays every pedido block and produces the same pages"""
+        pedidos, clientes = make_pedidos(40)
+        fresh = _page_texts(pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA, use_cache=False))
+        first = pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA)
+        assert cache.stats()["misses"] == 40
+        second = pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA)
+        assert cache.stats()["hits"] == 40
+        assert _page_texts(first) == fresh
+        assert _page_texts(second) == fresh
+
+    def test_incremental_batch_only_renders_changes(self, cache):
+        """Changing one pedido only misses that pedido"""
+        pedidos, clientes = make_pedidos(20)
+        pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA)
+        pedidos[5] = {**pedidos[5], "notas": "Nueva aclaración"}
+        pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA)
+        stats = cache.stats()
+        assert stats["hits"] == 19
+        assert stats["misses"] == 21
+
+    def test_hoja_ruta_reprint_keeps_entrega_numbers(self, cache):
+        """Cached delivery cards still get their running entrega number"""
+        pedidos, clientes = make_pedidos(30)
+        fresh = _page_texts(pdf_utils.generar_pdf_hoja_ruta(pedidos, clientes, "Juan", FECHA, use_cache=False))
+        pdf_utils.generar_pdf_hoja_ruta(pedidos, clientes, "Juan", FECHA)
+        cached = _page_texts(pdf_utils.generar_pdf_hoja_ruta(pedidos, clientes, "Juan", FECHA))
+        assert cache.stats()["hits"] == 30
+        assert cached == fresh
+        assert "#30" in "".join(cached)
+
+
+class TestReportLabInternals:
+    """The cache replays private ReportLab state: fail loudly when it changes"""
+
+    def test_pinned_reportlab_version(self):
+        """A ReportLab upgrade must re-check the internals below before bumping REPORTLAB_FRAGMENT_VERSION"""
+        import reportlab
+        assert reportlab.Version == pdf_utils.REPORTLAB_FRAGMENT_VERSION, (
+            f"ReportLab {reportlab.Version} installed: check Canvas._code, _formsinuse, _fontname "
+            "and _fontsize, then bump REPORTLAB_FRAGMENT_VERSION (the fragment cache is disabled until then)"
+        )
+        assert pdf_utils.FRAGMENT_CACHE_SUPPORTED
+
+    def test_canvas_private_attributes(self):
+        """Page operators, forms in use and the current font are where the cache reads them"""
+        import pdf_layout
+        pdf = pdf_utils._new_canvas(BytesIO())
+        assert isinstance(pdf._code, list) and isinstance(pdf._formsinuse, list)
+        start = len(pdf._code)
+        pdf.drawString(10, 10, "Hola")
+        assert pdf._code[start:] and all(isinstance(op, str) for op in pdf._code[start:])
+        pdf_layout.draw_form(pdf, "prueba", lambda c: c.rect(0, 0, 10, 10), bbox=(0, 0, 10, 10))
+        assert "prueba" in pdf._formsinuse
+        pdf.setFont("Helvetica-Bold", 9)
+        assert (pdf._fontname, pdf._fontsize) == ("Helvetica-Bold", 9)
+        assert pdf_layout._CANVAS_FONT_ATTRS
+
+    def test_fragment_keys_include_reportlab_version(self, monkeypatch):
+        """Fragments recorded by another ReportLab release are never replayed"""
+        import reportlab
+        pedido = make_pedidos(1)[0][0]
+        key = pdf_utils._pedido_fragment_key(pedido, {})
+        monkeypatch.setattr(reportlab, "Version", "9.9.9")
+        assert pdf_utils._pedido_fragment_key(pedido, {}) != key
+
+    def test_unsupported_reportlab_disables_cache(self, cache, monkeypatch):
+        """Without the expected internals documents are drawn from scratch"""
+        monkeypatch.setattr(pdf_utils, "FRAGMENT_CACHE_SUPPORTED", False)
+        pedidos, clientes = make_pedidos(10)
+        pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA)
+        pdf_utils.generar_pdf_hoja_ruta(pedidos, clientes, "Juan", FECHA)
+        assert cache.stats()["entries"] == 0 and cache.stats()["misses"] == 0
@@ -0,0 +1,147 @@
+"""
+Tests for PDF generation utilities.
+"""
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader
+
+import pdf_utils
+from benchmarks.fixtures import make_pedidos
+
+
+FECHA = "01/03/2026 08:00"
+
+
+def _page_texts(pdf_bytes):
+    return [page.extract_text() for page in PdfReader(BytesIO(pdf_bytes)).pages]
+
+
+class TestGenerarPdfMultiple:
+    """Test multi-pedido PDF pagination and rendering modes"""
+
+    def test_empty_pedidos(self):
+        """No pedidos should still produce a valid one-page PDF"""
+        texts = _page_texts(pdf_utils.generar_pdf_multiple([], [], FECHA))
+        assert len(texts) == 1
+        assert "No hay pedidos" in texts[0]
+
+    def test_page_count_matches_pagination(self):
+        """Rendered pages must match the first-pass page assignment"""
+        pedidos, clientes = make_pedidos(60)
+        pages = pdf_utils.paginar_pedidos(pedidos)
+        texts = _page_texts(pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA, parallel=False))
+        assert len(texts) == len(pages)
+        assert f"Página {len(pages)} de {len(pages)}" in texts[-1]
+
+    def test_parallel_matches_serial(self, monkeypatch):
+        """Parallel rendering keeps page order and global page numbering"""
+        monkeypatch.setattr(pdf_utils, "PDF_PARALLEL_WORKERS", 2)
+        pedidos, clientes = make_pedidos(120)
+        serial = _page_texts(pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA, parallel=False, use_cache=False))
+        parallel = _page_texts(pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA, parallel=True, use_cache=False))
+        assert len(parallel) == len(serial)
+        total = len(serial)
+        for num, (s_text, p_text) in enumerate(zip(serial, parallel), 1):
+            assert f"Página {num} de {total}" in p_text
+            assert s_text == p_text
+
+    def test_auto_mode_threshold(self, monkeypatch):
+        """Parallel mode is only picked automatically above the threshold"""
+        monkeypatch.setattr(pdf_utils, "PDF_PARALLEL_WORKERS", 4)
+        monkeypatch.setattr(pdf_utils, "PDF_PARALLEL_MIN_PEDIDOS", 100)
+        assert not pdf_utils._should_render_parallel(99, None)
+        assert pdf_utils._should_render_parallel(100, None)
+        assert not pdf_utils._should_render_parallel(1000, False)
+
+        monkeypatch.setattr(pdf_utils, "PDF_PARALLEL_MIN_PEDIDOS", 0)
+        assert not pdf_utils._should_render_parallel(1000, None)
+
+
+class TestLayoutPrimitives:
+    """Test shared Form XObjects and memoized measurements"""
+
+    def test_static_chrome_is_shared_form(self):
+        """Every page references the same header/pedido forms instead of redrawing them"""
+        pedidos, clientes = make_pedidos(60)
+        reader = PdfReader(BytesIO(
+            pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA, parallel=False, use_cache=False)
+        ))
+        assert len(reader.pages) > 1
+        for page in reader.pages:
+            xobjects = page["/Resources"]["/XObject"]
+            assert {"/FormXob.lista_header", "/FormXob.pedido_fondo"} <= set(xobjects.keys())
+        first = reader.pages[0]["/Resources"]["/XObject"]["/FormXob.pedido_fondo"].indirect_reference
+        last = reader.pages[-1]["/Resources"]["/XObject"]["/FormXob.pedido_fondo"].indirect_reference
+        assert first == last
+
+    def test_hoja_ruta_uses_forms(self):
+        """Route sheet header and card marks are forms; per-page text stays live"""
+        pedidos, clientes = make_pedidos(30)
+        pdf_bytes = pdf_utils.generar_pdf_hoja_ruta(pedidos, clientes, "Juan", FECHA, use_cache=False)
+        reader = PdfReader(BytesIO(pdf_bytes))
+        page = reader.pages[1]
+        assert {"/FormXob.hoja_ruta_header", "/FormXob.hoja_ruta_marcas"} <= set(page["/Resources"]["/XObject"].keys())
+        assert "Página 2" in page.extract_text()
+
+    def test_measure_pedido_matches_wrapping(self):
+        """Cached layout heights agree with the line wrapping used to draw"""
+        pedido = {"id": 1, "cliente_id": 1, "notas": "x " * 120, "productos": [
+            {"nombre": "Producto con un nombre bastante largo que ocupa varias lineas", "cantidad": 1, "precio": 10},
+        ]}
+        layout = pdf_utils.measure_pedido(pedido)
+        assert pdf_utils.measure_pedido(pedido).height == layout.height
+        assert len(layout.notas_lines) > 1
+        assert layout.height == pdf_utils.estimate_pedido_height(pedido)
+
+
+class TestPdfSpool:
+    """Test spooled PDF output and chunked streaming"""
+
+    def test_output_matches_bytes(self):
+        """Writing into a spool produces the same document as returning bytes"""
+        pedidos, clientes = make_pedidos(40)
+        expected = _page_texts(pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA, parallel=False, use_cache=False))
+        spool = pdf_utils.open_pdf_spool()
+        assert pdf_utils.generar_pdf_multiple(pedidos, clientes, FECHA, parallel=False, use_cache=False, output=spool) is None
+        data = b"".join(pdf_utils.iter_pdf_spool(spool, chunk_size=4096))
+        assert len(data) == pdf_utils.spool_size(spool)
+        assert _page_texts(data) == expected
+
+    def test_spool_spills_to_disk(self, monkeypatch):
+        """Documents above PDF_SPOOL_MAX_MB leave memory for a temp file"""
+        monkeypatch.setattr(pdf_utils, "PDF_SPOOL_MAX_MB", 0.01)
+        pedidos, clientes = make_pedidos(40)
+        spool = pdf_utils.open_pdf_spool()
+        pdf_utils.generar_pdf_hoja_ruta(pedidos, clientes, "Juan", FECHA, use_cache=False, output=spool)
+        assert spool._rolled
+        assert b"".join(pdf_utils.iter_pdf_spool(spool)).startswith(b"%PDF")
+        spool.close()
+
+
+class TestPdfEndpoints:
+    """Test PDF endpoints stream complete documents"""
+
+    def test_generar_pdfs_streams_pdf(self, client, auth_headers):
+        """/pedidos/generar_pdfs streams the whole document"""
+        cliente_id = client.post("/api/clientes", headers=auth_headers, json={"nombre": "Cliente PDF"}).json()["id"]
+        producto_id = client.post("/api/productos", headers=auth_headers, json={
+            "nombre": "Producto PDF", "precio": 100.0, "stock": 100
+        }).json()["id"]
+        pedido_id = client.post("/api/pedidos", headers=auth_headers, json={
+            "cliente": {"id": cliente_id, "nombre": "Cliente PDF"},
+            "productos": [{"id": producto_id, "nombre": "Producto PDF", "precio": 100.0, "cantidad": 2, "tipo": "unidad"}]
+        }).json()["id"]
+
+        response = client.post("/api/pedidos/generar_pdfs", headers=auth_headers, json={"pedido_ids": [pedido_id]})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.content.rstrip().endswith(b"%%EOF")
+        assert "Cliente PDF" in _page_texts(response.content)[0]
+
+    def test_hoja_ruta_empty_streams_pdf(self, client, auth_headers):
+        """/hoja-ruta/generar-pdf without pedidos still returns a valid PDF"""
+        response = client.post("/api/hoja-ruta/generar-pdf", headers=auth_headers, json={"repartidor": "Nadie"})
+        assert response.status_code == 200
+        assert "attachment; filename=hoja_ruta_Nadie.pdf" == response.headers["content-disposition"]
+        assert "No hay pedidos" in _page_texts(response.content)[0]
@@ -0,0 +1,130 @@
+"""
+Tests for the blocking PostgreSQL connection pool, on a fake driver.
+"""
+import threading
+import time
+
+import pytest
+
+from exceptions import safe_error_handler
+from pg_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Stands in for a psycopg2 connection"""
+    opened = 0
+
+    def __init__(self):
+        FakeConnection.opened += 1
+        self.number = FakeConnection.opened
+        self.closed = False
+        self.rollbacks = 0
+        self.broken = False
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _pool(clock=None, **kwargs):
+    def ping(con):
+        if con.broken:
+            raise OSError("server closed the connection unexpectedly")
+
+    options = {"minconn": 0, "maxconn": 1, "acquire_timeout": 5, "ping": ping}
+    options.update(kwargs)
+    if clock is not None:
+        options["clock"] = clock
+    return ConnectionPool(FakeConnection, **options)
+
+
+class TestWaiting:
+    """Test blocking checkout"""
+
+    def test_waiters_served_in_order(self):
+        """An exhausted pool queues callers and hands connections over FIFO"""
+        pool = _pool()
+        held = pool.getconn()
+        order = []
+
+        def worker(name):
+            con = pool.getconn()
+            order.append(name)
+            time.sleep(0.01)
+            pool.putconn(con)
+
+        threads = []
+        for name in ("first", "second", "third"):
+            thread = threading.Thread(target=worker, args=(name,))
+            thread.start()
+            threads.append(thread)
+            while pool.stats()["waiters"] < len(threads):
+                time.sleep(0.001)
+        pool.putconn(held)
+        for thread in threads:
+            thread.join(5)
+        assert order == ["first", "second", "third"]
+        assert pool.stats()["opened"] == 1
+
+    def test_timeout(self):
+        """No connection within the timeout: PoolTimeout, mapped to a 503"""
+        pool = _pool()
+        pool.getconn()
+        with pytest.raises(PoolTimeout) as exc_info:
+            pool.getconn(timeout=0.05)
+        assert pool.stats()["timeouts"] == 1 and pool.stats()["waiters"] == 0
+        assert safe_error_handler(exc_info.value, "test").status_code == 503
+
+
+class TestHealth:
+    """Test validation, recycling and leak detection"""
+
+    def test_preping_replaces_broken(self):
+        """A connection idle past ping_after is pinged and replaced if it fails"""
+        clock = FakeClock()
+        pool = _pool(clock, ping_after=30)
+        con = pool.getconn()
+        pool.putconn(con)
+        con.broken = True
+        clock.now += 10
+        assert pool.getconn() is con
+        pool.putconn(con)
+        clock.now += 31
+        replacement = pool.getconn()
+        assert replacement is not con and con.closed
+        assert pool.stats()["ping_failures"] == 1
+
+    def test_max_lifetime(self):
+        """Connections past max_lifetime are closed when returned"""
+        clock = FakeClock()
+        pool = _pool(clock, max_lifetime=60)
+        con = pool.getconn()
+        clock.now += 61
+        pool.putconn(con)
+        assert con.closed and pool.stats()["idle"] == 0
+        assert pool.getconn() is not con
+
+    def test_leaks_reported_and_closed_reclaimed(self):
+        """Long-held connections are reported with their call site; closed ones free their slot"""
+        clock = FakeClock()
+        pool = _pool(clock, maxconn=2, leak_after=60)
+        kept = pool.getconn()
+        closed = pool.getconn()
+        clock.now += 61
+        leaks = pool.check_leaks()
+        assert len(leaks) == 2 and "test_pg_pool.py" in leaks[0]["call_site"]
+        closed.close()
+        pool.check_leaks()
+        stats = pool.stats()
+        assert stats["in_use"] == 1 and stats["reclaimed"] == 1 and stats["leaks"] == 2
+        assert pool.getconn(timeout=0) is not kept
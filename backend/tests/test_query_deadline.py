@@ -0,0 +1,136 @@
+"""
+Tests for per-statement deadlines by route class.
+"""
+import contextvars
+
+import pytest
+
+import db
+import metrics
+import query_deadline
+from query_deadline import QueryTimeout, route_class
+
+RUNAWAY = """
+    WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c)
+    SELECT MAX(x) FROM (SELECT x FROM c LIMIT 1000000000)
+"""
+
+
+def _in_request(method, path, fn):
+    """Run fn with the deadline of a request, without leaking it into other tests"""
+    def run():
+        query_deadline.start_request(method, path)
+        return fn()
+    return contextvars.copy_context().run(run)
+
+
+class FakePgCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+
+class FakePgConnection:
+    def __init__(self):
+        self.statement_timeout_ms = None
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self, cursor_factory=None):
+        return FakePgCursor(self.statements)
+
+    def commit(self):
+        self.commits += 1
+
+
+class TestRouteClasses:
+    """Test request classification"""
+
+    def test_classes(self):
+        assert route_class("POST", "/api/pedidos") == "orders"
+        assert route_class("GET", "/api/pedidos") == "default"
+        assert route_class("GET", "/api/reportes/ventas") == "reports"
+        assert route_class("GET", "/api/pedidos/export/csv") == "reports"
+        assert route_class("POST", "/api/admin/backup") == "admin"
+        assert query_deadline.statement_timeout() is None
+
+
+class TestSQLite:
+    """Test the progress-handler deadline"""
+
+    def test_runaway_query_interrupted(self, temp_db, monkeypatch):
+        """A statement past its deadline raises QueryTimeout; the connection stays usable"""
+        monkeypatch.setitem(query_deadline.QUERY_TIMEOUTS_MS, "reports", 50)
+
+        def run():
+            with db.get_db_connection() as con:
+                cur = con.cursor()
+                with pytest.raises(QueryTimeout):
+                    cur.execute(RUNAWAY)
+                cur.execute("SELECT 1")
+                return cur.fetchone()[0]
+
+        assert _in_request("GET", "/api/reportes/clientes", run) == 1
+
+    def test_deadline_kept_while_fetching_explained_query(self, temp_db, monkeypatch):
+        """EXPLAIN of a slow statement does not lift its deadline for the rest of the fetch"""
+        import sqlite3
+        import query_stats
+        monkeypatch.setitem(query_deadline.QUERY_TIMEOUTS_MS, "reports", 50)
+        monkeypatch.setattr(query_stats, "SLOW_QUERY_MS", 0)
+
+        def run():
+            with db.get_db_connection() as con:
+                cur = con.cursor()
+                cur.execute("""
+                    WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c)
+                    SELECT x FROM c LIMIT 50000000
+                """)
+                assert con.deadline is not None
+                with pytest.raises(sqlite3.OperationalError, match="interrupted"):
+                    for _ in cur:
+                        pass
+
+        _in_request("GET", "/api/reportes/clientes", run)
+
+    def test_no_deadline_outside_requests(self, temp_db):
+        """Startup, migrations and jobs run without a deadline"""
+        with db.get_db_connection() as con:
+            con.execute("SELECT 1")
+            assert con.deadline is None
+
+    def test_endpoint_returns_503(self, client, auth_headers, monkeypatch):
+        """A report past its deadline is a 503 and is counted"""
+        monkeypatch.setitem(query_deadline.QUERY_TIMEOUTS_MS, "reports", 1e-6)
+        monkeypatch.setattr(query_deadline, "QUERY_PROGRESS_OPS", 1)
+        before = metrics.DB_QUERY_TIMEOUTS._values.get(("reports",), 0)
+        response = client.get("/api/reportes/clientes", headers=auth_headers)
+        assert response.status_code == 503
+        assert metrics.DB_QUERY_TIMEOUTS._values[("reports",)] > before
+
+
+class TestPostgres:
+    """Test statement_timeout on pooled connections"""
+
+    @pytest.fixture(autouse=True)
+    def _psycopg2(self, monkeypatch):
+        # db only imports psycopg2 with USE_POSTGRES
+        monkeypatch.setattr(db, "psycopg2", pytest.importorskip("psycopg2"), raising=False)
+
+    def test_set_only_when_changed(self):
+        """SET + COMMIT when the route class timeout differs from the connection's"""
+        con = FakePgConnection()
+        _in_request("POST", "/api/pedidos", lambda: db._apply_statement_timeout(con))
+        _in_request("PUT", "/api/pedidos/1", lambda: db._apply_statement_timeout(con))
+        assert con.statements == [("SET statement_timeout = %s", (2000,))] and con.commits == 1
+        db._apply_statement_timeout(con)
+        assert con.statements[-1] == ("SET statement_timeout = %s", (0,))
+        assert con.statement_timeout_ms == 0
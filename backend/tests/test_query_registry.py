@@ -0,0 +1,151 @@
+"""
+Tests for the schema-resolved query registry in db.py.
+"""
+import db
+from db import SchemaInfo, compile_query, get_query, run_query, run_query_ids
+
+
+def _schema(postgres, legacy=False):
+    schema = SchemaInfo.__new__(SchemaInfo)
+    schema.postgres = postgres
+    schema.columns = {
+        "pedidos": frozenset({"id", "id_cliente" if legacy else "cliente_id", "fecha", "creado_por", "estado"}),
+        "detalles_pedido": frozenset({"id", "pedido_id", "producto_id", "cantidad"} | (set() if legacy else {"tipo"})),
+        "productos": frozenset({"id", "nombre", "precio"}),
+        "clientes": frozenset({"id", "nombre"}),
+    }
+    schema.pedido_cliente = "id_cliente" if legacy else "cliente_id"
+    schema.detalle_pedido = "pedido_id"
+    schema.detalle_producto = "producto_id"
+    return schema
+
+
+class FakePgCursor:
+    """Records statements; stands in for a pooled psycopg2 cursor"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+
+class FakePgConnection:
+    def __init__(self):
+        self.prepared_statements = {}
+
+
+class TestCompile:
+    """Test statement compilation per dialect and schema"""
+
+    def test_sqlite_resolves_legacy_columns(self):
+        """Legacy column variants and missing optional columns are resolved at compile time"""
+        query = compile_query(_schema(False, legacy=True), "pedido_insert")
+        assert query.sql == "INSERT INTO pedidos (id_cliente, fecha, creado_por) VALUES (?, ?, ?)"
+        assert query.prepare_sql is None
+        detalle = compile_query(_schema(False, legacy=True), "detalle_insert")
+        assert "tipo" not in detalle.sql
+
+    def test_postgres_prepared(self):
+        """PostgreSQL gets %s placeholders, RETURNING id and a PREPARE/EXECUTE pair"""
+        query = compile_query(_schema(True), "pedido_insert")
+        assert query.sql == "INSERT INTO pedidos (cliente_id, fecha, creado_por) VALUES (%s, %s, %s) RETURNING id"
+        assert query.prepare_sql == (
+            "PREPARE q_pedido_insert AS INSERT INTO pedidos (cliente_id, fecha, creado_por) "
+            "VALUES ($1, $2, $3) RETURNING id"
+        )
+        assert query.execute_sql == "EXECUTE q_pedido_insert (%s, %s, %s)"
+
+    def test_variants_and_id_lists(self):
+        """Variants get their own prepared name; ID_LIST is an array or an IN list"""
+        listed = compile_query(_schema(True), "pedidos_list", ("pendiente", True, True))
+        assert listed.name == "q_pedidos_list_pendiente_True_True"
+        assert "(estado = %s OR estado IS NULL) AND creado_por = %s" in listed.sql
+        assert listed.sql.endswith("LIMIT %s OFFSET %s")
+        assert "dp.pedido_id = ANY(%s)" in compile_query(_schema(True), "pedidos_productos").sql
+        assert "dp.pedido_id IN (?, ?, ?, ?)" in compile_query(_schema(False), "pedidos_productos", id_count=4).sql
+
+    def test_placeholders_outside_literals_only(self):
+        """`?` inside string literals is kept and `%` is escaped for psycopg2"""
+        sql, count = db._convert_placeholders("SELECT '?' AS q, x LIKE 'a%' FROM t WHERE y = ?", numbered=False)
+        assert sql == "SELECT '?' AS q, x LIKE 'a%%' FROM t WHERE y = %s" and count == 1
+
+
+class TestCache:
+    """Test caching per schema version"""
+
+    def test_cached_until_schema_changes(self, temp_db):
+        """Lookups hit the cache; clear_column_cache() recompiles"""
+        with db.get_db_connection() as con:
+            cur = con.cursor()
+            first = get_query(cur, "pedido_insert")
+            assert get_query(cur, "pedido_insert") is first
+            db.clear_column_cache()
+            second = get_query(cur, "pedido_insert")
+        assert second is not first and second.version > first.version
+
+    def test_prepared_once_per_connection(self, monkeypatch):
+        """PREPARE runs once per connection and again (after DEALLOCATE) on a new schema version"""
+        monkeypatch.setattr(db, "_schema_info", _schema(True))
+        db._COMPILED_QUERIES.clear()
+        connection = FakePgConnection()
+        cur = FakePgCursor(connection)
+        run_query(cur, "producto_id_por_nombre", ("a",))
+        run_query(cur, "producto_id_por_nombre", ("b",))
+        assert cur.statements == [
+            "PREPARE q_producto_id_por_nombre AS SELECT id FROM productos WHERE nombre = $1 LIMIT 1",
+            "EXECUTE q_producto_id_por_nombre (%s)",
+            "EXECUTE q_producto_id_por_nombre (%s)",
+        ]
+        db.clear_column_cache()
+        monkeypatch.setattr(db, "_schema_info", _schema(True))
+        cur.statements.clear()
+        run_query(cur, "producto_id_por_nombre", ("c",))
+        assert cur.statements[:2] == [
+            "DEALLOCATE q_producto_id_por_nombre",
+            "PREPARE q_producto_id_por_nombre AS SELECT id FROM productos WHERE nombre = $1 LIMIT 1",
+        ]
+        db.clear_column_cache()
+
+
+class TestIdLists:
+    """Test ID_LIST execution on SQLite"""
+
+    def test_padded_in_lists(self, temp_db):
+        """Any number of ids runs on a power-of-two IN list and returns each row once"""
+        with db.get_db_transaction() as (con, cur):
+            cur.executemany("INSERT INTO productos (nombre, precio) VALUES (?, 1)", [(f"p{i}",) for i in range(10)])
+            cur.execute("INSERT INTO clientes (nombre) VALUES ('c')")
+            cur.executemany("INSERT INTO pedidos (cliente_id) VALUES (1)", [()] * 5)
+            cur.executemany("INSERT INTO detalles_pedido (pedido_id, producto_id, cantidad) VALUES (?, ?, 1)",
+                            [(p, p) for p in range(1, 6)])
+        with db.get_db_connection() as con:
+            cur = con.cursor()
+            run_query_ids(cur, "pedidos_productos", [1, 3, 5])
+            assert sorted(row["pedido_id"] for row in cur.fetchall()) == [1, 3, 5]
+            run_query_ids(cur, "pedidos_productos", [2])
+            assert [row["pedido_id"] for row in cur.fetchall()] == [2]
+        sizes = {key[2] for key in db._COMPILED_QUERIES if key[0] == "pedidos_productos"}
+        assert sizes == {4, 1}
+
+
+class TestPedidos:
+    """Test the pedidos functions on the compiled statements"""
+
+    def test_add_and_filter(self, temp_db):
+        """add_pedido + get_pedidos filters and pagination"""
+        with db.get_db_transaction() as (con, cur):
+            cur.execute("INSERT INTO clientes (nombre) VALUES ('Cliente')")
+            cur.execute("INSERT INTO productos (nombre, precio) VALUES ('Chorizo', 100)")
+        for i in range(3):
+            db.add_pedido({"cliente_id": 1, "productos": [{"nombre": "Chorizo", "cantidad": i + 1}]},
+                          creado_por="ana" if i else "beto")
+        with db.get_db_transaction() as (con, cur):
+            cur.execute("UPDATE pedidos SET estado = NULL WHERE id = 1")
+            cur.execute("UPDATE pedidos SET estado = 'entregado' WHERE id = 2")
+
+        assert [p["id"] for p in db.get_pedidos(estado="pendiente")] == [3, 1]
+        page = db.get_pedidos(page=2, limit=1, creado_por="ana")
+        assert page["total"] == 2 and [p["id"] for p in page["data"]] == [2]
+        assert page["data"][0]["productos"][0]["cantidad"] == 2
@@ -0,0 +1,142 @@
+"""
+Tests for query instrumentation (fingerprints, slow-query plans, N+1 detection).
+"""
+import pytest
+
+import db
+import query_stats
+from logging_config import request_timings_var, start_request_timings
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    query_stats.reset()
+    token = request_timings_var.set(None)
+    yield
+    request_timings_var.reset(token)
+    query_stats.reset()
+
+
+class TestFingerprint:
+    """Test statement normalization"""
+
+    def test_literals_and_in_lists_collapsed(self):
+        """Statements differing only in values share a fingerprint"""
+        a = query_stats.fingerprint("SELECT * FROM pedidos WHERE id IN (?, ?, ?) AND estado = 'pendiente'")
+        b = query_stats.fingerprint("SELECT *  FROM pedidos\n WHERE id IN (?) AND estado = 'entregado'")
+        assert a == b == "SELECT * FROM pedidos WHERE id IN (...) AND estado = ?"
+
+    def test_numbers_but_not_identifiers(self):
+        """Numeric literals are replaced, digits inside names are kept"""
+        assert query_stats.fingerprint("SELECT col1 FROM t2 LIMIT 50") == "SELECT col1 FROM t2 LIMIT ?"
+
+
+class TestRecordQuery:
+    """Test per-request counters and aggregates"""
+
+    def test_request_counters(self, temp_db):
+        """Queries through any cursor are counted on the current request"""
+        timings = start_request_timings()
+        with db.get_db_connection() as con:
+            cur = con.cursor()
+            cur.execute("SELECT COUNT(*) FROM productos")
+            db._execute(cur, "SELECT COUNT(*) FROM clientes")
+            con.execute("SELECT 1")
+        assert timings.db_queries >= 3
+        assert timings.db_seconds > 0
+        assert timings.query_counts["SELECT COUNT(*) FROM productos"] == 1
+
+    def test_slow_query_plan(self, temp_db, monkeypatch):
+        """Slow queries are aggregated with their EXPLAIN QUERY PLAN"""
+        monkeypatch.setattr(query_stats, "SLOW_QUERY_MS", 0)
+        with db.get_db_connection() as con:
+            con.execute("SELECT * FROM pedidos WHERE id = ?", (1,)).fetchall()
+        slow = query_stats.snapshot(limit=1000)["slow_queries"]
+        entry = next(q for q in slow if q["fingerprint"] == "SELECT * FROM pedidos WHERE id = ?")
+        assert entry["slow_count"] == 1
+        assert "pedidos" in entry["plan"]
+
+    def test_prepared_statement_explained(self, monkeypatch):
+        """EXECUTE of a registry statement gets an EXPLAIN EXECUTE plan"""
+        monkeypatch.setattr(query_stats, "SLOW_QUERY_MS", 0)
+        explained = []
+        query_stats.record_query("EXECUTE q_get_pedido (%s)", 0.2, lambda: explained.append(1) or "Index Scan")
+        assert explained == [1]
+        entry = query_stats.snapshot(limit=1000)["slow_queries"][0]
+        assert entry["plan"] == "Index Scan"
+
+    def test_pg_explain_failure_keeps_transaction(self, monkeypatch):
+        """A failing EXPLAIN is rolled back to a savepoint, so the request's transaction stays usable"""
+        monkeypatch.setattr(db, "psycopg2", pytest.importorskip("psycopg2"), raising=False)
+        statements = []
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                statements.append(sql)
+                if sql.startswith("EXPLAIN"):
+                    raise RuntimeError("cannot EXPLAIN")
+
+        class Connection:
+            def cursor(self, cursor_factory=None):
+                return Cursor()
+
+        with pytest.raises(RuntimeError):
+            db._explain_pg(Connection(), "EXECUTE q_x (%s)", (1,))
+        assert statements == [
+            "SAVEPOINT query_stats_explain", "EXPLAIN EXECUTE q_x (%s)", "ROLLBACK TO SAVEPOINT query_stats_explain",
+        ]
+
+    def test_failed_query_recorded(self, temp_db):
+        """A failing statement is still counted"""
+        with db.get_db_connection() as con:
+            with pytest.raises(Exception):
+                con.execute("SELECT * FROM tabla_inexistente")
+        fps = [q["fingerprint"] for q in query_stats.snapshot(limit=1000)["top_queries"]]
+        assert "SELECT * FROM tabla_inexistente" in fps
+
+
+class TestNPlusOne:
+    """Test repeated-fingerprint detection"""
+
+    def test_repeated_query_flagged(self, temp_db):
+        """A statement executed in a loop is reported for the route"""
+        timings = start_request_timings()
+        with db.get_db_connection() as con:
+            for i in range(query_stats.N_PLUS_ONE_THRESHOLD):
+                con.execute("SELECT * FROM clientes WHERE id = ?", (i,)).fetchall()
+        suspects = query_stats.finish_request("/api/test", timings)
+        assert suspects == [{
+            "fingerprint": "SELECT * FROM clientes WHERE id = ?",
+            "count": query_stats.N_PLUS_ONE_THRESHOLD,
+        }]
+        assert query_stats.snapshot()["n_plus_one"][0]["route"] == "/api/test"
+
+    def test_batched_query_not_flagged(self, temp_db):
+        """A few distinct queries are not an N+1"""
+        timings = start_request_timings()
+        with db.get_db_connection() as con:
+            con.execute("SELECT * FROM clientes WHERE id IN (?, ?, ?)", (1, 2, 3)).fetchall()
+        assert query_stats.finish_request("/api/test", timings) == []
+
+
+class TestQueryStatsEndpoint:
+    """Test the admin endpoint"""
+
+    def test_stats_and_reset(self, client, auth_headers):
+        """Admins see aggregates from previous requests and can reset them"""
+        client.get("/api/productos", headers=auth_headers)
+        response = client.get("/api/admin/query-stats", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_queries"] > 0 and data["top_queries"]
+        assert client.delete("/api/admin/query-stats", headers=auth_headers).json()["success"]
+
+    def test_requires_admin(self, client, user_headers):
+        """Non-admins are rejected"""
+        assert client.get("/api/admin/query-stats", headers=user_headers).status_code == 403
@@ -0,0 +1,82 @@
+"""
+Tests for the shared (cross-worker) rate limit storage and key function.
+"""
+import pytest
+from limits import parse
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter
+from starlette.requests import Request
+
+import deps
+from rate_limit_storage import SharedSQLiteStorage
+
+
+@pytest.fixture
+def uri(tmp_path):
+    return "sqlite://" + str(tmp_path / "limits.sqlite")
+
+
+def _request(headers=None, client=("10.0.0.1", 1234)):
+    return Request({
+        "type": "http", "method": "GET", "path": "/", "query_string": b"", "client": client,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    })
+
+
+class TestSharedSQLiteStorage:
+    """Test counters shared between workers through the SQLite file"""
+
+    def test_limit_shared_across_workers(self, uri):
+        """Two workers together cannot exceed one limit"""
+        item = parse("5/minute")
+        workers = [SlidingWindowCounterRateLimiter(SharedSQLiteStorage(uri, flush_interval=0)) for _ in range(2)]
+        allowed = [workers[i % 2].hit(item, "user:ana") for i in range(10)]
+        assert allowed.count(True) == 5
+        assert allowed[:5] == [True] * 5
+
+    def test_increments_batched_until_flush(self, uri):
+        """Hits stay local until the flush interval, then become visible"""
+        a = SharedSQLiteStorage(uri, flush_interval=3600)
+        b = SharedSQLiteStorage(uri, flush_interval=3600)
+        a.flush()  # starts a's interval
+        for _ in range(3):
+            a.incr("k", 60)
+        assert a.get("k") == 3
+        b.flush()
+        assert b.get("k") == 0
+        a.flush()
+        b.flush()
+        assert b.get("k") == 3
+        b.incr("k", 60)
+        b.flush()
+        a.flush()
+        assert a.get("k") == 4
+
+    def test_fixed_window_strategy(self, uri):
+        """The fixed-window strategy works on the same storage"""
+        limiter = FixedWindowRateLimiter(SharedSQLiteStorage(uri, flush_interval=0))
+        item = parse("2/minute")
+        assert [limiter.hit(item, "ip:1") for _ in range(3)] == [True, True, False]
+
+    def test_clear_and_reset(self, uri):
+        """clear drops one key everywhere; reset drops all"""
+        storage = SharedSQLiteStorage(uri, flush_interval=0)
+        storage.incr("a", 60)
+        storage.incr("b", 60)
+        storage.clear("a")
+        assert storage.get("a") == 0 and storage.get("b") == 1
+        storage.reset()
+        assert SharedSQLiteStorage(uri, flush_interval=0).get("b") == 0
+
+
+class TestRateLimitKey:
+    """Test limits are keyed by user when authenticated, by IP otherwise"""
+
+    def test_authenticated_user(self):
+        token = deps.create_access_token({"sub": "ana", "rol": "admin"})
+        assert deps.rate_limit_key(_request({"Authorization": f"Bearer {token}"})) == "user:ana"
+
+    def test_anonymous_uses_ip(self):
+        assert deps.rate_limit_key(_request()) == "ip:10.0.0.1"
+
+    def test_forged_token_uses_ip(self):
+        assert deps.rate_limit_key(_request({"Authorization": "Bearer not.a.token"})) == "ip:10.0.0.1"
@@ -0,0 +1,81 @@
+"""
+Tests for the compact Record rows returned by db.fetchall_records.
+"""
+import json
+import sys
+
+import pytest
+
+import db
+from db import Record, _record_type, fetchall_records
+from serialization import dumps
+
+
+class TestRecord:
+    """Test the dict-like row type"""
+
+    def test_reads_like_a_dict(self):
+        """Name, position, get, membership, iteration and dict() conversion"""
+        row = _record_type(("id", "nombre", "precio"))((1, "Chorizo", 100.0))
+        assert row["nombre"] == "Chorizo" and row[2] == 100.0
+        assert row.get("stock") is None and row.get("stock", 0) == 0
+        assert "precio" in row and "Chorizo" not in row
+        assert list(row) == ["id", "nombre", "precio"] and len(row) == 3
+        assert dict(row) == row.to_dict() == {"id": 1, "nombre": "Chorizo", "precio": 100.0}
+        assert row == {"id": 1, "nombre": "Chorizo", "precio": 100.0}
+        with pytest.raises(KeyError):
+            row["stock"]
+
+    def test_compact_and_read_only(self):
+        """No per-row __dict__; the column map is shared per column list"""
+        record = _record_type(("id", "nombre"))
+        assert record is _record_type(("id", "nombre")) and issubclass(record, Record)
+        row = record((1, "a"))
+        assert not hasattr(row, "__dict__")
+        with pytest.raises(TypeError):
+            row["nombre"] = "b"
+        assert sys.getsizeof(row) < sys.getsizeof({"id": 1, "nombre": "a"})
+
+    def test_json(self):
+        """Records serialize as objects"""
+        row = _record_type(("id", "nombre"))((1, "Ñandú"))
+        assert json.loads(dumps({"rows": [row]})) == {"rows": [{"id": 1, "nombre": "Ñandú"}]}
+
+
+class TestFetch:
+    """Test the fetch helpers and the read paths using them"""
+
+    def test_fetchall_keeps_cursor_row_factory(self, temp_db):
+        """Rows come as Records; later fetches on the cursor still get sqlite3.Row"""
+        with db.get_db_connection() as con:
+            cur = con.cursor()
+            cur.execute("SELECT 1 AS id, 'a' AS nombre UNION ALL SELECT 2, 'b'")
+            rows = fetchall_records(cur)
+            assert [r["nombre"] for r in rows] == ["a", "b"]
+            cur.execute("SELECT 1 AS id")
+            assert cur.fetchone()["id"] == 1
+            cur.execute("SELECT 1 AS id WHERE 0")
+            assert fetchall_records(cur) == []
+
+    def test_catalog_with_list_prices(self, temp_db):
+        """get_productos_con_precios_lista appends precio_final and en_lista to each row"""
+        with db.get_db_transaction() as (con, cur):
+            cur.execute("INSERT INTO productos (nombre, precio) VALUES ('A', 100), ('B', 200)")
+            cur.execute("INSERT INTO listas_precios (nombre, multiplicador) VALUES ('Mayorista', 0.5)")
+            cur.execute("INSERT INTO precios_lista (lista_id, producto_id, precio_especial) VALUES (1, 2, 150)")
+            cur.execute("INSERT INTO clientes (nombre, lista_precio_id) VALUES ('C', 1)")
+        productos = db.get_productos_con_precios_lista(cliente_id=1)
+        assert [(p["nombre"], p["precio_final"], p["en_lista"]) for p in productos] == [
+            ("A", 50.0, False), ("B", 150, True),
+        ]
+        assert db.get_productos_con_precios_lista()[0]["precio_final"] == 100
+
+    def test_reporte_clientes(self, client, auth_headers):
+        """The clients report keeps its JSON shape"""
+        client.post("/api/clientes", json={"nombre": "Cliente Uno"}, headers=auth_headers)
+        body = client.get("/api/reportes/clientes", headers=auth_headers).json()
+        assert body["resumen"]["total_clientes"] == 1
+        assert body["clientes"][0] == {
+            "id": body["clientes"][0]["id"], "nombre": "Cliente Uno", "telefono": None, "direccion": None,
+            "total_pedidos": 0, "total_gastado": 0, "ultimo_pedido": None,
+        }
@@ -0,0 +1,78 @@
+"""
+Tests for the fast JSON response path.
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from serialization import ResponseSerializer, dumps, rows_response
+
+
+class Item(BaseModel):
+    id: int
+    nombre: str
+    color: Optional[str] = "#6366f1"
+
+
+class TestDumps:
+    """Test the encoder output"""
+
+    def test_compact_utf8(self):
+        """Same compact, non-ASCII-escaped output as Starlette's JSONResponse"""
+        content = {"nombre": "Lácteos ñandú", "items": [1, 2.5, None, True]}
+        expected = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        assert dumps(content) == expected
+
+    def test_extra_types(self):
+        """Decimal (PostgreSQL NUMERIC), datetimes, models and int keys"""
+        content = {
+            1: Decimal("10"), "precio": Decimal("12.50"),
+            "fecha": datetime(2026, 3, 2, 9, 30), "item": Item(id=1, nombre="a"),
+        }
+        assert json.loads(dumps(content)) == {
+            "1": 10, "precio": 12.5, "fecha": "2026-03-02T09:30:00",
+            "item": {"id": 1, "nombre": "a", "color": "#6366f1"},
+        }
+
+
+class TestResponses:
+    """Test the response helpers"""
+
+    def test_rows_response(self):
+        """Row tuples become objects keyed by column"""
+        response = rows_response(("id", "nombre"), [(1, "a"), (2, "b")])
+        assert response.media_type == "application/json"
+        assert json.loads(response.body) == [{"id": 1, "nombre": "a"}, {"id": 2, "nombre": "b"}]
+
+    def test_serializer_matches_response_model(self):
+        """Extra keys dropped and defaults applied, like response_model"""
+        serializer = ResponseSerializer(List[Item])
+        response = serializer([{"id": 1, "nombre": "a", "fecha_creacion": "x"}, Item(id=2, nombre="b", color=None)])
+        assert json.loads(response.body) == [
+            {"id": 1, "nombre": "a", "color": "#6366f1"},
+            {"id": 2, "nombre": "b", "color": None},
+        ]
+
+    def test_serializer_rejects_invalid(self):
+        """Invalid content fails instead of producing a malformed response"""
+        with pytest.raises(ValidationError):
+            ResponseSerializer(List[Item])([{"id": "not-a-number", "nombre": "a"}])
+
+    def test_list_endpoints(self, client, auth_headers):
+        """List endpoints keep their JSON shape"""
+        client.post("/api/clientes", json={"nombre": "Cliente Uno"}, headers=auth_headers)
+        client.post("/api/productos", json={"nombre": "Chorizo", "precio": 100}, headers=auth_headers)
+        client.post("/api/categorias", json={"nombre": "Embutidos"}, headers=auth_headers)
+
+        clientes = client.get("/api/clientes", headers=auth_headers).json()
+        assert set(clientes[0]) == {"id", "nombre", "telefono", "direccion", "zona", "vendedor_id", "vendedor_nombre"}
+        productos = client.get("/api/productos?lite=true", headers=auth_headers).json()
+        assert productos[0]["nombre"] == "Chorizo" and productos[0]["imagen_url"] is None
+        categorias = client.get("/api/categorias", headers=auth_headers).json()
+        assert set(categorias[0]) == {"id", "nombre", "descripcion", "color", "orden", "activa"}
+        cliente = client.get(f"/api/clientes/{clientes[0]['id']}", headers=auth_headers).json()
+        assert cliente == clientes[0]
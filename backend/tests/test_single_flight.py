@@ -0,0 +1,132 @@
+"""
+Tests for request coalescing (single flight).
+"""
+import asyncio
+
+import pytest
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+
+import metrics
+from single_flight import single_flight
+
+ADMIN = {"username": "admin", "rol": "admin"}
+VENDEDOR = {"username": "ana", "rol": "vendedor"}
+
+
+def _endpoint(scope="role", result=None):
+    """A coalescing endpoint that blocks until released, counting executions"""
+    calls = []
+    release = asyncio.Event()
+
+    @single_flight(scope)
+    async def endpoint(desde: str = None, limit: int = 10, current_user: dict = None):
+        calls.append((desde, limit))
+        await release.wait()
+        return result if result is not None else {"desde": desde, "calls": len(calls)}
+
+    return endpoint, calls, release
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestCoalescing:
+    """Test which concurrent calls share one execution"""
+
+    def test_identical_calls_share_one_execution(self):
+        """Defaults applied: positional, keyword and omitted defaults are the same request"""
+        async def scenario():
+            endpoint, calls, release = _endpoint()
+            tasks = [
+                asyncio.ensure_future(endpoint("2026-01-01", current_user=ADMIN)),
+                asyncio.ensure_future(endpoint(desde="2026-01-01", limit=10, current_user=ADMIN)),
+                asyncio.ensure_future(endpoint(current_user=ADMIN, desde="2026-01-01")),
+            ]
+            await _settle()
+            release.set()
+            results = await asyncio.gather(*tasks)
+            return calls, results, endpoint.in_flight
+
+        before = metrics.SINGLE_FLIGHT_REQUESTS._values.get(("endpoint", "coalesced"), 0)
+        calls, results, in_flight = asyncio.run(scenario())
+        assert len(calls) == 1 and all(r == {"desde": "2026-01-01", "calls": 1} for r in results)
+        assert in_flight == {}
+        assert metrics.SINGLE_FLIGHT_REQUESTS._values[("endpoint", "coalesced")] == before + 2
+
+    @pytest.mark.parametrize("scope,users,executions", [
+        ("role", [ADMIN, VENDEDOR, {"username": "otro", "rol": "vendedor"}], 2),
+        ("user", [VENDEDOR, {"username": "otro", "rol": "vendedor"}], 2),
+        ("global", [ADMIN, VENDEDOR], 1),
+    ])
+    def test_scopes(self, scope, users, executions):
+        async def scenario():
+            endpoint, calls, release = _endpoint(scope)
+            tasks = [asyncio.ensure_future(endpoint(current_user=user)) for user in users]
+            await _settle()
+            release.set()
+            await asyncio.gather(*tasks)
+            return calls
+
+        assert len(asyncio.run(scenario())) == executions
+
+    def test_different_params_not_coalesced(self):
+        async def scenario():
+            endpoint, calls, release = _endpoint()
+            tasks = [asyncio.ensure_future(endpoint(limit=n, current_user=ADMIN)) for n in (10, 20)]
+            await _settle()
+            release.set()
+            await asyncio.gather(*tasks)
+            return calls
+
+        assert asyncio.run(scenario()) == [(None, 10), (None, 20)]
+
+    def test_leader_cancelled_followers_served(self):
+        """A leader whose client went away does not cancel the shared execution"""
+        async def scenario():
+            endpoint, calls, release = _endpoint()
+            leader = asyncio.ensure_future(endpoint(current_user=ADMIN))
+            follower = asyncio.ensure_future(endpoint(current_user=ADMIN))
+            await _settle()
+            leader.cancel()
+            await _settle()
+            release.set()
+            return leader.cancelled(), await follower
+
+        cancelled, result = asyncio.run(scenario())
+        assert cancelled and result == {"desde": None, "calls": 1}
+
+    def test_responses_copied_per_request(self):
+        """Headers added to one request's response do not leak into the others"""
+        async def scenario():
+            endpoint, calls, release = _endpoint(result=JSONResponse({"ok": True}))
+            tasks = [asyncio.ensure_future(endpoint(current_user=ADMIN)) for _ in range(2)]
+            await _settle()
+            release.set()
+            return await asyncio.gather(*tasks)
+
+        first, second = asyncio.run(scenario())
+        MutableHeaders(raw=first.raw_headers)["content-encoding"] = "gzip"
+        assert first is not second and "content-encoding" not in second.headers
+        assert second.body == b'{"ok":true}'
+
+    def test_sync_functions_rejected(self):
+        with pytest.raises(TypeError):
+            @single_flight()
+            def endpoint():
+                return None
+
+
+class TestEndpoints:
+    """Test coalescing on the real routes"""
+
+    def test_productos(self, client, auth_headers):
+        from routers import productos
+        assert productos.get_productos.single_flight == "role"
+        before = metrics.SINGLE_FLIGHT_REQUESTS._values.get(("get_productos", "leader"), 0)
+        response = client.get("/api/productos?lite=true", headers=auth_headers)
+        assert response.status_code == 200 and isinstance(response.json(), list)
+        assert metrics.SINGLE_FLIGHT_REQUESTS._values[("get_productos", "leader")] == before + 1
+        assert productos.get_productos.in_flight == {}
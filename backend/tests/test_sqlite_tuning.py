@@ -0,0 +1,78 @@
+"""
+Tests for the SQLite storage tuning profile, checkpoints and stats.
+"""
+import db
+import sqlite_tuning
+
+
+def _fill_wal(rows=2000):
+    """
+    Commit enough data in WAL mode to leave a non-empty WAL file. Returns an
+    open connection: closing the last one checkpoints and removes the WAL.
+    """
+    holder = db.conectar()
+    holder.execute("PRAGMA journal_mode=WAL")
+    holder.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    with db.get_db_connection() as con:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA wal_autocheckpoint=0")  # this connection never checkpoints on its own
+        con.execute("CREATE TABLE IF NOT EXISTS tuning_blob (data BLOB)")
+        con.executemany("INSERT INTO tuning_blob VALUES (?)", [(b"x" * 500,) for _ in range(rows)])
+        con.commit()
+    return holder
+
+
+class TestProfile:
+    """Test the per-connection PRAGMA profile"""
+
+    def test_applied_to_every_connection(self, temp_db):
+        with db.get_db_connection() as con:
+            pragma = lambda name: con.execute(f"PRAGMA {name}").fetchone()[0]
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("temp_store") == 2  # MEMORY
+            assert pragma("cache_size") == -sqlite_tuning.SQLITE_CACHE_SIZE_KB
+            assert pragma("journal_size_limit") == sqlite_tuning.SQLITE_JOURNAL_SIZE_LIMIT_MB * 1024 * 1024
+            assert pragma("foreign_keys") == 1
+
+
+class TestCheckpoint:
+    """Test WAL checkpoints"""
+
+    def test_threshold_and_truncate(self, temp_db):
+        """Below the threshold nothing happens; TRUNCATE empties the WAL"""
+        holder = _fill_wal()
+        wal = sqlite_tuning.wal_size(db.DB_PATH)
+        assert wal > 0
+        with db.get_db_connection() as con:
+            skipped = sqlite_tuning.checkpoint(con, db.DB_PATH, threshold_bytes=wal + 1)
+            assert skipped["skipped"] and skipped["wal_bytes"] == wal
+            result = sqlite_tuning.checkpoint(con, db.DB_PATH, mode="TRUNCATE", threshold_bytes=wal)
+        assert not result["skipped"] and result["wal_bytes_before"] == wal
+        holder.close()
+        assert result["wal_bytes"] == 0 and not result["busy"]
+
+
+class TestStats:
+    """Test storage and page cache stats"""
+
+    def test_fragmentation(self, temp_db):
+        """Deleted pages show up as freelist, in the PRAGMAs and in the file header"""
+        holder = _fill_wal()
+        with db.get_db_connection() as con:
+            con.execute("DELETE FROM tuning_blob")
+            con.commit()
+            sqlite_tuning.checkpoint(con, db.DB_PATH, mode="TRUNCATE")
+            stats = sqlite_tuning.storage_stats(con, db.DB_PATH)
+        holder.close()
+        assert stats["freelist_pages"] > 0 and 0 < stats["fragmentation"] < 1
+        assert stats["profile"]["temp_store"] == 2
+        header = sqlite_tuning.header_stats(db.DB_PATH)
+        assert header["freelist_bytes"] == stats["freelist_pages"] * stats["page_size"]
+        assert header["db_bytes"] == stats["db_bytes"]
+
+    def test_admin_endpoint(self, client, admin_token):
+        response = client.get("/api/admin/sqlite-storage", headers={"Authorization": f"Bearer {admin_token}"})
+        body = response.json()
+        assert response.status_code == 200 and body["enabled"]
+        assert body["profile"]["synchronous"] == 1 and "wal_bytes" in body
+        assert body["page_cache"] == {"available": False, "hit_ratio": None}
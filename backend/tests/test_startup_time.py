@@ -0,0 +1,79 @@
+"""
+Startup time budget of the API process.
+
+Imports `main` in a fresh interpreter with `python -X importtime` and checks
+that the heavy optional dependencies are imported on first use only and that
+importing the application stays within IMPORT_TIME_BUDGET_MS.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous for slow CI machines (about 1.3s on a developer laptop); the
+# lazy-import check below is the strict part
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2500"))
+
+# Only needed by PDFs, uploads, PostgreSQL, Sentry or Excel exports
+LAZY_MODULES = ("reportlab", "pypdf", "PIL", "psycopg2", "sentry_sdk", "openpyxl", "pdf_utils", "pdf_layout")
+
+
+def _import_times(tmp_path) -> dict:
+    """Cumulative import time in microseconds of every module imported by `import main`"""
+    env = {
+        **os.environ,
+        "ENVIRONMENT": "test",
+        "USE_POSTGRES": "false",
+        "SENTRY_DSN": "",
+        "DB_PATH": str(tmp_path / "startup.db"),
+    }
+    for name in ("METRICS_MULTIPROC_DIR", "PYTHONDONTWRITEBYTECODE"):
+        env.pop(name, None)
+    times = {}
+    # The first run writes the bytecode caches; the second is what a restart costs
+    for _ in range(2):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120,
+        )
+        assert result.returncode == 0, result.stderr[-2000:]
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.fixture(scope="module")
+def import_times(tmp_path_factory):
+    return _import_times(tmp_path_factory.mktemp("startup"))
+
+
+class TestStartupTime:
+    """Test what importing the application costs"""
+
+    def test_heavy_dependencies_are_lazy(self, import_times):
+        """Registering the routers does not import ReportLab, PIL, psycopg2, Sentry..."""
+        imported = sorted(
+            name for name in import_times
+            if name.split(".")[0] in LAZY_MODULES
+        )
+        assert imported == []
+
+    def test_import_time_budget(self, import_times):
+        """`import main` stays within IMPORT_TIME_BUDGET_MS"""
+        assert "main" in import_times
+        elapsed_ms = import_times["main"] / 1000
+        assert elapsed_ms <= IMPORT_TIME_BUDGET_MS, (
+            f"import main took {elapsed_ms:.0f}ms (budget {IMPORT_TIME_BUDGET_MS:.0f}ms); slowest: "
+            + ", ".join(
+                f"{name} {us / 1000:.0f}ms"
+                for name, us in sorted(import_times.items(), key=lambda item: -item[1])[1:8]
+            )
+        )
@@ -0,0 +1,6 @@
+"""
+Developer command-line tools for the Chorizaurio API.
+
+Run from the backend directory, e.g.:
+    python -m tools.gen_data --scale 10
+"""
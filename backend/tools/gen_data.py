@@ -0,0 +1,390 @@
+"""
+Synthetic dataset generator: realistic volume for local performance work.
+
+Creates, at scale 1:
+- 10 categorías, 12 tags, 4 listas de precios with special prices
+- 500 clientes across the Montevideo zonas (some on a price list)
+- 300 productos with categoría, tags and stock
+- 6 ofertas of every TipoOferta (porcentaje, precio_cantidad, nxm, regalo)
+- 6 repartidores
+- --years of pedidos (~80 per business day, growing over time) with a
+  weekday / business-hours distribution and ~4 items each, i.e. roughly
+  100k detalle rows per year of history
+
+so --scale 10 --years 1 loads about 1M detalle rows. Popular clientes and
+productos get most of the orders (skewed weights), older pedidos are
+mostly entregado, recent ones pendiente / preparando.
+
+Rows are streamed in chunks with executemany (SQLite) or COPY
+(PostgreSQL) inside one transaction, after ensure_schema() and the
+migrations, and are appended after the existing ids. Output is
+deterministic for a given --seed.
+
+Usage (from backend/):
+    python -m tools.gen_data --scale 10 [--years 2] [--seed 42] [--db /tmp/big.db]
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Rows per executemany / COPY batch
+CHUNK_ROWS = 20000
+
+CATEGORIAS = [
+    ("Embutidos", "#ef4444"), ("Carne vacuna", "#b91c1c"), ("Cerdo", "#f97316"),
+    ("Pollo", "#eab308"), ("Fiambres", "#a855f7"), ("Lácteos", "#3b82f6"),
+    ("Congelados", "#06b6d4"), ("Almacén", "#84cc16"), ("Bebidas", "#14b8a6"),
+    ("Limpieza", "#64748b"),
+]
+TAGS = [
+    ("Refrigerado", "conservacion"), ("Congelado", "conservacion"), ("Seco", "conservacion"),
+    ("Sin TACC", "dieta"), ("Light", "dieta"), ("Orgánico", "dieta"),
+    ("Por kilo", "venta"), ("Por caja", "venta"), ("Por unidad", "venta"),
+    ("Importado", "origen"), ("Nacional", "origen"), ("Artesanal", "origen"),
+]
+LISTAS = [("Minorista", 1.0), ("Mayorista", 0.9), ("Distribuidor", 0.85), ("VIP", 0.8)]
+ZONAS = [
+    "Centro", "Cordón", "Pocitos", "Punta Carretas", "Malvín", "Buceo", "Carrasco",
+    "Cerro", "Unión", "Prado", "La Teja", "Colón", "Sayago", "Parque Batlle",
+]
+PRODUCTOS_BASE = {
+    "Embutidos": ["Chorizo parrillero", "Morcilla dulce", "Salchicha viena", "Chorizo colorado"],
+    "Carne vacuna": ["Asado de tira", "Vacío", "Nalga", "Pulpa", "Carne picada"],
+    "Cerdo": ["Bondiola", "Costilla de cerdo", "Matambre de cerdo", "Panceta"],
+    "Pollo": ["Pollo entero", "Muslo de pollo", "Pechuga", "Milanesa de pollo"],
+    "Fiambres": ["Jamón cocido", "Salame", "Mortadela", "Paleta"],
+    "Lácteos": ["Queso muzzarella", "Queso dambo", "Manteca", "Crema de leche"],
+    "Congelados": ["Hamburguesas", "Nuggets", "Papas prefritas", "Milanesas de soja"],
+    "Almacén": ["Aceite de girasol", "Arroz", "Fideos", "Sal gruesa"],
+    "Bebidas": ["Agua mineral", "Refresco cola", "Jugo de naranja", "Cerveza"],
+    "Limpieza": ["Detergente", "Lavandina", "Bolsas de residuos", "Papel de cocina"],
+}
+VARIANTES = ["x 500 g", "x 1 kg", "x 2 kg", "x 12 unidades", "x 6 unidades", "familiar", "premium", "económico"]
+TIPOS_VENTA = ["unidad", "unidad", "unidad", "kg", "caja", "gancho", "tira"]
+VENDEDORES = ["admin", "vendedor1", "vendedor2", "vendedor3", "oficina"]
+REPARTIDORES = [("Juan", "#ef4444"), ("Pedro", "#3b82f6"), ("Carlos", "#22c55e"),
+                ("Martín", "#f59e0b"), ("Diego", "#8b5cf6"), ("Lucía", "#ec4899")]
+TIPOS_OFERTA = ["porcentaje", "precio_cantidad", "nxm", "regalo"]
+
+# Relative order volume per weekday (Mon..Sun) and per local hour
+WEEKDAY_WEIGHTS = [1.25, 1.1, 1.0, 1.1, 1.3, 0.55, 0.05]
+HOUR_WEIGHTS = {
+    6: 1, 7: 4, 8: 9, 9: 12, 10: 11, 11: 8, 12: 4, 13: 3,
+    14: 6, 15: 7, 16: 6, 17: 4, 18: 2, 19: 1,
+}
+PEDIDOS_POR_DIA = 80  # average business day at scale 1
+UTC_OFFSET_HOURS = 3  # Uruguay is UTC-3; fecha is stored as naive UTC
+
+
+# ============================================================================
+# BULK LOADING
+# ============================================================================
+
+class BulkWriter:
+    """Chunked inserts: executemany on SQLite, COPY FROM STDIN on PostgreSQL."""
+
+    def __init__(self, cur, postgres: bool):
+        self.cur = cur
+        self.postgres = postgres
+        self.counts: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+
+    def insert(self, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]):
+        batch: List[Sequence[Any]] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= CHUNK_ROWS:
+                self._write(table, columns, batch)
+                batch = []
+        if batch:
+            self._write(table, columns, batch)
+
+    def _write(self, table: str, columns: Sequence[str], batch: List[Sequence[Any]]):
+        start = time.perf_counter()
+        if self.postgres:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in batch:
+                writer.writerow([r"\N" if value is None else value for value in row])
+            buffer.seek(0)
+            self.cur.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+            )
+        else:
+            placeholders = ", ".join("?" * len(columns))
+            self.cur.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", batch)
+        self.counts[table] = self.counts.get(table, 0) + len(batch)
+        self.seconds[table] = self.seconds.get(table, 0.0) + time.perf_counter() - start
+
+
+def _max_id(cur, table: str) -> int:
+    cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+    return int(cur.fetchone()[0])
+
+
+def _ids_by_name(writer: "BulkWriter", table: str, names: Iterable[str]) -> Dict[str, int]:
+    names = list(names)
+    placeholders = ", ".join(["%s" if writer.postgres else "?"] * len(names))
+    writer.cur.execute(f"SELECT nombre, id FROM {table} WHERE nombre IN ({placeholders})", names)
+    return {row[0]: row[1] for row in writer.cur.fetchall()}
+
+
+def _insert_missing_by_name(writer: BulkWriter, table: str, columns: Sequence[str], rows: List[Tuple]) -> Dict[str, int]:
+    """Insert rows (first column = nombre) that don't exist yet; return {nombre: id} for all."""
+    existing = _ids_by_name(writer, table, [r[0] for r in rows])
+    missing = [r for r in rows if r[0] not in existing]
+    if missing:
+        writer.insert(table, columns, missing)
+    return _ids_by_name(writer, table, [r[0] for r in rows])
+
+
+def _sync_sequences(cur, tables: Iterable[str]):
+    """Explicit ids bypass PostgreSQL sequences; move them past the loaded rows."""
+    for table in tables:
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        )
+
+
+# ============================================================================
+# GENERATION
+# ============================================================================
+
+def _popularity(rnd: random.Random, n: int, skew: float = 1.1) -> List[float]:
+    """Zipf-like popularity in a shuffled order, as cumulative weights for rnd.choices."""
+    weights = [1.0 / (rank ** skew) for rank in range(1, n + 1)]
+    rnd.shuffle(weights)
+    return list(itertools.accumulate(weights))
+
+
+def _pedido_times(rnd: random.Random, start: date, days: int, per_day: float) -> Iterator[datetime]:
+    """Local order timestamps following weekday / hour weights, with ~30% growth over the period."""
+    hours = list(HOUR_WEIGHTS)
+    hour_weights = list(HOUR_WEIGHTS.values())
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        growth = 0.85 + 0.3 * offset / max(1, days - 1)
+        expected = per_day * WEEKDAY_WEIGHTS[day.weekday()] * growth
+        count = max(0, int(rnd.gauss(expected, expected ** 0.5)))
+        for hour in sorted(rnd.choices(hours, hour_weights, k=count)):
+            yield datetime(day.year, day.month, day.day, hour, rnd.randint(0, 59), rnd.randint(0, 59))
+
+
+def _estado(rnd: random.Random, age_days: int) -> str:
+    if rnd.random() < 0.03:
+        return "cancelado"
+    if age_days > 3:
+        return "entregado"
+    if age_days > 0:
+        return rnd.choice(["preparando", "entregado", "entregado"])
+    return rnd.choice(["pendiente", "pendiente", "preparando"])
+
+
+def generate(scale: float = 1.0, years: float = 2.0, seed: int = 42,
+             today: Optional[date] = None, log=print) -> Dict[str, Dict[str, float]]:
+    """
+    Load the dataset into the configured database (db.DB_PATH or DATABASE_URL).
+    Returns {table: {"rows": n, "seconds": s}}.
+    """
+    import db
+    import migrations
+
+    rnd = random.Random(seed)
+    today = today or date.today()
+    postgres = db.is_postgres()
+    db.ensure_schema()
+    if not postgres:
+        migrations.run_pending_migrations()
+    db.ensure_indexes()
+
+    num_clientes = max(5, int(500 * scale))
+    num_productos = max(10, int(300 * scale))
+    ofertas_por_tipo = max(1, int(6 * scale))
+    days = max(1, int(365 * years))
+
+    started = time.perf_counter()
+    with db.get_db_transaction() as (con, cur):
+        writer = BulkWriter(cur, postgres)
+        now_local = datetime.combine(today, datetime.min.time()).isoformat()
+
+        # -- reference data --
+        categorias = _insert_missing_by_name(
+            writer, "categorias", ("nombre", "descripcion", "color", "orden", "activa", "fecha_creacion"),
+            [(nombre, f"Productos de {nombre.lower()}", color, i, 1, now_local)
+             for i, (nombre, color) in enumerate(CATEGORIAS)]
+        )
+        tags = _insert_missing_by_name(
+            writer, "tags", ("nombre", "tipo"), [(nombre, tipo) for nombre, tipo in TAGS]
+        )
+        listas = _insert_missing_by_name(
+            writer, "listas_precios", ("nombre", "descripcion", "multiplicador", "activa", "fecha_creacion"),
+            [(nombre, f"Lista {nombre.lower()}", mult, 1, now_local) for nombre, mult in LISTAS]
+        )
+        repartidores = _insert_missing_by_name(
+            writer, "repartidores", ("nombre", "telefono", "activo", "color"),
+            [(nombre, f"09{rnd.randint(1000000, 9999999)}", 1, color) for nombre, color in REPARTIDORES]
+        )
+
+        # -- clientes --
+        cliente_base = _max_id(cur, "clientes")
+        lista_ids = list(listas.values())
+        writer.insert("clientes", ("id", "nombre", "telefono", "direccion", "zona", "lista_precio_id"), (
+            (cliente_base + i,
+             f"{rnd.choice(['Almacén', 'Carnicería', 'Autoservicio', 'Rotisería', 'Restaurante'])} "
+             f"{rnd.choice(['El Sol', 'La Esquina', 'Don José', 'San Martín', 'Central', 'Del Puerto'])} {cliente_base + i}",
+             f"09{rnd.randint(1000000, 9999999)}",
+             f"{rnd.choice(['Av. Italia', '18 de Julio', 'Rivera', 'Garzón', 'Agraciada', 'Millán'])} {rnd.randint(100, 5000)}",
+             rnd.choice(ZONAS),
+             rnd.choice(lista_ids) if rnd.random() < 0.3 else None)
+            for i in range(1, num_clientes + 1)
+        ))
+        cliente_ids = list(range(cliente_base + 1, cliente_base + num_clientes + 1))
+
+        # -- productos, tags, special prices --
+        producto_base = _max_id(cur, "productos")
+        categoria_names = list(PRODUCTOS_BASE)
+        productos = []
+        for i in range(1, num_productos + 1):
+            categoria = categoria_names[i % len(categoria_names)]
+            nombre = f"{rnd.choice(PRODUCTOS_BASE[categoria])} {rnd.choice(VARIANTES)} #{producto_base + i}"
+            stock_minimo = rnd.choice([5, 10, 20, 50])
+            productos.append((
+                producto_base + i, nombre, round(rnd.uniform(40, 1500), 2), categorias[categoria],
+                round(rnd.uniform(0, stock_minimo * 8), 1), stock_minimo, rnd.choice(TIPOS_VENTA),
+            ))
+        writer.insert("productos", ("id", "nombre", "precio", "categoria_id", "stock", "stock_minimo", "stock_tipo"), productos)
+        producto_ids = [p[0] for p in productos]
+        precios = {p[0]: p[2] for p in productos}
+        tag_ids = list(tags.values())
+        writer.insert("productos_tags", ("producto_id", "tag_id"), (
+            (producto_id, tag_id)
+            for producto_id in producto_ids
+            for tag_id in rnd.sample(tag_ids, rnd.randint(0, 3))
+        ))
+        writer.insert("precios_lista", ("lista_id", "producto_id", "precio_especial"), (
+            (lista_id, producto_id, round(precios[producto_id] * mult * rnd.uniform(0.95, 1.0), 2))
+            for nombre, mult in LISTAS if mult < 1.0
+            for lista_id in [listas[nombre]]
+            for producto_id in rnd.sample(producto_ids, len(producto_ids) // 3)
+        ))
+
+        # -- ofertas of every type --
+        oferta_cols = set(db._table_columns(cur, "ofertas"))
+        oferta_base = _max_id(cur, "ofertas")
+        ofertas, oferta_productos = [], []
+        for n, tipo in enumerate(t for t in TIPOS_OFERTA for _ in range(ofertas_por_tipo)):
+            oferta_id = oferta_base + n + 1
+            desde = today - timedelta(days=rnd.randint(0, int(days * 0.9)))
+            hasta = desde + timedelta(days=rnd.randint(7, 45))
+            fields = {
+                "id": oferta_id, "titulo": f"Oferta {tipo} {oferta_id}", "descripcion": f"Promoción {tipo}",
+                "desde": desde.isoformat(), "hasta": hasta.isoformat(), "activa": int(hasta >= today),
+                "descuento_porcentaje": rnd.choice([5, 10, 15, 20, 25]) if tipo == "porcentaje" else None,
+                "tipo": tipo,
+                "reglas_json": json.dumps([
+                    {"cantidad": 6, "precio_unitario": round(rnd.uniform(40, 300), 2)},
+                    {"cantidad": 12, "precio_unitario": round(rnd.uniform(30, 250), 2)},
+                ]) if tipo == "precio_cantidad" else None,
+                "compra_cantidad": rnd.choice([2, 3, 4]) if tipo == "nxm" else None,
+                "paga_cantidad": None,
+                "regalo_producto_id": rnd.choice(producto_ids) if tipo == "regalo" else None,
+                "regalo_cantidad": 1 if tipo == "regalo" else None,
+            }
+            if tipo == "nxm":
+                fields["paga_cantidad"] = fields["compra_cantidad"] - 1
+            ofertas.append(fields)
+            for producto_id in rnd.sample(producto_ids, min(len(producto_ids), rnd.randint(1, 5))):
+                oferta_productos.append((oferta_id, producto_id, rnd.choice([1, 2, 3, 6])))
+        # Older schemas lack the advanced offer columns
+        columns = [c for c in ofertas[0] if c in oferta_cols]
+        writer.insert("ofertas", columns, ([o[c] for c in columns] for o in ofertas))
+        writer.insert("oferta_productos", ("oferta_id", "producto_id", "cantidad"), oferta_productos)
+
+        # -- pedidos and detalles --
+        pedido_cliente = db._pedidos_cliente_col(cur)
+        detalle_pedido = db._detalles_pedido_col(cur)
+        detalle_producto = db._detalles_producto_col(cur)
+        cliente_weights = _popularity(rnd, len(cliente_ids), skew=0.9)
+        producto_weights = _popularity(rnd, len(producto_ids), skew=1.1)
+        repartidor_names = list(repartidores)
+        pedido_columns = ("id", pedido_cliente, "fecha", "fecha_creacion", "estado", "creado_por",
+                          "repartidor", "pdf_generado")
+        detalle_columns = (detalle_pedido, detalle_producto, "cantidad", "tipo")
+        pedido_id = _max_id(cur, "pedidos")
+        pedidos: List[Tuple] = []
+        detalles: List[Tuple] = []
+        start = today - timedelta(days=days - 1)
+        for local in _pedido_times(rnd, start, days, PEDIDOS_POR_DIA * scale):
+            pedido_id += 1
+            fecha = (local + timedelta(hours=UTC_OFFSET_HOURS)).isoformat()
+            estado = _estado(rnd, (today - local.date()).days)
+            pedidos.append((
+                pedido_id, rnd.choices(cliente_ids, cum_weights=cliente_weights)[0], fecha, fecha,
+                estado, rnd.choice(VENDEDORES),
+                rnd.choice(repartidor_names) if estado in ("preparando", "entregado") else None,
+                int(estado == "entregado"),
+            ))
+            items = rnd.choices(producto_ids, cum_weights=producto_weights, k=rnd.randint(1, 8))
+            for producto_id in set(items):
+                detalles.append((pedido_id, producto_id, rnd.choice([1, 1, 2, 3, 5, 10, 12]),
+                                 rnd.choice(TIPOS_VENTA)))
+            # Parents first so the detalle foreign keys always resolve
+            if len(detalles) >= CHUNK_ROWS:
+                writer.insert("pedidos", pedido_columns, pedidos)
+                writer.insert("detalles_pedido", detalle_columns, detalles)
+                pedidos, detalles = [], []
+        writer.insert("pedidos", pedido_columns, pedidos)
+        writer.insert("detalles_pedido", detalle_columns, detalles)
+
+        if postgres:
+            _sync_sequences(cur, ["clientes", "productos", "ofertas", "pedidos", "categorias", "tags",
+                                  "listas_precios", "repartidores"])
+
+    if not postgres:
+        with db.get_db_connection() as con:
+            con.execute("ANALYZE")
+
+    total = time.perf_counter() - started
+    report = {
+        table: {"rows": rows, "seconds": round(writer.seconds[table], 3)}
+        for table, rows in writer.counts.items()
+    }
+    log(f"Loaded {sum(writer.counts.values())} rows in {total:.1f}s "
+        f"({writer.counts.get('detalles_pedido', 0)} detalles_pedido)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="size factor (10 ~ 1M detalle rows per year)")
+    parser.add_argument("--years", type=float, default=2.0, help="years of pedidos history")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="SQLite file to load (default: DB_PATH / DATABASE_URL)")
+    parser.add_argument("--force", action="store_true", help="allow running with ENVIRONMENT=production")
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["DB_PATH"] = args.db
+        os.environ["USE_POSTGRES"] = "false"
+    if os.getenv("ENVIRONMENT") == "production" and not args.force:
+        sys.exit("Refusing to load synthetic data with ENVIRONMENT=production (use --force)")
+
+    import db
+    if args.db:
+        db.DB_PATH = args.db
+    target = "PostgreSQL" if db.is_postgres() else db.DB_PATH
+    print(f"Generating scale={args.scale} years={args.years} seed={args.seed} into {target}", file=sys.stderr)
+    report = generate(args.scale, args.years, args.seed, log=lambda msg: print(msg, file=sys.stderr))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()